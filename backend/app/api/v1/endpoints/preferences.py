@@ -6,6 +6,7 @@ from typing import Dict, Any
 from app.api.v1.envelope import ApiResponse
 from app.api.v1.resp import ok
 from app.core.config import settings
+from app.services.registry_io import atomic_write_text
 from app.schemas.preferences import UserPreferences
 
 router = APIRouter(tags=["preferences"])
@@ -26,9 +27,8 @@ def _read_preferences() -> Dict[str, Any]:
 def _write_preferences(prefs: Dict[str, Any]) -> None:
     """写入偏好配置，直接覆盖"""
     try:
-        os.makedirs(os.path.dirname(settings.PREFERENCES_PATH), exist_ok=True)
-        with open(settings.PREFERENCES_PATH, "w", encoding="utf-8") as f:
-            json.dump(prefs, f, ensure_ascii=False, indent=2)
+        # 原子替换：多个 worker 并发读时不会读到写了一半的文件
+        atomic_write_text(settings.PREFERENCES_PATH, json.dumps(prefs, ensure_ascii=False, indent=2))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to write preferences: {e}")
 
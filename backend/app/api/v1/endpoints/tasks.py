@@ -1,16 +1,26 @@
-from fastapi import APIRouter, HTTPException, Query, Request
-from fastapi.responses import FileResponse
-from typing import List, Dict
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import List, Dict, Optional
 from app.schemas.pipelines import (
-    PipelineExecutionResult
+    PipelineBatchExecutionRequest,
+    PipelineExecutionForkRequest,
+    PipelineExecutionResult,
+    PipelineSweepRequest
 )
 from app.services.dataflow_engine import dataflow_engine
+from app.services.execution_events import TERMINAL_STATUSES, execution_event_hub
+from app.services.sample_runs import sample_spec
+from app.services.cache_retention import finalize_task_cache, is_compressed, resolve_step_file, step_file_path, touch_step_file
 from app.core.container import container
 from app.api.v1.envelope import ApiResponse
 from app.api.v1.resp import ok
 from app.api.v1.errors import *
 from datetime import datetime
 from app.core.logger_setup import get_logger
+import asyncio
+import gzip
+import json
 import os
 
 # 配置日志
@@ -20,30 +30,82 @@ router = APIRouter(tags=["tasks"])
 
 
 # CRUD操作API
-@router.get("/executions", response_model=ApiResponse[List[PipelineExecutionResult]], operation_id="list_executions", summary="列出所有Pipeline执行记录")
-def list_executions():
+# 只传 cursor 时的每页条数
+EXECUTIONS_PAGE_SIZE = 50
+
+
+def _split_csv(value: Optional[str]) -> Optional[List[str]]:
+    """逗号分隔的查询参数 -> 列表"""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()] or None
+
+
+@router.get("/executions", response_model=ApiResponse[List[Dict]], operation_id="list_executions", summary="分页列出Pipeline执行记录")
+def list_executions(
+    status: Optional[str] = Query(None, description="状态过滤，多个用逗号分隔，如 queued,running"),
+    pipeline_id: Optional[str] = Query(None, description="Pipeline ID 过滤"),
+    created_after: Optional[str] = Query(None, description="创建时间下界（ISO 格式，含）"),
+    created_before: Optional[str] = Query(None, description="创建时间上界（ISO 格式，含）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 meta.next_cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页条数；不传 limit 与 cursor 时不分页，返回全部"),
+    fields: Optional[str] = Query(
+        None,
+        description="返回字段，逗号分隔；默认只返回摘要字段，pipeline_config / logs / output 等需显式请求",
+    ),
+):
+    """
+    分页列出执行记录（按创建时间倒序）
+
+    翻页时把响应 meta.next_cursor 原样作为 cursor 传回；next_cursor 为空表示没有更多数据。
+    limit 与 cursor 都不传时与旧接口一致，返回全部记录（摘要字段）。
+    """
+    if limit is None and cursor:
+        limit = EXECUTIONS_PAGE_SIZE
     try:
-        executions = container.task_registry.list_executions()
-        return ok(executions)
+        executions, next_cursor = container.task_registry.list_executions(
+            status=_split_csv(status),
+            pipeline_id=pipeline_id,
+            created_after=created_after,
+            created_before=created_before,
+            cursor=cursor,
+            limit=limit,
+            fields=_split_csv(fields),
+        )
+        return ok(executions, meta={"next_cursor": next_cursor, "limit": limit})
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         logger.error(f"Failed to list executions: {e}")
         raise HTTPException(500, f"Failed to list executions: {e}")
 
 @router.get("/execution/{task_id}/status", response_model=ApiResponse[Dict], operation_id="get_execution_status", summary="查询Pipeline执行状态（算子粒度）")
-def get_execution_status(task_id: str):
+async def get_execution_status(
+    task_id: str,
+    wait_for_change: bool = Query(False, description="为 true 时阻塞到状态/当前算子/进度(10%)变化或超时，只返回增量"),
+    timeout_s: float = Query(30.0, ge=0, le=120, description="wait_for_change 时的最长等待秒数"),
+    since: Optional[int] = Query(None, ge=0, description="wait_for_change 时的起点游标，取上次返回的 cursor；缺省为当前"),
+):
     """
     查询任务执行状态（包含算子粒度）
     
     Args:
         task_id: 任务 ID
+        wait_for_change: 长轮询模式。Agent 轮询执行进度时应使用该模式并传回上次的 cursor，
+            以减少往返次数；返回的 operators 只包含有变化的算子，logs 只包含新日志的末尾几行
+        timeout_s: 长轮询最长等待时间，超时返回 timed_out=true
+        since: 长轮询起点游标
     
     Returns:
-        执行状态字典，包含每个算子的执行状态
+        执行状态字典，包含每个算子的执行状态；长轮询模式下为增量字典
     """
     try:
         logger.info(f"Request: GET /execution/{task_id}/status")
         
-        status = container.task_registry.get_execution_status(task_id)
+        if wait_for_change:
+            status = await container.task_registry.wait_execution_change(task_id, since=since, timeout_s=timeout_s)
+        else:
+            status = await run_in_threadpool(container.task_registry.get_execution_status, task_id)
         if not status:
             raise HTTPException(404, f"Task with id {task_id} not found")
         
@@ -55,6 +117,53 @@ def get_execution_status(task_id: str):
         logger.error(f"Failed to get task status: {e}")
         raise HTTPException(500, f"Failed to get task status: {str(e)}")
 
+def _sse(event: Dict) -> str:
+    """编码一条 SSE 消息；id 即事件游标，断线重连时浏览器会带上 Last-Event-ID"""
+    return (
+        f"id: {event['cursor']}\n"
+        f"event: {event.get('type', 'message')}\n"
+        f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+    )
+
+
+@router.get("/execution/{task_id}/events", operation_id="stream_execution_events", summary="订阅Pipeline执行事件（SSE）")
+async def stream_execution_events(
+    request: Request,
+    task_id: str,
+    since: Optional[int] = Query(None, ge=0, description="事件游标（字节偏移），通常取 status 接口返回的 cursor"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    以 Server-Sent Events 推送任务的执行事件
+
+    事件类型：status（状态切换）、operator（算子状态）、progress（进度）、log（新日志行）。
+    每个事件的 data 中带 cursor，重连时作为 since 传回即可续传（带 Last-Event-ID 且更大时以它为准）；任务进入终态后流结束。
+    """
+    registry = container.task_registry
+    record = registry.get(task_id)
+    if not record:
+        raise HTTPException(404, f"Task with id {task_id} not found")
+
+    # EventSource 自动重连时 URL 里仍是最初的 since，Last-Event-ID 才是最后收到的游标：取两者中较大者
+    since = max(since or 0, int(last_event_id) if last_event_id and last_event_id.isdigit() else 0)
+    journal = registry.journal(task_id)
+
+    async def event_stream():
+        if not journal.exists() and record.get("status") in TERMINAL_STATUSES:
+            # 没有事件日志的历史任务：直接给出终态
+            yield _sse({"type": "status", "status": record.get("status"), "fields": {}, "cursor": since})
+            return
+        async for event in execution_event_hub.subscribe(task_id, journal, since):
+            if await request.is_disconnected():
+                break
+            yield _sse(event) if event is not None else ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/execution/{task_id}/result", response_model=ApiResponse[Dict], operation_id="get_task_result", summary="查询任务执行结果")
 def get_task_result(task_id: str, step: int = None, limit: int = 5):
     """
@@ -115,14 +224,48 @@ def get_execution_log(task_id: str, operator_name: str = Query(None, description
         raise HTTPException(500, f"Failed to get task logs: {str(e)}")
 
 
+@router.get("/execution/{task_id}/log/tail", response_model=ApiResponse[Dict], operation_id="tail_execution_log", summary="增量读取任务日志")
+def tail_execution_log(
+    task_id: str,
+    offset: int = Query(0, ge=0, description="上次返回的 next_offset，首次传 0"),
+    max_lines: int = Query(200, ge=1, le=5000, description="本次最多返回的行数"),
+    last_n: Optional[int] = Query(None, ge=0, le=5000, description="只返回最后 N 行（忽略 offset）"),
+    operator_name: Optional[str] = Query(None, description="算子名称（可选，只看该算子的日志）"),
+):
+    """
+    增量读取任务日志
+
+    只返回 offset 之后的新日志行和下一次的 next_offset；last_n 可在不加载完整日志的情况下
+    取最后 N 行。跟随日志时先用 last_n 取尾部，再用返回的 next_offset 继续增量读取。
+    """
+    try:
+        tail = container.task_registry.tail_execution_logs(
+            task_id,
+            offset=offset,
+            max_lines=max_lines,
+            last_n=last_n,
+            operator_name=operator_name,
+        )
+        if tail is None:
+            raise HTTPException(404, f"Task with id {task_id} not found")
+        return ok(tail)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to tail task logs: {e}")
+        raise HTTPException(500, f"Failed to tail task logs: {str(e)}")
+
+
 @router.get("/execution/{task_id}/download", operation_id="download_task_result", summary="下载任务执行结果文件,step从0开始计数，想请求第一个算子传step=0")
-def download_task_result(task_id: str, step: int = None):
+def download_task_result(task_id: str, step: int = None, compressed: bool = Query(False, description="中间步骤已压缩时直接下载 .gz 原文件")):
     """
     下载任务执行结果文件
     
     Args:
         task_id: 任务 ID
         step: 步骤索引（可选，None 表示下载最后一个已完成的步骤）
+        compressed: 中间步骤已被压缩时，是否直接返回 .gz 文件（默认边解压边下载）
     
     Returns:
         文件下载响应
@@ -131,8 +274,7 @@ def download_task_result(task_id: str, step: int = None):
         logger.info(f"Request: GET /execution/{task_id}/download, step={step}")
         
         # 获取执行记录
-        data = container.task_registry._read()
-        execution_data = data.get("tasks", {}).get(task_id)
+        execution_data = container.task_registry.get(task_id)
         
         if not execution_data:
             raise HTTPException(404, f"Task with id {task_id} not found")
@@ -157,25 +299,45 @@ def download_task_result(task_id: str, step: int = None):
         operator_info = execution_results[step]
         operator_name = operator_info.get("operator", f"step_{step}")
         
-        # 构建缓存文件路径（使用绝对路径）
-        from app.core.config import settings
-        cache_path = settings.CACHE_DIR
-        cache_task_dir = f"{task_id}_output"
-        cache_file_prefix = "dataflow_cache_step"
+        # 构建缓存文件路径（使用绝对路径；中间步骤在运行结束后会被压缩为 .jsonl.gz）
         actual_step_for_json = step + 1
-
-        cache_file_name = f"{cache_file_prefix}_step{actual_step_for_json}.jsonl"
-
-        cache_file = os.path.join(cache_path, cache_task_dir, cache_file_name)
+        cache_file = resolve_step_file(task_id, step)
         
         # 检查文件是否存在
-        if not os.path.exists(cache_file):
-            raise HTTPException(404, f"Result file not found for step {step}: {cache_file}")
+        if cache_file is None:
+            if step in (execution_data.get("evicted_steps") or []):
+                # 文件被缓存回收，而不是从未生成
+                raise HTTPException(410, f"Result file for step {step} was evicted from cache at {execution_data.get('cache_evicted_at')}")
+            raise HTTPException(404, f"Result file not found for step {step}: {step_file_path(task_id, step)}")
+        touch_step_file(cache_file)
         
         # 返回文件下载
         filename = f"{task_id}_{operator_name}_step{actual_step_for_json}.jsonl"
         logger.info(f"Downloading file: {cache_file} as {filename}")
         
+        if is_compressed(cache_file):
+            if compressed:
+                return FileResponse(
+                    path=cache_file,
+                    filename=filename + ".gz",
+                    media_type="application/gzip",
+                    headers={"Content-Disposition": f"attachment; filename=\"{filename}.gz\""}
+                )
+            # 边解压边发送，不在内存或磁盘上展开整个文件
+            def _decompressed_chunks():
+                with gzip.open(cache_file, "rb") as f:
+                    while True:
+                        chunk = f.read(256 * 1024)
+                        if not chunk:
+                            break
+                        yield chunk
+            
+            return StreamingResponse(
+                _decompressed_chunks(),
+                media_type="application/jsonl",
+                headers={"Content-Disposition": f"attachment; filename=\"{filename}\""}
+            )
+        
         return FileResponse(
             path=cache_file,
             filename=filename,
@@ -192,6 +354,38 @@ def download_task_result(task_id: str, step: int = None):
         raise HTTPException(500, f"Failed to download execution result: {str(e)}")
 
 
+@router.put("/execution/{task_id}/pin", response_model=ApiResponse[Dict], operation_id="pin_task_output", summary="固定/取消固定任务输出（固定后不会被缓存回收）")
+def pin_task_output(task_id: str, pinned: bool = Query(True, description="true 固定，false 取消固定")):
+    try:
+        record = container.task_registry.set_pinned(task_id, pinned)
+        if not record:
+            raise HTTPException(404, f"Task with id {task_id} not found")
+        return ok({"task_id": task_id, "pinned": bool(record.get("pinned"))})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to pin task output: {e}")
+        raise HTTPException(500, f"Failed to pin task output: {e}")
+
+
+@router.get("/cache/usage", response_model=ApiResponse[Dict], operation_id="get_cache_usage", summary="查看任务输出缓存占用")
+def get_cache_usage():
+    try:
+        return ok(container.cache_retention.usage())
+    except Exception as e:
+        logger.error(f"Failed to get cache usage: {e}")
+        raise HTTPException(500, f"Failed to get cache usage: {e}")
+
+
+@router.post("/cache/enforce", response_model=ApiResponse[Dict], operation_id="enforce_cache_retention", summary="立即按配额/时效回收任务输出缓存")
+def enforce_cache_retention():
+    try:
+        return ok(container.cache_retention.enforce())
+    except Exception as e:
+        logger.error(f"Failed to enforce cache retention: {e}")
+        raise HTTPException(500, f"Failed to enforce cache retention: {e}")
+
+
 @router.get("/stats", response_model=ApiResponse[Dict], operation_id="get_task_stats", summary="获取任务统计信息（状态分布等）")
 def get_task_stats():
     try:
@@ -202,6 +396,30 @@ def get_task_stats():
         raise HTTPException(500, f"Failed to get task stats: {e}")
 
 
+@router.get("/stats/rollups", response_model=ApiResponse[List[Dict]], operation_id="get_task_stats_rollups", summary="按分钟/小时/天聚合的运行统计（成功率、耗时 p95、处理行数）")
+def get_task_stats_rollups(
+    granularity: str = Query("hour", description="聚合粒度：minute / hour / day"),
+    since: Optional[str] = Query(None, description="起始时间（ISO 格式，含）"),
+    until: Optional[str] = Query(None, description="结束时间（ISO 格式，含）"),
+    pipeline_id: Optional[str] = Query(None, description="只看某个 Pipeline"),
+    by_pipeline: bool = Query(True, description="是否按 Pipeline 分组；false 时同一时间桶合并为一行"),
+):
+    try:
+        rollups = container.task_registry.get_rollups(
+            granularity=granularity,
+            since=since,
+            until=until,
+            pipeline_id=pipeline_id,
+            by_pipeline=by_pipeline,
+        )
+        return ok(rollups, meta={"granularity": granularity, "count": len(rollups)})
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        logger.error(f"Failed to get task stats rollups: {e}")
+        raise HTTPException(500, f"Failed to get task stats rollups: {e}")
+
+
 # Pipeline执行API
 @router.post("/execute", response_model=ApiResponse[PipelineExecutionResult], operation_id="execute_pipeline", summary="执行Pipeline")
 async def execute_pipeline(request: Request, pipeline_id):
@@ -224,10 +442,9 @@ async def execute_pipeline(request: Request, pipeline_id):
         result = dataflow_engine.run(pipeline_config["config"], task_id, execution_path=container.task_registry.path)
         
         # 更新执行记录到 registry
-        data = container.task_registry._read()
-        if task_id in data.get("tasks", {}):
-            data["tasks"][task_id].update(result)
-            container.task_registry._write(data)
+        container.task_registry.store.update(task_id, lambda record: record.update(result))
+        # 压缩中间步骤 + 缓存回收放到后台，不拖慢响应
+        asyncio.get_running_loop().run_in_executor(None, finalize_task_cache, task_id, container.task_registry.store)
         
         return ok(result, message=f"Pipeline execution {result['status']}")
         
@@ -248,18 +465,15 @@ async def execute_pipeline(request: Request, pipeline_id):
             # 如果有 task_id，更新执行状态为 failed
             if task_id:
                 try:
-                    data = container.task_registry._read()
-                    if task_id in data.get("tasks", {}):
-                        data["tasks"][task_id].update({
-                            "status": "failed",
-                            "output": {
-                                "error": e.message,
-                                "context": e.context,
-                                "original_error": str(e.original_error) if e.original_error else None
-                            },
-                            "completed_at": datetime.now().isoformat()
-                        })
-                        container.pipeline_registry._write(data)
+                    container.task_registry.store.update(task_id, lambda record: record.update({
+                        "status": "failed",
+                        "output": {
+                            "error": e.message,
+                            "context": e.context,
+                            "original_error": str(e.original_error) if e.original_error else None
+                        },
+                        "completed_at": datetime.now().isoformat()
+                    }))
                 except Exception as update_error:
                     logger.error(f"Failed to update execution status: {update_error}")
             
@@ -280,12 +494,22 @@ async def execute_pipeline(request: Request, pipeline_id):
 
 
 @router.post("/execute-async", response_model=ApiResponse[Dict], operation_id="execute_pipeline_async", summary="异步执行Pipeline（使用Ray）")
-async def execute_pipeline_async(request: Request, pipeline_id: str):
+async def execute_pipeline_async(
+    request: Request,
+    pipeline_id: str,
+    priority: Optional[str] = Query(None, pattern="^(interactive|batch)$", description="调度队列：interactive（小数据 / 采样运行，优先）或 batch；缺省按输入数据集行数决定"),
+    user_id: str = Query("default", description="提交用户，调度器在同一队列内按用户公平分配"),
+    step_cache: bool = Query(True, description="是否复用跨运行步骤缓存；false 时本次运行的每个算子都重新计算"),
+    sample_mode: Optional[str] = Query(None, pattern="^(head|random|percent)$", description="采样运行：head（前 N 行）/ random（随机 N 行）/ percent（按百分比随机）；缺省为全量运行"),
+    sample_size: Optional[float] = Query(None, gt=0, description="采样行数（head / random）或百分比（percent）"),
+    sample_seed: Optional[int] = Query(None, description="random / percent 采样的随机种子，缺省为 0"),
+):
     """
     异步执行 Pipeline
     
-    使用 Ray 进行异步执行，立即返回 task_id 和 task_id
-    客户端可以通过 GET /execution/{task_id}/status 轮询执行状态
+    提交到调度队列后立即返回 task_id 与排队信息（位置、预计开始时间）；
+    客户端可以通过 GET /execution/{task_id}/status 轮询执行状态。
+    给出 sample_mode 时只在采样出的数据上执行（采样运行，走交互队列）
     """
     try:
         logger.info(f"Request: {request.method} {request.url.path}")
@@ -293,10 +517,18 @@ async def execute_pipeline_async(request: Request, pipeline_id: str):
         pipeline_config = container.pipeline_registry.get_pipeline(pipeline_id)
         if not pipeline_config:
             raise HTTPException(404, f"Pipeline {pipeline_id} not found")
+        try:
+            sample = sample_spec(sample_mode, sample_size, sample_seed)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
 
         # 调用服务层开始异步执行
         result = await container.task_registry.start_execution_async(
-            pipeline_id=pipeline_id
+            pipeline_id=pipeline_id,
+            priority=priority,
+            user_id=user_id,
+            step_cache=step_cache,
+            sample=sample
         )
         task_id = result["task_id"]
         logger.info(f"Async Execution ID: {task_id}, Task ID: {task_id}")
@@ -304,7 +536,10 @@ async def execute_pipeline_async(request: Request, pipeline_id: str):
         return ok({
             "task_id": task_id,
             "status": "queued",
-            "message": "Pipeline execution submitted to Ray"
+            "lane": result["lane"],
+            "queue": result["queue"],
+            "sample": sample,
+            "message": "Pipeline execution submitted to scheduler"
         })
         
     except HTTPException:
@@ -316,6 +551,196 @@ async def execute_pipeline_async(request: Request, pipeline_id: str):
         raise HTTPException(500, f"Failed to submit pipeline execution: {str(e)}")
 
 
+@router.post("/execution/{task_id}/resume", response_model=ApiResponse[Dict], operation_id="resume_execution", summary="从最后一个完好的步骤续跑")
+async def resume_execution(
+    request: Request,
+    task_id: str,
+    priority: Optional[str] = Query(None, pattern="^(interactive|batch)$", description="调度队列；缺省按输入数据集行数决定"),
+    user_id: str = Query("default", description="提交用户"),
+):
+    """
+    新建一个子执行：复用该执行已完成算子的输出（cache_local/{task_id}_output），只运行剩下的算子
+    """
+    try:
+        logger.info(f"Request: {request.method} {request.url.path}")
+        result = await container.task_registry.resume_execution(task_id, priority=priority, user_id=user_id)
+        return ok({
+            "task_id": result["task_id"],
+            "status": "queued",
+            "lane": result["lane"],
+            "queue": result["queue"],
+            "lineage": result["lineage"],
+            "message": f"Resumed from step {result['lineage']['from_step']}"
+        })
+    except KeyError:
+        raise HTTPException(404, f"Task {task_id} not found")
+    except FileNotFoundError as e:
+        # 需要复用的步骤输出已被缓存回收
+        raise HTTPException(410, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to resume execution {task_id}: {e}")
+        raise HTTPException(500, f"Failed to resume execution: {str(e)}")
+
+
+@router.post("/execution/{task_id}/fork", response_model=ApiResponse[Dict], operation_id="fork_execution", summary="从指定步骤分叉执行")
+async def fork_execution(
+    request: Request,
+    task_id: str,
+    body: PipelineExecutionForkRequest,
+    priority: Optional[str] = Query(None, pattern="^(interactive|batch)$", description="调度队列；缺省按输入数据集行数决定"),
+    user_id: str = Query("default", description="提交用户"),
+):
+    """
+    新建一个子执行：from_step 之前的算子输出复用该执行的结果，之后的算子可以替换成编辑过的版本
+    """
+    try:
+        logger.info(f"Request: {request.method} {request.url.path}, from_step={body.from_step}")
+        operators = [op.model_dump() for op in body.operators] if body.operators is not None else None
+        result = await container.task_registry.fork_execution(
+            task_id, body.from_step, operators=operators, priority=priority, user_id=user_id
+        )
+        return ok({
+            "task_id": result["task_id"],
+            "status": "queued",
+            "lane": result["lane"],
+            "queue": result["queue"],
+            "lineage": result["lineage"],
+            "message": f"Forked from step {body.from_step}"
+        })
+    except KeyError:
+        raise HTTPException(404, f"Task {task_id} not found")
+    except FileNotFoundError as e:
+        # 需要复用的步骤输出已被缓存回收
+        raise HTTPException(410, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fork execution {task_id}: {e}")
+        raise HTTPException(500, f"Failed to fork execution: {str(e)}")
+
+
+@router.post("/execute-batch", response_model=ApiResponse[Dict], operation_id="execute_pipeline_batch", summary="同一个Pipeline批量执行多个数据集")
+async def execute_pipeline_batch(
+    request: Request,
+    body: PipelineBatchExecutionRequest,
+    priority: Optional[str] = Query(None, pattern="^(interactive|batch)$", description="调度队列；缺省按各数据集行数决定"),
+    user_id: str = Query("default", description="提交用户，调度器在同一队列内按用户公平分配"),
+    step_cache: bool = Query(True, description="是否复用跨运行步骤缓存"),
+    sample_mode: Optional[str] = Query(None, pattern="^(head|random|percent)$", description="对每个数据集做采样运行，含义同 execute-async"),
+    sample_size: Optional[float] = Query(None, gt=0, description="采样行数或百分比"),
+    sample_seed: Optional[int] = Query(None, description="采样随机种子"),
+):
+    """
+    建一个批量父任务，为每个数据集提交一个子执行（照常经过调度队列与并发限制）；
+    通过 GET /batch/{batch_id}/status 查看汇总进度
+    """
+    try:
+        logger.info(f"Request: {request.method} {request.url.path}, pipeline_id={body.pipeline_id}")
+        if not body.dataset_ids and not body.dataset_glob:
+            raise HTTPException(400, "Either dataset_ids or dataset_glob must be provided")
+        try:
+            sample = sample_spec(sample_mode, sample_size, sample_seed)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        result = await container.task_registry.start_batch_execution(
+            body.pipeline_id,
+            dataset_ids=body.dataset_ids,
+            dataset_glob=body.dataset_glob,
+            priority=priority,
+            user_id=user_id,
+            step_cache=step_cache,
+            sample=sample,
+        )
+        return ok(dict(result, status="queued", message=f"Submitted {result['total']} execution(s)"))
+    except KeyError as e:
+        raise HTTPException(404, f"Not found: {e}")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to submit batch execution: {e}")
+        raise HTTPException(500, f"Failed to submit batch execution: {str(e)}")
+
+
+@router.post("/execute-sweep", response_model=ApiResponse[Dict], operation_id="execute_pipeline_sweep", summary="参数扫描：共享上游只跑一次")
+async def execute_pipeline_sweep(
+    request: Request,
+    body: PipelineSweepRequest,
+    priority: Optional[str] = Query(None, pattern="^(interactive|batch)$", description="调度队列；缺省按输入数据集行数决定"),
+    user_id: str = Query("default", description="提交用户，调度器在同一队列内按用户公平分配"),
+    step_cache: bool = Query(True, description="是否复用跨运行步骤缓存"),
+    sample_mode: Optional[str] = Query(None, pattern="^(head|random|percent)$", description="在采样数据上做扫描，含义同 execute-async"),
+    sample_size: Optional[float] = Query(None, gt=0, description="采样行数或百分比"),
+    sample_seed: Optional[int] = Query(None, description="采样随机种子"),
+):
+    """
+    先运行被扫描算子之前的共享前缀，完成后每个取值分叉出一个下游运行；
+    通过 GET /sweep/{sweep_id} 查看对比表
+    """
+    try:
+        logger.info(f"Request: {request.method} {request.url.path}, pipeline_id={body.pipeline_id}")
+        try:
+            sample = sample_spec(sample_mode, sample_size, sample_seed)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        result = await container.task_registry.start_sweep(
+            body.pipeline_id,
+            operator_index=body.operator_index,
+            param=body.param,
+            values=body.values,
+            section=body.section,
+            priority=priority,
+            user_id=user_id,
+            step_cache=step_cache,
+            sample=sample,
+        )
+        return ok(dict(result, status="queued"))
+    except KeyError as e:
+        raise HTTPException(404, f"Not found: {e}")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to start sweep: {e}")
+        raise HTTPException(500, f"Failed to start sweep: {str(e)}")
+
+
+@router.get("/sweep/{sweep_id}", response_model=ApiResponse[Dict], operation_id="get_sweep_comparison", summary="参数扫描的对比表")
+async def get_sweep_comparison(sweep_id: str):
+    """
+    每个取值一行：状态、输出行数、下游算子耗时与前几行输出；另附共享前缀的运行情况
+    """
+    try:
+        return ok(await container.task_registry.sweep_status(sweep_id))
+    except KeyError:
+        raise HTTPException(404, f"Sweep {sweep_id} not found")
+    except Exception as e:
+        logger.error(f"Failed to get sweep comparison: {e}")
+        raise HTTPException(500, f"Failed to get sweep comparison: {str(e)}")
+
+
+@router.get("/batch/{batch_id}/status", response_model=ApiResponse[Dict], operation_id="get_batch_status", summary="批量执行的汇总进度")
+async def get_batch_status(batch_id: str):
+    """
+    汇总子执行的状态：各状态数量、完成百分比、吞吐（行/秒）与失败的子执行
+    """
+    try:
+        return ok(await run_in_threadpool(container.task_registry.batch_status, batch_id))
+    except KeyError:
+        raise HTTPException(404, f"Batch {batch_id} not found")
+    except Exception as e:
+        logger.error(f"Failed to get batch status: {e}")
+        raise HTTPException(500, f"Failed to get batch status: {str(e)}")
+
+
 @router.post("/execution/{task_id}/kill", response_model=ApiResponse[Dict], operation_id="kill_execution", summary="终止Pipeline执行")
 async def kill_execution(request: Request, task_id: str):
     """
@@ -330,8 +755,8 @@ async def kill_execution(request: Request, task_id: str):
     try:
         logger.info(f"Request: {request.method} {request.url.path}, task_id: {task_id}")
         
-        # 调用服务层终止任务
-        killed = container.task_registry.kill_execution(task_id)
+        # 调用服务层终止任务（会等 worker 进程 / actor 退出，放到线程池里）
+        killed = await run_in_threadpool(container.task_registry.kill_execution, task_id)
         
         if not killed:
             raise HTTPException(404, f"Task {task_id} not found or cannot be killed")
@@ -20,6 +20,39 @@ class Settings(BaseSettings):
     
     DATA_REGISTRY: str = os.path.join(BASE_DIR, "data", "data_registry.yaml") #
     TASK_REGISTRY: str = os.path.join(BASE_DIR, "data", "task_registry.json")
+    TASK_STORE_BACKEND: str = "sqlite" # "sqlite" (WAL, task_registry.db next to TASK_REGISTRY) or "json" (legacy single file)
+    EXECUTION_EVENT_POLL_INTERVAL: float = 0.2 # seconds between journal size checks for live execution event streams
+    STATS_MINUTE_RETENTION_HOURS: float = 48 # per-minute task rollups older than this are pruned (hour/day rollups are kept)
+    EXECUTION_STATE_FLUSH_INTERVAL: float = 0.2 # seconds between batched writes of the execution state actor
+    EXECUTION_REPORT_BATCH_SIZE: int = 200 # worker sends buffered status/log events to the state actor once this many are queued
+    EXECUTION_REPORT_MAX_DELAY: float = 0.25 # ...or at least this often (seconds)
+    EXECUTION_MAX_CONCURRENCY: int = 2 # pipeline runs dispatched at once by the scheduler; the rest wait in the queue
+    EXECUTION_INTERACTIVE_RESERVED: int = 1 # of those, slots batch runs may not take (kept free for the interactive lane)
+    EXECUTION_INTERACTIVE_MAX_ROWS: int = 1000 # runs on datasets up to this many rows default to the interactive lane
+    EXECUTION_DEFAULT_RUN_SECONDS: float = 300 # run time assumed for queue ETAs until a pipeline has finished runs
+    EXECUTION_WORKER_POOL_SIZE: int = 2 # long-lived Ray worker actors with DataFlow preloaded (0 = a fresh Ray task per run)
+    EXECUTION_WORKER_MAX_JOBS: int = 50 # a pooled worker is recycled after this many runs (0 = never)
+    EXECUTION_WORKER_MAX_RSS_GROWTH_MB: float = 2048 # ...or once its RSS grew this much since warm-up (0 = never)
+    EXECUTION_RESOURCE_ADMISSION: bool = True # dispatch a run only when its CPU / memory request fits into Ray's free resources
+    EXECUTION_ADMISSION_RETRY_S: float = 5.0 # how often a run waiting for resources re-checks Ray's free resources
+    EXECUTION_MEMORY_BASE_MB: float = 256 # memory assumed for a run before looking at its input
+    EXECUTION_MEMORY_PER_INPUT_MB: float = 4.0 # MB of memory per MB of input file (rows expand in pandas)
+    EXECUTION_MEMORY_PER_ROW_KB: float = 4.0 # ...or per input row when the dataset has no file_size
+    EXECUTION_MEMORY_HISTORY_RUNS: int = 10 # recent finished runs of a pipeline whose measured memory feeds the estimate
+    EXECUTION_MEMORY_HISTORY_HEADROOM: float = 1.2 # factor applied to the largest measured memory
+    EXECUTION_SHARD_MIN_ROWS: int = 50 # operators declared with `shards` never get shards smaller than this many rows
+    EXECUTION_STREAM_CHUNK_ROWS: int = 1000 # rows per chunk flowing between consecutive `stream` operators
+    EXECUTION_STREAM_QUEUE_CHUNKS: int = 2 # chunks buffered between two streaming operators before the upstream one blocks
+    EXECUTION_PARALLEL_BRANCHES: bool = False # run independent operators (by input_*/output_* key flow) as concurrent branches, see branch_execution.py
+    EXECUTION_BRANCH_WORKERS: int = 4 # threads running the branches of one parallel block
+    EXECUTION_SWEEP_SAMPLE_ROWS: int = 3 # output rows shown per variant in the comparison table of a parameter sweep
+    EXECUTION_ISOLATED_CONTEXT: bool = False # run operators without os.chdir / global redirect_stdout (per-context output capture, relative path params resolved explicitly), see execution_context.py; implied by EXECUTION_WORKER_CONCURRENCY > 1
+    EXECUTION_WORKER_CONCURRENCY: int = 1 # pipelines one pooled worker runs at once (threaded actor, for I/O-bound runs); >1 also turns on the isolated context
+    EXECUTION_BACKEND: str = "ray" # "ray", or "local": warm worker processes on this machine without a Ray runtime (single-node deployments), see pipeline_executor.py
+    EXECUTION_LOCAL_WORKERS: int = 2 # warm worker processes of the local backend (0 = a fresh process per run); recycled like pool actors
+    RAY_ADDRESS: str | None = None # Ray cluster to join, e.g. "auto" (several API workers share one cluster); None starts a local Ray
+    RAY_NUM_CPUS: int | None = None # CPUs of a locally started Ray (None = all cores); ignored when RAY_ADDRESS is set
+    RAY_NAMESPACE: str = "dataflow_webui" # Ray namespace for the named execution state actor
     PIPELINE_REGISTRY: str = os.path.join(BASE_DIR, "data", "pipeline_registry.json")
     SERVING_REGISTRY: str = os.path.join(BASE_DIR, "data", "serving_registry.yaml")
     TEXT2SQL_DATABASE_REGISTRY: str = os.path.join(BASE_DIR, "data", "text2sql_database_registry.yaml") # text2sql database config
@@ -29,6 +62,14 @@ class Settings(BaseSettings):
     PREFERENCES_PATH: str = os.path.join(BASE_DIR, "data", "user_preferences.json") # preference information cache
     SQLITE_DB_DIR: str = os.path.join(BASE_DIR, "data", "text2sql_dbs") # where sqlite database files are stored
     CACHE_DIR: str = os.path.join(BASE_DIR, "cache_local") # cache directory for pipeline execution
+    CACHE_QUOTA_GB: float = 20 # disk quota for CACHE_DIR; intermediate step files are evicted LRU-first above it (0 = unlimited)
+    CACHE_MAX_AGE_DAYS: float = 0 # task outputs older than this are removed (0 = keep forever; opt-in, deletes whole run directories)
+    CACHE_MAX_RUNS: int = 0 # keep outputs of at most this many runs (0 = unlimited; opt-in, deletes whole run directories)
+    CACHE_KEEP_RECENT_RUNS: int = 20 # final outputs of the newest N runs are never evicted
+    CACHE_COMPRESS_INTERMEDIATE: bool = True # gzip intermediate step files once a run completes (final step stays plain)
+    STEP_CACHE_ENABLED: bool = True # reuse an operator's output across runs when input, class, params and version match
+    STEP_CACHE_DIR: str = os.path.join(BASE_DIR, "cache_local", "step_cache") # content-addressed step outputs (see step_cache.py)
+    STEP_CACHE_QUOTA_GB: float = 10 # disk quota of the step cache; least recently used entries are evicted above it (0 = unlimited)
     RESOURCE_DIR: str = "data"  # resource directory for storing schemas and other resources
     DEFAULT_SERVING_FILLING: bool = True # whether to fill default values for missing fields in serving
 
@@ -16,6 +16,7 @@ class AppContainer:
         self.dataset_visualize_service = None
         self.json_schema_manager = None
         self.user_prompt_registry = None
+        self.cache_retention = None
 
     def init(self):
         from app.services.dataset_registry import DatasetRegistry, VisualizeDatasetService
@@ -27,6 +28,7 @@ class AppContainer:
         from app.services.text2sql_database_registry import Text2SQLDatabaseRegistry, Text2SQLDatabaseManagerRegistry
         from app.services.json_schema_manager import JsonSchemaManager
         from app.services.user_prompt_registry import UserPromptRegistry
+        from app.services.cache_retention import create_cache_retention_manager
         
         from .config import settings
         import importlib
@@ -53,6 +55,7 @@ class AppContainer:
         self.text2sql_database_manager_registry = Text2SQLDatabaseManagerRegistry()
         self.json_schema_manager = JsonSchemaManager()
         self.user_prompt_registry = UserPromptRegistry()
+        self.cache_retention = create_cache_retention_manager(self.task_registry.store)
 
 
 
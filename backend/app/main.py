@@ -66,4 +66,19 @@ def startup_refresh_ops_cache():
             container.operator_registry.dump_ops_to_json(lang=lang)
         logger.info("Operator cache regenerated at startup.")
     except Exception as e:
-        logger.error(f"Failed to regenerate operator cache at startup: {e}")
\ No newline at end of file
+        logger.error(f"Failed to regenerate operator cache at startup: {e}")
+# --- 4. Startup event to apply cache retention ---
+@app.on_event("startup")
+def startup_enforce_cache_retention():
+    try:
+        container.cache_retention.enforce()
+    except Exception as e:
+        logger.error(f"Failed to enforce cache retention at startup: {e}")
+# --- 5. Startup event to rebuild the execution queue ---
+@app.on_event("startup")
+async def startup_recover_execution_queue():
+    try:
+        from app.services.pipeline_executor import get_pipeline_executor
+        get_pipeline_executor().recover_queue(container.task_registry.path)
+    except Exception as e:
+        logger.error(f"Failed to recover queued executions at startup: {e}")
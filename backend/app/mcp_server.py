@@ -40,6 +40,7 @@ def create_mcp_server(app: FastAPI) -> FastApiMCP:
             "execute_pipeline_async",           # POST /api/v1/tasks/execute-async
             "get_execution_status",             # GET /api/v1/tasks/execution/{task_id}/status
             "get_task_result",                  # GET /api/v1/tasks/execution/{task_id}/result
+            "tail_execution_log",               # GET /api/v1/tasks/execution/{task_id}/log/tail  ← 增量读日志，last_n 取尾部
             "list_datasets",                    # GET /api/v1/datasets/
             "get_dataset_columns",              # GET /api/v1/datasets/columns/{ds_id}
             "get_dataset_preview",              # GET /api/v1/datasets/preview/{ds_id}  ← 必须在设置 lang 等语义参数前调用，agent 凭样本判断数据语言
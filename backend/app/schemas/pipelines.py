@@ -34,11 +34,23 @@ class ExecutionStatus(str, Enum):
     cancelled = "cancelled"
 
 
+class ResourceSpec(BaseModel):
+    """运行资源声明（调度器据此做准入，见 execution_resources.py）"""
+    num_cpus: Optional[float] = Field(default=None, gt=0, description="需要的 CPU 数")
+    memory_mb: Optional[float] = Field(default=None, gt=0, description="需要的内存（MB）")
+    max_concurrent: Optional[int] = Field(default=None, ge=1, description="同一 Pipeline 同时运行的上限")
+
+
 class PipelineOperator(BaseModel): # 画布上的pipeline类
     """Pipeline算子模型"""
     name: str = Field(..., description="算子名称")
     params: Any = Field(default_factory=dict, description="算子参数配置")
     location: tuple[float, float] = Field(default=(0, 0), description="算子在画布上的位置, 包含x和y两个坐标值")
+    resources: Optional[ResourceSpec] = Field(default=None, description="该算子的资源需求（如加载 embedding 模型）")
+    shards: Optional[int] = Field(default=None, ge=1, description="逐行算子的数据并行分片数（见 sharded_execution.py）")
+    cache: Optional[bool] = Field(default=None, description="设为 false 时该算子不使用跨运行步骤缓存（输出不确定的算子）")
+    stream: Optional[bool] = Field(default=None, description="可按批处理的算子：与相邻的流式算子按块流水执行（见 streaming_execution.py）")
+    parallel: Optional[bool] = Field(default=None, description="设为 false 时该算子不参与分支并行执行（见 branch_execution.py）")
     # @field_validator('name')
     # def validate_operator_name(cls, v: str) -> str:
     #     """验证算子名称格式"""
@@ -58,6 +70,10 @@ class PipelineConfig(BaseModel):
     input_dataset: Union[str, PipelineInputDataset] = Field(..., description="输入数据集ID或配置")
     # 用 list 的顺序代表算子执行顺序
     operators: List[PipelineOperator] = Field(default_factory=list, description="算子执行序列")
+    resources: Optional[ResourceSpec] = Field(default=None, description="整条 Pipeline 的资源需求")
+    step_cache: Optional[bool] = Field(default=None, description="设为 false 时整条 Pipeline 不使用跨运行步骤缓存（见 step_cache.py）")
+    stream_chunk_rows: Optional[int] = Field(default=None, ge=1, description="流式算子之间每块的行数")
+    parallel_branches: Optional[bool] = Field(default=None, description="按 input_*/output_* key 依赖把相邻的独立算子分支并行执行；缺省取 EXECUTION_PARALLEL_BRANCHES")
     
     # @field_validator('operators')
     # def validate_operators(cls, v: List[PipelineOperator]) -> List[PipelineOperator]:
@@ -106,6 +122,28 @@ class PipelineExecutionRequest(BaseModel):
     #     return v
 
 
+class PipelineExecutionForkRequest(BaseModel):
+    """从某一步分叉执行的请求模型"""
+    from_step: int = Field(..., ge=0, description="第一个重新运行的算子索引（从 0 开始，与结果接口的 step 一致）")
+    operators: Optional[List[PipelineOperator]] = Field(None, description="替换 from_step 及之后的算子；不传则沿用原执行的算子")
+
+
+class PipelineBatchExecutionRequest(BaseModel):
+    """同一个 Pipeline 批量执行多个数据集的请求模型"""
+    pipeline_id: str = Field(..., description="预定义Pipeline ID")
+    dataset_ids: List[str] = Field(default_factory=list, description="输入数据集ID列表")
+    dataset_glob: Optional[str] = Field(None, description="按已注册数据集的文件路径 / 名称 / ID 匹配的 glob，如 /data/shards/part-*.jsonl")
+
+
+class PipelineSweepRequest(BaseModel):
+    """参数扫描请求模型：同一个算子参数取多个值，各跑一次下游"""
+    pipeline_id: str = Field(..., description="预定义Pipeline ID")
+    operator_index: int = Field(..., ge=0, description="被扫描算子在 operators 中的索引")
+    param: str = Field(..., description="参数名，如 min_score")
+    values: List[Any] = Field(..., min_length=1, description="参数的候选取值，每个取值一个变体")
+    section: Optional[str] = Field(None, pattern="^(init|run)$", description="参数所在分组；缺省时先找 init 再找 run")
+
+
 class PipelineExecutionResult(BaseModel):
     """Pipeline执行结果模型"""
     task_id: str = Field(..., description="执行会话唯一标识符")
@@ -6,14 +6,14 @@ AgentSessionManager：管理代码 Agent CLI 子进程和会话 ID。
 - 子进程的实际启动与 stream-json 解析委托给 ``app.services.agents`` 下的 Adapter。
 """
 import asyncio
-import json
 import os
-import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import AsyncGenerator
 from app.core.config import settings
 from app.core.logger_setup import get_logger
+from app.services.registry_io import RegistryFile
 from app.services.agents import (
     AgentAdapter,
     AGENT_KINDS,
@@ -139,8 +139,7 @@ class AgentSessionManager:
     管理代码 Agent CLI 子进程、当前活跃 session_id（含 agent_kind），
     以及每个用户的历史会话列表。
 
-    运行时内存：
-      _current:    user_id -> {"session_id": str, "agent_kind": "claude"|"cursor"|"codex"}
+    运行时内存（仅本进程）：
       _adapters:   user_id -> 当前在 stream 的 AgentAdapter 实例（用于 abort）
       _last_active_user_id: 最近一次发起 chat_stream 的 user_id（供 MCP render 定向推送）
 
@@ -159,106 +158,107 @@ class AgentSessionManager:
           }
         }
       新会话在首条消息到来时写入；每次 chat 结束后更新 updated_at 与 message_count。
+      文件是唯一真相（多个 API worker 共用）：当前 session / agent 也从文件记录推导，
+      每次修改都在 RegistryFile 的进程间锁内读-改-写。
     """
 
     def __init__(self):
-        self._current: dict[str, dict[str, str]] = {}
         self._adapters: dict[str, AgentAdapter] = {}
         self._last_active_user_id: str | None = None
-        self._file_lock = threading.Lock()
-        self._data: dict = self._load()
-        for uid, rec in self._data.items():
-            cur_sid = rec.get("current")
-            cur_kind = rec.get("current_agent") or DEFAULT_AGENT
-            if cur_sid:
-                self._current[uid] = {"session_id": cur_sid, "agent_kind": cur_kind}
+        self._file = RegistryFile(str(SESSIONS_FILE), fmt="json", default={})
+        self._ensure_storage()
 
     # ── 磁盘 I/O ─────────────────────────────────────────────
     def _ensure_storage(self):
         SESSIONS_FILE.parent.mkdir(parents=True, exist_ok=True)
-        if not SESSIONS_FILE.exists():
-            SESSIONS_FILE.write_text("{}")
+        self._file.ensure()
 
     def _load(self) -> dict:
-        self._ensure_storage()
+        """读一次文件（只读视图，调用方不要修改）；每个操作只调用一次"""
         try:
-            content = SESSIONS_FILE.read_text()
-            return json.loads(content) if content.strip() else {}
+            return self._file.read(copy_result=False)
         except Exception:
             return {}
 
-    def _save(self):
-        with self._file_lock:
-            try:
-                SESSIONS_FILE.write_text(
-                    json.dumps(self._data, ensure_ascii=False, indent=2)
-                )
-            except Exception:
-                pass
-
-    def _user_record(self, user_id: str) -> dict:
-        rec = self._data.get(user_id)
-        if not rec:
-            rec = {"current": None, "current_agent": None, "history": []}
-            self._data[user_id] = rec
-        return rec
-
-    def _find_history_entry(self, user_id: str, session_id: str) -> dict | None:
-        rec = self._data.get(user_id) or {}
-        for item in rec.get("history", []):
+    @staticmethod
+    def _current_of(rec: dict | None) -> dict[str, str] | None:
+        """{"session_id", "agent_kind"}，由用户记录里的 current / current_agent 推导"""
+        cur_sid = (rec or {}).get("current")
+        if not cur_sid:
+            return None
+        return {
+            "session_id": cur_sid,
+            "agent_kind": rec.get("current_agent") or DEFAULT_AGENT,
+        }
+
+    def _current(self, user_id: str) -> dict[str, str] | None:
+        return self._current_of(self._load().get(user_id))
+
+    @contextmanager
+    def _user_record(self, user_id: str):
+        """加锁读出最新的用户记录交给调用方修改，退出时写回"""
+        with self._file.transaction() as data:
+            rec = data.get(user_id)
+            if not rec:
+                rec = {"current": None, "current_agent": None, "history": []}
+                data[user_id] = rec
+            yield rec
+
+    @staticmethod
+    def _find_history_entry(rec: dict, session_id: str) -> dict | None:
+        for item in (rec or {}).get("history", []):
             if item.get("session_id") == session_id:
                 return item
         return None
 
+    def _detach_current(self, user_id: str) -> None:
+        with self._user_record(user_id) as rec:
+            rec["current"] = None
+            rec["current_agent"] = None
+
     # ── 历史会话 API ─────────────────────────────────────────
     def list_history(self, user_id: str) -> list[dict]:
-        rec = self._data.get(user_id) or {}
-        items = list(rec.get("history", []))
+        rec = self._load().get(user_id) or {}
+        items = [dict(item) for item in rec.get("history", [])]
         items.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
         return items
 
     def new_session(self, user_id: str) -> None:
         """把当前活跃 session 置空；下一轮对话会创建新的 session。"""
-        self._current.pop(user_id, None)
-        rec = self._user_record(user_id)
-        rec["current"] = None
-        rec["current_agent"] = None
-        self._save()
+        self._detach_current(user_id)
 
     def switch_session(self, user_id: str, session_id: str) -> bool:
         """切换到一条历史会话，后续 chat_stream 会沿用它的 agent_kind。"""
-        entry = self._find_history_entry(user_id, session_id)
-        if not entry:
-            return False
-        kind = entry.get("agent_kind") or DEFAULT_AGENT
-        self._current[user_id] = {"session_id": session_id, "agent_kind": kind}
-        rec = self._user_record(user_id)
-        rec["current"] = session_id
-        rec["current_agent"] = kind
-        self._save()
+        with self._file.locked():
+            entry = self._find_history_entry(self._load().get(user_id), session_id)
+            if not entry:
+                return False
+            agent_kind = entry.get("agent_kind") or DEFAULT_AGENT
+            with self._user_record(user_id) as rec:
+                rec["current"] = session_id
+                rec["current_agent"] = agent_kind
         return True
 
     def delete_session(self, user_id: str, session_id: str) -> bool:
-        rec = self._data.get(user_id)
-        if not rec:
-            return False
-        before = len(rec.get("history", []))
-        rec["history"] = [
-            h for h in rec.get("history", []) if h.get("session_id") != session_id
-        ]
-        if rec.get("current") == session_id:
-            rec["current"] = None
-            rec["current_agent"] = None
-            self._current.pop(user_id, None)
-        self._save()
+        with self._file.locked():
+            if user_id not in self._load():
+                return False
+            with self._user_record(user_id) as rec:
+                before = len(rec.get("history", []))
+                rec["history"] = [
+                    h for h in rec.get("history", []) if h.get("session_id") != session_id
+                ]
+                if rec.get("current") == session_id:
+                    rec["current"] = None
+                    rec["current_agent"] = None
         return len(rec["history"]) < before
 
     def rename_session(self, user_id: str, session_id: str, title: str) -> bool:
-        entry = self._find_history_entry(user_id, session_id)
-        if not entry:
-            return False
-        entry["title"] = title
-        self._save()
+        with self._file.locked():
+            if not self._find_history_entry(self._load().get(user_id), session_id):
+                return False
+            with self._user_record(user_id) as rec:
+                self._find_history_entry(rec, session_id)["title"] = title
         return True
 
     # ── Chat 主流程 ─────────────────────────────────────────
@@ -276,14 +276,13 @@ class AgentSessionManager:
         """
         self._last_active_user_id = user_id
 
-        prior = self._current.get(user_id)
+        prior = self._current(user_id)
         kind = normalize_agent_kind(
             agent_kind or (prior.get("agent_kind") if prior else None)
         )
 
         # 切换 agent 等同于开新会话：旧会话的 session_id 对新 agent 没意义
         if prior and prior.get("agent_kind") != kind:
-            self._current.pop(user_id, None)
             prior = None
 
         session_id = prior.get("session_id") if prior else None
@@ -304,42 +303,42 @@ class AgentSessionManager:
                     if sid and (
                         not prior or prior.get("session_id") != sid
                     ):
-                        self._current[user_id] = {
-                            "session_id": sid,
-                            "agent_kind": kind,
-                        }
-                        rec = self._user_record(user_id)
-                        rec["current"] = sid
-                        rec["current_agent"] = kind
-                        if not self._find_history_entry(user_id, sid):
-                            now = datetime.utcnow().isoformat()
-                            title = (
-                                message.strip().splitlines()[0][:40]
-                                if message else "新会话"
-                            )
-                            rec["history"].append({
-                                "session_id": sid,
-                                "agent_kind": kind,
-                                "title": title,
-                                "created_at": now,
-                                "updated_at": now,
-                                "message_count": 0,
-                            })
-                        self._save()
+                        with self._user_record(user_id) as rec:
+                            rec["current"] = sid
+                            rec["current_agent"] = kind
+                            if not self._find_history_entry(rec, sid):
+                                now = datetime.utcnow().isoformat()
+                                title = (
+                                    message.strip().splitlines()[0][:40]
+                                    if message else "新会话"
+                                )
+                                rec["history"].append({
+                                    "session_id": sid,
+                                    "agent_kind": kind,
+                                    "title": title,
+                                    "created_at": now,
+                                    "updated_at": now,
+                                    "message_count": 0,
+                                })
                     # `session` 事件不直接抛给前端 —— 前端不需要看到 session_id
                     continue
                 yield event
         finally:
-            cur = self._current.get(user_id)
-            if cur:
-                entry = self._find_history_entry(user_id, cur["session_id"])
-                if entry:
-                    entry["updated_at"] = datetime.utcnow().isoformat()
-                    entry["message_count"] = int(entry.get("message_count", 0)) + 1
-                    self._save()
-            adapter_in_flight = self._adapters.pop(user_id, None)
-            if adapter_in_flight is adapter and adapter.is_running:
-                adapter.kill()
+            try:
+                with self._file.transaction() as data:
+                    rec = data.get(user_id)
+                    cur = self._current_of(rec)
+                    entry = self._find_history_entry(rec, cur["session_id"]) if cur else None
+                    if entry:
+                        entry["updated_at"] = datetime.utcnow().isoformat()
+                        entry["message_count"] = int(entry.get("message_count", 0)) + 1
+            except Exception as e:
+                # 写会话记录失败不能跳过下面的清理，否则 adapter 会一直留在 _adapters 里
+                logger.error(f"Failed to update agent session history for {user_id}: {e}")
+            finally:
+                adapter_in_flight = self._adapters.pop(user_id, None)
+                if adapter_in_flight is adapter and adapter.is_running:
+                    adapter.kill()
 
     # ── 终止 / 清除 ─────────────────────────────────────────
     def abort_session(self, user_id: str):
@@ -348,31 +347,28 @@ class AgentSessionManager:
         if adapter:
             adapter.kill()
         self._adapters.pop(user_id, None)
-        self._current.pop(user_id, None)
-        rec = self._user_record(user_id)
-        rec["current"] = None
-        rec["current_agent"] = None
-        self._save()
+        self._detach_current(user_id)
 
     def clear_session(self, user_id: str):
         """仅脱离当前活跃会话（不 kill 进程、不删历史）。"""
-        self._current.pop(user_id, None)
-        rec = self._user_record(user_id)
-        rec["current"] = None
-        rec["current_agent"] = None
-        self._save()
+        self._detach_current(user_id)
 
     def get_session_id(self, user_id: str) -> str | None:
-        cur = self._current.get(user_id)
+        cur = self._current(user_id)
         return cur["session_id"] if cur else None
 
     def get_session_agent(self, user_id: str) -> str | None:
-        cur = self._current.get(user_id)
+        cur = self._current(user_id)
         return cur["agent_kind"] if cur else None
 
     def list_sessions(self) -> dict:
-        """当前活跃 session 快照（调试用）。"""
-        return dict(self._current)
+        """当前活跃 session 快照（调试用）：user_id -> {"session_id", "agent_kind"}"""
+        current = {}
+        for uid, rec in self._load().items():
+            cur = self._current_of(rec)
+            if cur:
+                current[uid] = cur
+        return current
 
     def has_active_process(self, user_id: str) -> bool:
         adapter = self._adapters.get(user_id)
@@ -0,0 +1,142 @@
+"""Fan-out of one pipeline over many input datasets.
+
+Applying a pipeline to dozens of shard files used to take one ``execute-async``
+call per file, each re-reading the pipeline and re-resolving its servings. A
+batch execution instead:
+
+* resolves the datasets once: explicit dataset IDs and/or a glob matched
+  against the registered datasets' name, file path and ID;
+* resolves the serving / database-manager metadata of the operators once and
+  shares it with every child (only the storage part differs per child);
+* creates a parent task (``executor_type = "batch"``) listing its children, and
+  one ordinary child execution per dataset (``batch_id`` on the child record);
+* leaves concurrency to the execution scheduler: children are queued like any
+  other run, so lanes, fair share, admission and ``max_concurrent`` apply.
+
+:func:`aggregate` folds the children's records into the batch view: counts by
+status, progress, throughput (rows of finished children per second since the
+batch started) and the failed children. The parent gets its terminal status
+once every child finished (``failed`` if any child failed).
+"""
+from __future__ import annotations
+
+import copy
+import fnmatch
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+BATCH_EXECUTOR_TYPE = "batch"
+BATCH_KEY = "batch"
+TERMINAL_STATUSES = ("completed", "failed", "cancelled", "success")
+
+
+def resolve_datasets(
+    datasets: Iterable[Dict[str, Any]],
+    dataset_ids: Optional[List[str]] = None,
+    pattern: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    按 ID 列表和 / 或 glob 选出批量执行的输入数据集（保持顺序、去重）
+
+    Raises:
+        KeyError: dataset_ids 中有未注册的 ID
+        ValueError: 一个数据集也没选中
+    """
+    registered = {ds["id"]: ds for ds in datasets if ds.get("id")}
+    selected: Dict[str, Dict[str, Any]] = {}
+    missing = [ds_id for ds_id in dataset_ids or [] if ds_id not in registered]
+    if missing:
+        raise KeyError(", ".join(missing))
+    for ds_id in dataset_ids or []:
+        selected.setdefault(ds_id, registered[ds_id])
+    if pattern:
+        matched = [
+            ds for ds in registered.values()
+            if any(fnmatch.fnmatch(str(ds.get(field) or ""), pattern) for field in ("root", "name", "id"))
+        ]
+        for ds in sorted(matched, key=lambda d: str(d.get("root") or d.get("name") or d["id"])):
+            selected.setdefault(ds["id"], ds)
+    if not selected:
+        raise ValueError("No dataset selected for the batch")
+    return list(selected.values())
+
+
+def dataset_pipeline_config(pipeline_config: Dict[str, Any], dataset_id: str) -> Dict[str, Any]:
+    """子执行的 Pipeline 配置：只换输入数据集（保留画布上的位置信息）"""
+    config = copy.deepcopy(pipeline_config)
+    input_dataset = config.get("input_dataset")
+    if isinstance(input_dataset, dict):
+        input_dataset["id"] = dataset_id
+    else:
+        config["input_dataset"] = dataset_id
+    return config
+
+
+def _elapsed_s(started_at: Optional[str], until: Optional[str] = None) -> Optional[float]:
+    try:
+        start = datetime.fromisoformat(started_at)
+        end = datetime.fromisoformat(until) if until else datetime.now()
+    except (TypeError, ValueError):
+        return None
+    return max((end - start).total_seconds(), 0.0)
+
+
+def aggregate(batch: Dict[str, Any], children: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    汇总批量执行的进度
+
+    Args:
+        batch: 父任务上的 batch 信息（children 列表含 task_id / dataset_id / num_samples）
+        children: {子执行 ID: 子执行记录}
+
+    Returns:
+        {"status", "total", "counts", "progress_percentage", "rows_processed",
+         "throughput_rows_per_s", "failures", "finished_at"}
+    """
+    entries = batch.get("children") or []
+    counts: Dict[str, int] = {}
+    rows = 0
+    failures = []
+    finished_at = None
+    for entry in entries:
+        record = children.get(entry["task_id"]) or {}
+        status = record.get("status") or "queued"
+        if status == "success":
+            status = "completed"
+        counts[status] = counts.get(status, 0) + 1
+        if status == "completed":
+            rows += int(entry.get("num_samples") or 0)
+        elif status in ("failed", "cancelled"):
+            failures.append({
+                "task_id": entry["task_id"],
+                "dataset_id": entry.get("dataset_id"),
+                "status": status,
+                "error": record.get("error_message") or (record.get("output") or {}).get("error"),
+            })
+        end = record.get("finished_at") or record.get("completed_at")
+        if status in TERMINAL_STATUSES and end and (finished_at is None or end > finished_at):
+            finished_at = end
+
+    total = len(entries)
+    done = sum(n for s, n in counts.items() if s in TERMINAL_STATUSES)
+    if total and done == total:
+        status = "failed" if failures else "completed"
+    else:
+        status = "running" if counts.get("running") or done else "queued"
+        finished_at = None
+    elapsed = _elapsed_s(batch.get("started_at"), finished_at)
+    return {
+        "status": status,
+        "total": total,
+        "counts": counts,
+        "progress_percentage": round(done * 100 / total, 1) if total else 100.0,
+        "rows_processed": rows,
+        "throughput_rows_per_s": round(rows / elapsed, 3) if elapsed else None,
+        "elapsed_s": round(elapsed, 3) if elapsed is not None else None,
+        "failures": failures,
+        "finished_at": finished_at,
+    }
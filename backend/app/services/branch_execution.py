@@ -0,0 +1,274 @@
+"""Branch-parallel execution of independent operators.
+
+Pipelines run in list order, although the compile key graph often shows that
+several operators only read columns that already exist (dataset columns or
+outputs of earlier operators) and not each other's outputs, e.g. three LLM
+operators that each annotate ``text`` into a different column. With
+``parallel_branches`` enabled (pipeline config, default
+``EXECUTION_PARALLEL_BRANCHES``) the executor:
+
+* splits the run order into *blocks* of consecutive operators that declare
+  ``output_*`` keys (not streamed, not sharded, not ``parallel: false``);
+* derives a DAG inside each block from the ``input_*`` / ``output_*`` key flow
+  (:func:`dependencies`): an operator depends on an earlier one when it reads
+  or rewrites one of its output keys;
+* runs every operator of a block as soon as its dependencies finished, up to
+  ``EXECUTION_BRANCH_WORKERS`` at a time, each on an in-memory copy of the
+  block input plus the columns of its ancestors;
+* merges the new columns back and writes the per-step files exactly as a
+  sequential run would have (step ``k`` holds the block input plus the columns
+  of the block's first ``k`` operators), so result endpoints, resume / fork and
+  downstream operators see no difference.
+
+Merging is only valid for operators that keep the input rows and columns and
+add new columns. An operator that rewrites an existing column is caught from
+the key flow before anything runs. An operator that filters or reorders rows is
+only seen in its output. In that case the block keeps the operators before it
+in run order: their step files are written as a sequential run would have
+written them. No operator after it is started. The block then raises
+:class:`BranchFallback` with those operators in ``completed``, and the executor
+runs the rest sequentially, so finished LLM calls are not paid twice. Blocks
+that are a plain chain are not worth it and keep the sequential path (and its
+step cache). The whole block runs in the operator workdir, as ``operator_io``
+does for a single operator.
+"""
+from __future__ import annotations
+
+import contextvars
+import copy
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.execution_context import capture_output, operator_workdir
+from app.services.pipeline_compile_check import key_flow
+from app.services.step_cache import detach
+from app.services.streaming_execution import ChunkStorage
+
+logger = get_logger(__name__)
+
+
+def branches_enabled(pipeline_config: Dict[str, Any]) -> bool:
+    enabled = (pipeline_config or {}).get("parallel_branches")
+    return settings.EXECUTION_PARALLEL_BRANCHES if enabled is None else bool(enabled)
+
+
+def dependencies(flows: List[Tuple[str, Set[str], Set[str]]]) -> Dict[str, Set[str]]:
+    """
+    块内的依赖图
+
+    Args:
+        flows: 按执行顺序的 (op_key, input keys, output keys)
+
+    Returns:
+        {op_key: 它直接依赖的更早的 op_key}
+    """
+    deps: Dict[str, Set[str]] = {}
+    for j, (key_j, inputs_j, outputs_j) in enumerate(flows):
+        deps[key_j] = {
+            key_i for key_i, inputs_i, outputs_i in flows[:j]
+            if inputs_j & outputs_i or outputs_j & outputs_i or inputs_i & outputs_j
+        }
+    return deps
+
+
+def _chain_length(deps: Dict[str, Set[str]], order: List[str]) -> int:
+    depth: Dict[str, int] = {}
+    for key in order:
+        depth[key] = 1 + max((depth[d] for d in deps[key]), default=0)
+    return max(depth.values(), default=0)
+
+
+def parallel_blocks(entries: List[Tuple[str, Dict[str, Any], bool]]) -> List[List[str]]:
+    """
+    找出值得分支并行执行的算子块
+
+    Args:
+        entries: 按执行顺序的 (op_key, run_params, 是否允许参与并行)
+
+    Returns:
+        每块是连续的 op_key 列表；块内至少有两个算子互不依赖
+    """
+    blocks: List[List[str]] = []
+    current: List[Tuple[str, Set[str], Set[str]]] = []
+
+    def flush():
+        if len(current) >= 2:
+            order = [key for key, _, _ in current]
+            if _chain_length(dependencies(current), order) < len(order):
+                blocks.append(order)
+        current.clear()
+
+    for op_key, run_params, eligible in entries:
+        inputs, outputs = key_flow(run_params)
+        if eligible and outputs:
+            current.append((op_key, inputs, outputs))
+        else:
+            flush()
+    flush()
+    return blocks
+
+
+class BranchFallback(Exception):
+    """
+    块内的算子不能按列合并（改了行数 / 顺序或已有列），需要顺序执行
+
+    completed 是按运行顺序排在它前面、已经跑完并写好步骤文件的算子，顺序执行从它们之后开始
+    """
+
+    def __init__(self, message: str, completed: Optional[List["BranchOp"]] = None):
+        super().__init__(message)
+        self.completed = completed or []
+
+
+class BranchOpError(Exception):
+    """块内某个算子失败"""
+
+    def __init__(self, op_key: str, original: BaseException):
+        super().__init__(f"{op_key}: {original}")
+        self.op_key = op_key
+        self.original = original
+
+
+@dataclass
+class BranchOp:
+    """并行块里的一个算子"""
+
+    operator: Any
+    run_params: Dict[str, Any]
+    op_key: str
+    inputs: Set[str] = field(default_factory=set)
+    outputs: Set[str] = field(default_factory=set)
+    stdout: Any = None
+    stderr: Any = None
+    rows: int = 0
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    new_columns: List[str] = field(default_factory=list)
+    result: Optional[pd.DataFrame] = field(default=None, repr=False)
+
+
+def run_branch_block(
+    ops: List[BranchOp],
+    view,
+    workers: Optional[int] = None,
+    on_start: Optional[Callable[[BranchOp], Any]] = None,
+) -> List[BranchOp]:
+    """
+    按依赖图并行执行一块算子，合并新增列并写出各步文件
+
+    Args:
+        ops: 按执行顺序排列的算子；view 是第一个算子的 step 视图
+        workers: 同时运行的算子数
+        on_start: 某算子开始运行时的回调（在工作线程中调用）
+
+    Raises:
+        BranchFallback: 算子不满足“保留输入行和列、只新增列”；排在它之前的算子的步骤文件已写好（见 completed），
+            其余算子需要顺序执行
+        BranchOpError: 第一个失败的算子及其原始异常
+    """
+    workers = max(1, int(workers or settings.EXECUTION_BRANCH_WORKERS))
+    source = view.read(output_type="dataframe")
+    clobbered = [op.op_key for op in ops if op.outputs & set(source.columns)]
+    if clobbered:
+        raise BranchFallback(f"{', '.join(clobbered)} rewrite existing columns")
+
+    deps = dependencies([(op.op_key, op.inputs, op.outputs) for op in ops])
+    ancestors: Dict[str, Set[str]] = {}
+    for op in ops:
+        ancestors[op.op_key] = set(deps[op.op_key]).union(*(ancestors[d] for d in deps[op.op_key]))
+    position = {op.op_key: index for index, op in enumerate(ops)}
+    stop = threading.Event()
+    # 不能合并的算子中运行顺序最靠前的一个的位置：它之前的算子照常跑完并保留，之后的不再启动
+    limit = len(ops)
+    limit_lock = threading.Lock()
+
+    def run_one(op: BranchOp):
+        nonlocal limit
+        # 已失败，或排在不能合并的算子之后（结果不会保留）：不再启动
+        if stop.is_set() or position[op.op_key] > limit:
+            return
+        frame = source.copy()
+        for other in ops:
+            if other.op_key in ancestors[op.op_key]:
+                for column in other.new_columns:
+                    frame[column] = other.result[column].values
+        storage = ChunkStorage(view, frame)
+        op.started_at = datetime.now().isoformat()
+        if on_start is not None:
+            on_start(op)
+        with capture_output(op.stdout, op.stderr):
+            op.operator.run(**dict(op.run_params, storage=storage))
+        out = storage.output
+        if out is None:
+            raise RuntimeError(f"Operator {type(op.operator).__name__} wrote no output")
+        kept = list(frame.columns)
+        if len(out) != len(frame) or any(c not in out.columns for c in kept) or not out[kept].equals(frame):
+            with limit_lock:
+                limit = min(limit, position[op.op_key])
+            raise BranchFallback(f"{op.op_key} does not keep the input rows and columns")
+        op.new_columns = [c for c in out.columns if c not in frame.columns]
+        op.result = out[op.new_columns]
+        op.rows = len(out)
+        op.completed_at = datetime.now().isoformat()
+
+    done: Set[str] = set()
+    failure: Optional[BaseException] = None
+    fallbacks: Dict[int, BranchFallback] = {}
+    # 整块在算子工作目录里运行；隔离模式下每个工作线程带一份当前上下文
+    with operator_workdir(), ThreadPoolExecutor(max_workers=workers, thread_name_prefix="branch") as pool:
+        running: Dict[Any, BranchOp] = {}
+        pending = list(ops)
+        while pending or running:
+            if failure is None:
+                pending = [op for op in pending if position[op.op_key] < limit]
+                for op in [op for op in pending if deps[op.op_key] <= done]:
+                    pending.remove(op)
+                    running[pool.submit(contextvars.copy_context().run, run_one, op)] = op
+            if not running:
+                break
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                op = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    done.add(op.op_key)
+                elif isinstance(error, BranchFallback):
+                    fallbacks[position[op.op_key]] = error
+                elif failure is None:
+                    failure = BranchOpError(op.op_key, error)
+                    stop.set()
+    if failure is not None:
+        raise failure
+
+    fallback = fallbacks.get(limit)
+    kept = ops[:limit]
+    seen: Dict[str, str] = {}
+    for index, op in enumerate(kept):
+        clash = next((column for column in op.new_columns if column in seen), None)
+        if clash is not None:
+            fallback = BranchFallback(f"{seen[clash]} and {op.op_key} both add column '{clash}'")
+            kept = ops[:index]
+            break
+        for column in op.new_columns:
+            seen[column] = op.op_key
+
+    # 按顺序执行时第 k 步的内容：块输入 + 前 k 个算子新增的列
+    merged = source.copy()
+    for index, op in enumerate(kept):
+        for column in op.new_columns:
+            merged[column] = op.result[column].values
+        step_view = copy.copy(view)
+        step_view.operator_step = view.operator_step + index
+        detach(step_view._get_cache_file_path(step_view.operator_step + 1))
+        step_view.write(merged)
+    if fallback is not None:
+        raise BranchFallback(str(fallback), completed=kept)
+    logger.info(f"Ran {len(ops)} operator(s) as parallel branches on {len(source)} rows: {', '.join(position)}")
+    return ops
@@ -0,0 +1,470 @@
+"""Retention and eviction for per-task step outputs in ``cache_local``.
+
+Every run writes ``<CACHE_DIR>/<task_id>_output/dataflow_cache_step_stepN.jsonl``
+(N = operator index + 1) and nothing used to delete them. The
+:class:`CacheRetentionManager` applies three policies, in this order:
+
+1. **age** – task outputs older than ``max_age_days`` are removed entirely;
+2. **run count** – only the newest ``max_runs`` task outputs are kept;
+3. **quota** – while the cache is above ``quota_bytes``, intermediate step
+   files are evicted least-recently-used first; if that is not enough, final
+   outputs of older runs go too.
+
+Age and run count delete whole run directories, so they are opt-in
+(``CACHE_MAX_AGE_DAYS`` / ``CACHE_MAX_RUNS`` default to 0); only the quota is
+on by default, and an upgrade never removes existing outputs just for being old.
+
+Outputs of running tasks, pinned tasks (``record["pinned"]``) and the final
+step of the ``keep_recent_runs`` newest runs are never touched. Every evicted
+step is recorded on the task record (``evicted_steps``), so result / download
+endpoints can answer "evicted" instead of "not found".
+
+Reading a step file through :func:`touch_step_file` stamps its atime, which is
+what the LRU order is based on (independent of ``noatime`` mounts).
+
+:meth:`CacheRetentionManager.enforce` scans the whole cache. It runs at
+startup and on demand. After each run and on each submission, callers use
+:meth:`CacheRetentionManager.maybe_enforce` instead. It keeps the last scan's
+per-task sizes in ``.retention_state.json`` and refreshes only the finished
+task's directory. A full scan happens only when that estimate exceeds the quota
+or the state is older than ``RESCAN_INTERVAL_S``. Both run under a file lock
+(``registry_io``), so the API process and the workers never evict concurrently.
+
+After a run completes, :func:`compress_task_steps` gzips the intermediate step
+files in place (``...stepN.jsonl`` -> ``...stepN.jsonl.gz``); the final step
+stays plain. Readers go through :func:`resolve_step_file` /
+:func:`open_step_file`, which accept either form and decompress as a stream.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import IO, Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.registry_io import atomic_write_text, lock_for
+
+logger = get_logger(__name__)
+
+STEP_FILE_PREFIX = "dataflow_cache_step"
+TASK_DIR_SUFFIX = "_output"
+_STEP_FILE_RE = re.compile(rf"^{STEP_FILE_PREFIX}_step(\d+)\.jsonl(\.gz)?$")
+COMPRESSED_SUFFIX = ".gz"
+
+# 这些状态的任务仍可能在写文件，不参与回收
+ACTIVE_STATUSES = {"pending", "queued", "running"}
+
+# 上次全量扫描的结果（各任务输出大小），maybe_enforce 据此增量估算占用
+RETENTION_STATE_FILE = ".retention_state.json"
+# 记下的占用最多用多久；过期后（或估算超配额时）重新全量扫描
+RESCAN_INTERVAL_S = 300
+
+
+def task_output_dir(task_id: str, cache_dir: Optional[str] = None) -> str:
+    return os.path.join(cache_dir or settings.CACHE_DIR, f"{task_id}{TASK_DIR_SUFFIX}")
+
+
+def step_file_path(task_id: str, step: int, cache_dir: Optional[str] = None) -> str:
+    """step 为 0 开始的算子索引；FileStorage 的 step0 是输入，第 k 个算子写 step{k+1}"""
+    return os.path.join(task_output_dir(task_id, cache_dir), f"{STEP_FILE_PREFIX}_step{step + 1}.jsonl")
+
+
+def resolve_step_file(task_id: str, step: int, cache_dir: Optional[str] = None) -> Optional[str]:
+    """返回该步骤实际存在的文件（原始 jsonl 或压缩后的 jsonl.gz），都不存在返回 None"""
+    path = step_file_path(task_id, step, cache_dir)
+    for candidate in (path, path + COMPRESSED_SUFFIX):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def is_compressed(path: str) -> bool:
+    return path.endswith(COMPRESSED_SUFFIX)
+
+
+def open_step_file(path: str) -> IO[str]:
+    """以文本方式打开步骤文件，压缩文件按流解压"""
+    if is_compressed(path):
+        return gzip.open(path, "rt", encoding="utf-8")
+    try:
+        return open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        # 打开前刚好被压缩
+        return gzip.open(path + COMPRESSED_SUFFIX, "rt", encoding="utf-8")
+
+
+def compress_task_steps(task_id: str, cache_dir: Optional[str] = None, compresslevel: int = 5) -> Dict[str, int]:
+    """
+    压缩一次运行的中间步骤文件（最终步骤保持原样，方便直接下载 / 继续处理）
+
+    先写临时文件再原子替换，读者任何时刻都能读到完整的原始或压缩文件；
+    atime / mtime 沿用原文件，不影响回收顺序。
+    """
+    output_dir = task_output_dir(task_id, cache_dir)
+    summary = {"files": 0, "bytes_before": 0, "bytes_after": 0}
+    if not os.path.isdir(output_dir):
+        return summary
+    step_files: Dict[int, List[str]] = {}
+    for name in os.listdir(output_dir):
+        match = _STEP_FILE_RE.match(name)
+        if match and int(match.group(1)) > 0:
+            step_files.setdefault(int(match.group(1)), []).append(name)
+    if not step_files:
+        return summary
+    final_number = max(step_files)
+    for number, names in sorted(step_files.items()):
+        if number == final_number:
+            continue
+        for name in names:
+            if name.endswith(COMPRESSED_SUFFIX):
+                continue
+            source = os.path.join(output_dir, name)
+            target = source + COMPRESSED_SUFFIX
+            tmp = target + ".tmp"
+            try:
+                stat = os.stat(source)
+                with open(source, "rb") as src, gzip.open(tmp, "wb", compresslevel=compresslevel) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.utime(tmp, (stat.st_atime, stat.st_mtime))
+                os.replace(tmp, target)
+                os.remove(source)
+            except OSError as e:
+                logger.warning(f"Failed to compress {source}: {e}")
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                continue
+            summary["files"] += 1
+            summary["bytes_before"] += stat.st_size
+            summary["bytes_after"] += os.path.getsize(target)
+    if summary["files"]:
+        logger.info(
+            f"Compressed {summary['files']} intermediate step file(s) of {task_id}: "
+            f"{summary['bytes_before']} -> {summary['bytes_after']} bytes"
+        )
+    return summary
+
+
+def touch_step_file(path: str):
+    """记录一次读取（LRU 依据），只改 atime"""
+    try:
+        stat = os.stat(path)
+        os.utime(path, (time.time(), stat.st_mtime))
+    except OSError:
+        pass
+
+
+@dataclass
+class _StepFile:
+    task_id: str
+    step: int  # 0-based operator index
+    path: str
+    size: int
+    last_access: float
+
+
+@dataclass
+class _TaskOutput:
+    task_id: str
+    path: str
+    created: float
+    steps: List[_StepFile] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return sum(s.size for s in self.steps)
+
+    @property
+    def final_step(self) -> Optional[int]:
+        return max((s.step for s in self.steps), default=None)
+
+
+class CacheRetentionManager:
+    """cache_local 的配额 / 时效 / 数量回收"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        task_store,
+        quota_bytes: int = 0,
+        max_age_days: float = 0,
+        max_runs: int = 0,
+        keep_recent_runs: int = 0,
+    ):
+        """
+        Args:
+            cache_dir: 缓存根目录（settings.CACHE_DIR）
+            task_store: 任务存储，用于读取状态 / pinned 并记录被回收的步骤
+            quota_bytes: 磁盘配额，0 表示不限制
+            max_age_days: 最长保留天数，0 表示不限制
+            max_runs: 最多保留多少次运行的输出，0 表示不限制
+            keep_recent_runs: 最近多少次运行的最终输出始终保留
+        """
+        self.cache_dir = cache_dir
+        self.task_store = task_store
+        self.quota_bytes = quota_bytes
+        self.max_age_days = max_age_days
+        self.max_runs = max_runs
+        self.keep_recent_runs = keep_recent_runs
+
+    # ------------------------------------------------------------------
+    # scanning
+    # ------------------------------------------------------------------
+    def _scan_task(self, task_id: str, path: str) -> Optional[_TaskOutput]:
+        try:
+            created = os.stat(path).st_mtime
+            entries = list(os.scandir(path))
+        except OSError:
+            return None
+        output = _TaskOutput(task_id=task_id, path=path, created=created)
+        for step_entry in entries:
+            match = _STEP_FILE_RE.match(step_entry.name)
+            if not match or int(match.group(1)) == 0:
+                continue
+            try:
+                stat = step_entry.stat()
+            except OSError:
+                continue
+            output.steps.append(_StepFile(
+                task_id=task_id,
+                step=int(match.group(1)) - 1,
+                path=step_entry.path,
+                size=stat.st_size,
+                last_access=max(stat.st_atime, stat.st_mtime),
+            ))
+            output.created = min(output.created, stat.st_mtime)
+        return output
+
+    def _scan(self) -> List[_TaskOutput]:
+        outputs: List[_TaskOutput] = []
+        if not os.path.isdir(self.cache_dir):
+            return outputs
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir() or not entry.name.endswith(TASK_DIR_SUFFIX):
+                continue
+            output = self._scan_task(entry.name[: -len(TASK_DIR_SUFFIX)], entry.path)
+            if output is not None:
+                outputs.append(output)
+        outputs.sort(key=lambda o: o.created, reverse=True)
+        return outputs
+
+    # ------------------------------------------------------------------
+    # incremental state
+    # ------------------------------------------------------------------
+    @property
+    def _state_path(self) -> str:
+        return os.path.join(self.cache_dir, RETENTION_STATE_FILE)
+
+    def _read_state(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or not isinstance(state.get("sizes"), dict):
+            return None
+        return state
+
+    def _write_state(self, sizes: Dict[str, int], scanned_at: float):
+        try:
+            atomic_write_text(self._state_path, json.dumps({"scanned_at": scanned_at, "sizes": sizes}))
+        except OSError as e:
+            logger.warning(f"Failed to write cache retention state: {e}")
+
+    def usage(self) -> Dict[str, Any]:
+        """当前缓存占用"""
+        outputs = self._scan()
+        total = sum(o.size for o in outputs)
+        pinned = [o.task_id for o in outputs if (self.task_store.get(o.task_id) or {}).get("pinned")]
+        return {
+            "cache_dir": self.cache_dir,
+            "total_bytes": total,
+            "quota_bytes": self.quota_bytes,
+            "usage_ratio": round(total / self.quota_bytes, 4) if self.quota_bytes else None,
+            "task_count": len(outputs),
+            "file_count": sum(len(o.steps) for o in outputs),
+            "pinned_tasks": pinned,
+            "policy": {
+                "max_age_days": self.max_age_days,
+                "max_runs": self.max_runs,
+                "keep_recent_runs": self.keep_recent_runs,
+            },
+            "largest_tasks": [
+                {"task_id": o.task_id, "bytes": o.size, "steps": len(o.steps)}
+                for o in sorted(outputs, key=lambda o: o.size, reverse=True)[:10]
+            ],
+        }
+
+    # ------------------------------------------------------------------
+    # eviction
+    # ------------------------------------------------------------------
+    def _record_evicted(self, task_id: str, steps: List[int], reason: str):
+        if not steps:
+            return
+        now = datetime.now().isoformat()
+
+        def _apply(record: Dict[str, Any]):
+            evicted = set(record.get("evicted_steps") or [])
+            evicted.update(steps)
+            record["evicted_steps"] = sorted(evicted)
+            record["cache_evicted_at"] = now
+            record["cache_evicted_reason"] = reason
+
+        try:
+            self.task_store.update(task_id, _apply)
+        except Exception as e:
+            logger.error(f"Failed to record evicted steps for {task_id}: {e}")
+
+    def _remove_files(self, files: List[_StepFile]) -> int:
+        freed = 0
+        for f in files:
+            try:
+                os.remove(f.path)
+                freed += f.size
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to evict {f.path}: {e}")
+        return freed
+
+    def _evict_task(self, output: _TaskOutput, reason: str) -> int:
+        freed = self._remove_files(output.steps)
+        self._record_evicted(output.task_id, [s.step for s in output.steps], reason)
+        shutil.rmtree(output.path, ignore_errors=True)
+        return freed
+
+    def maybe_enforce(self, task_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        运行结束 / 提交时调用：按上次扫描记下的占用估算，只有超配额或记录过期时才全量回收
+
+        Args:
+            task_id: 刚结束的任务，只重新统计它的输出目录
+
+        Returns:
+            全量回收时返回回收摘要，否则返回 None
+        """
+        with lock_for(self._state_path):
+            state = self._read_state()
+            if state is None or time.time() - state.get("scanned_at", 0) >= RESCAN_INTERVAL_S:
+                return self._enforce_locked()
+            sizes = state["sizes"]
+            if task_id is not None:
+                output = self._scan_task(task_id, task_output_dir(task_id, self.cache_dir))
+                if output is None:
+                    sizes.pop(task_id, None)
+                else:
+                    sizes[task_id] = output.size
+            if self.quota_bytes and sum(sizes.values()) > self.quota_bytes:
+                return self._enforce_locked()
+            if task_id is not None:
+                self._write_state(sizes, state["scanned_at"])
+            return None
+
+    def enforce(self) -> Dict[str, Any]:
+        """全量扫描并执行一次回收，返回回收摘要（与其它进程的回收互斥）"""
+        with lock_for(self._state_path):
+            return self._enforce_locked()
+
+    def _enforce_locked(self) -> Dict[str, Any]:
+        scanned_at = time.time()
+        outputs = self._scan()
+        # 任务记录只在需要判断某个输出能否回收时才读
+        records: Dict[str, Dict[str, Any]] = {}
+
+        def protected(output: _TaskOutput) -> bool:
+            if output.task_id not in records:
+                records[output.task_id] = self.task_store.get(output.task_id) or {}
+            record = records[output.task_id]
+            return bool(record.get("pinned")) or record.get("status") in ACTIVE_STATUSES
+
+        recent = {o.task_id for o in outputs[: self.keep_recent_runs]} if self.keep_recent_runs else set()
+        summary = {"evicted_tasks": [], "evicted_files": 0, "freed_bytes": 0}
+        remaining: List[_TaskOutput] = []
+
+        # 1 + 2：过期 / 超出运行数的整个任务输出
+        cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days else None
+        for rank, output in enumerate(outputs):
+            too_old = cutoff is not None and output.created < cutoff
+            too_many = bool(self.max_runs) and rank >= self.max_runs
+            if (too_old or too_many) and output.task_id not in recent and not protected(output):
+                summary["freed_bytes"] += self._evict_task(output, "age" if too_old else "max_runs")
+                summary["evicted_files"] += len(output.steps)
+                summary["evicted_tasks"].append(output.task_id)
+            else:
+                remaining.append(output)
+
+        # 3：配额，先按 LRU 回收中间步骤，再回收非最近运行的最终输出
+        sizes = {o.task_id: o.size for o in remaining}
+        total = sum(sizes.values())
+        if self.quota_bytes and total > self.quota_bytes:
+            by_id = {o.task_id: o for o in remaining}
+            intermediates, finals = [], []
+            for output in remaining:
+                final_step = output.final_step
+                for step in output.steps:
+                    if step.step != final_step:
+                        intermediates.append(step)
+                    elif output.task_id not in recent:
+                        finals.append(step)
+
+            evicted_by_task: Dict[str, List[int]] = {}
+            for candidate in sorted(intermediates, key=lambda s: s.last_access) + sorted(finals, key=lambda s: s.last_access):
+                if total <= self.quota_bytes:
+                    break
+                if protected(by_id[candidate.task_id]):
+                    continue
+                freed = self._remove_files([candidate])
+                total -= candidate.size
+                sizes[candidate.task_id] -= candidate.size
+                summary["freed_bytes"] += freed
+                summary["evicted_files"] += 1
+                evicted_by_task.setdefault(candidate.task_id, []).append(candidate.step)
+            for task_id, steps in evicted_by_task.items():
+                self._record_evicted(task_id, steps, "quota")
+            summary["evicted_tasks"].extend(t for t in evicted_by_task if t not in summary["evicted_tasks"])
+
+        summary["total_bytes"] = total
+        self._write_state(sizes, scanned_at)
+        if summary["evicted_files"]:
+            logger.info(
+                f"Cache retention evicted {summary['evicted_files']} file(s) from "
+                f"{len(summary['evicted_tasks'])} task(s), freed {summary['freed_bytes']} bytes"
+            )
+        return summary
+
+
+def finalize_task_cache(task_id: str, task_store=None):
+    """运行结束后的缓存处理：压缩中间步骤，然后按配额 / 时效回收"""
+    if settings.CACHE_COMPRESS_INTERMEDIATE:
+        try:
+            compress_task_steps(task_id)
+        except Exception as e:
+            logger.error(f"Failed to compress step outputs of {task_id}: {e}")
+    try:
+        create_cache_retention_manager(task_store).maybe_enforce(task_id)
+    except Exception as e:
+        logger.error(f"Cache retention failed after {task_id}: {e}")
+
+
+def create_cache_retention_manager(task_store=None) -> CacheRetentionManager:
+    """按 settings 创建回收器；task_store 缺省时打开默认任务存储（供 Ray worker 使用）"""
+    if task_store is None:
+        from app.services.task_store import create_task_store
+
+        task_store = create_task_store(settings.TASK_REGISTRY)
+    return CacheRetentionManager(
+        settings.CACHE_DIR,
+        task_store,
+        quota_bytes=int(settings.CACHE_QUOTA_GB * 1024 ** 3),
+        max_age_days=settings.CACHE_MAX_AGE_DAYS,
+        max_runs=settings.CACHE_MAX_RUNS,
+        keep_recent_runs=settings.CACHE_KEEP_RECENT_RUNS,
+    )
@@ -17,13 +17,14 @@ import ray
 import asyncio
 import io
 import sys
-from contextlib import redirect_stdout, redirect_stderr
 
 logger = get_logger(__name__)
 
 import inspect
 
 from app.services.param_coercion import coerce_param_value
+from app.services.execution_context import operator_io, operator_param
+from app.services.task_journal import open_execution_reporter
 
 class DataFlowEngineError(Exception):
     """DataFlow Engine 自定义异常类"""
@@ -271,16 +272,10 @@ class DataFlowEngine:
         return db_manager_instance
 
     @staticmethod
-    def decode_hashed_arguments(pipeline_config: Dict[str, Any], task_id: str) -> Dict[str, Any]:
+    def storage_runtime(pipeline_config: Dict[str, Any], task_id: str) -> Dict[str, Any]:
         """
-        解码哈希化的参数
+        解析输入数据集，得到一次执行的 storage 配置（批量执行时每个子执行单独调用）
         """
-        dataflow_runtime = {
-            "storage": {},
-            "serving_map" : {},
-            "embedding_serving_map" : {},
-            "db_manager_map" : {},
-        }
         try:
             input_dataset = pipeline_config["input_dataset"]
             if isinstance(input_dataset, dict):
@@ -309,15 +304,14 @@ class DataFlowEngine:
             os.makedirs(cache_path, exist_ok=True)
             logger.info(f"Cache directory: {cache_path}, exists: {os.path.exists(cache_path)}")
             
-            dataflow_runtime["storage"] = {
+            logger.info(f"Storage initialized with dataset: {dataset['root']}")
+            return {
                 "type": "file",
                 "first_entry_file_name": os.path.abspath(dataset['root']),
                 "cache_path": os.path.join(settings.BASE_DIR, "cache_local", f"{task_id}_output"),
                 "file_name_prefix": "dataflow_cache_step",
                 "cache_type": "jsonl",
             }
-
-            logger.info(f"Storage initialized with dataset: {dataset['root']}")
             
         except DataFlowEngineError:
             raise
@@ -330,7 +324,18 @@ class DataFlowEngine:
                 },
                 original_error=e
             )
-            
+
+    @staticmethod
+    def decode_hashed_arguments(pipeline_config: Dict[str, Any], task_id: str) -> Dict[str, Any]:
+        """
+        解码哈希化的参数
+        """
+        dataflow_runtime = {
+            "storage": DataFlowEngine.storage_runtime(pipeline_config, task_id),
+            "serving_map" : {},
+            "embedding_serving_map" : {},
+            "db_manager_map" : {},
+        }
         operators = pipeline_config.get("operators", [])
 
         for op_idx, op in enumerate(operators):
@@ -450,28 +455,12 @@ class DataFlowEngine:
         # ✅ 新增：算子粒度运行结果详情
         operators_detail: Dict[str, Dict[str, Any]] = {}
 
-        # ✅ 新增：实时更新执行状态到文件
-        def update_execution_status(status: str = None, partial_output: Dict[str, Any] = None):
-            """实时更新执行状态到文件"""
-            if not execution_path:
-                return
-            try:
-                import json
-                with open(execution_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                if task_id in data.get("tasks", {}):
-                    if status:
-                        data["tasks"][task_id]["status"] = status
-                    if partial_output:
-                        if "output" not in data["tasks"][task_id]:
-                             data["tasks"][task_id]["output"] = {}
-                        # 更新 output 中的内容
-                        data["tasks"][task_id]["output"].update(partial_output)
-                        
-                    with open(execution_path, "w", encoding="utf-8") as f:
-                        json.dump(data, f, indent=2)
-            except Exception as e:
-                logger.error(f"Failed to update execution status: {e}")
+        # ✅ 实时状态：算子状态 / 日志只追加到该任务自己的事件日志
+        reporter = open_execution_reporter(task_id, execution_path)
+
+        def report_operator(op_key: str):
+            """上报单个算子的当前状态（只带这一个算子）"""
+            reporter.operator(op_key, dict(operators_detail[op_key]))
 
         # ✅ 新增：统一写日志（同时写到全局 logs 和该算子的 logs）
         def add_log(stage: str, message: str, op_name: str = "__pipeline__"):
@@ -483,6 +472,9 @@ class DataFlowEngine:
             # 如果是具体的算子，记录到 operator_logs
             if op_name != "__pipeline__":
                 operator_logs.setdefault(op_name, []).append(ts_msg)
+                reporter.log(ts_msg, op_name)
+            else:
+                reporter.log(ts_msg)
         
         add_log("global", f"[{started_at}] Starting pipeline execution: {task_id}")
         logger.info(f"Starting pipeline execution: {task_id}")
@@ -669,7 +661,7 @@ class DataFlowEngine:
                                 add_log("init", f"[{datetime.now().isoformat()}]   - Compiled {len(compiled)} code-string(s) for {param_name}", op_key)
                             else:
                                 ann = init_sig.parameters.get(param_name).annotation if param_name in init_sig.parameters else inspect.Parameter.empty
-                                param_value = coerce_param_value(param_value, annotation=ann, default_value=default_value)
+                                param_value = operator_param(coerce_param_value(param_value, annotation=ann, default_value=default_value))
 
                             # Skip params the operator's __init__ does not accept
                             # (and which would otherwise cause a TypeError below).
@@ -731,7 +723,7 @@ class DataFlowEngine:
                             )
                             continue
                         ann = run_sig.parameters.get(param_name).annotation if param_name in run_sig.parameters else inspect.Parameter.empty
-                        param_value = coerce_param_value(param_value, annotation=ann, default_value=default_value)
+                        param_value = operator_param(coerce_param_value(param_value, annotation=ann, default_value=default_value))
                         run_params[param_name] = param_value
 
                     # Unpack VAR_KEYWORD params: if a param maps to a **kwargs
@@ -772,6 +764,9 @@ class DataFlowEngine:
             # Step 3: 执行所有 Operators
             add_log("run", f"[{datetime.now().isoformat()}] Step 3: Executing {len(run_op)} operators...")
             logger.info(f"Executing {len(run_op)} operators...")
+            reporter.status("running", started_at=started_at)
+            for op_key in operators_detail:
+                report_operator(op_key)
             
             execution_results = []
             for op_idx, (operator, run_params, op_name, op_key) in enumerate(run_op):
@@ -785,21 +780,16 @@ class DataFlowEngine:
                     operators_detail[op_key]["status"] = "running"
                     operators_detail[op_key]["started_at"] = datetime.now().isoformat()
                     
-                    # ✅ 实时更新状态到文件
-                    update_execution_status("running", {
-                        "operators_detail": operators_detail,
-                        "operator_logs": operator_logs # Sync logs to file
-                    })
-                    
-                    api_pipeline_path = os.path.join(settings.DATAFLOW_CORE_DIR, "api_pipelines")
-                    os.chdir(api_pipeline_path)
+                    # ✅ 实时上报算子状态
+                    report_operator(op_key)
                     
                     # ✅ 捕获 stdout/stderr
                     f_stdout = io.StringIO()
                     f_stderr = io.StringIO()
                     
                     try:
-                        with redirect_stdout(f_stdout), redirect_stderr(f_stderr):
+                        # 工作目录与输出捕获只作用于本次运行（见 execution_context.py）
+                        with operator_io(f_stdout, f_stderr):
                             operator.run(**run_params)
                     finally:
                         stdout_str = f_stdout.getvalue()
@@ -813,8 +803,6 @@ class DataFlowEngine:
                             for line in stderr_str.splitlines():
                                 if line.strip():
                                     add_log("run", f"[STDERR] {line}", op_key)
-                                    
-                    os.chdir(settings.BASE_DIR)
                     
                     # ✅ 获取处理后的数据量
                     # 尝试从 output file 获取
@@ -848,10 +836,7 @@ class DataFlowEngine:
                     # ✅ 更新算子粒度状态：执行完成
                     operators_detail[op_key]["status"] = "completed"
                     operators_detail[op_key]["completed_at"] = datetime.now().isoformat()
-                    update_execution_status("running", {
-                        "operators_detail": operators_detail,
-                        "operator_logs": operator_logs
-                    })
+                    report_operator(op_key)
 
                     
                     # ✅ 记录缓存文件信息
@@ -884,10 +869,7 @@ class DataFlowEngine:
                             available_columns = list(storage_obj.get_keys_from_dataframe() or [])
                     except Exception as inspect_exc:
                         logger.warning(f"Failed to inspect available columns after operator error: {inspect_exc}")
-                    update_execution_status("failed", {
-                        "operators_detail": operators_detail,
-                        "operator_logs": operator_logs
-                    })
+                    report_operator(op_key)
                     raise DataFlowEngineError(
                         f"执行Operator失败: {op_name}",
                         context={
@@ -939,6 +921,11 @@ class DataFlowEngine:
                     add_log("run", f"[{completed_at}] ERROR: {e.message}", target_key)
                     operators_detail[target_key]["status"] = "failed"
                     operators_detail[target_key]["error"] = e.message
+                    report_operator(target_key)
+                else:
+                    reporter.log(error_log)
+            else:
+                reporter.log(error_log)
             
             logs.append(error_log)
             
@@ -965,7 +952,7 @@ class DataFlowEngine:
         except Exception as e:
             completed_at = datetime.now().isoformat()
             error_log = f"[{completed_at}] ERROR: Unexpected error - {str(e)}"
-            logs.append(error_log)
+            add_log("global", error_log)
             
             logger.error(f"Unexpected error during pipeline execution: {e}")
             logger.error(traceback.format_exc())
@@ -2,6 +2,7 @@ import yaml, os, hashlib
 import json
 from typing import Dict, List
 from app.core.config import settings
+from app.services.registry_io import RegistryFile
 from loguru import logger
 import pandas as pd
 
@@ -59,6 +60,8 @@ class VisualizeDatasetService:
 class DatasetRegistry:
     def __init__(self, path: str | None = None, scan: bool = True):
         self.path = path or settings.DATA_REGISTRY
+        # 多进程安全：进程间锁 + 原子替换写入 + 版本戳缓存（见 registry_io.py）
+        self._file = RegistryFile(self.path, fmt="yaml", default={"datasets": {}})
         self._ensure()
         if scan:
             self.scan_all_datasets()
@@ -113,18 +116,13 @@ class DatasetRegistry:
                 # logging.info(f"Registered dataset from {relative_path}.")
 
     def _ensure(self):
-        if not os.path.exists(self.path):
-            os.makedirs(os.path.dirname(self.path), exist_ok=True)
-            with open(self.path, "w", encoding="utf-8") as f:
-                yaml.safe_dump({"datasets": {}}, f, allow_unicode=True)
+        self._file.ensure()
 
     def _read(self) -> Dict:
-        with open(self.path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f) or {"datasets": {}}
+        return self._file.read()
 
     def _write(self, data: Dict):
-        with open(self.path, "w", encoding="utf-8") as f:
-            yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+        self._file.write(data)
 
     def _count_file_entries(self, file_path: str) -> int:
         """统计文件中的条目数量"""
@@ -169,7 +167,6 @@ class DatasetRegistry:
         return hash_md5.hexdigest()
 
     def add_or_update(self, ds: Dict):
-        data = self._read()
         # 计算一个稳定 id（基于路径）
         ds_id = hashlib.md5(ds["root"].encode("utf-8")).hexdigest()[:10]
         ds["id"] = ds_id
@@ -188,24 +185,25 @@ class DatasetRegistry:
         ds['type'] = ds.get('root','').split('.')[-1].lower()
         ds["added_at"] = pd.Timestamp.now().isoformat()
         
-        # 覆盖或新增
-        datasets = data.get("datasets",{})
-        datasets[ds_id] = ds
-        data["datasets"] = datasets
-        self._write(data)
+        # 覆盖或新增（哈希 / 计数在锁外完成，锁内只做读-改-写）
+        with self._file.transaction() as data:
+            datasets = data.get("datasets") or {}
+            datasets[ds_id] = ds
+            data["datasets"] = datasets
         return ds
 
     def get(self, ds_id: str) -> Dict | None:
         return self._read()["datasets"].get(ds_id)
     
     def remove(self, ds_id: str):
-        data = self._read()
-        datasets = data.get("datasets", {})
-        if ds_id in datasets:
-            del datasets[ds_id]
-            data["datasets"] = datasets
-            self._write(data)
-            return True
+        with self._file.locked():
+            data = self._read()
+            datasets = data.get("datasets", {})
+            if ds_id in datasets:
+                del datasets[ds_id]
+                data["datasets"] = datasets
+                self._write(data)
+                return True
         return False
     
     def preview(self, ds_id: str, num_lines: int = 5) -> List[Dict]:
@@ -0,0 +1,171 @@
+"""Per-run working directory and output capture without process-global state.
+
+Operators used to run inside ``os.chdir(api_pipelines)`` and
+``redirect_stdout`` / ``redirect_stderr``. Both change the whole process, so two
+pipelines (or two threads of one pipeline) in the same process would chdir
+under each other and mix their logs. In isolated mode (see
+:func:`isolated_context_enabled`) the engine instead:
+
+* installs :class:`ContextRoutedStream` as ``sys.stdout`` / ``sys.stderr`` once
+  per process. Every write goes to the stream bound in the current context
+  (:func:`capture_output`), falling back to the real stream. Context variables
+  are per thread and per asyncio task, so concurrent runs and the threads of
+  streaming / branch execution each capture their own output;
+* keeps the run's working directory in a context variable
+  (:func:`working_directory`) and resolves relative path parameters
+  (``./...``, ``../...``) against it explicitly (:func:`resolve_path_param`)
+  instead of changing the process working directory.
+
+Relative paths that an operator builds internally (not passed as a parameter)
+resolve against the process working directory, so such operators only work
+with the old chdir / redirect behaviour. That behaviour therefore stays the
+default: isolated mode is on when ``EXECUTION_ISOLATED_CONTEXT`` is set, or
+automatically when ``EXECUTION_WORKER_CONCURRENCY > 1`` (several pipelines
+share a worker process and cannot chdir under each other).
+"""
+from __future__ import annotations
+
+import io
+import os
+import sys
+import threading
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional, TextIO
+
+from app.core.config import settings
+
+_stdout_target: ContextVar[Optional[TextIO]] = ContextVar("dataflow_stdout", default=None)
+_stderr_target: ContextVar[Optional[TextIO]] = ContextVar("dataflow_stderr", default=None)
+_working_dir: ContextVar[Optional[str]] = ContextVar("dataflow_working_dir", default=None)
+_install_lock = threading.Lock()
+
+
+def isolated_context_enabled() -> bool:
+    """是否隔离运行：显式打开 EXECUTION_ISOLATED_CONTEXT，或 worker 并发 > 1（同一进程同时跑多个 Pipeline）"""
+    return bool(settings.EXECUTION_ISOLATED_CONTEXT) or settings.EXECUTION_WORKER_CONCURRENCY > 1
+
+
+def pipeline_workdir() -> str:
+    """算子运行时的工作目录（DataFlow 自带 api_pipelines 的相对路径以它为准）"""
+    return os.path.join(settings.DATAFLOW_CORE_DIR, "api_pipelines")
+
+
+class ContextRoutedStream(io.TextIOBase):
+    """写入当前上下文绑定的流；没有绑定时写到原来的 stdout / stderr"""
+
+    def __init__(self, fallback: TextIO, target: ContextVar):
+        self.fallback = fallback
+        self.target = target
+
+    def _current(self) -> TextIO:
+        return self.target.get() or self.fallback
+
+    def write(self, s: str) -> int:
+        return self._current().write(s)
+
+    def flush(self):
+        stream = self._current()
+        if hasattr(stream, "flush"):
+            stream.flush()
+
+    def isatty(self) -> bool:
+        stream = self._current()
+        return bool(getattr(stream, "isatty", lambda: False)())
+
+    def fileno(self) -> int:
+        return self.fallback.fileno()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self.fallback, "encoding", "utf-8")
+
+
+def install_routed_streams():
+    """把 sys.stdout / sys.stderr 换成按上下文分发的流（进程内只做一次）"""
+    with _install_lock:
+        if not isinstance(sys.stdout, ContextRoutedStream):
+            sys.stdout = ContextRoutedStream(sys.stdout, _stdout_target)
+        if not isinstance(sys.stderr, ContextRoutedStream):
+            sys.stderr = ContextRoutedStream(sys.stderr, _stderr_target)
+
+
+@contextmanager
+def capture_output(stdout: Optional[TextIO] = None, stderr: Optional[TextIO] = None) -> Iterator[None]:
+    """当前线程 / 任务内的 print 与 stderr 写入 stdout / stderr（None 表示不捕获）"""
+    install_routed_streams()
+    out_token = _stdout_target.set(stdout) if stdout is not None else None
+    err_token = _stderr_target.set(stderr) if stderr is not None else None
+    try:
+        yield
+    finally:
+        if err_token is not None:
+            _stderr_target.reset(err_token)
+        if out_token is not None:
+            _stdout_target.reset(out_token)
+
+
+@contextmanager
+def working_directory(path: str) -> Iterator[None]:
+    """绑定本次运行的工作目录（不改变进程的 cwd）"""
+    token = _working_dir.set(os.path.abspath(path))
+    try:
+        yield
+    finally:
+        _working_dir.reset(token)
+
+
+def current_workdir() -> str:
+    return _working_dir.get() or os.getcwd()
+
+
+def resolve_path_param(value: Any, workdir: Optional[str] = None) -> Any:
+    """./ 或 ../ 开头的字符串参数按本次运行的工作目录解析成绝对路径，其它值原样返回"""
+    if not isinstance(value, str) or "\n" in value:
+        return value
+    if not (value.startswith("./") or value.startswith("../")):
+        return value
+    return os.path.normpath(os.path.join(workdir or current_workdir(), value))
+
+
+@contextmanager
+def operator_workdir() -> Iterator[None]:
+    """
+    只进入算子工作目录，不捕获输出
+
+    包住在多个线程里运行的一组算子（流式组、并行分支），各线程再用 capture_output
+    捕获自己的输出。隔离模式下绑定在当前上下文，线程需用 contextvars.copy_context().run 启动才能继承；
+    否则 os.chdir，结束后回到 BASE_DIR。
+    """
+    if isolated_context_enabled():
+        with working_directory(pipeline_workdir()):
+            yield
+        return
+    os.chdir(pipeline_workdir())
+    try:
+        yield
+    finally:
+        os.chdir(settings.BASE_DIR)
+
+
+@contextmanager
+def operator_io(stdout: Optional[TextIO] = None, stderr: Optional[TextIO] = None) -> Iterator[None]:
+    """
+    算子运行的上下文：工作目录 + 输出捕获
+
+    隔离模式（isolated_context_enabled）下只改当前上下文，可在多个线程里同时使用；
+    否则沿用 os.chdir + redirect_stdout / redirect_stderr（整个进程生效）。
+    """
+    if isolated_context_enabled():
+        with operator_workdir(), capture_output(stdout, stderr):
+            yield
+        return
+    with operator_workdir(), redirect_stdout(stdout or sys.stdout), redirect_stderr(stderr or sys.stderr):
+        yield
+
+
+def operator_param(value: Any) -> Any:
+    """引擎传给算子的参数：隔离模式下相对路径显式解析到算子工作目录（不再依赖 chdir）"""
+    if isolated_context_enabled():
+        return resolve_path_param(value, pipeline_workdir())
+    return value
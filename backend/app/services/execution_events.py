@@ -0,0 +1,137 @@
+"""Push-based execution status events.
+
+Workers append events to the per-task journal (see ``task_journal.py``). This
+module turns those journals into live streams for API clients: for each task
+that has at least one subscriber there is exactly one :class:`_TaskChannel`
+that tails the journal and fans new events out to every subscriber queue, so N
+open editors cost one file tail instead of N status reads per second.
+
+Each event carries ``cursor`` = the byte offset right after it in the journal.
+A client that reconnects with ``since=<last cursor>`` (or the SSE
+``Last-Event-ID`` header) resumes without gaps or duplicates.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.task_journal import TaskJournal
+
+logger = get_logger(__name__)
+
+# 执行进入这些状态后事件流结束
+TERMINAL_STATUSES = {"completed", "failed", "cancelled", "success"}
+
+
+def is_terminal_event(event: Dict[str, Any]) -> bool:
+    return event.get("type") == "status" and event.get("status") in TERMINAL_STATUSES
+
+
+class _TaskChannel:
+    """单个任务的事件广播：一个 tail 协程，多个订阅队列"""
+
+    def __init__(self, task_id: str, journal: TaskJournal, offset: int, poll_interval: float):
+        self.task_id = task_id
+        self.journal = journal
+        self.offset = offset
+        self.poll_interval = poll_interval
+        self.subscribers: Set[asyncio.Queue] = set()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._pump_task = asyncio.create_task(self._pump())
+
+    def stop(self):
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            self._pump_task = None
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """读取 offset 之后新增的完整事件并推进 offset"""
+        events = []
+        for _, event, next_offset in self.journal.iter_events(self.offset):
+            event["cursor"] = next_offset
+            events.append(event)
+            self.offset = next_offset
+        return events
+
+    async def _pump(self):
+        try:
+            while self.subscribers:
+                # 只在文件变长时才解析，空闲任务的代价是一次 stat
+                if self.journal.size() > self.offset:
+                    for event in self.read_new():
+                        for queue in list(self.subscribers):
+                            queue.put_nowait(event)
+                await asyncio.sleep(self.poll_interval)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Execution event pump for {self.task_id} stopped: {e}")
+
+
+class ExecutionEventHub:
+    """按任务管理事件广播通道"""
+
+    def __init__(self, poll_interval: float = 0.2, heartbeat_interval: float = 15.0):
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._channels: Dict[str, _TaskChannel] = {}
+
+    def subscriber_count(self, task_id: str) -> int:
+        channel = self._channels.get(task_id)
+        return len(channel.subscribers) if channel else 0
+
+    async def subscribe(self, task_id: str, journal: TaskJournal, since: int = 0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        订阅任务事件
+
+        先回放 journal 中 since 之后的事件，再接上实时事件；收到终态事件后结束。
+        超过 heartbeat_interval 没有事件时产出 None，调用方可据此发送心跳。
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        channel = self._channels.get(task_id)
+
+        # 注册与回放之间没有 await，广播协程不会在这中间插入事件
+        replay: List[Dict[str, Any]] = []
+        replayed_to = since
+        for _, event, next_offset in journal.iter_events(since):
+            event["cursor"] = next_offset
+            replay.append(event)
+            replayed_to = next_offset
+
+        if channel is None:
+            channel = _TaskChannel(task_id, journal, replayed_to, self.poll_interval)
+            self._channels[task_id] = channel
+            channel.subscribers.add(queue)
+            channel.start()
+        else:
+            channel.subscribers.add(queue)
+
+        try:
+            for event in replay:
+                yield event
+                if is_terminal_event(event):
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event["cursor"] <= replayed_to:
+                    # 已经在回放里发过
+                    continue
+                yield event
+                if is_terminal_event(event):
+                    return
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers and self._channels.get(task_id) is channel:
+                channel.stop()
+                del self._channels[task_id]
+
+
+execution_event_hub = ExecutionEventHub(poll_interval=settings.EXECUTION_EVENT_POLL_INTERVAL)
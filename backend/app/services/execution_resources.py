@@ -0,0 +1,183 @@
+"""Resource requests and admission for pipeline executions.
+
+A run used to get nothing but Ray's default of one CPU, even when its operators
+load embedding models or hold a whole dataset in pandas. Every run now carries a
+:class:`ResourceRequest`:
+
+* **declared**: ``resources`` on the pipeline config and on each operator entry
+  (``num_cpus`` / ``memory_mb`` / ``max_concurrent``); operators run one after
+  another, so a run needs the largest operator figure, not the sum;
+* **history**: the memory recent finished runs of the same pipeline actually
+  used (``resource_usage`` written by the worker), plus some headroom;
+* **input size**: ``file_size`` / ``num_samples`` of the input dataset from the
+  dataset registry, scaled by how much a row-wise pandas frame inflates.
+
+Declared memory wins; otherwise the larger of history and input estimate is used.
+The scheduler asks :func:`fits` before dispatching, so a run that does not fit
+into Ray's free CPU / memory waits in the queue instead of OOM-killing neighbours.
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+
+@dataclass
+class ResourceRequest:
+    """一次执行需要的资源；sources 记录每一项的来源（declared / history / dataset / default）"""
+
+    num_cpus: float = 1.0
+    memory_mb: float = 0.0
+    max_concurrent: Optional[int] = None
+    sources: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ResourceRequest":
+        data = data or {}
+        return cls(
+            num_cpus=float(data.get("num_cpus") or 1.0),
+            memory_mb=float(data.get("memory_mb") or 0.0),
+            max_concurrent=data.get("max_concurrent"),
+            sources=dict(data.get("sources") or {}),
+        )
+
+
+def _declarations(pipeline_config: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    spec = pipeline_config.get("resources")
+    if isinstance(spec, dict):
+        yield spec
+    for op in pipeline_config.get("operators") or []:
+        spec = op.get("resources") if isinstance(op, dict) else None
+        if isinstance(spec, dict):
+            yield spec
+
+
+def declared_resources(pipeline_config: Dict[str, Any]) -> Dict[str, Any]:
+    """合并 Pipeline 与各算子声明的资源：CPU / 内存取最大值，并发上限取最小值"""
+    merged: Dict[str, Any] = {}
+    for spec in _declarations(pipeline_config):
+        for key in ("num_cpus", "memory_mb"):
+            if spec.get(key) is not None:
+                merged[key] = max(float(spec[key]), merged.get(key, 0.0))
+        if spec.get("max_concurrent"):
+            limit = int(spec["max_concurrent"])
+            merged["max_concurrent"] = min(limit, merged.get("max_concurrent", limit))
+    return merged
+
+
+def dataset_memory_mb(dataset: Optional[Dict[str, Any]]) -> Optional[float]:
+    """按输入数据集大小估算运行时内存（MB）；数据集信息缺失时返回 None"""
+    if not dataset:
+        return None
+    file_size = dataset.get("file_size")
+    if isinstance(file_size, (int, float)) and file_size > 0:
+        inflated = file_size / MB * settings.EXECUTION_MEMORY_PER_INPUT_MB
+    else:
+        num_samples = dataset.get("num_samples")
+        if not isinstance(num_samples, int) or num_samples <= 0:
+            return None
+        inflated = num_samples * settings.EXECUTION_MEMORY_PER_ROW_KB / 1024
+    return settings.EXECUTION_MEMORY_BASE_MB + inflated
+
+
+def historical_memory_mb(store, pipeline_id: Optional[str]) -> Optional[float]:
+    """同一 Pipeline 最近几次完成运行实际用掉的内存峰值（MB，含余量）"""
+    if not pipeline_id or pipeline_id == "custom" or settings.EXECUTION_MEMORY_HISTORY_RUNS <= 0:
+        return None
+    try:
+        records, _ = store.query(
+            status=["completed", "success"],
+            pipeline_id=pipeline_id,
+            limit=settings.EXECUTION_MEMORY_HISTORY_RUNS,
+            fields=["resource_usage", "sample"],
+        )
+    except Exception as e:
+        logger.warning(f"Failed to read resource history for {pipeline_id}: {e}")
+        return None
+    used = [
+        (r.get("resource_usage") or {}).get("memory_mb")
+        for r in records
+        # 采样运行只处理了一小部分数据，不能代表全量运行
+        if isinstance(r.get("resource_usage"), dict) and not r.get("sample")
+    ]
+    used = [u for u in used if isinstance(u, (int, float))]
+    if not used:
+        return None
+    return max(used) * settings.EXECUTION_MEMORY_HISTORY_HEADROOM
+
+
+def estimate_request(
+    pipeline_config: Dict[str, Any],
+    dataset: Optional[Dict[str, Any]] = None,
+    history_mb: Optional[float] = None,
+) -> ResourceRequest:
+    """
+    计算一次执行的资源请求
+
+    Args:
+        pipeline_config: Pipeline 配置（含可选的 resources 声明）
+        dataset: 输入数据集注册信息（file_size / num_samples）
+        history_mb: historical_memory_mb() 的结果
+    """
+    declared = declared_resources(pipeline_config)
+    request = ResourceRequest(max_concurrent=declared.get("max_concurrent"))
+    request.sources["num_cpus"] = "default"
+    if declared.get("num_cpus"):
+        request.num_cpus = declared["num_cpus"]
+        request.sources["num_cpus"] = "declared"
+
+    if declared.get("memory_mb"):
+        request.memory_mb = declared["memory_mb"]
+        request.sources["memory_mb"] = "declared"
+        return request
+    candidates = {"history": history_mb, "dataset": dataset_memory_mb(dataset)}
+    candidates = {k: v for k, v in candidates.items() if v is not None}
+    if candidates:
+        source = max(candidates, key=candidates.get)
+        request.memory_mb = round(candidates[source], 1)
+        request.sources["memory_mb"] = source
+    else:
+        request.memory_mb = float(settings.EXECUTION_MEMORY_BASE_MB)
+        request.sources["memory_mb"] = "default"
+    return request
+
+
+def fits(
+    request: ResourceRequest,
+    available: Dict[str, float],
+    total: Dict[str, float],
+    reserved: Optional[ResourceRequest] = None,
+    idle: bool = False,
+) -> bool:
+    """
+    请求能否放进当前空闲资源
+
+    Args:
+        request: 待派发执行的资源请求
+        available / total: ray.available_resources() / ray.cluster_resources()
+        reserved: Ray 没有记账的已派发请求之和（常驻 worker actor 不占 Ray 资源）
+        idle: 当前没有任何运行中的执行；此时超过集群总量的请求也放行，否则会永远排队
+    """
+    reserved = reserved or ResourceRequest(num_cpus=0.0)
+    free_cpus = available.get("CPU", 0.0) - reserved.num_cpus
+    free_mb = available.get("memory", 0.0) / MB - reserved.memory_mb
+    if request.num_cpus <= free_cpus and request.memory_mb <= free_mb:
+        return True
+    too_big = request.num_cpus > total.get("CPU", 0.0) or request.memory_mb > total.get("memory", 0.0) / MB
+    if too_big and idle:
+        logger.warning(
+            f"Resource request {request.num_cpus} CPU / {request.memory_mb:.0f}MB exceeds the cluster; "
+            f"admitting it alone"
+        )
+        return True
+    return False
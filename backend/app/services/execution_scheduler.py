@@ -0,0 +1,365 @@
+"""Admission scheduler for pipeline executions.
+
+``RayPipelineExecutor`` used to hand every submission straight to Ray, with
+Ray itself started as ``num_cpus=1``, so one long LLM pipeline blocked every
+other user. Submissions now go through :class:`ExecutionScheduler`:
+
+* **global concurrency**: at most ``EXECUTION_MAX_CONCURRENCY`` runs are
+  dispatched at a time; the rest wait in the queue;
+* **lanes**: ``interactive`` (small / sample runs) is always picked before
+  ``batch``, and ``EXECUTION_INTERACTIVE_RESERVED`` slots can never be taken
+  by batch runs, so a quick run does not wait behind a long one;
+* **fair share**: inside a lane the next run belongs to the user with the
+  fewest running executions (ties: the user served longest ago), FIFO per user;
+* **persistence**: the queue entry lives in the task record (``scheduling``),
+  so queued runs are rebuilt from the task store after a restart;
+* **resources**: a run is dispatched only when ``admit`` says its resource
+  request fits (see execution_resources.py); otherwise the queue waits for a
+  run to finish, re-checking every ``EXECUTION_ADMISSION_RETRY_S``. A pipeline
+  that declares ``max_concurrent`` never has more runs than that at once;
+* **ETA**: queue position and estimated start time come from simulating the
+  same policy forward with per-pipeline mean durations from the task rollups.
+
+The scheduler only decides *when*; launching is delegated to the executor
+through ``launcher``.
+"""
+from __future__ import annotations
+
+import datetime
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+LANES = ("interactive", "batch")
+DEFAULT_LANE = "batch"
+DEFAULT_USER = "default"
+
+
+@dataclass
+class QueuedExecution:
+    """一次排队中的执行；payload 是交给 launcher 的提交参数"""
+
+    task_id: str
+    lane: str
+    user_id: str
+    seq: int
+    enqueued_at: str
+    registry_path: str
+    pipeline_id: Optional[str] = None
+    payload: Dict[str, Any] = field(default_factory=dict)
+    resources: Dict[str, Any] = field(default_factory=dict)
+    started: Optional[float] = None
+
+    def scheduling_record(self) -> Dict[str, Any]:
+        """写进任务记录的排队信息（重启后据此重建队列）"""
+        return {
+            "lane": self.lane,
+            "user_id": self.user_id,
+            "seq": self.seq,
+            "enqueued_at": self.enqueued_at,
+            "resources": self.resources,
+        }
+
+
+def normalize_lane(lane: Optional[str]) -> str:
+    if lane is None:
+        return DEFAULT_LANE
+    if lane not in LANES:
+        raise ValueError(f"Invalid priority lane: {lane} (expected one of {', '.join(LANES)})")
+    return lane
+
+
+def next_seq() -> int:
+    """跨重启单调的排队序号"""
+    return time.time_ns()
+
+
+# 每个 Pipeline 的平均耗时估计：(registry_path, pipeline_id) -> (算出的时刻, 秒)
+_ESTIMATES: Dict[Tuple[str, str], Tuple[float, float]] = {}
+ESTIMATE_TTL_S = 60.0
+ESTIMATE_WINDOW_DAYS = 30
+
+
+def estimate_run_seconds(registry_path: str, pipeline_id: Optional[str]) -> float:
+    """
+    最近 30 天该 Pipeline 完成运行的平均耗时（取自 day 粒度 rollup）
+
+    没有历史时退回全部 Pipeline 的平均值，再没有就用 EXECUTION_DEFAULT_RUN_SECONDS。
+    """
+    key = (registry_path, pipeline_id or "")
+    cached = _ESTIMATES.get(key)
+    now = time.monotonic()
+    if cached and now - cached[0] < ESTIMATE_TTL_S:
+        return cached[1]
+
+    estimate = float(settings.EXECUTION_DEFAULT_RUN_SECONDS)
+    try:
+        from app.services.task_store import create_task_store
+
+        store = create_task_store(registry_path)
+        since = (datetime.datetime.now() - datetime.timedelta(days=ESTIMATE_WINDOW_DAYS)).isoformat()
+        for scope in ([pipeline_id, None] if pipeline_id else [None]):
+            raw = store.rollups("day", since=since, pipeline_id=scope)
+            total = sum(rollup["duration_sum"] for _, _, rollup in raw)
+            count = sum(rollup["duration_count"] for _, _, rollup in raw)
+            if count:
+                estimate = total / count
+                break
+    except Exception as e:
+        logger.warning(f"Failed to estimate run duration for {pipeline_id}: {e}")
+    _ESTIMATES[key] = (now, estimate)
+    return estimate
+
+
+class ExecutionScheduler:
+    """
+    全局并发 + 交互 / 批量两条队列 + 按用户公平分配
+
+    Args:
+        max_concurrency: 同时运行的执行数上限
+        interactive_reserved: 只留给 interactive 队列的槽位数
+        launcher: 真正提交一次执行的回调，返回 False 表示不再需要运行（已被取消 / 被其它进程领走）
+        estimator: QueuedExecution -> 预计运行秒数，用于排队 ETA
+        admit: (entry, running) -> 资源是否足够；返回 False 时该执行留在队首等待
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        interactive_reserved: Optional[int] = None,
+        launcher: Optional[Callable[[QueuedExecution], bool]] = None,
+        estimator: Optional[Callable[[QueuedExecution], float]] = None,
+        admit: Optional[Callable[[QueuedExecution, List[QueuedExecution]], bool]] = None,
+    ):
+        self.max_concurrency = max(1, max_concurrency or settings.EXECUTION_MAX_CONCURRENCY)
+        reserved = settings.EXECUTION_INTERACTIVE_RESERVED if interactive_reserved is None else interactive_reserved
+        self.interactive_reserved = max(0, reserved)
+        self.launcher = launcher
+        self.estimator = estimator or (lambda entry: estimate_run_seconds(entry.registry_path, entry.pipeline_id))
+        self._queue: Dict[str, QueuedExecution] = {}
+        self._running: Dict[str, QueuedExecution] = {}
+        self._last_served: Dict[str, float] = {}
+        self.admit = admit
+        # 因资源不足停在队首的执行；定时重试派发
+        self.blocked: Optional[str] = None
+        self._retry: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------ 容量
+
+    @property
+    def batch_capacity(self) -> int:
+        """批量队列最多能占的槽位（至少 1，避免配置成 0 后批量永远不跑）"""
+        return max(1, self.max_concurrency - self.interactive_reserved)
+
+    def queued_count(self) -> int:
+        return len(self._queue)
+
+    def running_count(self) -> int:
+        return len(self._running)
+
+    def is_queued(self, task_id: str) -> bool:
+        return task_id in self._queue
+
+    def is_running(self, task_id: str) -> bool:
+        return task_id in self._running
+
+    # ------------------------------------------------------------------ 入队 / 出队
+
+    def enqueue(self, entry: QueuedExecution, dispatch: bool = True) -> List[str]:
+        """排队并尝试派发，返回本次派发出去的 task_id（dispatch=False 时只排队）"""
+        with self._lock:
+            entry.lane = normalize_lane(entry.lane)
+            entry.user_id = entry.user_id or DEFAULT_USER
+            self._queue[entry.task_id] = entry
+        logger.info(f"Execution {entry.task_id} queued in {entry.lane} lane for user {entry.user_id}")
+        return self.dispatch() if dispatch else []
+
+    def remove(self, task_id: str) -> bool:
+        """从队列中移除尚未派发的执行（取消）"""
+        with self._lock:
+            if self.blocked == task_id:
+                self.blocked = None
+            return self._queue.pop(task_id, None) is not None
+
+    def finished(self, task_id: str) -> List[str]:
+        """运行结束（完成 / 失败 / 取消）后释放槽位并派发后续执行"""
+        with self._lock:
+            self._running.pop(task_id, None)
+        return self.dispatch()
+
+    def dispatch(self) -> List[str]:
+        """按策略派发直到没有空槽位或队列为空"""
+        launched = []
+        with self._lock:
+            while True:
+                entry = self._pick(self._queue.values(), self._running.values(), self._last_served)
+                if entry is None:
+                    break
+                if not self._admitted(entry):
+                    # 严格按策略顺序：队首放不下时后面的也不插队，避免大任务饿死
+                    if self.blocked != entry.task_id:
+                        logger.info(f"Execution {entry.task_id} waits for resources {entry.resources}")
+                    self.blocked = entry.task_id
+                    self._schedule_retry()
+                    break
+                self.blocked = None
+                self._queue.pop(entry.task_id, None)
+                entry.started = time.monotonic()
+                self._running[entry.task_id] = entry
+                self._last_served[entry.user_id] = entry.started
+                ok = False
+                try:
+                    ok = self.launcher(entry) if self.launcher is not None else True
+                except Exception as e:
+                    logger.error(f"Failed to launch execution {entry.task_id}: {e}")
+                if ok:
+                    launched.append(entry.task_id)
+                else:
+                    self._running.pop(entry.task_id, None)
+        return launched
+
+    def _admitted(self, entry: QueuedExecution) -> bool:
+        if self.admit is None:
+            return True
+        try:
+            return bool(self.admit(entry, list(self._running.values())))
+        except Exception as e:
+            # 资源探测失败时不阻塞队列
+            logger.warning(f"Admission check failed for {entry.task_id}, admitting: {e}")
+            return True
+
+    def _schedule_retry(self):
+        if self._retry is not None and self._retry.is_alive():
+            return
+        self._retry = threading.Timer(settings.EXECUTION_ADMISSION_RETRY_S, self.dispatch)
+        self._retry.daemon = True
+        self._retry.start()
+
+    def _pick(self, queued, running, last_served: Dict[str, float]) -> Optional[QueuedExecution]:
+        running = list(running)
+        if len(running) >= self.max_concurrency:
+            return None
+        # Pipeline 声明了并发上限（如独占 GPU 的算子）：已满的 Pipeline 暂不参与挑选
+        running_per_pipeline: Dict[Optional[str], int] = {}
+        for e in running:
+            running_per_pipeline[e.pipeline_id] = running_per_pipeline.get(e.pipeline_id, 0) + 1
+        queued = [
+            e for e in queued
+            if not e.resources.get("max_concurrent")
+            or running_per_pipeline.get(e.pipeline_id, 0) < e.resources["max_concurrent"]
+        ]
+        interactive = [e for e in queued if e.lane == "interactive"]
+        if interactive:
+            candidates = interactive
+        else:
+            running_batch = sum(1 for e in running if e.lane == "batch")
+            if running_batch >= self.batch_capacity:
+                return None
+            candidates = queued
+        if not candidates:
+            return None
+
+        running_per_user: Dict[str, int] = {}
+        for e in running:
+            running_per_user[e.user_id] = running_per_user.get(e.user_id, 0) + 1
+        # 公平分配：正在运行最少的用户优先，其次是最久没被服务的用户，最后按排队先后
+        return min(
+            candidates,
+            key=lambda e: (running_per_user.get(e.user_id, 0), last_served.get(e.user_id, 0.0), e.seq),
+        )
+
+    # ------------------------------------------------------------------ 排队位置 / ETA
+
+    def plan(self) -> Dict[str, Dict[str, Any]]:
+        """
+        按当前策略向前模拟，得到每个排队执行的位置与预计开始时间
+
+        Returns:
+            task_id -> {"lane", "position", "ahead", "running", "estimated_wait_s", "estimated_start_at"}
+        """
+        with self._lock:
+            queued = list(self._queue.values())
+            running = list(self._running.values())
+            last_served = dict(self._last_served)
+        if not queued:
+            return {}
+
+        now = time.monotonic()
+        # 模拟中的运行项：(预计结束的相对秒数, entry)
+        sim_running: List[Tuple[float, QueuedExecution]] = []
+        for entry in running:
+            elapsed = now - (entry.started or now)
+            sim_running.append((max(self._estimate(entry) - elapsed, 1.0), entry))
+        pending = list(queued)
+        t = 0.0
+        plan: Dict[str, Dict[str, Any]] = {}
+        while pending:
+            entry = self._pick(pending, [e for _, e in sim_running], last_served)
+            if entry is None:
+                if not sim_running:
+                    break
+                # 推进到下一个运行结束的时刻
+                sim_running.sort(key=lambda item: item[0])
+                t = max(t, sim_running.pop(0)[0])
+                continue
+            pending.remove(entry)
+            last_served[entry.user_id] = now + t
+            sim_running.append((t + self._estimate(entry), entry))
+            plan[entry.task_id] = {
+                "lane": entry.lane,
+                "position": len(plan) + 1,
+                "ahead": len(plan),
+                "running": len(running),
+                "estimated_wait_s": round(t, 1),
+                "estimated_start_at": (datetime.datetime.now() + datetime.timedelta(seconds=t)).isoformat(),
+            }
+        return plan
+
+    def queue_info(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """单个排队执行的位置与 ETA；不在本进程队列中时返回 None"""
+        if task_id not in self._queue:
+            return None
+        info = self.plan().get(task_id)
+        if info is not None and task_id == self.blocked:
+            info["waiting_for"] = "resources"
+        return info
+
+    def snapshot(self) -> Dict[str, Any]:
+        """调度器整体状态（调试 / 统计用）"""
+        with self._lock:
+            queued = list(self._queue.values())
+            running = list(self._running.values())
+        return {
+            "max_concurrency": self.max_concurrency,
+            "interactive_reserved": self.interactive_reserved,
+            "running": [{"task_id": e.task_id, "lane": e.lane, "user_id": e.user_id} for e in running],
+            "queued": {lane: sum(1 for e in queued if e.lane == lane) for lane in LANES},
+            "blocked_on_resources": self.blocked,
+        }
+
+    def _estimate(self, entry: QueuedExecution) -> float:
+        try:
+            return max(float(self.estimator(entry)), 1.0)
+        except Exception:
+            return float(settings.EXECUTION_DEFAULT_RUN_SECONDS)
+
+    def reset(self):
+        with self._lock:
+            self._queue.clear()
+            self._running.clear()
+            self._last_served.clear()
+            self.blocked = None
+            if self._retry is not None:
+                self._retry.cancel()
+                self._retry = None
+
+
+# 进程内唯一的调度器；由当前执行器（get_pipeline_executor）设置 launcher
+execution_scheduler = ExecutionScheduler()
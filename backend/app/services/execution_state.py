@@ -0,0 +1,388 @@
+"""Single-writer execution state service.
+
+Ray workers no longer open the task store / journal themselves. They buffer
+small status / operator / progress / log events and send them in batches to one
+detached Ray actor per task registry (:func:`execution_state_actor_name`). The
+actor is the only writer for running executions:
+
+* events are queued in memory and flushed every ``flush_interval`` seconds;
+  one flush does one journal write per task and at most one store transaction
+  per task (status patches are merged, repeated progress samples of the same
+  operator collapse to the latest one);
+* the folded execution view (status, operators_detail, logs, cursor) stays in
+  the actor's memory, so the API answers status reads from there instead of
+  re-reading the journal;
+* the actor runs one call at a time and each reporter sends its batches in
+  buffer order, so Ray's per-caller ordering keeps a task's batches (and its
+  final status, always the last one) in the order they were produced.
+
+When Ray is not running (tests, sync execution) everything falls back to the
+direct :class:`~app.services.task_journal.ExecutionReporter` path.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.logger_setup import get_logger
+from app.services.task_journal import (
+    ExecutionReporter,
+    JournalCache,
+    TaskJournal,
+    journal_path_for,
+)
+
+logger = get_logger(__name__)
+
+EXECUTION_STATE_ACTOR_NAME = "dataflow_execution_state"
+
+
+def execution_state_actor_name(registry_path: str) -> str:
+    """detached actor 按任务注册表路径命名，换了注册表（或另一套部署）不会复用到别人的 actor"""
+    digest = hashlib.sha1(os.path.abspath(registry_path).encode("utf-8")).hexdigest()[:12]
+    return f"{EXECUTION_STATE_ACTOR_NAME}_{digest}"
+
+# 特殊事件：携带最终结果，落盘时写入任务存储并追加一条终态事件
+FINISH_EVENT = "finish"
+
+
+class ExecutionStateService:
+    """
+    执行状态的唯一写者（在 Ray actor 里运行，也可以直接在进程内使用）
+
+    submit() 只入队，flush() 批量落盘；snapshot() 返回内存里折叠好的视图。
+    """
+
+    def __init__(
+        self,
+        registry_path: str,
+        flush_interval: float = 0.2,
+        max_views: int = 512,
+        autoflush: bool = False,
+    ):
+        from app.services.task_store import create_task_store
+
+        self.registry_path = registry_path
+        self.flush_interval = flush_interval
+        self.store = create_task_store(registry_path)
+        self._views = JournalCache(max_entries=max_views)
+        self._journals: Dict[str, TaskJournal] = {}
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        # 同一时间只有一个 flush 在写盘，保证同一任务的批次按顺序落盘
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"received": 0, "coalesced": 0, "written": 0, "flushes": 0}
+        if autoflush:
+            self.start()
+
+    # ------------------------------------------------------------------ 写入
+
+    def submit(self, task_id: str, events: List[Dict[str, Any]], flush: bool = False) -> int:
+        """
+        接收一批事件；flush=True 时立即落盘（终态、取消等需要马上可见的场景）
+
+        Returns:
+            该任务当前待落盘的事件数
+        """
+        with self._lock:
+            pending = self._pending.setdefault(task_id, [])
+            for event in events:
+                self.stats["received"] += 1
+                if not self._coalesce(pending, event):
+                    pending.append(event)
+            remaining = len(pending)
+        if flush:
+            self.flush()
+            return 0
+        return remaining
+
+    def _coalesce(self, pending: List[Dict[str, Any]], event: Dict[str, Any]) -> bool:
+        """同一算子尚未落盘的进度采样只保留最新一条"""
+        if event.get("type") != "progress":
+            return False
+        for i in range(len(pending) - 1, -1, -1):
+            queued = pending[i]
+            if queued.get("op_key") != event.get("op_key"):
+                continue
+            if queued.get("type") == "progress":
+                pending[i] = event
+                self.stats["coalesced"] += 1
+                return True
+            if queued.get("type") == "operator":
+                # 算子状态切换之前的进度不能挪到切换之后
+                return False
+        return False
+
+    def flush(self) -> int:
+        """把所有待落盘事件写入日志与任务存储，返回写入的事件数"""
+        with self._flush_lock:
+            with self._lock:
+                batches, self._pending = self._pending, {}
+            written = 0
+            for task_id, events in batches.items():
+                if not events:
+                    continue
+                try:
+                    written += self._write(task_id, events)
+                except Exception as e:
+                    logger.error(f"Failed to flush execution state for {task_id}: {e}")
+            if written:
+                self.stats["written"] += written
+                self.stats["flushes"] += 1
+            return written
+
+    def _journal(self, task_id: str) -> TaskJournal:
+        journal = self._journals.get(task_id)
+        if journal is None:
+            journal = self._journals[task_id] = TaskJournal(journal_path_for(self.registry_path, task_id))
+        return journal
+
+    def _write(self, task_id: str, events: List[Dict[str, Any]]) -> int:
+        journal = self._journal(task_id)
+        lines: List[Dict[str, Any]] = []
+        status_patch: Dict[str, Any] = {}
+        result = None
+        for event in events:
+            if event.get("type") == FINISH_EVENT:
+                result = event.get("result") or {}
+                fields = {k: result.get(k) for k in ("started_at", "completed_at") if result.get(k)}
+                lines.append({"ts": event.get("ts"), "type": "status", "status": result.get("status"), "fields": fields})
+                continue
+            lines.append(event)
+            if event.get("type") == "status":
+                status_patch.update(event.get("fields") or {})
+                if event.get("status"):
+                    status_patch["status"] = event["status"]
+
+        journal.append_many(lines)
+        # 一批事件最多一次索引列更新 + 一次最终结果写入
+        if status_patch and result is None:
+            self.store.patch(task_id, status_patch)
+        if result is not None:
+            persisted = {**status_patch, **ExecutionReporter.persisted_result(result, True)}
+            self.store.update(task_id, lambda record: record.update(persisted))
+            journal.close()
+            self._journals.pop(task_id, None)
+        self._views.advance(journal, task_id)
+        return len(lines)
+
+    # ------------------------------------------------------------------ 读取
+
+    def snapshot(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        内存中的执行视图（与已落盘的日志一致，cursor 即日志字节偏移）
+
+        actor 没见过的任务（例如重启之前的历史任务）返回 None，由调用方回退到读日志。
+        """
+        return self._views.cached(task_id)
+
+    def forget(self, task_id: str):
+        """任务被删除时丢弃内存状态"""
+        with self._lock:
+            self._pending.pop(task_id, None)
+        journal = self._journals.pop(task_id, None)
+        if journal is not None:
+            journal.close()
+        self._views.invalidate(task_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = sum(len(v) for v in self._pending.values())
+        return {**self.stats, "pending": pending, "open_journals": len(self._journals)}
+
+    # ------------------------------------------------------------------ 后台落盘
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._flush_loop, name="execution-state-flush", daemon=True)
+        self._thread.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+
+class BufferedExecutionReporter(ExecutionReporter):
+    """
+    worker 侧的上报器：事件先攒在本地，按条数 / 时间批量发给状态服务
+
+    status() 与 finish() 会立即发送；finish() 等待状态服务落盘后才返回，
+    worker 退出时最终结果一定已经持久化。
+    """
+
+    def __init__(
+        self,
+        task_id: str,
+        send: Callable[[str, List[Dict[str, Any]], bool], Any],
+        max_batch: int = 200,
+        max_delay: float = 0.25,
+    ):
+        super().__init__(task_id)
+        self._send = send
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # 取批次与发送在同一把锁里，定时线程和主线程的批次不会交错发出
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if max_delay > 0:
+            self._thread = threading.Thread(target=self._flush_loop, name=f"reporter-{task_id}", daemon=True)
+            self._thread.start()
+
+    def _append(self, event_type: str, **payload):
+        event = {"ts": datetime.now().isoformat(), "type": event_type, **payload}
+        with self._lock:
+            self._buffer.append(event)
+            full = len(self._buffer) >= self.max_batch
+        if full:
+            self.flush()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.max_delay):
+            self.flush()
+
+    def flush(self, wait: bool = False):
+        with self._send_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch and not wait:
+                return
+            try:
+                self._send(self.task_id, batch, wait)
+            except Exception as e:
+                logger.error(f"Failed to send execution events for {self.task_id}: {e}")
+
+    def status(self, status: str, **fields):
+        self._append("status", status=status, fields=fields)
+        self.flush()
+
+    def finish(self, result: Dict[str, Any]):
+        self._append(FINISH_EVENT, result=result)
+        self.flush(wait=True)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self.flush()
+
+
+def actor_execution_reporter(task_id: str, actor) -> BufferedExecutionReporter:
+    """在 Ray worker 里创建把事件发给状态 actor 的上报器"""
+    import ray
+    from app.core.config import settings
+
+    def send(tid: str, events: List[Dict[str, Any]], wait: bool):
+        ref = actor.submit.remote(tid, events, wait)
+        if wait:
+            ray.get(ref, timeout=60)
+
+    return BufferedExecutionReporter(
+        task_id,
+        send,
+        max_batch=settings.EXECUTION_REPORT_BATCH_SIZE,
+        max_delay=settings.EXECUTION_REPORT_MAX_DELAY,
+    )
+
+
+class ExecutionStateClient:
+    """
+    API 进程侧的句柄：创建 / 获取状态 actor，转发写入，读取内存视图
+
+    Ray 未初始化或 actor 不可用时 active 为 False，调用方回退到直接读写日志。
+    """
+
+    def __init__(self, snapshot_timeout: float = 2.0):
+        self.snapshot_timeout = snapshot_timeout
+        self._actor = None
+        self._registry_path: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        if self._actor is None:
+            return False
+        import ray
+
+        return ray.is_initialized()
+
+    @property
+    def handle(self):
+        return self._actor if self.active else None
+
+    def ensure(self, registry_path: str):
+        """启动（或复用）该任务注册表的 detached 状态 actor；需在 ray.init 之后调用"""
+        registry_path = os.path.abspath(registry_path)
+        if self._actor is not None and self._registry_path == registry_path:
+            return self._actor
+        import ray
+        from app.core.config import settings
+
+        name = execution_state_actor_name(registry_path)
+        # max_concurrency=1：调用按到达顺序逐个执行，同一 worker 的批次不会乱序落盘
+        actor_cls = ray.remote(num_cpus=0, max_concurrency=1)(ExecutionStateService)
+        self._actor = actor_cls.options(
+            name=name,
+            lifetime="detached",
+            get_if_exists=True,
+        ).remote(registry_path, flush_interval=settings.EXECUTION_STATE_FLUSH_INTERVAL, autoflush=True)
+        self._registry_path = registry_path
+        logger.info(f"Execution state actor ready: {name}")
+        return self._actor
+
+    def submit(self, task_id: str, events: List[Dict[str, Any]], flush: bool = False) -> bool:
+        """把 API 侧产生的事件（排队、取消）交给 actor 写；不可用时返回 False"""
+        actor = self.handle
+        if actor is None:
+            return False
+        import ray
+
+        stamped = [{"ts": datetime.now().isoformat(), **event} for event in events]
+        try:
+            ref = actor.submit.remote(task_id, stamped, flush)
+            if flush:
+                ray.get(ref, timeout=self.snapshot_timeout)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to submit events to execution state actor: {e}")
+            return False
+
+    def snapshot(self, task_id: str) -> Optional[Dict[str, Any]]:
+        actor = self.handle
+        if actor is None:
+            return None
+        import ray
+
+        try:
+            return ray.get(actor.snapshot.remote(task_id), timeout=self.snapshot_timeout)
+        except Exception as e:
+            logger.warning(f"Execution state snapshot unavailable for {task_id}: {e}")
+            return None
+
+    def forget(self, task_id: str):
+        actor = self.handle
+        if actor is not None:
+            actor.forget.remote(task_id)
+
+    def reset(self):
+        self._actor = None
+        self._registry_path = None
+
+
+execution_state = ExecutionStateClient()
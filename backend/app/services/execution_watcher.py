@@ -0,0 +1,209 @@
+"""Driver-side completion watcher for Ray pipeline executions.
+
+Every submitted execution registers its ObjectRef here. One asyncio task polls
+the outstanding refs with ``ray.wait``; when a ref becomes ready (or its worker
+dies) the watcher
+
+* fetches the result (or classifies the Ray error into an exit reason),
+* makes sure the task has a terminal status even if the worker never got to
+  write one (crash, OOM kill, exception before the reporter opened),
+* records ``duration_seconds`` / ``exit_reason`` / ``finalized_at`` on the task,
+* drops the ref, so the driver does not pin result payloads of finished runs,
+* notifies ``on_finished`` listeners (the scheduler frees the slot).
+
+The watcher stops by itself when nothing is outstanding and is restarted by the
+next ``track``.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import ray
+
+from app.core.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled", "success")
+
+
+def classify_exit(error: Optional[BaseException], result: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+    """
+    根据 ray.get 的结果 / 异常得到 (exit_reason, 最终状态)
+
+    exit_reason 取值：completed / failed（Pipeline 自己返回失败）/ cancelled /
+    worker_crashed（进程被杀、OOM、节点丢失、常驻 worker actor 退出）/ task_error（远程函数抛出未捕获异常）
+    """
+    if error is None:
+        status = (result or {}).get("status") or "completed"
+        return ("completed" if status in ("completed", "success") else status), status
+    if isinstance(error, ray.exceptions.TaskCancelledError):
+        return "cancelled", "cancelled"
+    crashed = (
+        ray.exceptions.WorkerCrashedError,
+        ray.exceptions.NodeDiedError,
+        ray.exceptions.OutOfMemoryError,
+        ray.exceptions.ObjectLostError,
+        ray.exceptions.RayActorError,
+    )
+    if isinstance(error, crashed):
+        return "worker_crashed", "failed"
+    return "task_error", "failed"
+
+
+def finalize_execution(
+    task_id: str,
+    registry_path: str,
+    result: Optional[Dict[str, Any]],
+    exit_reason: str,
+    status: str,
+    duration_s: float,
+    error: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    把一次执行的结束信息写入任务存储
+
+    worker 已经写过终态时只补充耗时与退出原因；否则（崩溃 / 异常返回）由这里写终态，
+    同样经过状态 actor 或事件日志，保证 SSE / 长轮询能看到结束事件。
+    """
+    from app.services.execution_state import FINISH_EVENT, execution_state
+    from app.services.task_journal import open_execution_reporter
+    from app.services.task_store import create_task_store
+
+    store = create_task_store(registry_path)
+    record = store.get(task_id)
+    if record is None:
+        return None
+    now = datetime.now().isoformat()
+
+    if record.get("status") not in TERMINAL_STATUSES:
+        final = dict(result or {})
+        final["status"] = status
+        final.setdefault("completed_at", now)
+        if error:
+            final.setdefault("output", {})
+            if isinstance(final["output"], dict):
+                final["output"].setdefault("error", error)
+        logger.warning(f"Execution {task_id} ended without a terminal status ({exit_reason}); marking {status}")
+        if not execution_state.submit(task_id, [{"type": FINISH_EVENT, "result": final}], flush=True):
+            reporter = open_execution_reporter(task_id, registry_path)
+            reporter.finish(final)
+            reporter.close()
+
+    return store.patch(task_id, {
+        "duration_seconds": round(duration_s, 3),
+        "exit_reason": exit_reason,
+        "finalized_at": now,
+    })
+
+
+class ExecutionCompletionWatcher:
+    """跟踪未完成的 ObjectRef，完成后落盘结束信息并释放引用"""
+
+    def __init__(self, poll_timeout: float = 1.0):
+        self.poll_timeout = poll_timeout
+        self.refs: Dict[str, ray.ObjectRef] = {}
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.finalized_count = 0
+        # 结束回调 task_id -> None，在线程池中调用（可能阻塞，需要事件循环时自行交回）
+        self.on_finished: List[Callable[[str], Any]] = []
+
+    def track(self, task_id: str, ref: ray.ObjectRef, registry_path: str):
+        """登记一次提交；在事件循环里调用时顺带确保监视协程在运行"""
+        self.refs[task_id] = ref
+        self._meta[task_id] = {"registry_path": registry_path, "submitted": time.monotonic()}
+        self.ensure_running()
+
+    def untrack(self, task_id: str) -> Optional[ray.ObjectRef]:
+        """不再跟踪（例如用户主动取消，由取消流程写终态）"""
+        self._meta.pop(task_id, None)
+        return self.refs.pop(task_id, None)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self.refs)
+
+    def ensure_running(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 在线程池里调用（同步接口）：交回之前见过的事件循环去启动；
+            # 从没见过事件循环时，由下一次 poll_once / track 处理
+            if self._loop is not None and self._loop.is_running():
+                self._loop.call_soon_threadsafe(self.ensure_running)
+            return
+        self._loop = loop
+        self._task = loop.create_task(self.run())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while self.refs:
+            try:
+                await self.poll_once(loop)
+            except Exception as e:
+                logger.error(f"Completion watcher poll failed: {e}")
+                await asyncio.sleep(self.poll_timeout)
+
+    async def poll_once(self, loop=None) -> List[str]:
+        """等待一轮（最多 poll_timeout 秒），返回本轮结束的任务"""
+        loop = loop or asyncio.get_running_loop()
+        refs = list(self.refs.values())
+        if not refs:
+            return []
+        ready, _ = await loop.run_in_executor(
+            None,
+            lambda: ray.wait(refs, num_returns=len(refs), timeout=self.poll_timeout, fetch_local=False),
+        )
+        if not ready:
+            return []
+        ready_ids = {id(ref) for ref in ready}
+        finished = [tid for tid, ref in list(self.refs.items()) if id(ref) in ready_ids]
+        for task_id in finished:
+            await loop.run_in_executor(None, self._finalize, task_id)
+            # 回调会阻塞（worker 池回收 actor、调度器派发下一个执行），同样放到线程池里
+            await loop.run_in_executor(None, self._notify, task_id)
+        return finished
+
+    def _notify(self, task_id: str):
+        for callback in list(self.on_finished):
+            try:
+                callback(task_id)
+            except Exception as e:
+                logger.error(f"Completion callback failed for {task_id}: {e}")
+
+    def _finalize(self, task_id: str):
+        ref = self.refs.get(task_id)
+        meta = self._meta.get(task_id)
+        if ref is None or meta is None:
+            return
+        result, error = None, None
+        try:
+            result = ray.get(ref, timeout=self.poll_timeout)
+        except Exception as e:
+            error = e
+        exit_reason, status = classify_exit(error, result)
+        duration = time.monotonic() - meta["submitted"]
+        try:
+            finalize_execution(
+                task_id,
+                meta["registry_path"],
+                result if isinstance(result, dict) else None,
+                exit_reason,
+                status,
+                duration,
+                error=f"{type(error).__name__}: {error}" if error else None,
+            )
+        except Exception as e:
+            logger.error(f"Failed to finalize execution {task_id}: {e}")
+        finally:
+            # 释放引用：driver 不再持有结果对象
+            self.untrack(task_id)
+            self.finalized_count += 1
+        logger.info(f"Execution {task_id} finalized: {exit_reason} in {duration:.1f}s")
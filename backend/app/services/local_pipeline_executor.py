@@ -0,0 +1,485 @@
+"""Local process-pool executor backend (``EXECUTION_BACKEND = "local"``).
+
+On a single node Ray costs more than it gives: ``ray.init`` takes seconds and
+starts a raylet, GCS and dashboard that stay resident next to the API. This
+backend runs pipelines in plain worker processes instead:
+
+* :class:`LocalWorkerPool` keeps up to ``EXECUTION_LOCAL_WORKERS`` processes
+  (``spawn`` start method, the API process has threads). Each one warms up
+  DataFlow once (:func:`~app.services.worker_pool.warm_up_process`) and then
+  runs jobs sent over a pipe, one at a time. Workers are recycled after
+  ``EXECUTION_WORKER_MAX_JOBS`` jobs or ``EXECUTION_WORKER_MAX_RSS_GROWTH_MB``
+  of RSS growth, like the Ray actor pool;
+* every job is a ``concurrent.futures.Future``. A reader thread per worker
+  resolves it with the result, or with :class:`LocalWorkerCrashed` when the
+  process dies mid-run. The future is finalized in the event loop's thread
+  pool, the same way the Ray completion watcher does it: terminal status,
+  duration, exit reason, then the ``on_finished`` listeners (releasing or
+  recycling the worker joins processes, so none of it runs on the loop);
+* status, operator progress and logs are written by the worker directly to the
+  task store and event journal (the reporter path used when there is no state
+  actor), so SSE, polling and result endpoints work unchanged;
+* cancelling a running job terminates its worker process, and a fresh warm
+  worker replaces it.
+
+Ray-only features degrade gracefully: operators declared with ``shards`` run
+unsharded, and admission checks requests against this machine's CPUs and memory.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.execution_resources import ResourceRequest, fits
+from app.services.execution_scheduler import QueuedExecution
+from app.services.execution_watcher import classify_exit, finalize_execution
+from app.services.pipeline_executor import PipelineExecutor
+from app.services.worker_pool import current_rss_mb, warm_up_process
+
+logger = get_logger(__name__)
+
+WORKER_NAME_PREFIX = "dataflow_local_worker"
+# fork 会复制 API 进程里的线程与锁状态，worker 一律用 spawn
+START_METHOD = "spawn"
+STOP_TIMEOUT_S = 5.0
+
+
+class LocalWorkerCrashed(RuntimeError):
+    """worker 进程在任务结束前退出（被杀、OOM、崩溃）"""
+
+
+def run_local_job(
+    pipeline_config: Dict[str, Any],
+    dataflow_runtime: Dict[str, Any],
+    task_id: str,
+    pipeline_execution_path: str,
+) -> Dict[str, Any]:
+    """worker 进程里执行一次 Pipeline；没有状态 actor，状态与日志直接写任务存储和事件日志"""
+    from app.services.ray_pipeline_executor import run_pipeline_job
+
+    print(f"[LOCAL WORKER] Starting execution: {task_id} (worker {os.getpid()})")
+    return run_pipeline_job(pipeline_config, dataflow_runtime, task_id, pipeline_execution_path, None)
+
+
+def _serve(conn, warm_up: Optional[Callable[[], Any]], job: Callable[..., Dict[str, Any]]):
+    """worker 进程主循环：预热后逐个执行管道里收到的任务，收到 None 或管道关闭时退出"""
+    started = time.perf_counter()
+    if warm_up is not None:
+        warm_up()
+    warmup_s = time.perf_counter() - started
+    baseline_rss_mb = current_rss_mb()
+    jobs = 0
+
+    def stats() -> Dict[str, Any]:
+        rss = current_rss_mb()
+        return {
+            "pid": os.getpid(),
+            "jobs": jobs,
+            "warmup_s": round(warmup_s, 3),
+            "rss_mb": round(rss, 1),
+            "rss_growth_mb": round(rss - baseline_rss_mb, 1),
+        }
+
+    conn.send({"type": "ready", "stats": stats()})
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        result, error = None, None
+        try:
+            result = job(*message["args"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        jobs += 1
+        conn.send({"type": "done", "task_id": message["task_id"], "result": result, "error": error, "stats": stats()})
+    conn.close()
+
+
+class _LocalWorker:
+    """驱动侧对一个 worker 进程的记录；读线程把结果交给当前任务的 Future"""
+
+    def __init__(self, process, conn, name: str):
+        self.process = process
+        self.conn = conn
+        self.name = name
+        self.task_id: Optional[str] = None
+        self.future: Optional[Future] = None
+        self.stats: Dict[str, Any] = {}
+        self.ready = threading.Event()
+        self._reader = threading.Thread(target=self._read, name=f"{name}_reader", daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            self.stats = message.get("stats") or self.stats
+            if message["type"] == "ready":
+                self.ready.set()
+            elif message["type"] == "done":
+                future, self.future = self.future, None
+                if future is not None:
+                    future.set_result(message)
+        future, self.future = self.future, None
+        if future is not None and not future.done():
+            self.process.join(timeout=STOP_TIMEOUT_S)
+            future.set_exception(LocalWorkerCrashed(
+                f"Local worker {self.process.pid} exited with code {self.process.exitcode} during the run"
+            ))
+
+    def send(self, message: Optional[Dict[str, Any]]):
+        self.conn.send(message)
+
+
+class LocalWorkerPool:
+    """
+    本机常驻 worker 进程池
+
+    Args:
+        size: 常驻进程数（0 表示每次执行启动一个新进程，结束即退出）
+        max_jobs: 每个进程最多执行的任务数，到达后回收
+        max_rss_growth_mb: 相对预热后的 RSS 增长上限（MB），超过后回收
+        job: worker 里执行任务的函数 job(pipeline_config, dataflow_runtime, task_id, path)，需可 pickle
+        warm_up: worker 启动时的预热函数，需可 pickle；None 表示不预热
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_jobs: Optional[int] = None,
+        max_rss_growth_mb: Optional[float] = None,
+        job: Callable[..., Dict[str, Any]] = run_local_job,
+        warm_up: Optional[Callable[[], Any]] = warm_up_process,
+    ):
+        self.size = max(0, settings.EXECUTION_LOCAL_WORKERS if size is None else size)
+        self.max_jobs = settings.EXECUTION_WORKER_MAX_JOBS if max_jobs is None else max_jobs
+        self.max_rss_growth_mb = (
+            settings.EXECUTION_WORKER_MAX_RSS_GROWTH_MB if max_rss_growth_mb is None else max_rss_growth_mb
+        )
+        self.job = job
+        self.warm_up = warm_up
+        self._idle: List[_LocalWorker] = []
+        self._busy: Dict[str, _LocalWorker] = {}
+        self._spawned = 0
+        self._lock = threading.RLock()
+        self.recycled_count = 0
+
+    def busy(self, task_id: str) -> bool:
+        return task_id in self._busy
+
+    def _spawn(self) -> _LocalWorker:
+        context = multiprocessing.get_context(START_METHOD)
+        parent_conn, child_conn = context.Pipe()
+        self._spawned += 1
+        name = f"{WORKER_NAME_PREFIX}_{os.getpid()}_{self._spawned}"
+        # 非 daemon：算子自己可能还要起子进程
+        process = context.Process(target=_serve, args=(child_conn, self.warm_up, self.job), name=name)
+        process.start()
+        child_conn.close()
+        return _LocalWorker(process, parent_conn, name)
+
+    def warm(self):
+        """预先启动进程到池大小（进程在后台预热）"""
+        with self._lock:
+            while len(self._idle) + len(self._busy) < self.size:
+                self._idle.append(self._spawn())
+
+    def _take_idle(self) -> Optional[_LocalWorker]:
+        """取一个还活着的空闲进程；空闲时已经退出的进程直接清理掉"""
+        while self._idle:
+            worker = self._idle.pop(0)
+            if worker.process.is_alive():
+                return worker
+            self._stop(worker)
+            self.recycled_count += 1
+            logger.info(f"Dropped dead idle local pipeline worker {worker.name} (exit code {worker.process.exitcode})")
+        return None
+
+    def submit(self, task_id: str, args: Tuple[Any, ...]) -> Future:
+        """把任务交给一个空闲进程（没有时启动一个），返回结果消息的 Future"""
+        with self._lock:
+            worker = self._take_idle() or self._spawn()
+            future: Future = Future()
+            worker.future = future
+            worker.task_id = task_id
+            self._busy[task_id] = worker
+            try:
+                # 读线程已退出时没有人会完成这个 Future，任务会一直停在 running
+                if not worker._reader.is_alive():
+                    raise LocalWorkerCrashed(f"Local worker {worker.name} is no longer reading results")
+                # 进程还在预热时任务在管道里等着，预热完立刻开始
+                worker.send({"task_id": task_id, "args": args})
+                return future
+            except Exception as e:
+                self._busy.pop(task_id, None)
+                worker.future = None
+                worker.task_id = None
+                failed, error = worker, e
+        # 提交失败：槽位还给池子，进程回收（在锁外 join）后抛给调用方
+        self._recycle(failed, "submit failed", graceful=False)
+        raise LocalWorkerCrashed(f"Failed to hand execution {task_id} to local worker {failed.name}: {error}") from error
+
+    def release(self, task_id: str):
+        """任务结束：按进程状态回收，否则放回空闲队列"""
+        with self._lock:
+            worker = self._busy.pop(task_id, None)
+        if worker is None:
+            return
+        worker.task_id = None
+        stats = worker.stats
+        reason = None
+        if not worker.process.is_alive():
+            reason = f"exited with code {worker.process.exitcode}"
+        elif self.max_jobs and stats.get("jobs", 0) >= self.max_jobs:
+            reason = f"{stats['jobs']} jobs"
+        elif self.max_rss_growth_mb and stats.get("rss_growth_mb", 0) > self.max_rss_growth_mb:
+            reason = f"rss grew by {stats['rss_growth_mb']}MB"
+        with self._lock:
+            if reason is None and len(self._idle) + len(self._busy) < self.size:
+                self._idle.append(worker)
+                return
+        self._recycle(worker, reason or "pool shrunk")
+
+    def kill(self, task_id: str) -> bool:
+        """终止正在执行某任务的进程，池里补一个新的"""
+        with self._lock:
+            worker = self._busy.pop(task_id, None)
+        if worker is None:
+            return False
+        self._recycle(worker, "killed", graceful=False)
+        return True
+
+    @staticmethod
+    def _stop(worker: _LocalWorker, graceful: bool = True):
+        process = worker.process
+        if graceful and process.is_alive():
+            try:
+                worker.send(None)
+            except (OSError, ValueError):
+                pass
+            process.join(timeout=STOP_TIMEOUT_S)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout=STOP_TIMEOUT_S)
+        if process.is_alive():
+            process.kill()
+            process.join(timeout=STOP_TIMEOUT_S)
+        try:
+            worker.conn.close()
+        except OSError:
+            pass
+
+    def _recycle(self, worker: _LocalWorker, reason: str, graceful: bool = True):
+        self._stop(worker, graceful)
+        self.recycled_count += 1
+        logger.info(f"Recycled local pipeline worker {worker.name}: {reason}")
+        # 补一个新的预热进程，下一次任务不必冷启动
+        self.warm()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "busy": {task_id: worker.name for task_id, worker in self._busy.items()},
+            "recycled": self.recycled_count,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            workers = self._idle + list(self._busy.values())
+            self._idle.clear()
+            self._busy.clear()
+        for worker in workers:
+            self._stop(worker, graceful=worker.task_id is None)
+
+
+def local_resources() -> Dict[str, float]:
+    """本机的 CPU 数与物理内存（字节），与 ray.cluster_resources() 同样的键"""
+    try:
+        memory = float(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"))
+    except (ValueError, OSError, AttributeError):
+        memory = 0.0
+    return {"CPU": float(os.cpu_count() or 1), "memory": memory}
+
+
+class LocalPipelineExecutor(PipelineExecutor):
+    """
+    本机进程池执行器：不启动 Ray，执行交给常驻 worker 进程
+    排队 / 派发与 Ray 后端相同（见 pipeline_executor.py）
+    """
+
+    backend = "local"
+
+    def __init__(self, max_concurrency: Optional[int] = None, pool: Optional[LocalWorkerPool] = None):
+        super().__init__(max_concurrency)
+        self.pool = pool or LocalWorkerPool()
+        # 运行中的执行：task_id -> {"registry_path", "submitted"}；结束或被终止后移除
+        self._running: Dict[str, Dict[str, Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.finalized_count = 0
+        # 结束回调 task_id -> None：先把进程放回池里（或回收），再让调度器释放槽位派发下一个
+        self.on_finished: List[Callable[[str], Any]] = [self.pool.release, self.scheduler.finished]
+        self._shutdown_registered = False
+        logger.info(f"LocalPipelineExecutor initialized with max_concurrency={self.max_concurrency}")
+
+    def activate(self):
+        super().activate()
+        self._remember_loop()
+        if not self._shutdown_registered:
+            # worker 进程不是 daemon，退出时要先让它们结束
+            atexit.register(self.pool.shutdown)
+            self._shutdown_registered = True
+        self.pool.warm()
+
+    def add_finished_listener(self, callback):
+        """注册执行结束回调 callback(task_id)；重复注册同一回调只生效一次"""
+        if callback not in self.on_finished:
+            self.on_finished.append(callback)
+
+    def _remember_loop(self):
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+    async def submit_execution(self, *args, **kwargs) -> str:
+        self._remember_loop()
+        return await super().submit_execution(*args, **kwargs)
+
+    def _admit(self, entry: QueuedExecution, running: List[QueuedExecution]) -> bool:
+        """调度器回调：资源请求加上运行中的请求能否放进本机的 CPU / 内存"""
+        total = local_resources()
+        reserved = ResourceRequest(num_cpus=0.0)
+        for other in running:
+            used = ResourceRequest.from_dict(other.resources)
+            reserved.num_cpus += used.num_cpus
+            reserved.memory_mb += used.memory_mb
+        return fits(ResourceRequest.from_dict(entry.resources), total, total, reserved, idle=not running)
+
+    def _launch(self, entry: QueuedExecution) -> bool:
+        """调度器回调：交给一个 worker 进程"""
+        task_id = entry.task_id
+        payload = entry.payload
+        if not self._claim(entry):
+            logger.info(f"Execution {task_id} is no longer queued here, skipping")
+            return False
+
+        logger.info(f"Submitting pipeline execution to a local worker: {task_id} ({entry.lane} lane, user {entry.user_id})")
+        try:
+            dataflow_runtime = self._dataflow_runtime(payload, task_id)
+            self._running[task_id] = {"registry_path": payload["pipeline_execution_path"], "submitted": time.monotonic()}
+            future = self.pool.submit(task_id, (
+                payload["pipeline_config"],
+                dataflow_runtime,
+                task_id,
+                payload["pipeline_execution_path"],
+            ))
+            future.add_done_callback(lambda f, tid=task_id: self._on_done(tid, f))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to submit pipeline execution: {e}")
+            logger.error(traceback.format_exc())
+            self._running.pop(task_id, None)
+            # 提交失败同样要有终态，否则任务会一直停在 queued
+            finalize_execution(task_id, payload["pipeline_execution_path"], None, "task_error", "failed", 0.0,
+                               error=f"Failed to start a local worker: {e}")
+            return False
+
+    def _on_done(self, task_id: str, future: Future):
+        """Future 结束（在 worker 的读线程里）：交给事件循环的线程池收尾，没有事件循环时就地收尾"""
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._complete(task_id, future), loop)
+        else:
+            self._finish(task_id, future)
+
+    async def _complete(self, task_id: str, future: Future):
+        # 收尾与回调都会阻塞（写任务存储；回收进程要 join、再补启动一个；调度器派发下一个执行），不放在事件循环上
+        await asyncio.get_running_loop().run_in_executor(None, self._finish, task_id, future)
+
+    def _finish(self, task_id: str, future: Future):
+        if self._finalize(task_id, future):
+            self._notify(task_id)
+
+    def _notify(self, task_id: str):
+        for callback in list(self.on_finished):
+            try:
+                callback(task_id)
+            except Exception as e:
+                logger.error(f"Completion callback failed for {task_id}: {e}")
+
+    def _finalize(self, task_id: str, future: Future) -> bool:
+        """写入结束信息；被终止的执行（终态由取消流程写入）返回 False"""
+        meta = self._running.pop(task_id, None)
+        if meta is None:
+            return False
+        error = future.exception()
+        message = future.result() if error is None else {}
+        result = message.get("result")
+        if isinstance(error, LocalWorkerCrashed):
+            exit_reason, status = "worker_crashed", "failed"
+        elif error is not None or message.get("error"):
+            exit_reason, status = "task_error", "failed"
+        else:
+            exit_reason, status = classify_exit(None, result)
+        duration = time.monotonic() - meta["submitted"]
+        try:
+            finalize_execution(
+                task_id,
+                meta["registry_path"],
+                result if isinstance(result, dict) else None,
+                exit_reason,
+                status,
+                duration,
+                error=str(error) if error is not None else message.get("error"),
+            )
+        except Exception as e:
+            logger.error(f"Failed to finalize execution {task_id}: {e}")
+        self.finalized_count += 1
+        logger.info(f"Execution {task_id} finalized: {exit_reason} in {duration:.1f}s")
+        return True
+
+    def kill_execution(self, task_id: str) -> bool:
+        """
+        终止指定的 Pipeline 执行任务：排队中的直接出队，运行中的结束其 worker 进程
+
+        Returns:
+            是否成功终止
+        """
+        if self.scheduler.remove(task_id):
+            logger.info(f"Removed queued task {task_id} from the scheduler")
+            return True
+        if self._running.pop(task_id, None) is None:
+            logger.warning(f"Task {task_id} not found in running local executions")
+            return False
+        self.pool.kill(task_id)
+        self.scheduler.finished(task_id)
+        logger.info(f"Successfully killed local execution {task_id}")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "running": list(self._running), "pool": self.pool.snapshot()}
+
+    def shutdown(self):
+        self.scheduler.reset()
+        self.pool.shutdown()
+        logger.info("Local executor shutdown completed")
+
+
+# 全局本机执行器实例（EXECUTION_BACKEND = "local" 时由 get_pipeline_executor 启用）
+local_executor = LocalPipelineExecutor()
@@ -0,0 +1,181 @@
+"""Parameter sweeps: one pipeline, one operator parameter, several values.
+
+Tuning a threshold (a filter's ``min_score``, a prompt template) used to mean
+editing the pipeline and re-running it from step 0 for every value, although
+everything upstream of the tuned operator is identical between the runs. A
+sweep instead:
+
+* runs the shared upstream prefix (operators ``[0, operator_index)``) once, as
+  an ordinary execution tagged with ``sweep_id``;
+* once the prefix completed, starts one child per value from that step, reusing
+  the prefix's step files exactly like a fork (see ``task_lineage.py``); the
+  children only differ in the swept parameter;
+* sweeping the first operator skips the prefix: every variant is a full run.
+
+The sweep itself is a parent task (``executor_type = "sweep"``).
+:func:`comparison` turns the variants' records into the comparison table:
+output rows, duration of the downstream operators and the first output rows of
+every variant.
+"""
+from __future__ import annotations
+
+import copy
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.batch_execution import TERMINAL_STATUSES, aggregate
+from app.services.cache_retention import open_step_file, resolve_step_file
+
+logger = get_logger(__name__)
+
+SWEEP_EXECUTOR_TYPE = "sweep"
+SWEEP_KEY = "sweep"
+SWEEP_LINEAGE_MODE = "sweep"
+PARAM_SECTIONS = ("init", "run")
+
+
+def find_param(operator: Dict[str, Any], param: str, section: Optional[str] = None) -> str:
+    """
+    参数所在的分组（init / run）
+
+    Raises:
+        ValueError: 算子没有这个参数
+    """
+    params = operator.get("params") or {}
+    for candidate in ([section] if section else PARAM_SECTIONS):
+        if any(p.get("name") == param for p in params.get(candidate) or []):
+            return candidate
+    raise ValueError(f"Operator {operator.get('name')} has no {section or 'init/run'} parameter '{param}'")
+
+
+def variant_operators(
+    operators: List[Dict[str, Any]], index: int, section: str, param: str, value: Any
+) -> List[Dict[str, Any]]:
+    """复制算子列表，只把第 index 个算子的参数换成 value"""
+    result = copy.deepcopy(operators)
+    for p in result[index]["params"][section]:
+        if p.get("name") == param:
+            p["value"] = value
+    return result
+
+
+def prefix_pipeline_config(pipeline_config: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """共享前缀的 Pipeline 配置：只保留被扫描算子之前的算子"""
+    config = copy.deepcopy(pipeline_config)
+    config["operators"] = (config.get("operators") or [])[:index]
+    return config
+
+
+def _duration_s(detail: Dict[str, Any]) -> float:
+    try:
+        start = datetime.fromisoformat(detail["started_at"])
+        end = datetime.fromisoformat(detail["completed_at"])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+    return max((end - start).total_seconds(), 0.0)
+
+
+def _head_rows(task_id: str, step: int, limit: int) -> List[Any]:
+    path = resolve_step_file(task_id, step)
+    rows: List[Any] = []
+    if path is None or limit <= 0:
+        return rows
+    try:
+        with open_step_file(path) as f:
+            for line in f:
+                if line.strip():
+                    rows.append(json.loads(line))
+                    if len(rows) >= limit:
+                        break
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read sample rows of {task_id} step {step}: {e}")
+    return rows
+
+
+def run_summary(
+    task_id: str,
+    operators_detail: Dict[str, Dict[str, Any]],
+    from_step: int,
+    num_operators: int,
+    sample_rows: int = 0,
+) -> Dict[str, Any]:
+    """
+    一次运行在 [from_step, num_operators) 这些算子上的结果
+
+    Returns:
+        {"rows": 最后一个算子的输出行数, "duration_s": 这些算子的运行时间之和, "samples": 前几行输出}
+    """
+    details = [
+        d for d in (operators_detail or {}).values()
+        if isinstance(d, dict) and isinstance(d.get("index"), int) and from_step <= d["index"] < num_operators
+    ]
+    last = next((d for d in details if d["index"] == num_operators - 1), {})
+    summary = {
+        "rows": last.get("sample_count"),
+        "duration_s": round(sum(_duration_s(d) for d in details), 3),
+    }
+    if sample_rows:
+        summary["samples"] = _head_rows(task_id, num_operators - 1, sample_rows) if last.get("status") in ("completed", "cached") else []
+    return summary
+
+
+def comparison(
+    sweep: Dict[str, Any],
+    prefix: Optional[Tuple[Dict[str, Any], Dict[str, Any]]],
+    variants: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]],
+    sample_rows: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    扫描的对比表
+
+    Args:
+        sweep: 父任务上的 sweep 信息
+        prefix: 共享前缀执行的 (记录, 视图)；扫描第一个算子时为 None
+        variants: {变体执行 ID: (记录, 视图)}
+
+    Returns:
+        {"status", "counts", "progress_percentage", "finished_at", "prefix", "variants"}
+    """
+    sample_rows = settings.EXECUTION_SWEEP_SAMPLE_ROWS if sample_rows is None else sample_rows
+    index = sweep["operator_index"]
+    num_operators = sweep["num_operators"]
+    entries = sweep.get("variants") or []
+
+    prefix_row = None
+    prefix_status = "completed"
+    if sweep.get("prefix_task_id"):
+        record, view = prefix or ({}, {})
+        prefix_status = view.get("status") or record.get("status") or "queued"
+        prefix_row = dict(
+            run_summary(sweep["prefix_task_id"], view.get("operators_detail"), 0, index),
+            task_id=sweep["prefix_task_id"],
+            status=prefix_status,
+            steps=index,
+        )
+
+    children = {task_id: dict(record, status=view.get("status")) for task_id, (record, view) in variants.items()}
+    summary = aggregate({"started_at": sweep.get("started_at"), "children": entries}, children)
+    if prefix_status in ("failed", "cancelled"):
+        summary.update(status="failed", finished_at=(prefix[0] if prefix else {}).get("finished_at"))
+    elif not entries:
+        summary.update(status="running" if prefix_status in ("running",) + TERMINAL_STATUSES else "queued")
+
+    rows = []
+    for entry in entries:
+        record, view = variants.get(entry["task_id"], ({}, {}))
+        row = {"value": entry["value"], "task_id": entry["task_id"], "status": view.get("status") or "queued"}
+        row.update(run_summary(entry["task_id"], view.get("operators_detail"), index, num_operators, sample_rows))
+        if row["status"] in ("failed", "cancelled"):
+            row["error"] = record.get("error_message") or (record.get("output") or {}).get("error")
+        rows.append(row)
+    return {
+        "status": summary["status"],
+        "counts": summary["counts"],
+        "progress_percentage": summary["progress_percentage"] if entries else 0.0,
+        "finished_at": summary["finished_at"],
+        "prefix": prefix_row,
+        "variants": rows,
+    }
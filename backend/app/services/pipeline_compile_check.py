@@ -22,7 +22,7 @@ actual key-graph validation happens in ``_build_operator_nodes_graph``.
 """
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Set, Tuple
 
 from dataflow.pipeline import PipelineABC
 
@@ -49,6 +49,14 @@ def _key_params(run_params: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
+def key_flow(run_params: Dict[str, Any]) -> Tuple[Set[str], Set[str]]:
+    """(input keys, output keys) of one operator, as seen by the compile key graph."""
+    keys = _key_params(run_params)
+    inputs = {value for name, value in keys.items() if name.startswith("input_")}
+    outputs = {value for name, value in keys.items() if name.startswith("output_")}
+    return inputs, outputs
+
+
 def compile_check(run_op: List[Tuple[Any, Dict[str, Any], str, str]], storage: Any) -> Dict[str, Any]:
     """Run DataFlow's compile() key validation on an assembled pipeline.
 
@@ -0,0 +1,257 @@
+"""Pluggable executor backends for pipeline runs.
+
+``TaskRegistry`` only talks to :class:`PipelineExecutor`. The queueing part is
+shared by every backend: a submission becomes a :class:`QueuedExecution`, the
+scheduler (see execution_scheduler.py) decides when it runs, and the task record
+is claimed before launching. Queued runs are also rebuilt after a restart. A
+backend only implements how a dispatched run is started, killed and finalized:
+
+* ``ray`` (:class:`~app.services.ray_pipeline_executor.RayPipelineExecutor`):
+  Ray tasks or warm worker actors, the state actor and sharding across the
+  cluster;
+* ``local`` (:class:`~app.services.local_pipeline_executor.LocalPipelineExecutor`):
+  warm worker processes on this machine, no Ray runtime (no raylet, GCS or
+  dashboard). Meant for single-node deployments.
+
+``EXECUTION_BACKEND`` picks the backend. :func:`get_pipeline_executor` creates
+it on first use and binds the shared scheduler to it.
+"""
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.execution_resources import estimate_request
+from app.services.execution_scheduler import QueuedExecution, execution_scheduler, next_seq
+from app.services.execution_state import execution_state
+from app.services.task_store import create_task_store
+
+logger = get_logger(__name__)
+
+EXECUTOR_BACKENDS = ("ray", "local")
+
+
+class PipelineExecutor(ABC):
+    """
+    执行器接口：排队 / 派发 / 重启恢复由这里统一处理，子类负责真正启动、终止执行
+
+    子类需实现 _launch、kill_execution、shutdown、add_finished_listener；
+    资源准入可选实现 _admit
+    """
+
+    backend = "base"
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        self.max_concurrency = max_concurrency or settings.EXECUTION_MAX_CONCURRENCY
+        self.scheduler = execution_scheduler
+
+    def activate(self):
+        """把进程内的调度器交给这个执行器（由 get_pipeline_executor 调用一次）"""
+        self.scheduler.max_concurrency = self.max_concurrency
+        self.scheduler.launcher = self._launch
+        self.scheduler.admit = self._admit if settings.EXECUTION_RESOURCE_ADMISSION else None
+        logger.info(f"Pipeline executor backend: {self.backend} (max_concurrency={self.max_concurrency})")
+
+    @abstractmethod
+    def add_finished_listener(self, callback: Callable[[str], Any]):
+        """注册执行结束回调 callback(task_id)（在线程池 / 后台线程中调用，不在事件循环上）；重复注册同一回调只生效一次"""
+
+    @abstractmethod
+    def _launch(self, entry: QueuedExecution) -> bool:
+        """调度器回调：真正启动一次执行"""
+
+    _admit: Optional[Callable[[QueuedExecution, List[QueuedExecution]], bool]] = None
+
+    @abstractmethod
+    def kill_execution(self, task_id: str) -> bool:
+        """终止排队中或运行中的执行；终态由调用方写入"""
+
+    @abstractmethod
+    def shutdown(self):
+        """停止后台线程 / 进程，释放执行器持有的资源"""
+
+    def dispatched_may_still_run(self) -> bool:
+        """重启后，已派发但仍是 queued 的执行是否可能还在别处运行（例如共享集群）"""
+        return False
+
+    async def submit_execution(
+        self,
+        pipeline_config: Dict[str, Any],
+        dataflow_runtime: Dict[str, Any],
+        task_id: str,
+        pipeline_registry_path: str,
+        pipeline_execution_path: str,
+        lane: Optional[str] = None,
+        user_id: Optional[str] = None,
+        pipeline_id: Optional[str] = None,
+        seq: Optional[int] = None,
+        enqueued_at: Optional[str] = None,
+        resources: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        提交 Pipeline 执行任务：先进入调度队列，有空槽位时立即派发
+
+        Args:
+            pipeline_config: Pipeline 配置
+            task_id: 执行 ID
+            pipeline_registry_path: Pipeline 注册表路径
+            pipeline_execution_path: Pipeline 执行记录路径
+            lane: "interactive" / "batch"，默认 batch
+            user_id: 提交用户（公平分配的单位）
+            pipeline_id: Pipeline ID（用于估算排队 ETA）
+            seq / enqueued_at: 已写入任务记录的排队序号与时间
+            resources: 资源请求（ResourceRequest.to_dict()），缺省只按声明估算
+
+        Returns:
+            task_id
+        """
+        entry = QueuedExecution(
+            task_id=task_id,
+            lane=lane,
+            user_id=user_id,
+            seq=seq or next_seq(),
+            enqueued_at=enqueued_at or datetime.now().isoformat(),
+            registry_path=pipeline_execution_path,
+            pipeline_id=pipeline_id,
+            resources=resources or estimate_request(pipeline_config).to_dict(),
+            payload={
+                "pipeline_config": pipeline_config,
+                "dataflow_runtime": dataflow_runtime,
+                "pipeline_registry_path": pipeline_registry_path,
+                "pipeline_execution_path": pipeline_execution_path,
+            },
+        )
+        launched = self.scheduler.enqueue(entry)
+        if task_id not in launched:
+            logger.info(f"Pipeline execution queued: {task_id} ({self.scheduler.queued_count()} waiting)")
+
+        # 异步接口，立即返回，不等待任务开始执行
+        return task_id
+
+    def _claim(self, entry: QueuedExecution) -> bool:
+        """
+        在任务记录上标记已派发；任务已不在排队（被取消）或已被其它 API 进程领走时返回 False
+        """
+        store = create_task_store(entry.registry_path)
+        claimed = []
+
+        def _apply(record: Dict[str, Any]):
+            scheduling = record.setdefault("scheduling", entry.scheduling_record())
+            if record.get("status") != "queued" or scheduling.get("dispatched_at"):
+                return
+            scheduling["dispatched_at"] = datetime.now().isoformat()
+            claimed.append(True)
+
+        store.update(entry.task_id, _apply)
+        return bool(claimed)
+
+    @staticmethod
+    def _dataflow_runtime(payload: Dict[str, Any], task_id: str) -> Dict[str, Any]:
+        dataflow_runtime = payload.get("dataflow_runtime")
+        if dataflow_runtime is None:
+            # 重启后恢复的排队任务：到真正运行时才解析数据集 / Serving
+            from app.services.dataflow_engine import DataFlowEngine
+            dataflow_runtime = DataFlowEngine.decode_hashed_arguments(payload["pipeline_config"], task_id)
+        return dataflow_runtime
+
+    def recover_queue(self, registry_path: str) -> int:
+        """
+        启动时从任务存储重建排队中的执行
+
+        已派发但仍是 queued 的记录：执行随进程退出，它们不会再运行，重新排队；
+        dispatched_may_still_run() 为 True 时（例如加入了共享 Ray 集群）它们可能仍在运行，保持不动。
+
+        Returns:
+            重新排队的执行数
+        """
+        store = create_task_store(registry_path)
+        entries = []
+        for record in store.list(status="queued"):
+            task_id = record.get("id")
+            scheduling = record.get("scheduling")
+            if not task_id or not scheduling:
+                continue
+            if self.scheduler.is_queued(task_id) or self.scheduler.is_running(task_id):
+                continue
+            if scheduling.get("dispatched_at"):
+                if self.dispatched_may_still_run():
+                    continue
+                store.update(task_id, lambda r: (r.get("scheduling") or {}).pop("dispatched_at", None))
+            pipeline_config = record.get("pipeline_config") or {}
+            entries.append(QueuedExecution(
+                task_id=task_id,
+                lane=scheduling.get("lane"),
+                user_id=scheduling.get("user_id"),
+                seq=scheduling["seq"] if scheduling.get("seq") is not None else next_seq(),
+                enqueued_at=scheduling.get("enqueued_at") or record.get("created_at") or datetime.now().isoformat(),
+                registry_path=registry_path,
+                pipeline_id=record.get("pipeline_id") or (record.get("meta") or {}).get("pipeline_id"),
+                resources=scheduling.get("resources") or estimate_request(pipeline_config).to_dict(),
+                payload={
+                    "pipeline_config": pipeline_config,
+                    "pipeline_registry_path": registry_path,
+                    "pipeline_execution_path": registry_path,
+                },
+            ))
+        # 全部入队后再统一派发，顺序由调度策略决定
+        for entry in entries:
+            self.scheduler.enqueue(entry, dispatch=False)
+        self.scheduler.dispatch()
+        if entries:
+            logger.info(f"Recovered {len(entries)} queued executions from {registry_path}")
+        return len(entries)
+
+    async def get_execution_status(
+        self,
+        task_id: str,
+        pipeline_execution_path: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        获取执行状态
+
+        Args:
+            task_id: 执行 ID
+            pipeline_execution_path: Pipeline 执行记录路径
+
+        Returns:
+            执行状态字典，如果不存在则返回 None
+        """
+        try:
+            record = create_task_store(pipeline_execution_path).get(task_id)
+            snapshot = execution_state.snapshot(task_id)
+            if record is not None and snapshot is not None and snapshot.get("status"):
+                record["status"] = snapshot["status"]
+            return record
+        except Exception as e:
+            logger.error(f"Failed to get execution status for {task_id}: {e}")
+            return None
+
+
+_executor: Optional[PipelineExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_pipeline_executor() -> PipelineExecutor:
+    """
+    按 EXECUTION_BACKEND 返回进程内唯一的执行器（首次调用时创建并接管调度器）
+
+    Raises:
+        ValueError: 未知的 backend
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            backend = (settings.EXECUTION_BACKEND or "ray").lower()
+            if backend == "ray":
+                from app.services.ray_pipeline_executor import ray_executor as executor
+            elif backend == "local":
+                from app.services.local_pipeline_executor import local_executor as executor
+            else:
+                raise ValueError(f"Unknown EXECUTION_BACKEND '{backend}', expected one of {', '.join(EXECUTOR_BACKENDS)}")
+            executor.activate()
+            _executor = executor
+        return _executor
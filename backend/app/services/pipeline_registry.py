@@ -8,6 +8,7 @@ import hashlib
 from typing import List, Optional, Dict, Any, Tuple, Union
 from app.core.logger_setup import get_logger
 from app.core.config import settings
+from app.services.registry_io import RegistryFile
 from app.schemas.pipelines import PipelineValidationIssue, PipelineValidationResult
 # from app.services.operator_registry import _op_registry
 from app.core.container import container
@@ -240,20 +241,22 @@ class PipelineRegistry:
         """
         # using absolute path
         self.path = path or settings.PIPELINE_REGISTRY
-
-        self._init_registry_file()
-        # 初始化后，更新所有api pipeline的operators列表
-        self._update_all_api_pipelines_operators()
+        # 多进程安全：进程间锁 + 原子替换写入 + 版本戳缓存（见 registry_io.py）
+        self._file = RegistryFile(self.path, fmt="json", default={"pipelines": {}})
+
+        # 多个 worker 同时启动时只有一个去初始化 / 扫描 api_pipelines
+        with self._file.locked():
+            self._init_registry_file()
+            # 初始化后，更新所有api pipeline的operators列表
+            self._update_all_api_pipelines_operators()
         
     def _read(self) -> Dict:
         """读取注册表文件"""
-        with open(self.path, "r", encoding="utf-8") as f:
-            return json.load(f) or {"pipelines": {}}
+        return self._file.read()
 
     def _write(self, data: Dict):
         """写入注册表文件"""
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)    
+        self._file.write(data)
 
     def _init_registry_file(self):
         """
@@ -1122,8 +1125,6 @@ class PipelineRegistry:
     
     def create_pipeline(self, pipeline_data: Dict[str, Any]) -> Dict[str, Any]:
         """创建一个新的Pipeline"""
-        data = self._read()
-        
         # 生成唯一ID
         pipeline_id = str(uuid.uuid4())
         current_time = self.get_current_time()
@@ -1152,8 +1153,8 @@ class PipelineRegistry:
         enriched_pipeline = self._enrich_pipeline_operators_internal(pipeline)
         
         # 保存 enriched pipeline 到文件
-        data["pipelines"][pipeline_id] = enriched_pipeline
-        self._write(data)
+        with self._file.transaction() as data:
+            data.setdefault("pipelines", {})[pipeline_id] = enriched_pipeline
         
         logger.info(f"Successfully created pipeline: {pipeline_id} with name: {pipeline_data.get('name', '')}")
         return enriched_pipeline
@@ -1184,9 +1185,9 @@ class PipelineRegistry:
                         pipeline_data["config"]["operators"] = operators
                         enriched_pipeline = self._enrich_pipeline_operators_internal(pipeline_data)
                         enriched_pipeline["updated_at"] = self.get_current_time()
-                        # 保存更新
-                        data["pipelines"][pipeline_id] = enriched_pipeline
-                        self._write(data)
+                        # 保存更新（只改这一条，别的 worker 的写入不会被覆盖）
+                        with self._file.transaction() as data:
+                            data.setdefault("pipelines", {})[pipeline_id] = enriched_pipeline
                         logger.info(f"Updated and enriched pipeline {pipeline_id} on get")
                         return enriched_pipeline
             
@@ -1311,22 +1312,25 @@ class PipelineRegistry:
         # enriched_pipeline = self._enrich_pipeline_operators_internal(updated_pipeline)
         
         # 保存 enriched pipeline 到文件
-        data["pipelines"][pipeline_id] = updated_pipeline
-        self._write(data)
+        with self._file.transaction() as data:
+            if pipeline_id not in data.get("pipelines", {}):
+                raise ValueError(f"Pipeline with id {pipeline_id} not found")
+            data["pipelines"][pipeline_id] = updated_pipeline
         
         logger.info(f"Updated pipeline: {pipeline_id}")
         return updated_pipeline
     
     def delete_pipeline(self, pipeline_id: str) -> bool:
         """删除指定的Pipeline"""
-        data = self._read()
-        
-        if pipeline_id not in data.get("pipelines", {}):
-            return False
-        
-        # 直接从文件删除
-        del data["pipelines"][pipeline_id]
-        self._write(data)
+        with self._file.locked():
+            data = self._read()
+            
+            if pipeline_id not in data.get("pipelines", {}):
+                return False
+            
+            # 直接从文件删除
+            del data["pipelines"][pipeline_id]
+            self._write(data)
         
         logger.info(f"Deleted pipeline: {pipeline_id}")
         return True
@@ -13,14 +13,30 @@ import inspect
 import os
 from datetime import datetime
 import traceback
+import copy
 import io
 import sys
 import re
 import time
-from contextlib import redirect_stdout, redirect_stderr
 
 from app.services.param_coercion import coerce_param_value
-from app.services.pipeline_compile_check import compile_check
+from app.services.execution_context import operator_io, operator_param
+from app.services.pipeline_compile_check import compile_check, key_flow
+from app.services.task_store import create_task_store
+from app.services.task_journal import ExecutionReporter, open_execution_reporter
+from app.services.cache_retention import finalize_task_cache
+from app.services.execution_state import actor_execution_reporter, execution_state
+from app.services.execution_watcher import ExecutionCompletionWatcher, finalize_execution
+from app.services.execution_scheduler import QueuedExecution
+from app.services.execution_resources import MB, ResourceRequest, fits
+from app.services.pipeline_executor import PipelineExecutor
+from app.services.worker_pool import WorkerPool, current_rss_mb, peak_rss_mb
+from app.services.sharded_execution import run_operator_sharded
+from app.services.task_lineage import RESUME_KEY, REUSED_STATUS, seed_resumed_steps
+from app.services.step_cache import CACHED_STATUS, StepCache, cache_enabled, detach, view_key
+from app.services.sample_runs import SAMPLE_KEY, describe as describe_sample, materialize_sample
+from app.services.streaming_execution import StreamStage, StreamingStageError, run_streaming_group, stream_groups
+from app.services.branch_execution import BranchFallback, BranchOp, BranchOpError, branches_enabled, parallel_blocks, run_branch_block
 
 logger = get_logger(__name__)
 
@@ -45,7 +61,11 @@ class DataFlowEngineError(Exception):
 class LogStream(io.StringIO):
     """
     Custom stream to capture stdout/stderr in real-time, 
-    parse progress bars, and update execution status.
+    parse progress bars, and report progress samples.
+
+    ``update_func(op_key)`` is called (throttled) after the in-memory
+    ``operators_detail[op_key]`` progress fields change; it only appends a
+    small progress event to the task journal.
     """
     def __init__(self, op_key: str, operators_detail: Dict, operator_logs: Dict, update_func: callable, add_log_func: callable):
         super().__init__()
@@ -85,13 +105,10 @@ class LogStream(io.StringIO):
                    if clean_text:
                        self.operators_detail[self.op_key]["progress"] = clean_text[-100:] # Keep last 100 chars to avoid huge strings
                 
-                # Throttle disk updates
+                # Throttle journal appends
                 now = time.time()
                 if now - self.last_update_time > self.update_interval:
-                    self.update_func("running", {
-                        "operators_detail": self.operators_detail,
-                        "operators_detail": self.operators_detail
-                    })
+                    self.update_func(self.op_key)
                     self.last_update_time = now
             except ValueError:
                 pass
@@ -159,7 +176,7 @@ def parse_and_clean_logs(log_content: str) -> tuple[List[str], Optional[str], Op
     return cleaned_lines, last_progress, last_percentage
 
 
-def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime: Dict[str, Any], task_id: str, execution_path: str):
+def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime: Dict[str, Any], task_id: str, execution_path: str, reporter: Optional[ExecutionReporter] = None):
     """
     Execute a DataFlow pipeline
     
@@ -168,6 +185,7 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
         dataflow_runtime: DataFlow runtime configuration
         task_id: Execution ID
         execution_path: Execution path
+        reporter: status/journal reporter (opened from execution_path if omitted)
     """
     started_at = datetime.now().isoformat()
     logs: List[str] = []
@@ -180,28 +198,17 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
     # ✅ 新增：算子粒度运行结果详情
     operators_detail: Dict[str, Dict[str, Any]] = {}
 
-    # ✅ 新增：实时更新执行状态到文件
-    def update_execution_status(status: str = None, partial_output: Dict[str, Any] = None):
-        """实时更新执行状态到文件"""
-        if not execution_path:
-            return
-        try:
-            import json
-            with open(execution_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if task_id in data.get("tasks", {}):
-                if status:
-                    data["tasks"][task_id]["status"] = status
-                if partial_output:
-                    if "output" not in data["tasks"][task_id]:
-                             data["tasks"][task_id]["output"] = {}
-                    # 更新 output 中的内容
-                    data["tasks"][task_id]["output"].update(partial_output)
-                    
-                with open(execution_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to update execution status: {e}")
+    # ✅ 实时状态：算子状态 / 日志 / 进度只追加到该任务自己的事件日志
+    if reporter is None:
+        reporter = open_execution_reporter(task_id, execution_path)
+
+    def report_operator(op_key: str):
+        """上报单个算子的当前状态（只带这一个算子）"""
+        reporter.operator(op_key, dict(operators_detail[op_key]))
+
+    def report_progress(op_key: str):
+        detail = operators_detail.get(op_key, {})
+        reporter.progress(op_key, detail.get("progress_percentage"), detail.get("progress"))
 
     # ✅ 新增：统一写日志（同时写到全局 logs 和该算子的 logs）
     def add_log(stage: str, message: str, op_name: str = "__pipeline__"):
@@ -212,6 +219,9 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
         # 如果是具体的算子，记录到 operator_logs
         if op_name != "__pipeline__":
             operator_logs.setdefault(op_name, []).append(ts_msg)
+            reporter.log(ts_msg, op_name)
+        else:
+            reporter.log(ts_msg)
     
     logger.success(f"Input dataflow runtime: {dataflow_runtime}")
     
@@ -225,8 +235,17 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
         logs.append(f"[{datetime.now().isoformat()}] Step 1: Initializing storage...")
         logger.info(f"Step 1: Initializing storage...")
         try:    
+            first_entry_file_name = dataflow_runtime['storage']['first_entry_file_name']
+            sample = pipeline_config.get(SAMPLE_KEY)
+            if sample:
+                # 采样运行：整条 Pipeline 只跑在采样出的 step 0 上
+                first_entry_file_name, sample_rows = materialize_sample(
+                    first_entry_file_name, sample, dataflow_runtime['storage']['cache_path']
+                )
+                output["sample"] = dict(sample, rows=sample_rows)
+                add_log("init", f"[{datetime.now().isoformat()}] Sample run on {describe_sample(sample)}: {sample_rows} rows")
             storage = FileStorage(
-                first_entry_file_name=dataflow_runtime['storage']['first_entry_file_name'],
+                first_entry_file_name=first_entry_file_name,
                 cache_path=dataflow_runtime['storage']['cache_path'],
                 file_name_prefix=dataflow_runtime['storage']['file_name_prefix'],
                 cache_type=dataflow_runtime['storage']['cache_type'],
@@ -237,6 +256,15 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
             
         except Exception as e:
             raise Exception(f"Failed to initialize storage: {e}")
+
+        # 续跑 / 分叉：前 start_step 个算子的输出从父执行复用，只运行之后的算子
+        resume = pipeline_config.get(RESUME_KEY) or {}
+        start_step = int(resume.get("from_step") or 0)
+        parent_task_id = resume.get("parent_task_id")
+        if start_step:
+            seeded = seed_resumed_steps(parent_task_id, dataflow_runtime['storage']['cache_path'], start_step)
+            add_log("init", f"[{datetime.now().isoformat()}] Resuming from step {start_step} of {parent_task_id} ({len(seeded)} step files reused)")
+            logger.info(f"Resuming from step {start_step} of {parent_task_id}")
         
         # Step 2: 初始化所有 Operators
         add_log("init", f"[{datetime.now().isoformat()}] Step 2: Initializing operators...")
@@ -247,6 +275,7 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
         embedding_serving_instance_map: Dict[str, Any] = {}
         db_manager_instance_map: Dict[Any, DatabaseManager] = {}
         run_op = []
+        shard_requests: Dict[str, Optional[int]] = {}
         operators = pipeline_config.get("operators", [])
         
         add_log("init", f"[{datetime.now().isoformat()}] Found {len(operators)} operators to initialize")
@@ -256,11 +285,21 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
         for op_idx, op in enumerate(operators):
             op_name = op.get("name", f"Operator_{op_idx}")
             op_key = f"{op_name}_{op_idx}"
+            if op_idx < start_step:
+                # 输出已从父执行复用，不再实例化
+                operators_detail[op_key] = {
+                    "name": op_name,
+                    "index": op_idx,
+                    "status": REUSED_STATUS,
+                    "reused_from": parent_task_id
+                }
+                continue
             operators_detail[op_key] = {
                 "name": op_name,
                 "index": op_idx,
                 "status": "initializing"
             }
+            shard_requests[op_key] = op.get("shards")
             add_log("init", f"[{datetime.now().isoformat()}] [{op_idx+1}/{len(operators)}] Initializing operator: {op_name}", op_key)
             logger.info(f"[{op_idx+1}/{len(operators)}] Initializing operator: {op_name}")
             try:
@@ -465,7 +504,7 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
                                 add_log("init", f"[{datetime.now().isoformat()}]   - Compiled {len(compiled)} code-string(s) for {param_name}", op_key)
                         else:
                             ann = init_sig.parameters.get(param_name).annotation if param_name in init_sig.parameters else inspect.Parameter.empty
-                            param_value = coerce_param_value(param_value, annotation=ann, default_value=default_value)
+                            param_value = operator_param(coerce_param_value(param_value, annotation=ann, default_value=default_value))
 
                         # 若强制类型转换后得到 None（例如空字符串被 normalize 成
                         # None），但算子对该参数有非 None 默认值，则不要用 None
@@ -511,7 +550,7 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
                             item_name = item.get("name")
                             item_val = item.get("value") if item.get("value") is not None else item.get("default_value")
                             item_default = item.get("default_value")
-                            run_params[item_name] = coerce_param_value(item_val, annotation=inspect.Parameter.empty, default_value=item_default)
+                            run_params[item_name] = operator_param(coerce_param_value(item_val, annotation=inspect.Parameter.empty, default_value=item_default))
                     else:
                         # 跳过签名里不存在、且 run() 又不吃 **kwargs 的多余参数，
                         # 否则 operator.run(**run_params) 会因未知关键字参数直接失败。
@@ -522,7 +561,7 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
                             )
                             continue
                         ann = run_sig.parameters.get(param_name).annotation if param_name in run_sig.parameters else inspect.Parameter.empty
-                        run_params[param_name] = coerce_param_value(param_value, annotation=ann, default_value=default_value)
+                        run_params[param_name] = operator_param(coerce_param_value(param_value, annotation=ann, default_value=default_value))
                 
                 # 实例化 Operator
                 operator_instance = operator_cls(**init_params)
@@ -554,7 +593,12 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
         # 真正执行前拦下，给出精确的 key 错误——保证「能跑通的才跑」，而不是
         # 跑到某个算子中途才崩。compile 只登记 key 图、不会真正执行算子/调 LLM。
         try:
-            compile_result = compile_check(run_op, storage)
+            compile_storage = storage
+            if start_step:
+                # 续跑时从复用的最后一步开始累积 key（它的列 = 数据集列 + 上游产出）
+                compile_storage = copy.copy(storage)
+                compile_storage.first_entry_file_name = storage._get_cache_file_path(start_step)
+            compile_result = compile_check(run_op, compile_storage)
         except Exception as _ce:
             # 兜底:预检自身不该成为新的失败点
             logger.warning(f"[compile] pre-check raised, skipping: {_ce!r}", exc_info=True)
@@ -580,11 +624,252 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
 
         add_log("run", f"[{datetime.now().isoformat()}] Step 3: Executing {len(run_op)} operators...")
         logger.info(f"Executing {len(run_op)} operators...")
+        for op_key in operators_detail:
+            report_operator(op_key)
         
-        execution_results = []
+        execution_results = [
+            {"operator": detail["name"], "status": REUSED_STATUS, "index": detail["index"]}
+            for detail in operators_detail.values()
+            if detail["status"] == REUSED_STATUS
+        ]
+        def flush_captured(op_key: str, f_stdout: LogStream, f_stderr: LogStream):
+            """把算子捕获的 stdout / stderr 清洗后写进日志，并记下最后一条进度"""
+            stdout_str = f_stdout.getvalue()
+            stderr_str = f_stderr.getvalue()
+
+            last_progress_info = None
+            
+            if stdout_str:
+                cleaned_stdout, p_out, pct_out = parse_and_clean_logs(stdout_str)
+                if p_out:
+                    last_progress_info = p_out
+                    if pct_out is not None:
+                        operators_detail[op_key]["progress_percentage"] = pct_out
+                for line in cleaned_stdout:
+                    add_log("run", f"[STDOUT] {line}", op_key)
+                    
+            if stderr_str:
+                cleaned_stderr, p_err, pct_err = parse_and_clean_logs(stderr_str)
+                if p_err:
+                    last_progress_info = p_err
+                    if pct_err is not None:
+                        operators_detail[op_key]["progress_percentage"] = pct_err
+                for line in cleaned_stderr:
+                    add_log("run", f"[STDERR] {line}", op_key)
+
+            if last_progress_info:
+                operators_detail[op_key]["progress"] = last_progress_info
+
+        # 相邻的 stream 算子组成流式组：在组内第一个算子处按块流水执行整组
+        run_op_by_key = {entry[3]: entry for entry in run_op}
+        key_by_index = {detail["index"]: key for key, detail in operators_detail.items()}
+        stream_heads: Dict[str, List[str]] = {}
+        for group in stream_groups(operators, [operators_detail[entry[3]]["index"] for entry in run_op]):
+            stream_heads[key_by_index[group[0]]] = [key_by_index[index] for index in group]
+        streamed_keys = {key for keys in stream_heads.values() for key in keys[1:]}
+
+        def run_stream_group(group_keys: List[str]):
+            stages = []
+            for key in group_keys:
+                operator, run_params, op_name, _ = run_op_by_key[key]
+                run_params["storage"] = storage.step()
+                operators_detail[key]["status"] = "running"
+                operators_detail[key]["started_at"] = datetime.now().isoformat()
+                operators_detail[key]["streamed"] = True
+                report_operator(key)
+                stages.append(StreamStage(
+                    operator=operator,
+                    run_params={k: v for k, v in run_params.items() if k != "storage"},
+                    op_key=key,
+                    view=run_params["storage"],
+                    stdout=LogStream(key, operators_detail, operator_logs, report_progress, add_log),
+                    stderr=LogStream(key, operators_detail, operator_logs, report_progress, add_log),
+                ))
+            names = ", ".join(operators_detail[key]["name"] for key in group_keys)
+            add_log("run", f"[{datetime.now().isoformat()}] Streaming {len(stages)} operator(s) chunk by chunk: {names}")
+            logger.info(f"Streaming operators: {names}")
+
+            def report_chunk(stage: StreamStage):
+                operators_detail[stage.op_key]["progress"] = f"{stage.rows_in} rows in {stage.chunks} chunks"
+                report_progress(stage.op_key)
+
+            try:
+                run_streaming_group(stages, chunk_rows=pipeline_config.get("stream_chunk_rows"), on_chunk=report_chunk)
+            except StreamingStageError as e:
+                for stage in stages:
+                    detail = operators_detail[stage.op_key]
+                    detail["status"] = "failed" if stage.op_key == e.op_key else "cancelled"
+                    if stage.op_key == e.op_key:
+                        detail["error"] = str(e.original)
+                    report_operator(stage.op_key)
+                logger.error(f"Streaming operator {e.op_key} failed: {e.original!r}", exc_info=e.original)
+                failed = operators_detail[e.op_key]
+                raise DataFlowEngineError(
+                    f"执行Operator失败: {failed['name']}",
+                    context={
+                        "operator": failed["name"],
+                        "operator_index": failed["index"],
+                        "total_operators": len(run_op),
+                        "streamed": True,
+                    },
+                    original_error=e.original
+                )
+            finally:
+                for stage in stages:
+                    flush_captured(stage.op_key, stage.stdout, stage.stderr)
+
+            for stage in stages:
+                detail = operators_detail[stage.op_key]
+                detail.update({
+                    "status": "completed",
+                    "completed_at": datetime.now().isoformat(),
+                    "sample_count": stage.rows_out,
+                    "chunks": stage.chunks,
+                })
+                add_log("run", f"Processed {stage.rows_out} samples in {stage.chunks} chunks", stage.op_key)
+                report_operator(stage.op_key)
+                execution_results.append({"operator": detail["name"], "status": "completed", "index": detail["index"]})
+
+        # 按 input_*/output_* key 依赖互不相关的相邻算子：在块内第一个算子处按 DAG 并行执行整块
+        parallel_heads: Dict[str, List[str]] = {}
+        if branches_enabled(pipeline_config):
+            entries = []
+            for operator, run_params, op_name, key in run_op:
+                op_index = operators_detail[key]["index"]
+                eligible = (
+                    key not in streamed_keys and key not in stream_heads
+                    and not shard_requests.get(key)
+                    and operators[op_index].get("parallel") is not False
+                )
+                entries.append((key, run_params, eligible))
+            for block in parallel_blocks(entries):
+                parallel_heads[block[0]] = block
+        parallel_keys = {key for keys in parallel_heads.values() for key in keys[1:]}
+
+        def run_parallel_block(block_keys: List[str]) -> List[str]:
+            """
+            并行执行一块算子，返回已完成的 op_key
+
+            算子不能按列合并时只返回排在它前面、已经写好步骤文件的算子，其余由调用方顺序执行
+            """
+            view = storage.step()
+            ops = []
+            for key in block_keys:
+                operator, run_params, op_name, _ = run_op_by_key[key]
+                inputs, outputs = key_flow(run_params)
+                ops.append(BranchOp(
+                    operator=operator,
+                    run_params={k: v for k, v in run_params.items() if k != "storage"},
+                    op_key=key,
+                    inputs=inputs,
+                    outputs=outputs,
+                    stdout=LogStream(key, operators_detail, operator_logs, report_progress, add_log),
+                    stderr=LogStream(key, operators_detail, operator_logs, report_progress, add_log),
+                ))
+            names = ", ".join(operators_detail[key]["name"] for key in block_keys)
+            add_log("run", f"[{datetime.now().isoformat()}] Running {len(ops)} operator(s) as parallel branches: {names}")
+            logger.info(f"Parallel branches: {names}")
+
+            def mark_running(op: BranchOp):
+                operators_detail[op.op_key].update({"status": "running", "started_at": op.started_at, "branched": True})
+                report_operator(op.op_key)
+
+            try:
+                run_branch_block(ops, view, on_start=mark_running)
+            except BranchFallback as e:
+                # 只保留排在不能合并的算子之前、已写好步骤文件的算子；step 视图退到它们之后，其余按顺序执行
+                completed = e.completed
+                storage.operator_step += len(completed) - 1
+                for op in ops[len(completed):]:
+                    for stale in ("started_at", "branched"):
+                        operators_detail[op.op_key].pop(stale, None)
+                    operators_detail[op.op_key]["status"] = "initialized"
+                    report_operator(op.op_key)
+                finish_branches(completed)
+                add_log("run", f"[{datetime.now().isoformat()}] Parallel branches not applicable ({e}), "
+                               f"kept {len(completed)} finished operator(s), running the rest sequentially")
+                logger.warning(f"Parallel branches fell back to sequential after {len(completed)} operator(s): {e}")
+                return [op.op_key for op in completed]
+            except BranchOpError as e:
+                for op in ops:
+                    detail = operators_detail[op.op_key]
+                    if op.op_key == e.op_key:
+                        detail.update({"status": "failed", "error": str(e.original)})
+                    elif op.started_at is not None or detail["status"] == "running":
+                        detail["status"] = "cancelled"
+                    report_operator(op.op_key)
+                logger.error(f"Parallel branch {e.op_key} failed: {e.original!r}", exc_info=e.original)
+                failed = operators_detail[e.op_key]
+                raise DataFlowEngineError(
+                    f"执行Operator失败: {failed['name']}",
+                    context={
+                        "operator": failed["name"],
+                        "operator_index": failed["index"],
+                        "total_operators": len(run_op),
+                        "branched": True,
+                    },
+                    original_error=e.original
+                )
+            finally:
+                for op in ops:
+                    flush_captured(op.op_key, op.stdout, op.stderr)
+
+            storage.operator_step += len(ops) - 1
+            finish_branches(ops)
+            return block_keys
+
+        def finish_branches(ops: List[BranchOp]):
+            for op in ops:
+                detail = operators_detail[op.op_key]
+                detail.update({"status": "completed", "completed_at": op.completed_at, "sample_count": op.rows})
+                add_log("run", f"Processed {op.rows} samples (parallel branch)", op.op_key)
+                report_operator(op.op_key)
+                execution_results.append({"operator": detail["name"], "status": "completed", "index": detail["index"]})
+
+        # 第一个要运行的算子读 step{start_step}
+        storage.operator_step = start_step - 1
+        # 跨运行步骤缓存：输入 / 算子 / 参数 / 版本都相同的步骤直接复用上次的输出
+        step_cache = StepCache() if cache_enabled(pipeline_config) else None
+        step_digests: Dict[str, str] = {}
         for op_idx, (operator, run_params, op_name, op_key) in enumerate(run_op):
+            op_index = operators_detail[op_key]["index"]
+            if op_key in streamed_keys:
+                continue  # 已随所在的流式组执行完
+            if op_key in stream_heads:
+                run_stream_group(stream_heads[op_key])
+                continue
+            if op_key in parallel_heads:
+                handled = run_parallel_block(parallel_heads[op_key])
+                parallel_keys.difference_update(key for key in parallel_heads[op_key] if key not in handled)
+                if op_key in handled:
+                    continue
+            if op_key in parallel_keys:
+                continue  # 已随所在的并行块执行完
             try:
                 run_params["storage"] = storage.step()
+                output_path = run_params["storage"]._get_cache_file_path(run_params["storage"].operator_step + 1)
+                cache_key = None
+                if step_cache is not None and operators[op_index].get("cache") is not False:
+                    try:
+                        cache_key = view_key(run_params["storage"], type(operator), operators[op_index], dataflow_runtime, step_digests)
+                    except Exception as e:
+                        logger.warning(f"Step cache key for {op_name} unavailable: {e}")
+                    cached = step_cache.restore(cache_key, output_path) if cache_key else None
+                    if cached is not None:
+                        step_digests[output_path] = cached["output_sha256"]
+                        operators_detail[op_key].update({
+                            "status": CACHED_STATUS,
+                            "cache_key": cache_key,
+                            "sample_count": cached.get("rows", 0),
+                            "completed_at": datetime.now().isoformat(),
+                        })
+                        add_log("run", f"[{datetime.now().isoformat()}] [{op_idx+1}/{len(run_op)}] {op_name} skipped: output reused from step cache ({cache_key[:12]})", op_key)
+                        logger.info(f"[{op_idx+1}/{len(run_op)}] {op_name} served from step cache")
+                        report_operator(op_key)
+                        execution_results.append({"operator": op_name, "status": CACHED_STATUS, "index": op_index})
+                        continue
+                # 输出文件可能是缓存条目的硬链接，重写前先断开
+                detach(output_path)
                 add_log("run", f"[{datetime.now().isoformat()}] [{op_idx+1}/{len(run_op)}] Running operator: {op_name}", op_key)
                 logger.info(f"[{op_idx+1}/{len(run_op)}] Running {op_name}")
                 logger.debug(f"Run params: {list(run_params.keys())}")
@@ -593,52 +878,33 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
                 operators_detail[op_key]["status"] = "running"
                 operators_detail[op_key]["started_at"] = datetime.now().isoformat()
                 
-                # ✅ 实时更新状态到文件
-                update_execution_status("running", {
-                    "operators_detail": operators_detail,
-                    "operator_logs": operator_logs
-                })
-                
-                api_pipeline_path = os.path.join(settings.DATAFLOW_CORE_DIR, "api_pipelines")
-                print(api_pipeline_path)
-                os.chdir(api_pipeline_path)
+                # ✅ 实时上报算子状态
+                report_operator(op_key)
                 
                 # ✅ 捕获 stdout/stderr
                 # 使用自定义 LogStream 以支持实时进度捕获
-                f_stdout = LogStream(op_key, operators_detail, operator_logs, update_execution_status, add_log)
-                f_stderr = LogStream(op_key, operators_detail, operator_logs, update_execution_status, add_log)
+                f_stdout = LogStream(op_key, operators_detail, operator_logs, report_progress, add_log)
+                f_stderr = LogStream(op_key, operators_detail, operator_logs, report_progress, add_log)
+
+                def report_shards(done: int, total: int):
+                    operators_detail[op_key]["progress"] = f"{done}/{total} shards"
+                    operators_detail[op_key]["progress_percentage"] = round(done * 100 / total, 1)
+                    report_progress(op_key)
                 
                 try:    
-                    with redirect_stdout(f_stdout), redirect_stderr(f_stderr):
-                        operator.run(**run_params)
+                    # 声明了 shards 的逐行算子：输入切片后并行跑在多个 Ray 任务上，再按顺序合并
+                    sharded = run_operator_sharded(operator, run_params, shard_requests.get(op_key), report_shards)
+                    operators_detail[op_key]["shards"] = sharded["shards"] if sharded else 1
+                    if sharded is None:
+                        # 工作目录与输出捕获只作用于本次运行（见 execution_context.py）
+                        with operator_io(f_stdout, f_stderr):
+                            operator.run(**run_params)
+                    else:
+                        add_log("run", f"Ran on {sharded['shards']} shards in parallel", op_key)
+                        f_stdout.write(sharded["stdout"])
+                        f_stderr.write(sharded["stderr"])
                 finally:
-                    stdout_str = f_stdout.getvalue()
-                    stderr_str = f_stderr.getvalue()
-
-                    last_progress_info = None
-                    
-                    if stdout_str:
-                        cleaned_stdout, p_out, pct_out = parse_and_clean_logs(stdout_str)
-                        if p_out:
-                            last_progress_info = p_out
-                            if pct_out is not None:
-                                operators_detail[op_key]["progress_percentage"] = pct_out
-                        for line in cleaned_stdout:
-                            add_log("run", f"[STDOUT] {line}", op_key)
-                            
-                    if stderr_str:
-                        cleaned_stderr, p_err, pct_err = parse_and_clean_logs(stderr_str)
-                        if p_err:
-                            last_progress_info = p_err
-                            if pct_err is not None:
-                                operators_detail[op_key]["progress_percentage"] = pct_err
-                        for line in cleaned_stderr:
-                            add_log("run", f"[STDERR] {line}", op_key)
-
-                    if last_progress_info:
-                        operators_detail[op_key]["progress"] = last_progress_info
-
-                os.chdir(settings.BASE_DIR)
+                    flush_captured(op_key, f_stdout, f_stderr)
 
                 # ✅ 获取处理后的数据量
                 # 尝试从 output file 获取
@@ -665,6 +931,11 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
                 
                 operators_detail[op_key]["sample_count"] = sample_count
                 add_log("run", f"Processed {sample_count} samples", op_key)
+                if cache_key:
+                    stored = step_cache.store(cache_key, output_path, operator=op_name, rows=sample_count, task_id=task_id)
+                    if stored is not None:
+                        step_digests[output_path] = stored["output_sha256"]
+                        operators_detail[op_key]["cache_key"] = cache_key
                 
                 add_log("run", f"[{datetime.now().isoformat()}] [{op_idx+1}/{len(run_op)}] {op_name} completed successfully", op_key)
                 logger.info(f"[{op_idx+1}/{len(run_op)}] {op_name} completed")
@@ -675,7 +946,7 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
                 
                 # ✅ 记录缓存文件信息
                 from app.core.config import settings
-                cache_file = os.path.join(settings.CACHE_DIR, f"dataflow_cache_step_{op_idx}.jsonl")
+                cache_file = os.path.join(settings.CACHE_DIR, f"dataflow_cache_step_{op_index}.jsonl")
                 cache_file_exists = os.path.exists(cache_file)
                 logger.info(f"[Pipeline] Operator {op_name} completed, cache_file: {cache_file}, exists: {cache_file_exists}")
                 if cache_file_exists:
@@ -686,16 +957,13 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
                     except Exception as e:
                         logger.error(f"[Pipeline] Failed to read cache file: {e}")
                 
-                # ✅ 实时更新状态到文件
-                update_execution_status("running", {
-                    "operators_detail": operators_detail,
-                    "operator_logs": operator_logs
-                })
+                # ✅ 实时上报算子状态
+                report_operator(op_key)
                 
                 execution_results.append({
                     "operator": op_name,
                     "status": "completed",
-                    "index": op_idx
+                    "index": op_index
                 })
                 
             except Exception as e:
@@ -707,16 +975,13 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
                     f"Operator {op_name} run failed with underlying error: {e!r}",
                     exc_info=True,
                 )
-                update_execution_status("failed", {
-                    "operators_detail": operators_detail,
-                    "operator_logs": operator_logs
-                })
+                report_operator(op_key)
                 
                 raise DataFlowEngineError(
                     f"执行Operator失败: {op_name}",
                     context={
                         "operator": op_name,
-                        "operator_index": op_idx,
+                        "operator_index": op_index,
                         "total_operators": len(run_op),
                         "run_params": {k: str(v)[:50] for k, v in run_params.items() if k != "storage"}
                     },
@@ -750,16 +1015,24 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
         error_op_name = e.context.get("operator")
         if error_op_name:
              # Find matching key in operators_detail or iterate
+             # （同名算子可能出现多次：按算子索引定位，才不会把已完成的同名算子标成失败）
             target_key = None
+            error_op_index = e.context.get("operator_index")
             for k, v in operators_detail.items():
-                if v["name"] == error_op_name:
-                    target_key = k
-                    break
+                if v["name"] == error_op_name and v.get("status") != REUSED_STATUS:
+                    if error_op_index is None or v.get("index") == error_op_index:
+                        target_key = k
+                        break
             
             if target_key:
                 add_log("run", f"[{completed_at}] ERROR: {e.message}", target_key)
                 operators_detail[target_key]["status"] = "failed"
                 operators_detail[target_key]["error"] = e.message
+                report_operator(target_key)
+            else:
+                reporter.log(error_log)
+        else:
+            reporter.log(error_log)
         
         logs.append(error_log)
         
@@ -786,7 +1059,7 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
     except Exception as e:
         completed_at = datetime.now().isoformat()
         error_log = f"[{completed_at}] ERROR: Unexpected error - {str(e)}"
-        logs.append(error_log)
+        add_log("global", error_log)
         
         logger.error(f"Unexpected error during pipeline execution: {e}")
         logger.error(traceback.format_exc())
@@ -805,25 +1078,137 @@ def dataflow_pipeline_execute(pipeline_config: Dict[str, Any], dataflow_runtime:
             "completed_at": completed_at
         }
     
-class RayPipelineExecutor:
+def prepare_worker_process():
+    """
+    Ray worker 进程的准备工作：加载 DataFlow 扩展、标记 RAY_WORKER、切换到与主进程一致的工作目录
+
+    普通 Ray 任务每次执行都要做一遍；worker 池里的常驻 actor 只在启动时做一次。
+    """
+    import importlib
+    for ext in settings._DATAFLOW_EXTENSIONS:
+        try:
+            importlib.import_module(ext)
+            print(f"[Ray Worker] Successfully loaded DataFlow extension: {ext}")
+        except ImportError as e:
+            print(f"[Ray Worker] Failed to load DataFlow extension '{ext}': {e}")
+    
+    # 设置环境变量，标识这是 Ray worker
+    os.environ["RAY_WORKER"] = "1"
+    
+    # 切换到正确的工作目录（与主进程一致）
+    os.chdir(settings.BASE_DIR)
+    logger.info(f"[Ray Worker] Changed working directory to: {os.getcwd()}")
+    logger.info(f"[Ray Worker] CACHE_DIR: {settings.CACHE_DIR} (exists: {os.path.exists(settings.CACHE_DIR)})")
+    logger.info(f"[Ray Worker] DATA_REGISTRY: {settings.DATA_REGISTRY} (exists: {os.path.exists(settings.DATA_REGISTRY)})")
+    logger.info(f"[Ray Worker] DATAFLOW_CORE_DIR: {settings.DATAFLOW_CORE_DIR} (exists: {os.path.exists(settings.DATAFLOW_CORE_DIR)})")
+
+
+def run_pipeline_job(
+    pipeline_config: Dict[str, Any],
+    dataflow_runtime: Dict[str, Any],
+    task_id: str,
+    pipeline_execution_path: str,
+    state_actor=None
+) -> Dict[str, Any]:
+    """
+    在（已准备好的）worker 进程里执行一次 Pipeline，并把状态 / 结果写回
+
+    Args:
+        pipeline_config: Pipeline 配置
+        dataflow_runtime: Dataflow 运行时
+        task_id: 执行 ID
+        pipeline_execution_path: Pipeline 执行记录路径
+        state_actor: 执行状态 actor；为 None 时直接写任务存储与事件日志
+
+    Returns:
+        执行结果字典
+    """
+    logger.info(f"[Ray Worker] Starting pipeline execution: {task_id}")
+    rss_before, peak_before = current_rss_mb(), peak_rss_mb()
+    try:
+        # 更新状态为 running：事件批量发给状态 actor，由它统一落盘
+        if state_actor is not None:
+            reporter = actor_execution_reporter(task_id, state_actor)
+        else:
+            reporter = open_execution_reporter(task_id, pipeline_execution_path)
+        reporter.status("running", started_at=datetime.now().isoformat())
+                    
+        # 执行 Pipeline（算子状态 / 日志 / 进度实时追加到任务事件日志）
+        result = dataflow_pipeline_execute(pipeline_config, dataflow_runtime, task_id, execution_path=pipeline_execution_path, reporter=reporter)
+        # 本次运行实际用掉的内存：供同一 Pipeline 之后的资源估算使用
+        # （峰值没有刷新时只能拿运行前后的 RSS 作下限）
+        peak_after = peak_rss_mb()
+        peak = peak_after if peak_after > peak_before else max(rss_before, current_rss_mb())
+        result["resource_usage"] = {
+            "peak_rss_mb": round(peak, 1),
+            "memory_mb": round(max(peak - rss_before, 0.0), 1),
+        }
+        
+        # 更新执行记录（日志类字段已在事件日志里，不再重复写入任务存储）
+        reporter.finish(result)
+        reporter.close()
+        
+        # 运行结束后：压缩中间步骤文件，再按配额 / 时效回收 cache_local
+        finalize_task_cache(task_id, create_task_store(pipeline_execution_path))
+        
+        logger.info(f"[Ray Worker] Pipeline execution completed: {task_id}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"[Ray Worker] Pipeline execution failed: {e}")
+        logger.error(traceback.format_exc())
+        
+        # 返回失败结果
+        return {
+            "task_id": task_id,
+            "status": "failed",
+            "output": {
+                "error": str(e),
+                "traceback": traceback.format_exc()
+            },
+            "logs": [f"ERROR: {str(e)}"],
+            "started_at": datetime.now().isoformat(),
+            "completed_at": datetime.now().isoformat()
+        }
+
+
+class RayPipelineExecutor(PipelineExecutor):
     """
     基于 Ray 的异步 Pipeline 执行器
-    支持最大并行度为 1 的执行控制
+    提交先进入调度器（见 execution_scheduler.py），按全局并发、交互 / 批量队列和
+    用户公平分配依次派发到 Ray
     """
+
+    backend = "ray"
     
-    def __init__(self, max_concurrency: int = 1):
+    def __init__(self, max_concurrency: Optional[int] = None):
         """
         初始化 Ray 执行器
         
         Args:
-            max_concurrency: 最大并行度，默认为 1
+            max_concurrency: 最大并行度，默认取 settings.EXECUTION_MAX_CONCURRENCY
         """
-        self.max_concurrency = max_concurrency
+        super().__init__(max_concurrency)
         self._initialized = False
-        self._semaphore = None
-        self._task_refs: Dict[str, ray.ObjectRef] = {}
-        logger.info(f"RayPipelineExecutor initialized with max_concurrency={max_concurrency}")
+        # 未完成任务的 ObjectRef 由完成监视器持有，结束后立即释放
+        self._watcher = ExecutionCompletionWatcher()
+        self._task_refs: Dict[str, ray.ObjectRef] = self._watcher.refs
+        # 常驻 worker 池：任务结束先把 actor 放回池里（或回收），再让调度器释放槽位派发下一个
+        # （调度器由 activate() 交给本执行器；资源准入：请求放不进 Ray 空闲资源时留在队列里等）
+        self.pool = WorkerPool()
+        self._watcher.on_finished.append(self.pool.release)
+        self._watcher.on_finished.append(self.scheduler.finished)
+        logger.info(f"RayPipelineExecutor initialized with max_concurrency={self.max_concurrency}")
     
+    def add_finished_listener(self, callback):
+        """注册执行结束回调 callback(task_id)；重复注册同一回调只生效一次"""
+        if callback not in self._watcher.on_finished:
+            self._watcher.on_finished.append(callback)
+
+    def dispatched_may_still_run(self) -> bool:
+        # 本地 Ray 随进程退出；加入共享集群（RAY_ADDRESS）时执行可能仍在运行
+        return bool(settings.RAY_ADDRESS)
+
     def _ensure_initialized(self):
         """确保 Ray 已初始化"""
         if not self._initialized:
@@ -833,16 +1218,24 @@ class RayPipelineExecutor:
                 # 获取项目根目录
                 project_root = settings.BASE_DIR
                 
-                # 简化 Ray 初始化配置
-                ray.init(
-                    num_cpus=self.max_concurrency,
+                # 并发由调度器控制，不再用 num_cpus 把整个 Ray 限制成 max_concurrency 个 CPU；
+                # 配置了 RAY_ADDRESS（如 "auto"）时加入已有集群，多个 API worker 共用
+                init_kwargs = dict(
+                    namespace=settings.RAY_NAMESPACE,
                     ignore_reinit_error=True,
                     log_to_driver=True,
                     logging_level="info"
                 )
+                if settings.RAY_ADDRESS:
+                    init_kwargs["address"] = settings.RAY_ADDRESS
+                elif settings.RAY_NUM_CPUS:
+                    init_kwargs["num_cpus"] = settings.RAY_NUM_CPUS
+                ray.init(**init_kwargs)
                 logger.info("Ray initialized successfully")
                 logger.info(f"Ray cluster resources: {ray.cluster_resources()}")
                 logger.info(f"Ray working directory: {project_root}")
+            # worker actor 在后台预热 DataFlow，第一个任务到达时已经可用
+            self.pool.warm()
             self._initialized = True
     
     @staticmethod
@@ -852,11 +1245,12 @@ class RayPipelineExecutor:
         dataflow_runtime: Dict[str, Any],
         task_id: str,
         pipeline_registry_path: str,
-        pipeline_execution_path: str
+        pipeline_execution_path: str,
+        state_actor=None
     ) -> Dict[str, Any]:
         """
-        Ray 远程执行函数
-        在独立的 Ray worker 中执行 Pipeline
+        Ray 远程执行函数（未启用 worker 池时使用）
+        在独立的 Ray worker 中执行 Pipeline；每次都要重新做进程准备
         
         Args:
             pipeline_config: Pipeline 配置
@@ -864,189 +1258,101 @@ class RayPipelineExecutor:
             task_id: 执行 ID
             pipeline_registry_path: Pipeline 注册表路径
             pipeline_execution_path: Pipeline 执行记录路径
+            state_actor: 执行状态 actor；为 None 时直接写任务存储与事件日志
         
         Returns:
             执行结果字典
         """
         # 立即输出日志，确认 Ray worker 启动
         print(f"[RAY WORKER] Starting execution: {task_id}")
-        
-        try:
-            import json
-            import os
-            import importlib
-            from datetime import datetime
-            from app.core.logger_setup import get_logger
-            from app.core.config import settings
-            from app.services.dataflow_engine import DataFlowEngine
-            for ext in settings._DATAFLOW_EXTENSIONS:
-                try:
-                    importlib.import_module(ext)
-                    print(f"[Ray Worker] Successfully loaded DataFlow extension: {ext}")
-                except ImportError as e:
-                    print(f"[Ray Worker] Failed to load DataFlow extension '{ext}': {e}")
-            
-            # 设置环境变量，标识这是 Ray worker
-            os.environ["RAY_WORKER"] = "1"
-            
-            logger = get_logger(__name__)
-            logger.info(f"[Ray Worker] Starting pipeline execution: {task_id}")
-            
-            # 切换到正确的工作目录（与主进程一致）
-            correct_dir = settings.BASE_DIR
-            os.chdir(correct_dir)
-            logger.info(f"[Ray Worker] Changed working directory to: {os.getcwd()}")
-            
-            logger.info(f"[Ray Worker] Starting pipeline execution: {task_id}")
-            
-            logger.info(f"[Ray Worker] Current working directory: {os.getcwd()}")
-            logger.info(f"[Ray Worker] BASE_DIR: {settings.BASE_DIR}")
-            logger.info(f"[Ray Worker] CACHE_DIR: {settings.CACHE_DIR}")
-            logger.info(f"[Ray Worker] DATA_REGISTRY: {settings.DATA_REGISTRY}")
-            logger.info(f"[Ray Worker] DATAFLOW_CORE_DIR: {settings.DATAFLOW_CORE_DIR}")
-            logger.info(f"[Ray Worker] DATA_REGISTRY exists: {os.path.exists(settings.DATA_REGISTRY)}")
-            logger.info(f"[Ray Worker] DATAFLOW_CORE_DIR exists: {os.path.exists(settings.DATAFLOW_CORE_DIR)}")
-            logger.info(f"[Ray Worker] CACHE_DIR exists: {os.path.exists(settings.CACHE_DIR)}")
-            
-            # 列出当前目录下的文件
-            try:
-                logger.info(f"[Ray Worker] Files in current directory: {os.listdir('.')[:20]}")
-                if os.path.exists('data'):
-                    logger.info(f"[Ray Worker] Files in data directory: {os.listdir('data')[:20]}")
-                if os.path.exists(settings.CACHE_DIR):
-                    logger.info(f"[Ray Worker] Files in cache directory: {os.listdir(settings.CACHE_DIR)[:20]}")
-                else:
-                    logger.warning(f"[Ray Worker] Cache directory does not exist: {settings.CACHE_DIR}")
-            except Exception as e:
-                logger.error(f"[Ray Worker] Failed to list files: {e}")
-                        
-            # 检查数据集是否加载成功
-            
-            # 更新状态为 running
-            try:
-                with open(pipeline_execution_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                if task_id in data.get("tasks", {}):
-                    data["tasks"][task_id]["status"] = "running"
-                    data["tasks"][task_id]["started_at"] = datetime.now().isoformat()
-                    with open(pipeline_execution_path, "w", encoding="utf-8") as f:
-                        json.dump(data, f, indent=2)
-            except Exception as e:
-                logger.error(f"[Ray Worker] Failed to update execution status to running: {e}")
-                        
-            # 执行 Pipeline（传入 execution_path 以支持实时状态更新）
-            result = dataflow_pipeline_execute(pipeline_config, dataflow_runtime, task_id, execution_path=pipeline_execution_path)
-            
-            # 更新执行记录
-            try:
-                with open(pipeline_execution_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                if task_id in data.get("tasks", {}):
-                    data["tasks"][task_id].update(result)
-                    with open(pipeline_execution_path, "w", encoding="utf-8") as f:
-                        json.dump(data, f, indent=2)
-            except Exception as e:
-                logger.error(f"[Ray Worker] Failed to update execution result: {e}")
-            
-            logger.info(f"[Ray Worker] Pipeline execution completed: {task_id}")
-            return result
-            
-        except Exception as e:
-            import traceback
-            logger.error(f"[Ray Worker] Pipeline execution failed: {e}")
-            logger.error(traceback.format_exc())
-            
-            # 返回失败结果
-            return {
-                "task_id": task_id,
-                "status": "failed",
-                "output": {
-                    "error": str(e),
-                    "traceback": traceback.format_exc()
-                },
-                "logs": [f"ERROR: {str(e)}"],
-                "started_at": datetime.now().isoformat(),
-                "completed_at": datetime.now().isoformat()
-            }
+        prepare_worker_process()
+        return run_pipeline_job(pipeline_config, dataflow_runtime, task_id, pipeline_execution_path, state_actor)
     
-    async def submit_execution(
-        self,
-        pipeline_config: Dict[str, Any],
-        dataflow_runtime: Dict[str, Any],
-        task_id: str,
-        pipeline_registry_path: str,
-        pipeline_execution_path: str
-    ) -> str:
-        """
-        提交 Pipeline 执行任务到 Ray
-        
-        Args:
-            pipeline_config: Pipeline 配置
-            task_id: 执行 ID
-            pipeline_registry_path: Pipeline 注册表路径
-            pipeline_execution_path: Pipeline 执行记录路径
-        
-        Returns:
-            task_id
-        """
+    def _admit(self, entry: QueuedExecution, running: List[QueuedExecution]) -> bool:
+        """调度器回调：资源请求能否放进 Ray 当前空闲的 CPU / 内存"""
         self._ensure_initialized()
+        reserved = ResourceRequest(num_cpus=0.0)
+        if self.pool.enabled:
+            # 常驻 actor 不向 Ray 申请资源，运行中的请求由这里记账
+            for other in running:
+                used = ResourceRequest.from_dict(other.resources)
+                reserved.num_cpus += used.num_cpus
+                reserved.memory_mb += used.memory_mb
+        return fits(
+            ResourceRequest.from_dict(entry.resources),
+            ray.available_resources(),
+            ray.cluster_resources(),
+            reserved,
+            idle=not running,
+        )
+
+    def _task_options(self, entry: QueuedExecution) -> Dict[str, Any]:
+        """普通 Ray 任务的资源参数（不超过集群总量，否则 Ray 永远调度不了）"""
+        request = ResourceRequest.from_dict(entry.resources)
+        total = ray.cluster_resources()
+        return {
+            "num_cpus": min(request.num_cpus, total.get("CPU", request.num_cpus)),
+            "memory": int(min(request.memory_mb * MB, total.get("memory", request.memory_mb * MB))),
+        }
+
+    def _launch(self, entry: QueuedExecution) -> bool:
+        """调度器回调：真正提交到 Ray"""
+        task_id = entry.task_id
+        payload = entry.payload
+        if not self._claim(entry):
+            logger.info(f"Execution {task_id} is no longer queued here, skipping")
+            return False
         
-        logger.info(f"Submitting pipeline execution to Ray: {task_id}")
-        logger.info(f"Ray is initialized: {ray.is_initialized()}")
+        logger.info(f"Submitting pipeline execution to Ray: {task_id} ({entry.lane} lane, user {entry.user_id})")
         
         # 提交远程任务
         try:
-            future = self._execute_pipeline_remote.remote(
-                pipeline_config,
-                dataflow_runtime,
-                task_id,
-                pipeline_registry_path,
-                pipeline_execution_path
-            )
+            self._ensure_initialized()
+            # 执行状态的唯一写者：worker 只把事件发给它
+            execution_state.ensure(payload["pipeline_execution_path"])
+            
+            dataflow_runtime = self._dataflow_runtime(payload, task_id)
+            if self.pool.enabled:
+                # 交给常驻 worker：DataFlow 已预热，不再有冷启动
+                future = self.pool.submit(
+                    task_id,
+                    payload["pipeline_config"],
+                    dataflow_runtime,
+                    payload["pipeline_execution_path"],
+                    execution_state.handle
+                )
+            else:
+                future = self._execute_pipeline_remote.options(**self._task_options(entry)).remote(
+                    payload["pipeline_config"],
+                    dataflow_runtime,
+                    task_id,
+                    payload["pipeline_registry_path"],
+                    payload["pipeline_execution_path"],
+                    execution_state.handle
+                )
             
-            # 保存任务引用，用于后续kill操作
-            self._task_refs[task_id] = future
+            # 交给完成监视器：用于后续 kill 操作，结束后写入耗时 / 退出原因、释放引用并派发下一个
+            self._watcher.track(task_id, future, payload["pipeline_execution_path"])
             
             logger.info(f"Pipeline execution submitted: {task_id}, future: {future}")
-            logger.info(f"Ray cluster resources: {ray.cluster_resources()}")
             logger.info(f"Ray available resources: {ray.available_resources()}")
-            
-            # 异步接口，立即返回，不等待任务开始执行
-            return task_id
+            return True
             
         except Exception as e:
             logger.error(f"Failed to submit pipeline execution: {e}")
             import traceback
             logger.error(traceback.format_exc())
-            raise
-    
-    async def get_execution_status(
-        self,
-        task_id: str,
-        pipeline_execution_path: str
-    ) -> Optional[Dict[str, Any]]:
-        """
-        获取执行状态
-        
-        Args:
-            task_id: 执行 ID
-            pipeline_execution_path: Pipeline 执行记录路径
-        
-        Returns:
-            执行状态字典，如果不存在则返回 None
-        """
-        try:
-            import json
-            with open(pipeline_execution_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data.get("tasks", {}).get(task_id)
-        except Exception as e:
-            logger.error(f"Failed to get execution status for {task_id}: {e}")
-            return None
-    
+            # 提交失败同样要有终态，否则任务会一直停在 queued
+            finalize_execution(task_id, payload["pipeline_execution_path"], None, "task_error", "failed", 0.0,
+                               error=f"Failed to submit to Ray: {e}")
+            return False
+
     def shutdown(self):
         """关闭 Ray"""
+        self.scheduler.reset()
         if ray.is_initialized():
+            self.pool.shutdown()
+            execution_state.reset()
             ray.shutdown()
             self._initialized = False
             logger.info("Ray shutdown completed")
@@ -1061,6 +1367,11 @@ class RayPipelineExecutor:
         Returns:
             是否成功终止
         """
+        # 还在排队：直接出队，不会再派发
+        if self.scheduler.remove(task_id):
+            logger.info(f"Removed queued task {task_id} from the scheduler")
+            return True
+        
         if task_id not in self._task_refs:
             logger.warning(f"Task {task_id} not found in tracked tasks")
             return False
@@ -1068,12 +1379,17 @@ class RayPipelineExecutor:
         try:
             task_ref = self._task_refs[task_id]
             
-            # force=True 确保即使任务已经在运行也会被强制终止
-            # recursive=True 确保取消所有子任务
-            ray.cancel(task_ref, force=True, recursive=True)
+            if self.pool.busy(task_id):
+                # actor 任务不支持 force cancel：直接结束这个 worker，池里补一个新的
+                self.pool.kill(task_id)
+            else:
+                # force=True 确保即使任务已经在运行也会被强制终止
+                # recursive=True 确保取消所有子任务
+                ray.cancel(task_ref, force=True, recursive=True)
             
-            # 从追踪字典中移除
-            del self._task_refs[task_id]
+            # 从追踪字典中移除（终态由取消流程写入），释放调度槽位
+            self._watcher.untrack(task_id)
+            self.scheduler.finished(task_id)
             
             logger.info(f"Successfully cancelled task {task_id}")
             return True
@@ -1086,4 +1402,4 @@ class RayPipelineExecutor:
 
 
 # 创建全局 Ray 执行器实例
-ray_executor = RayPipelineExecutor(max_concurrency=1)
+ray_executor = RayPipelineExecutor()
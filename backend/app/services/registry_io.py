@@ -0,0 +1,263 @@
+"""Multi-process safe access to the file-backed registries.
+
+All YAML/JSON registries (datasets, pipelines, servings, text2sql databases /
+managers, user prompt templates, JSON schemas, agent sessions) used to do an
+unlocked ``read -> modify -> open(path, "w")`` on a shared file, so two API
+worker processes could lose each other's updates or read a half-written file.
+:class:`RegistryFile` gives them one concurrency layer:
+
+* **inter-process lock**: ``fcntl.flock`` (``msvcrt.locking`` on Windows) on a
+  ``<file>.lock`` sidecar, re-entrant within a process, so a whole
+  read-modify-write runs under one lock;
+* **atomic replace writes**: data is written to a temp file in the same
+  directory, fsync'ed and ``os.replace``-d over the registry, so readers see
+  either the old or the new file, never a truncated one;
+* **version stamps**: ``(st_ino, st_mtime_ns, st_size)`` of the file. Every
+  replace changes the inode, so a parsed copy cached in one process is thrown
+  away as soon as another process writes. Reads are a single ``stat`` when
+  nothing changed.
+
+This makes the registry files safe to share between processes; the task
+registry already lives in SQLite (see ``task_store.py``) and does not need it.
+The API still runs as a single ``uvicorn`` worker: the execution scheduler, the
+running agent CLI adapters and the WebSocket connections are per-process state,
+so ``--workers N`` stays unsupported until scheduling is shared.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import yaml
+
+from app.core.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+try:  # POSIX
+    import fcntl
+
+    def _lock_fd(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock_fd(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_fd(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        # LK_LOCK 最多重试 10 秒，这里循环到拿到为止
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock_fd(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+Stamp = Optional[Tuple[int, int, int]]
+
+
+class InterProcessLock:
+    """
+    基于 lock 文件的进程间互斥锁，同一进程内可重入
+
+    进程内先用 RLock 串行化线程，再由持有 RLock 的最外层调用去拿文件锁。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                _lock_fd(fd)
+                self._fd = fd
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            try:
+                _unlock_fd(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def atomic_write_text(path: str, text: str, encoding: str = "utf-8"):
+    """写临时文件 + fsync + os.replace：读者只会看到完整的旧文件或新文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _file_stamp(path: str) -> Stamp:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+# 序列化格式：(loads, dumps)
+def _yaml_dumps(data: Any) -> str:
+    return yaml.safe_dump(data, allow_unicode=True, sort_keys=False)
+
+
+FORMATS: Dict[str, Tuple[Callable[[str], Any], Callable[[Any], str]]] = {
+    "json": (json.loads, lambda data: json.dumps(data, ensure_ascii=False, indent=2)),
+    "yaml": (yaml.safe_load, _yaml_dumps),
+}
+
+# 同一路径在同一进程内共用一把锁（多个 Registry 实例指向同一文件时也互斥）
+_LOCKS: Dict[str, InterProcessLock] = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def lock_for(path: str) -> InterProcessLock:
+    key = os.path.abspath(path)
+    with _LOCKS_GUARD:
+        lock = _LOCKS.get(key)
+        if lock is None:
+            lock = _LOCKS[key] = InterProcessLock(key + ".lock")
+        return lock
+
+
+class RegistryFile:
+    """
+    一个注册表文件：加锁、原子替换写入、按版本戳缓存解析结果
+
+    Args:
+        path: 注册表文件路径
+        fmt: "json" / "yaml"
+        default: 文件不存在或为空时的内容（会被深拷贝）
+    """
+
+    def __init__(self, path: str, fmt: str = "json", default: Any = None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported registry format: {fmt}")
+        self.path = str(path)
+        self.fmt = fmt
+        self.default = {} if default is None else default
+        self._loads, self._dumps = FORMATS[fmt]
+        self._lock = lock_for(self.path)
+        self._cache_lock = threading.Lock()
+        self._cached_stamp: Stamp = None
+        self._cached: Any = None
+
+    # ------------------------------------------------------------------ 锁
+
+    def locked(self):
+        """整段读-改-写的进程间锁（可重入）"""
+        return self._lock
+
+    # ------------------------------------------------------------------ 读
+
+    @property
+    def version(self) -> Optional[str]:
+        """文件当前的版本戳；其它进程写入后一定变化"""
+        stamp = _file_stamp(self.path)
+        return "-".join(str(part) for part in stamp) if stamp else None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def read(self, copy_result: bool = True) -> Any:
+        """
+        读取并解析文件；版本戳未变时直接用缓存
+
+        默认返回深拷贝，调用方可以随意修改；只读且确定不改动时可传 copy_result=False。
+        """
+        stamp = _file_stamp(self.path)
+        with self._cache_lock:
+            if stamp is not None and stamp == self._cached_stamp:
+                data = self._cached
+            else:
+                data = self._load(stamp)
+        return copy.deepcopy(data) if copy_result else data
+
+    def _load(self, stamp: Stamp) -> Any:
+        if stamp is None:
+            data = copy.deepcopy(self.default)
+        else:
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = f.read()
+            data = self._loads(content) if content.strip() else None
+            if data is None:
+                data = copy.deepcopy(self.default)
+        self._cached, self._cached_stamp = data, stamp
+        return data
+
+    # ------------------------------------------------------------------ 写
+
+    def write(self, data: Any):
+        """原子替换写入，并把新内容放进缓存"""
+        text = self._dumps(data)
+        with self._lock:
+            atomic_write_text(self.path, text)
+            stamp = _file_stamp(self.path)
+        with self._cache_lock:
+            self._cached, self._cached_stamp = copy.deepcopy(data), stamp
+
+    def ensure(self, initial: Any = None):
+        """文件不存在时写入初始内容（加锁后再检查一次，多个进程同时启动也只写一次）"""
+        if self.exists():
+            return
+        with self._lock:
+            if not self.exists():
+                self.write(copy.deepcopy(self.default if initial is None else initial))
+
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        """
+        加锁读出最新内容交给调用方修改，正常退出时写回
+
+        with registry_file.transaction() as data:
+            data["x"] = 1
+        """
+        with self._lock:
+            data = self.read()
+            yield data
+            self.write(data)
@@ -0,0 +1,142 @@
+"""Sample (dry) runs of a pipeline on a slice of its input dataset.
+
+Checking an edited pipeline used to mean running it over the whole dataset.
+``execute-async`` now takes a sample spec:
+
+* ``head``: the first ``size`` rows;
+* ``random``: ``size`` rows drawn uniformly with ``seed`` (input order kept);
+* ``percent``: ``size`` percent of the rows, drawn the same way.
+
+The spec is stored as ``sample`` in the run's pipeline config and on the task
+record (the run is tagged as a sample run). The worker materializes the sample
+as step 0 of the run's own output directory and points the storage at it, so
+every operator, the result endpoints and resume/fork only ever see the sample.
+Sample runs always use the interactive lane, are admitted with the base memory
+request, and do not count as memory history for the full pipeline.
+"""
+from __future__ import annotations
+
+import os
+import random
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.core.logger_setup import get_logger
+from app.services.cache_retention import STEP_FILE_PREFIX
+
+logger = get_logger(__name__)
+
+SAMPLE_KEY = "sample"
+SAMPLE_MODES = ("head", "random", "percent")
+SAMPLE_LANE = "interactive"
+
+
+def sample_spec(mode: Optional[str], size: Optional[float] = None, seed: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    校验并规整采样参数
+
+    Returns:
+        {"mode", "size", "seed"}；mode 为空时返回 None（不是采样运行）
+
+    Raises:
+        ValueError: 参数不合法
+    """
+    if not mode:
+        return None
+    if mode not in SAMPLE_MODES:
+        raise ValueError(f"Unknown sample mode '{mode}', expected one of {', '.join(SAMPLE_MODES)}")
+    if size is None:
+        raise ValueError(f"Sample mode '{mode}' needs a size")
+    if mode == "percent":
+        if not 0 < float(size) <= 100:
+            raise ValueError("Sample percent must be in (0, 100]")
+        size = float(size)
+    else:
+        if float(size) < 1 or float(size) != int(size):
+            raise ValueError("Sample size must be a positive number of rows")
+        size = int(size)
+    spec: Dict[str, Any] = {"mode": mode, "size": size}
+    if mode != "head":
+        spec["seed"] = int(seed or 0)
+    return spec
+
+
+def _selected(total: int, spec: Dict[str, Any]) -> Optional[set]:
+    """随机 / 百分比模式下选中的行号；head 模式返回 None"""
+    if spec["mode"] == "head":
+        return None
+    if spec["mode"] == "percent":
+        count = max(1, round(total * spec["size"] / 100)) if total else 0
+    else:
+        count = spec["size"]
+    return set(random.Random(spec.get("seed", 0)).sample(range(total), min(count, total)))
+
+
+def _jsonl_rows(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line if line.endswith("\n") else line + "\n"
+
+
+def _sample_jsonl(source: str, spec: Dict[str, Any], target: str) -> int:
+    """逐行采样本地 JSONL，不把整个数据集读进内存"""
+    selected = None
+    if spec["mode"] != "head":
+        selected = _selected(sum(1 for _ in _jsonl_rows(source)), spec)
+    written = 0
+    with open(target, "w", encoding="utf-8") as out:
+        for index, line in enumerate(_jsonl_rows(source)):
+            if selected is None:
+                if written >= spec["size"]:
+                    break
+            elif index not in selected:
+                continue
+            out.write(line)
+            written += 1
+    return written
+
+
+def _sample_dataframe(source: str, spec: Dict[str, Any], target: str) -> int:
+    """其它格式（csv / parquet / hf: / ms: ...）借 FileStorage 读取后采样"""
+    from dataflow.utils.storage import FileStorage
+
+    storage = FileStorage(first_entry_file_name=source, cache_path=os.path.dirname(target),
+                          file_name_prefix=STEP_FILE_PREFIX, cache_type="jsonl")
+    dataframe = storage.step().read(output_type="dataframe")
+    selected = _selected(len(dataframe), spec)
+    if selected is None:
+        dataframe = dataframe.head(spec["size"])
+    else:
+        dataframe = dataframe.iloc[sorted(selected)]
+    dataframe.reset_index(drop=True).to_json(target, orient="records", lines=True, force_ascii=False)
+    return len(dataframe)
+
+
+def materialize_sample(source: str, spec: Dict[str, Any], cache_path: str) -> Tuple[str, int]:
+    """
+    把采样结果写成本次运行的 step 0（worker 端调用）
+
+    Args:
+        source: 原始输入（数据集文件路径或 hf: / ms: 数据源）
+        spec: sample_spec() 的结果
+        cache_path: 本次运行的输出目录
+
+    Returns:
+        (采样文件路径, 行数)
+    """
+    os.makedirs(cache_path, exist_ok=True)
+    target = os.path.join(cache_path, f"{STEP_FILE_PREFIX}_step0.jsonl")
+    if source.endswith(".jsonl") and os.path.isfile(source):
+        rows = _sample_jsonl(source, spec, target)
+    else:
+        rows = _sample_dataframe(source, spec, target)
+    logger.info(f"Materialized {spec['mode']} sample of {rows} rows from {source} into {target}")
+    return target, rows
+
+
+def describe(spec: Dict[str, Any]) -> str:
+    if spec["mode"] == "head":
+        return f"first {spec['size']} rows"
+    if spec["mode"] == "percent":
+        return f"{spec['size']:g}% of rows (seed {spec.get('seed', 0)})"
+    return f"{spec['size']} random rows (seed {spec.get('seed', 0)})"
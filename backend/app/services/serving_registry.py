@@ -3,6 +3,7 @@ import importlib
 import inspect
 from typing import Dict, List, Any
 from app.core.config import settings
+from app.services.registry_io import RegistryFile
 """
 Registry Yaml Format:
 {
@@ -27,17 +28,15 @@ class ServingRegistry:
     """Serving管理类，负责管理算子所需的LLM Serving实例的参数。主要用于**API Serving**"""
     def __init__(self, path: str | None = None):
         self.path = path or settings.SERVING_REGISTRY
+        # 多进程安全：进程间锁 + 原子替换写入 + 版本戳缓存（见 registry_io.py）
+        self._file = RegistryFile(self.path, fmt="yaml", default={})
         self._ensure()
 
     def _ensure(self):
-        if not os.path.exists(self.path):
-            with open(self.path, 'w') as f:
-                yaml.dump({}, f)
+        self._file.ensure()
                 
     def _get_all(self):
-        with open(self.path, 'r') as f:
-            data = yaml.safe_load(f)
-        return data
+        return self._file.read()
     
     def _get(self, id: str) -> Dict[str, Any] | None:
         data = self._get_all()
@@ -48,53 +47,51 @@ class ServingRegistry:
         return item
                 
     def _set(self, name: str, cls_name: str, params: List[Dict[str, Any]]) -> str:
-        data = self._get_all() or {}
         id = os.urandom(8).hex()
-        data[id] = {
-            "name": name,
-            "cls_name": cls_name,
-            "params": params
-        }
-        with open(self.path, 'w') as f:
-            yaml.dump(data, f)
+        with self._file.transaction() as data:
+            data[id] = {
+                "name": name,
+                "cls_name": cls_name,
+                "params": params
+            }
         return id
 
     def _update(self, id: str, name: str | None = None, cls_name: str | None = None, params: List[Dict[str, Any]] | None = None) -> bool:
-        data = self._get_all()
-        if id not in data:
-            return False
-        
-        if name:
-            data[id]["name"] = name
-        if cls_name:
-            raise ValueError("cls_name is not allowed to be updated")
-        if params is not None:
-            # Update parameter values only, keeping other metadata
-            current_params_map = {p['name']: p for p in data[id].get("params", [])}
+        with self._file.locked():
+            data = self._get_all()
+            if id not in data:
+                return False
             
-            for new_p in params:
-                pname = new_p.get('name')
-                if pname in current_params_map:
-                    # Only update the value if present in the new param
-                    if 'value' in new_p:
-                         current_params_map[pname]['value'] = new_p['value']
-                else:
-                     # If it's a new parameter (like api_key), add it
-                     current_params_map[pname] = new_p
-                     
-            data[id]["params"] = list(current_params_map.values())
-            
-        with open(self.path, 'w') as f:
-            yaml.dump(data, f)
+            if name:
+                data[id]["name"] = name
+            if cls_name:
+                raise ValueError("cls_name is not allowed to be updated")
+            if params is not None:
+                # Update parameter values only, keeping other metadata
+                current_params_map = {p['name']: p for p in data[id].get("params", [])}
+                
+                for new_p in params:
+                    pname = new_p.get('name')
+                    if pname in current_params_map:
+                        # Only update the value if present in the new param
+                        if 'value' in new_p:
+                             current_params_map[pname]['value'] = new_p['value']
+                    else:
+                         # If it's a new parameter (like api_key), add it
+                         current_params_map[pname] = new_p
+                         
+                data[id]["params"] = list(current_params_map.values())
+                
+            self._file.write(data)
         return True
 
     def _delete(self, id: str) -> bool:
-        data = self._get_all()
-        if id not in data:
-            return False
-        del data[id]
-        with open(self.path, 'w') as f:
-            yaml.dump(data, f)
+        with self._file.locked():
+            data = self._get_all()
+            if id not in data:
+                return False
+            del data[id]
+            self._file.write(data)
         return True
 
     def get_serving_classes(self) -> List[Dict[str, Any]]:
@@ -0,0 +1,173 @@
+"""Data-parallel execution of row-wise operators.
+
+``dataflow_pipeline_execute`` normally calls ``operator.run(storage=storage.step())``
+once over the whole step file. Row-independent operators (rule filters, refiners,
+prompted generators) can instead declare ``shards: K`` on their pipeline entry:
+
+1. the step input is split into K contiguous row ranges, each written as the
+   input step of its own ``FileStorage`` view under ``<cache_path>/.shards/stepN/shardI``;
+2. the operator (pickled) runs on every shard as a separate Ray task, so the
+   shards use as many CPUs as Ray gives them;
+3. shard outputs are concatenated in shard order and written through the
+   operator's regular storage view, i.e. to the standard
+   ``dataflow_cache_step_stepN.jsonl``. Downstream operators, the result
+   endpoints and cache retention do not know the step was sharded.
+
+Shards are never smaller than ``EXECUTION_SHARD_MIN_ROWS`` rows. The effective
+shard count goes into ``operators_detail[op]["shards"]``. Operators that cannot be
+pickled (or runs outside Ray) fall back to the single in-process call.
+"""
+from __future__ import annotations
+
+import copy
+import io
+import math
+import os
+import shutil
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+import ray
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.execution_context import operator_io
+
+logger = get_logger(__name__)
+
+SHARD_DIR = ".shards"
+
+
+def shard_count(requested: Optional[int], num_rows: int) -> int:
+    """实际分片数：不超过请求值，且每片至少 EXECUTION_SHARD_MIN_ROWS 行"""
+    if not requested or requested <= 1 or num_rows <= 1:
+        return 1
+    min_rows = max(1, settings.EXECUTION_SHARD_MIN_ROWS)
+    return max(1, min(int(requested), math.ceil(num_rows / min_rows), num_rows))
+
+
+def _shard_view(view, shard_dir: str):
+    """与 view 同一 step 的 FileStorage 副本，只是读写都落在 shard_dir 下"""
+    shard = copy.copy(view)
+    shard.cache_path = shard_dir
+    if view.operator_step == 0:
+        shard.first_entry_file_name = os.path.join(
+            shard_dir, f"{view.file_name_prefix}_step0.{view.cache_type}"
+        )
+    return shard
+
+
+def split_step(view, dataframe: pd.DataFrame, shards: int, shard_root: str) -> List[Any]:
+    """把 view 的输入行按顺序切成 shards 段，写成各分片的输入文件，返回各分片的 storage 视图"""
+    views = []
+    bounds = [round(i * len(dataframe) / shards) for i in range(shards + 1)]
+    for i in range(shards):
+        shard = _shard_view(view, os.path.join(shard_root, f"shard{i}"))
+        # 借 FileStorage.write 写“上一步的输出”，即本分片这一步的输入
+        writer = copy.copy(shard)
+        writer.operator_step = shard.operator_step - 1
+        writer.write(dataframe.iloc[bounds[i]:bounds[i + 1]].reset_index(drop=True))
+        views.append(shard)
+    return views
+
+
+def read_shard_output(shard) -> Optional[pd.DataFrame]:
+    """读分片输出；算子把整片过滤光时输出文件为空，返回 None"""
+    path = shard._get_cache_file_path(shard.operator_step + 1)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Shard output not written: {path}")
+    if os.path.getsize(path) == 0:
+        return None
+    reader = copy.copy(shard)
+    reader.operator_step = shard.operator_step + 1
+    return reader.read(output_type="dataframe")
+
+
+@ray.remote(max_retries=0)
+def _run_shard(operator, run_params: Dict[str, Any], shard, index: int) -> Dict[str, Any]:
+    """在独立 Ray 任务里对一个分片执行算子"""
+    from app.services.ray_pipeline_executor import prepare_worker_process
+
+    prepare_worker_process()
+    out, err = io.StringIO(), io.StringIO()
+    with operator_io(out, err):
+        operator.run(**dict(run_params, storage=shard))
+    return {"index": index, "stdout": out.getvalue(), "stderr": err.getvalue()}
+
+
+def run_operator_sharded(
+    operator,
+    run_params: Dict[str, Any],
+    requested_shards: Optional[int],
+    on_shard_done: Optional[Callable[[int, int], Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    分片执行一个算子
+
+    Args:
+        operator: 已实例化的算子
+        run_params: run() 参数，其中 storage 是本算子的 step 视图
+        requested_shards: 算子声明的分片数
+        on_shard_done: (已完成分片数, 分片总数) 回调，用于上报进度
+
+    Returns:
+        {"shards", "rows", "stdout", "stderr"}；不适合分片（只有 1 片、不在 Ray 中、
+        算子无法序列化）时返回 None，由调用方照常在本进程执行
+    """
+    view = run_params["storage"]
+    if not requested_shards or requested_shards <= 1 or not ray.is_initialized():
+        return None
+    dataframe = view.read(output_type="dataframe")
+    shards = shard_count(requested_shards, len(dataframe))
+    if shards <= 1:
+        return None
+
+    shard_root = os.path.join(view.cache_path, SHARD_DIR, f"step{view.operator_step + 1}")
+    shutil.rmtree(shard_root, ignore_errors=True)
+    try:
+        views = split_step(view, dataframe, shards, shard_root)
+        del dataframe
+        shard_params = {k: v for k, v in run_params.items() if k != "storage"}
+        try:
+            operator_ref = ray.put(operator)
+        except Exception as e:
+            logger.warning(f"Operator {type(operator).__name__} cannot be shipped to shard tasks, running unsharded: {e}")
+            return None
+
+        pending = [_run_shard.remote(operator_ref, shard_params, shard, i) for i, shard in enumerate(views)]
+        outputs: Dict[int, Dict[str, Any]] = {}
+        try:
+            while pending:
+                ready, pending = ray.wait(pending, num_returns=1)
+                result = ray.get(ready[0])
+                outputs[result["index"]] = result
+                if on_shard_done is not None:
+                    on_shard_done(len(outputs), shards)
+        except Exception:
+            # 一个分片失败整个算子失败，其余分片不必再跑
+            for ref in pending:
+                ray.cancel(ref, force=True)
+            raise
+
+        # 按分片顺序合并，写回本算子的标准 step 文件
+        frames = [read_shard_output(shard) for shard in views]
+        frames = [f for f in frames if f is not None]
+        merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if merged.empty:
+            path = view._get_cache_file_path(view.operator_step + 1)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "w").close()
+        else:
+            view.write(merged)
+        return {
+            "shards": shards,
+            "rows": len(merged),
+            "stdout": "".join(outputs[i]["stdout"] for i in sorted(outputs)),
+            "stderr": "".join(outputs[i]["stderr"] for i in sorted(outputs)),
+        }
+    finally:
+        shutil.rmtree(shard_root, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(shard_root))
+        except OSError:
+            pass  # 其它 step 仍在分片中
@@ -0,0 +1,310 @@
+"""Content-addressed step cache shared by all runs.
+
+Two runs of the same operator with the same parameters over the same input
+produce the same step file, but every run used to recompute it (and re-pay its
+LLM calls). Before running an operator the executor now computes a key over
+
+* the SHA-256 of the step's input file (the dataset for the first operator);
+* the operator class (module + name);
+* its init / run params as written in the pipeline config, normalized to
+  sorted JSON; serving ids are replaced by the serving's own params (model,
+  url, ...; never the api key), so editing a serving invalidates its entries;
+* the operator version: the ``__version__`` of the package that defines it plus
+  a hash of the class source, so a library upgrade or a local edit misses.
+
+A hit links (or copies) ``<STEP_CACHE_DIR>/<key[:2]>/<key>.jsonl`` to the
+operator's output step file and the operator is skipped; it shows up as
+``"cached"`` in ``operators_detail``. After a miss the fresh output is linked
+into the cache. A ``<key>.json`` side file keeps the output hash (the next
+operator's input hash, so it need not be re-read) and the last use; entries
+are evicted least recently used first above ``STEP_CACHE_QUOTA_GB``. The cache
+total is kept as a running sum in ``<STEP_CACHE_DIR>/index.json``, which is
+updated under a ``registry_io`` file lock shared by all worker processes. A
+store only adds its entry's size to that sum. The directory is scanned only
+when the sum goes over the quota, or when the index is missing.
+
+Runs opt out with ``step_cache: false`` in the pipeline config (or
+``step_cache=false`` on execute-async), single non-deterministic operators with
+``cache: false`` on their entry.
+"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.registry_io import lock_for
+
+logger = get_logger(__name__)
+
+CACHED_STATUS = "cached"
+STEP_CACHE_KEY = "step_cache"
+SERVING_PARAMS = {"llm_serving": "serving_map", "embedding_serving": "embedding_serving_map"}
+_SECRET_PARAMS = ("api_key",)
+_HASH_CHUNK = 1024 * 1024
+# 缓存总大小的累计值（所有进程共用，加文件锁读写）
+INDEX_FILE = "index.json"
+
+
+def cache_enabled(pipeline_config: Dict[str, Any]) -> bool:
+    """本次运行是否使用跨运行步骤缓存（全局开关 + 运行级开关）"""
+    return bool(settings.STEP_CACHE_ENABLED and settings.STEP_CACHE_DIR) and pipeline_config.get(STEP_CACHE_KEY) is not False
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def operator_version(operator_cls: type) -> str:
+    """算子所在包的版本号 + 类源码哈希；拿不到源码时只用版本号"""
+    package = sys.modules.get((operator_cls.__module__ or "").split(".")[0])
+    version = str(getattr(package, "__version__", ""))
+    try:
+        source = inspect.getsource(operator_cls)
+    except (OSError, TypeError):
+        return version
+    return f"{version}+{hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _serving_params(serving_info: Optional[Dict[str, Any]]) -> Any:
+    if not isinstance(serving_info, dict):
+        return None
+    params = {
+        p.get("name"): p.get("value") if p.get("value") is not None else p.get("default_value")
+        for p in serving_info.get("params") or []
+        if isinstance(p, dict) and p.get("name") not in _SECRET_PARAMS
+    }
+    return {"cls_name": serving_info.get("cls_name"), "params": params}
+
+
+def normalized_params(op: Dict[str, Any], dataflow_runtime: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """把 Pipeline 配置里一个算子的 init / run 参数规整成可稳定序列化的字典"""
+    dataflow_runtime = dataflow_runtime or {}
+    normalized: Dict[str, Any] = {}
+    params = op.get("params") if isinstance(op.get("params"), dict) else {}
+    for stage in ("init", "run"):
+        values = {}
+        for param in params.get(stage) or []:
+            name = param.get("name")
+            if not name or name == "storage":
+                continue
+            value = param.get("value") if param.get("value") is not None else param.get("default_value")
+            if stage == "init" and name in SERVING_PARAMS:
+                # serving 只在配置里写 id；缓存键要跟着它背后的模型 / 地址变
+                value = _serving_params((dataflow_runtime.get(SERVING_PARAMS[name]) or {}).get(value)) or value
+            values[name] = value
+        normalized[stage] = values
+    return normalized
+
+
+def step_key(input_sha256: str, operator_cls: type, op: Dict[str, Any], dataflow_runtime: Optional[Dict[str, Any]] = None) -> str:
+    """步骤缓存键：输入文件哈希 + 算子类 + 规整后的参数 + 算子版本"""
+    payload = {
+        "input": input_sha256,
+        "operator": f"{operator_cls.__module__}.{operator_cls.__qualname__}",
+        "params": normalized_params(op, dataflow_runtime),
+        "version": operator_version(operator_cls),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def view_key(view, operator_cls: type, op: Dict[str, Any], dataflow_runtime: Optional[Dict[str, Any]], digests: Dict[str, str]) -> Optional[str]:
+    """
+    算子 storage 视图对应的缓存键
+
+    Args:
+        view: 本算子的 step 视图（storage.step() 的返回值）
+        digests: 本次运行已知的 {文件路径: SHA-256}，上一步的输出哈希在这里复用
+
+    Returns:
+        输入不是本地文件（如 hf:/ms: 数据源）时返回 None，本步不走缓存
+    """
+    input_path = view._get_cache_file_path(view.operator_step)
+    if input_path not in digests:
+        if not os.path.isfile(input_path):
+            return None
+        digests[input_path] = file_sha256(input_path)
+    return step_key(digests[input_path], operator_cls, op, dataflow_runtime)
+
+
+def _link_or_copy(src: str, dst: str):
+    """原子地把 src 放到 dst（优先硬链接，跨设备时复制）"""
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    tmp = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def detach(path: str):
+    """
+    删除将被算子重写的输出文件
+
+    输出文件可能是缓存条目的硬链接（例如崩溃后重新派发的同一任务），
+    FileStorage 原地截断写入会连带改坏缓存，先删掉断开链接。
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class StepCache:
+    """
+    跨运行的内容寻址步骤缓存
+
+    Args:
+        root: 缓存目录（默认 STEP_CACHE_DIR）
+        quota_bytes: 容量上限，超过后按最近使用时间淘汰（0 表示不限）
+    """
+
+    def __init__(self, root: Optional[str] = None, quota_bytes: Optional[int] = None):
+        self.root = root or settings.STEP_CACHE_DIR
+        self.quota_bytes = (
+            int(settings.STEP_CACHE_QUOTA_GB * 1024 ** 3) if quota_bytes is None else quota_bytes
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.root, INDEX_FILE)
+
+    def _paths(self, key: str):
+        base = os.path.join(self.root, key[:2], key)
+        return f"{base}.jsonl", f"{base}.json"
+
+    def _read_meta(self, meta_path: str) -> Dict[str, Any]:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta_path: str, meta: Dict[str, Any]):
+        tmp = f"{meta_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, meta_path)
+
+    def restore(self, key: str, target: str) -> Optional[Dict[str, Any]]:
+        """命中时把缓存输出放到 target，返回条目元信息；未命中返回 None"""
+        data_path, meta_path = self._paths(key)
+        meta = self._read_meta(meta_path)
+        if not meta or not os.path.exists(data_path):
+            return None
+        try:
+            detach(target)
+            _link_or_copy(data_path, target)
+            meta["last_used"] = time.time()
+            meta["hits"] = int(meta.get("hits") or 0) + 1
+            self._write_meta(meta_path, meta)
+        except OSError as e:
+            logger.warning(f"Step cache entry {key[:12]} unusable, recomputing: {e}")
+            return None
+        return meta
+
+    def store(self, key: str, output_path: str, **info: Any) -> Optional[Dict[str, Any]]:
+        """把算子的输出文件收进缓存，返回条目元信息（含 output_sha256）"""
+        if not os.path.isfile(output_path):
+            return None
+        data_path, meta_path = self._paths(key)
+        # 同一个键重新收录时只计大小的差值
+        previous = (self._read_meta(meta_path).get("bytes") or 0) if os.path.exists(data_path) else 0
+        try:
+            _link_or_copy(output_path, data_path)
+            now = time.time()
+            meta = dict(info, key=key, output_sha256=file_sha256(data_path),
+                        bytes=os.path.getsize(data_path), created_at=now, last_used=now, hits=0)
+            self._write_meta(meta_path, meta)
+        except OSError as e:
+            logger.warning(f"Failed to store step cache entry {key[:12]}: {e}")
+            return None
+        self._account(meta["bytes"] - previous)
+        return meta
+
+    def _account(self, delta: int):
+        """把新条目计入累计大小；只有超过容量（或还没有累计值）时才扫描目录"""
+        if not self.quota_bytes:
+            return
+        with lock_for(self._index_path):
+            total = self._read_meta(self._index_path).get("total_bytes")
+            if total is None:
+                total = sum(e["bytes"] for e in self._entries())
+            else:
+                total += delta
+            if total > self.quota_bytes:
+                self._evict_locked()
+            else:
+                self._write_meta(self._index_path, {"total_bytes": total})
+
+    def _entries(self) -> List[Dict[str, Any]]:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for bucket in os.scandir(self.root):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if not entry.name.endswith(".jsonl"):
+                    continue
+                key = entry.name[: -len(".jsonl")]
+                meta = self._read_meta(self._paths(key)[1])
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                entries.append({"key": key, "bytes": size, "last_used": meta.get("last_used") or 0})
+        return entries
+
+    def usage(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            "root": self.root,
+            "entries": len(entries),
+            "total_bytes": sum(e["bytes"] for e in entries),
+            "quota_bytes": self.quota_bytes,
+        }
+
+    def evict(self) -> List[str]:
+        """扫描整个缓存，超过容量时按最近使用时间从旧到新淘汰条目，返回被淘汰的键"""
+        if not self.quota_bytes:
+            return []
+        with lock_for(self._index_path):
+            return self._evict_locked()
+
+    def _evict_locked(self) -> List[str]:
+        with self._lock:
+            entries = self._entries()
+            total = sum(e["bytes"] for e in entries)
+            evicted = []
+            for entry in sorted(entries, key=lambda e: e["last_used"]):
+                if total <= self.quota_bytes:
+                    break
+                for path in self._paths(entry["key"]):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= entry["bytes"]
+                evicted.append(entry["key"])
+            # 扫描得到的准确值覆盖累计值（顺带纠正外部删除造成的偏差）
+            self._write_meta(self._index_path, {"total_bytes": total})
+        if evicted:
+            logger.info(f"Step cache evicted {len(evicted)} entr{'y' if len(evicted) == 1 else 'ies'}")
+        return evicted
@@ -0,0 +1,261 @@
+"""Streaming (chunk-pipelined) execution of consecutive operators.
+
+Normally every operator reads its whole input step, and the next operator only
+starts once the complete output JSONL is written: N operators mean N full
+read / write passes, and peak memory is a whole dataframe. Operators that can
+work on any batch of rows may declare ``stream: true`` on their pipeline entry.
+Consecutive streaming operators form a *group* that runs as a pipeline:
+
+* a source thread reads the group's input step in chunks of
+  ``stream_chunk_rows`` rows (pipeline config, default
+  ``EXECUTION_STREAM_CHUNK_ROWS``);
+* every operator runs in its own thread and calls ``run()`` once per chunk on
+  an in-memory :class:`ChunkStorage`; its output chunk is appended to the
+  operator's regular step file (so the per-step files stay inspectable and the
+  result endpoints work unchanged) and handed to the next operator;
+* stages are connected by queues of ``EXECUTION_STREAM_QUEUE_CHUNKS`` chunks, so
+  a slow downstream operator (an LLM call) blocks its producers instead of
+  letting chunks pile up in memory, while it already works on the first chunk.
+
+The first failing operator stops the whole group. Streaming operators do not go
+through the step cache or sharding. Output of operators that keep state across
+``run()`` calls (dedup, global sorting) would differ, hence the opt-in.
+"""
+from __future__ import annotations
+
+import contextvars
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+from dataflow.utils.storage import DataFlowStorage
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.execution_context import capture_output, operator_workdir
+
+logger = get_logger(__name__)
+
+_END = object()
+_PUT_POLL_S = 0.2
+
+
+def stream_groups(operators: List[Dict[str, Any]], indices: List[int]) -> List[List[int]]:
+    """
+    把相邻的流式算子分组
+
+    Args:
+        operators: Pipeline 配置里的算子列表
+        indices: 本次实际运行的算子索引（续跑时不含复用的前缀），按执行顺序
+
+    Returns:
+        每组是连续的算子索引列表
+    """
+    groups: List[List[int]] = []
+    previous = None
+    for index in indices:
+        if not (operators[index] or {}).get("stream"):
+            previous = None
+            continue
+        if previous is not None and index == previous + 1 and groups:
+            groups[-1].append(index)
+        else:
+            groups.append([index])
+        previous = index
+    return groups
+
+
+class ChunkStorage(DataFlowStorage):
+    """
+    内存里的单块 storage：read() 返回本块输入，write() 收下本块输出
+
+    cache_path / file_name_prefix / cache_type / operator_step 与算子原本的
+    FileStorage 视图相同，个别读取这些属性的算子照常工作。
+    """
+
+    def __init__(self, view, chunk: pd.DataFrame):
+        self.cache_path = getattr(view, "cache_path", None)
+        self.file_name_prefix = getattr(view, "file_name_prefix", None)
+        self.cache_type = getattr(view, "cache_type", None)
+        self.operator_step = getattr(view, "operator_step", 0)
+        self.chunk = chunk
+        self.output: Optional[pd.DataFrame] = None
+
+    def get_keys_from_dataframe(self) -> list[str]:
+        return self.chunk.columns.tolist()
+
+    def read(self, output_type: str = "dataframe") -> Any:
+        dataframe = self.chunk.copy()
+        if output_type == "dataframe":
+            return dataframe
+        if output_type == "dict":
+            return dataframe.to_dict(orient="records")
+        raise ValueError(f"Unsupported output type: {output_type}")
+
+    def write(self, data: Any) -> Any:
+        if isinstance(data, list):
+            data = pd.DataFrame(data)
+        if not isinstance(data, pd.DataFrame):
+            raise ValueError(f"Unsupported data type: {type(data)}")
+        self.output = data.reset_index(drop=True)
+        return self.output
+
+
+def iter_input_chunks(view, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """按块读取 view 这一步的输入；本地 JSONL 逐块解析，其它来源整读后再切块"""
+    path = view._get_cache_file_path(view.operator_step)
+    if path.endswith(".jsonl") and os.path.isfile(path):
+        if os.path.getsize(path) == 0:
+            return
+        with pd.read_json(path, lines=True, chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                yield chunk.reset_index(drop=True)
+        return
+    dataframe = view.read(output_type="dataframe")
+    for start in range(0, len(dataframe), chunk_rows):
+        yield dataframe.iloc[start:start + chunk_rows].reset_index(drop=True)
+
+
+def _append_jsonl(path: str, dataframe: pd.DataFrame):
+    text = dataframe.to_json(orient="records", lines=True, force_ascii=False)
+    if text and not text.endswith("\n"):
+        text += "\n"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+@dataclass
+class StreamStage:
+    """流式组里的一个算子；view 是它的 step 视图，输出追加到 view 的下一步文件"""
+
+    operator: Any
+    run_params: Dict[str, Any]
+    op_key: str
+    view: Any
+    stdout: Any = None
+    stderr: Any = None
+    chunks: int = 0
+    rows_in: int = 0
+    rows_out: int = 0
+    error: Optional[BaseException] = field(default=None, repr=False)
+
+    @property
+    def output_path(self) -> str:
+        return self.view._get_cache_file_path(self.view.operator_step + 1)
+
+
+class StreamingStageError(Exception):
+    """流式组中某个算子失败"""
+
+    def __init__(self, op_key: str, original: BaseException):
+        super().__init__(f"{op_key}: {original}")
+        self.op_key = op_key
+        self.original = original
+
+
+def run_streaming_group(
+    stages: List[StreamStage],
+    chunk_rows: Optional[int] = None,
+    queue_chunks: Optional[int] = None,
+    on_chunk: Optional[Callable[[StreamStage], Any]] = None,
+) -> List[StreamStage]:
+    """
+    以流水线方式执行一组相邻算子
+
+    Args:
+        stages: 按执行顺序排列的算子；第一个算子的 view 决定组的输入
+        chunk_rows: 每块行数
+        queue_chunks: 相邻算子之间最多缓存的块数（背压）
+        on_chunk: 某算子处理完一块后的回调，用于上报进度
+
+    Raises:
+        StreamingStageError: 第一个失败的算子及其原始异常
+    """
+    chunk_rows = max(1, int(chunk_rows or settings.EXECUTION_STREAM_CHUNK_ROWS))
+    queue_chunks = max(1, int(queue_chunks or settings.EXECUTION_STREAM_QUEUE_CHUNKS))
+    queues = [queue.Queue(maxsize=queue_chunks) for _ in stages]
+    stop = threading.Event()
+
+    def put(q: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=_PUT_POLL_S)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def source():
+        try:
+            for chunk in iter_input_chunks(stages[0].view, chunk_rows):
+                if not put(queues[0], chunk):
+                    return
+        except BaseException as e:
+            stages[0].error = e
+            stop.set()
+        finally:
+            put(queues[0], _END)
+
+    def stage_loop(index: int):
+        stage = stages[index]
+        downstream = queues[index + 1] if index + 1 < len(stages) else None
+        try:
+            while not stop.is_set():
+                try:
+                    chunk = queues[index].get(timeout=_PUT_POLL_S)
+                except queue.Empty:
+                    continue
+                if chunk is _END:
+                    break
+                chunk_storage = ChunkStorage(stage.view, chunk)
+                # 输出按线程的上下文捕获到本算子的日志流
+                with capture_output(stage.stdout, stage.stderr):
+                    stage.operator.run(**dict(stage.run_params, storage=chunk_storage))
+                if chunk_storage.output is None:
+                    raise RuntimeError(f"Operator {type(stage.operator).__name__} wrote no output for a chunk")
+                stage.chunks += 1
+                stage.rows_in += len(chunk)
+                stage.rows_out += len(chunk_storage.output)
+                if len(chunk_storage.output):
+                    _append_jsonl(stage.output_path, chunk_storage.output)
+                    if downstream is not None and not put(downstream, chunk_storage.output):
+                        return
+                if on_chunk is not None:
+                    on_chunk(stage)
+        except BaseException as e:
+            stage.error = e
+            stop.set()
+        finally:
+            if downstream is not None:
+                put(downstream, _END)
+
+    for stage in stages:
+        path = stage.output_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 空输出也要留下文件，下游 / 结果接口才能读到“0 行”
+        open(path, "w").close()
+
+    # 整组在算子工作目录里运行（与顺序执行的 operator_io 一致）；隔离模式下工作目录在上下文里，
+    # 每个线程带一份当前上下文启动，各线程只单独捕获自己的输出
+    with operator_workdir():
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(source,), name="stream-source", daemon=True)]
+        for index, stage in enumerate(stages):
+            thread = threading.Thread(
+                target=contextvars.copy_context().run, args=(stage_loop, index), name=f"stream-{stage.op_key}", daemon=True
+            )
+            threads.append(thread)
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for stage in stages:
+        if stage.error is not None:
+            raise StreamingStageError(stage.op_key, stage.error)
+    logger.info(
+        f"Streamed {stages[0].rows_in} rows through {len(stages)} operator(s) in {stages[0].chunks} chunk(s)"
+    )
+    return stages
@@ -0,0 +1,453 @@
+"""Append-only per-task event journal.
+
+Every execution gets its own ``<task_journals>/<task_id>.jsonl`` file. The
+worker only ever *appends* small events to it (status changes, operator
+transitions, log lines, progress samples), so the write cost of an event is
+O(1) instead of re-serializing ``operators_detail`` / ``operator_logs`` into the
+shared registry. Each log line is stored exactly once; ``logs`` and
+``operator_logs`` are both rebuilt from the same ``log`` events.
+
+Event lines look like (``type`` is always serialized first, so readers can
+skip unwanted event types by the line prefix without parsing JSON)::
+
+    {"type": "status",   "ts": "...", "status": "running", "fields": {...}}
+    {"type": "operator", "ts": "...", "op_key": "Foo_0", "fields": {"status": "running"}}
+    {"type": "progress", "ts": "...", "op_key": "Foo_0", "percentage": 42.0, "progress": "..."}
+    {"type": "log",      "ts": "...", "op_key": "Foo_0", "line": "[STDOUT] ..."}
+
+The byte offset of a line in the file is its cursor: it is unique, monotonic
+and survives several writers appending with ``O_APPEND``. Readers keep the
+offset they stopped at and only parse new bytes (:class:`JournalCache`).
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+JOURNAL_DIR_NAME = "task_journals"
+
+
+def journal_dir_for(registry_path: str) -> str:
+    """日志目录与任务注册表放在同一目录下：data/task_journals/"""
+    return os.path.join(os.path.dirname(os.path.abspath(registry_path)), JOURNAL_DIR_NAME)
+
+
+def journal_path_for(registry_path: str, task_id: str) -> str:
+    return os.path.join(journal_dir_for(registry_path), f"{task_id}.jsonl")
+
+
+def encode_event(event: Dict[str, Any]) -> str:
+    """事件 -> 一行 JSON；type 固定是第一个键，缺 ts 时补上"""
+    line = {"type": event.get("type")}
+    line.update(event)
+    line.setdefault("ts", datetime.now().isoformat())
+    return json.dumps(line, ensure_ascii=False, default=str) + "\n"
+
+
+def _type_prefix(event_type: str) -> bytes:
+    """encode_event 写出的该类型事件行的行首"""
+    return ("{" + json.dumps("type") + ": " + json.dumps(event_type, ensure_ascii=False)).encode("utf-8")
+
+
+class TaskJournal:
+    """单个任务的事件日志（只追加）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def _handle(self):
+        if self._fh is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # "a" 模式即 O_APPEND：多进程追加时每行都完整落在文件末尾
+            self._fh = open(self.path, "a", encoding="utf-8")
+        return self._fh
+
+    def append(self, event_type: str, **payload) -> None:
+        """追加一条事件"""
+        line = encode_event(dict(payload, type=event_type))
+        with self._lock:
+            fh = self._handle()
+            fh.write(line)
+            fh.flush()
+
+    def append_many(self, events: List[Dict[str, Any]]) -> int:
+        """
+        一次写入追加一批事件（事件里已带 type，可选带 ts），返回写完后的文件大小
+
+        单写者批量落盘时使用：一批事件只产生一次 write + flush。
+        """
+        if not events:
+            return self.size()
+        lines = [encode_event(event) for event in events]
+        with self._lock:
+            fh = self._handle()
+            fh.write("".join(lines))
+            fh.flush()
+            return fh.tell()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read(self, since: int = 0) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """
+        从字节偏移 since 开始读取完整的事件行
+
+        Returns:
+            ([(offset, event), ...], next_offset)。末尾尚未写完的半行不会被消费，
+            下次从 next_offset 继续即可。
+        """
+        events = list(self.iter_events(since))
+        if events:
+            return [(o, e) for o, e, _ in events], events[-1][2]
+        return [], since
+
+    def iter_events(
+        self,
+        since: int = 0,
+        until: Optional[int] = None,
+        skip_types: Tuple[str, ...] = (),
+    ) -> Iterator[Tuple[int, Dict[str, Any], int]]:
+        """
+        逐行产出 (offset, event, next_offset)
+
+        Args:
+            since: 起始字节偏移
+            until: 读到该偏移为止（不含）
+            skip_types: 不需要的事件类型（如大量 log 行）；按行首在 JSON 解析之前跳过，
+                行首不是 encode_event 格式的旧行解析后再按 type 过滤
+        """
+        if not os.path.exists(self.path):
+            return
+        skip_prefixes = tuple(_type_prefix(t) for t in skip_types)
+        with open(self.path, "rb") as f:
+            f.seek(since)
+            offset = since
+            for raw in f:
+                if until is not None and offset >= until:
+                    break
+                if not raw.endswith(b"\n"):
+                    break
+                next_offset = offset + len(raw)
+                if skip_prefixes and raw.startswith(skip_prefixes):
+                    offset = next_offset
+                    continue
+                try:
+                    event = json.loads(raw.decode("utf-8"))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    logger.warning(f"Skip malformed journal line at {self.path}:{offset}")
+                    offset = next_offset
+                    continue
+                if skip_types and event.get("type") in skip_types:
+                    offset = next_offset
+                    continue
+                yield offset, event, next_offset
+                offset = next_offset
+
+    def read_logs(
+        self,
+        since: int = 0,
+        max_lines: int = 200,
+        op_filter: Optional[Callable[[str], bool]] = None,
+    ) -> Tuple[List[str], int, bool]:
+        """
+        从字节偏移 since 向后读取至多 max_lines 行日志
+
+        Args:
+            op_filter: 只保留 op_key 满足条件的日志行；None 表示全部日志
+
+        Returns:
+            (lines, next_offset, has_more)。has_more 表示因 max_lines 截断、后面还有可读内容。
+        """
+        lines: List[str] = []
+        next_offset = since
+        for _, event, end in self.iter_events(since):
+            if len(lines) >= max_lines:
+                return lines, next_offset, True
+            # 非日志事件 / 被过滤的日志也推进游标
+            next_offset = end
+            if event.get("type") != "log":
+                continue
+            if op_filter is not None and not op_filter(event.get("op_key") or ""):
+                continue
+            lines.append(event.get("line", ""))
+        return lines, next_offset, False
+
+    def last_logs(
+        self,
+        n: int,
+        op_filter: Optional[Callable[[str], bool]] = None,
+        block_size: int = 64 * 1024,
+    ) -> Tuple[List[str], int]:
+        """
+        读取最后 n 行日志：从文件末尾按块倒读，不加载整个日志
+
+        Returns:
+            (lines, next_offset)。next_offset 指向已写完的末尾，可直接用于后续的增量读取。
+        """
+        end = self._complete_size(0)
+        if end == 0 or n <= 0:
+            return [], end
+        lines: List[str] = []
+        log_prefix = _type_prefix("log")
+        with open(self.path, "rb") as f:
+            position, carry = end, b""
+            while position > 0 and len(lines) < n:
+                read_size = min(block_size, position)
+                position -= read_size
+                f.seek(position)
+                chunk = f.read(read_size) + carry
+                parts = chunk.split(b"\n")
+                # 第一段可能是上一块的半行，留到下一轮拼接（读到文件头时除外）
+                carry = parts.pop(0) if position > 0 else b""
+                for raw in reversed(parts):
+                    # 行首是别的事件类型时不必解析；旧格式的行（ts 在前）解析后再判断
+                    if not raw or (raw.startswith(b'{"type": ') and not raw.startswith(log_prefix)):
+                        continue
+                    try:
+                        event = json.loads(raw.decode("utf-8"))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        continue
+                    if event.get("type") != "log":
+                        continue
+                    if op_filter is not None and not op_filter(event.get("op_key") or ""):
+                        continue
+                    lines.append(event.get("line", ""))
+                    if len(lines) >= n:
+                        break
+        lines.reverse()
+        return lines, end
+
+    def _complete_size(self, floor: int) -> int:
+        """文件中最后一个完整行的结束偏移（不小于 floor）"""
+        size = self.size()
+        if size <= floor:
+            return floor
+        with open(self.path, "rb") as f:
+            position = size
+            while position > floor:
+                step = min(4096, position - floor)
+                f.seek(position - step)
+                block = f.read(step)
+                index = block.rfind(b"\n")
+                if index != -1:
+                    return position - step + index + 1
+                position -= step
+        return floor
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def remove(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def empty_view() -> Dict[str, Any]:
+    return {
+        "status": None,
+        "fields": {},
+        "operators_detail": {},
+        "operator_logs": {},
+        "logs": [],
+    }
+
+
+def apply_event(view: Dict[str, Any], event: Dict[str, Any]) -> None:
+    """把一条事件折叠进执行视图"""
+    event_type = event.get("type")
+    if event_type == "status":
+        if event.get("status"):
+            view["status"] = event["status"]
+        view["fields"].update(event.get("fields") or {})
+    elif event_type == "operator":
+        view["operators_detail"].setdefault(event["op_key"], {}).update(event.get("fields") or {})
+    elif event_type == "progress":
+        detail = view["operators_detail"].setdefault(event["op_key"], {})
+        if event.get("percentage") is not None:
+            detail["progress_percentage"] = event["percentage"]
+        if event.get("progress"):
+            detail["progress"] = event["progress"]
+    elif event_type == "log":
+        line = event.get("line", "")
+        view["logs"].append(line)
+        op_key = event.get("op_key")
+        if op_key:
+            view["operator_logs"].setdefault(op_key, []).append(line)
+
+
+def _copy_view(view: Dict[str, Any], cursor: int) -> Dict[str, Any]:
+    """复制容器层级即可（日志行是不可变字符串），比 deepcopy 便宜得多"""
+    return {
+        "cursor": cursor,
+        "status": view["status"],
+        "fields": dict(view["fields"]),
+        "operators_detail": {k: dict(v) for k, v in view["operators_detail"].items()},
+        "operator_logs": {k: list(v) for k, v in view["operator_logs"].items()},
+        "logs": list(view["logs"]),
+    }
+
+
+class JournalCache:
+    """
+    按任务缓存折叠后的视图，只解析上次读取之后新增的字节
+
+    日志只追加，所以 (offset, view) 可以增量推进；状态轮询的代价与新增事件数
+    成正比，而不是与历史大小成正比。
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def view(self, journal: TaskJournal, key: str) -> Optional[Dict[str, Any]]:
+        """
+        返回 journal 当前的视图副本；日志文件不存在时返回 None
+
+        视图里的 cursor 是已折叠到的字节偏移，从它继续订阅事件不会漏也不会重复。
+        """
+        if not journal.exists():
+            self.invalidate(key)
+            return None
+        with self._lock:
+            offset, view = self._advance(journal, key)
+            return _copy_view(view, offset)
+
+    def advance(self, journal: TaskJournal, key: str) -> int:
+        """只把新增事件折叠进缓存（不复制视图），返回折叠到的偏移"""
+        with self._lock:
+            return self._advance(journal, key)[0]
+
+    def cached(self, key: str) -> Optional[Dict[str, Any]]:
+        """返回已缓存视图的副本，不读磁盘；没有缓存时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return _copy_view(entry[1], entry[0]) if entry is not None else None
+
+    def _advance(self, journal: TaskJournal, key: str) -> Tuple[int, Dict[str, Any]]:
+        offset, view = self._entries.pop(key, (0, None))
+        if view is None or journal.size() < offset:
+            # 文件被截断/重建，从头再来
+            offset, view = 0, empty_view()
+        for _, event, next_offset in journal.iter_events(offset):
+            apply_event(view, event)
+            offset = next_offset
+        self._entries[key] = (offset, view)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return offset, view
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class ExecutionReporter:
+    """
+    执行过程的状态上报入口（worker 侧）
+
+    高频的算子状态 / 日志 / 进度只追加到任务日志；只有状态切换和最终结果才写
+    任务存储的那一行（它们决定列表、统计等索引列）。
+    """
+
+    # 最终结果里这些字段已经由日志事件完整记录，不再重复写入任务存储
+    JOURNALED_RESULT_KEYS = ("logs", "operator_logs")
+
+    def __init__(self, task_id: str, journal: Optional[TaskJournal] = None, store=None):
+        self.task_id = task_id
+        self.journal = journal
+        self.store = store
+
+    def _append(self, event_type: str, **payload):
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(event_type, **payload)
+        except Exception as e:
+            logger.error(f"Failed to append journal event for {self.task_id}: {e}")
+
+    def status(self, status: str, **fields):
+        """状态切换：日志 + 任务存储的索引列"""
+        self._append("status", status=status, fields=fields)
+        if self.store is not None:
+            try:
+                self.store.patch(self.task_id, {"status": status, **fields})
+            except Exception as e:
+                logger.error(f"Failed to update execution status: {e}")
+
+    def operator(self, op_key: str, fields: Dict[str, Any]):
+        """单个算子的状态变化（只携带该算子自己的字段）"""
+        self._append("operator", op_key=op_key, fields=fields)
+
+    def progress(self, op_key: str, percentage: Optional[float] = None, progress: Optional[str] = None):
+        self._append("progress", op_key=op_key, percentage=percentage, progress=progress)
+
+    def log(self, line: str, op_key: Optional[str] = None):
+        if op_key:
+            self._append("log", op_key=op_key, line=line)
+        else:
+            self._append("log", line=line)
+
+    @classmethod
+    def persisted_result(cls, result: Dict[str, Any], journaled: bool) -> Dict[str, Any]:
+        """任务存储里保存的最终结果：有事件日志时去掉其中已记录的日志类字段"""
+        if not journaled:
+            # 没有日志可回放时保留完整结果
+            return result
+        persisted = {k: v for k, v in result.items() if k not in cls.JOURNALED_RESULT_KEYS}
+        if isinstance(persisted.get("output"), dict):
+            persisted["output"] = {
+                k: v for k, v in persisted["output"].items() if k not in cls.JOURNALED_RESULT_KEYS
+            }
+        return persisted
+
+    def finish(self, result: Dict[str, Any]):
+        """写入最终结果：日志里记一次终态，任务存储写一次精简后的结果"""
+        fields = {k: result.get(k) for k in ("started_at", "completed_at") if result.get(k)}
+        self._append("status", status=result.get("status"), fields=fields)
+        if self.store is None:
+            return
+        persisted = self.persisted_result(result, self.journal is not None and self.journal.exists())
+        try:
+            self.store.update(self.task_id, lambda record: record.update(persisted))
+        except Exception as e:
+            logger.error(f"Failed to persist execution result for {self.task_id}: {e}")
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+
+def open_execution_reporter(task_id: str, registry_path: Optional[str]) -> ExecutionReporter:
+    """按任务注册表路径打开该任务的事件日志 + 任务存储"""
+    if not registry_path:
+        return ExecutionReporter(task_id)
+    from app.services.task_store import create_task_store
+
+    return ExecutionReporter(
+        task_id,
+        journal=TaskJournal(journal_path_for(registry_path, task_id)),
+        store=create_task_store(registry_path),
+    )
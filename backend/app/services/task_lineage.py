@@ -0,0 +1,122 @@
+"""Resume or fork an execution from a completed step of an earlier run.
+
+When operator 7 of 9 fails, re-running from step 0 re-pays every upstream LLM
+call although ``cache_local/{task_id}_output/`` still holds the outputs of the
+steps that finished. A child execution instead:
+
+* copies the parent's pipeline config, keeping operators ``[0, from_step)``
+  unchanged (a *fork* may replace the operators from ``from_step`` on);
+* records ``resume = {"parent_task_id", "from_step"}`` in that config, so the
+  worker (also after a restart) seeds its own output directory with the
+  parent's step files ``1..from_step`` (hard links where possible; the step the
+  first re-run operator reads is decompressed if the parent's copy was gzipped);
+* starts its ``FileStorage`` at that step and only instantiates / runs the
+  remaining operators. Reused operators show up as ``"reused"`` in
+  ``operators_detail``.
+
+``from_step`` uses the numbering of the result endpoints: the index of the
+first operator that runs again. Lineage is kept on both task records: the
+child has ``lineage``, and the parent lists its children in ``children``.
+"""
+from __future__ import annotations
+
+import copy
+import gzip
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+from app.core.logger_setup import get_logger
+from app.services.cache_retention import STEP_FILE_PREFIX, is_compressed, resolve_step_file
+from app.services.step_cache import CACHED_STATUS
+
+logger = get_logger(__name__)
+
+RESUME_KEY = "resume"
+REUSED_STATUS = "reused"
+DONE_STATUSES = ("completed", REUSED_STATUS, CACHED_STATUS)
+
+
+def completed_prefix(operators_detail: Dict[str, Dict[str, Any]], num_operators: int) -> int:
+    """从第一个算子起连续完成（或复用）的算子数，即“最后一个完好步骤”之后的位置"""
+    status_by_index = {
+        detail.get("index"): detail.get("status")
+        for detail in (operators_detail or {}).values()
+        if isinstance(detail, dict)
+    }
+    done = 0
+    while done < num_operators and status_by_index.get(done) in DONE_STATUSES:
+        done += 1
+    return done
+
+
+def child_pipeline_config(
+    parent_config: Dict[str, Any],
+    parent_task_id: str,
+    from_step: int,
+    operators: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    生成子执行的 Pipeline 配置
+
+    Args:
+        parent_config: 父执行的 Pipeline 配置
+        parent_task_id: 父执行 ID
+        from_step: 第一个重新运行的算子索引；之前的算子输出从父执行复用
+        operators: fork 时替换 from_step 及之后的算子；None 表示沿用父执行的算子
+    """
+    config = copy.deepcopy(parent_config)
+    parent_ops = config.get("operators") or []
+    downstream = copy.deepcopy(operators) if operators is not None else parent_ops[from_step:]
+    config["operators"] = parent_ops[:from_step] + list(downstream)
+    if len(config["operators"]) <= from_step:
+        raise ValueError("Nothing to run after the reused steps")
+    if from_step:
+        config[RESUME_KEY] = {"parent_task_id": parent_task_id, "from_step": from_step}
+    else:
+        config.pop(RESUME_KEY, None)
+    return config
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def seed_resumed_steps(parent_task_id: str, cache_path: str, from_step: int, cache_dir: Optional[str] = None) -> List[str]:
+    """
+    把父执行前 from_step 个算子的输出放进子执行的输出目录（worker 端调用）
+
+    只有第 from_step - 1 步（第一个重新运行的算子的输入）是必需的；更早的步骤
+    只用于查看结果，还在就链接过来，已被回收就跳过。
+
+    Returns:
+        写入的文件路径；必需的那一步已被回收时抛 FileNotFoundError
+    """
+    os.makedirs(cache_path, exist_ok=True)
+    seeded = []
+    for index in range(from_step):
+        source = resolve_step_file(parent_task_id, index, cache_dir)
+        if source is None:
+            if index == from_step - 1:
+                raise FileNotFoundError(
+                    f"Output of step {index} of {parent_task_id} is no longer available (evicted from cache?)"
+                )
+            continue
+        plain = os.path.join(cache_path, f"{STEP_FILE_PREFIX}_step{index + 1}.jsonl")
+        if index == from_step - 1 and is_compressed(source):
+            # 第一个重新运行的算子由 FileStorage 直接读取，必须是未压缩的文件
+            with gzip.open(source, "rb") as src, open(plain + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(plain + ".tmp", plain)
+            target = plain
+        else:
+            target = os.path.join(cache_path, os.path.basename(source))
+            if os.path.exists(target):
+                os.remove(target)
+            _link_or_copy(source, target)
+        seeded.append(target)
+    logger.info(f"Seeded {len(seeded)} step file(s) from {parent_task_id} into {cache_path}")
+    return seeded
@@ -1,12 +1,27 @@
+import asyncio
 import json
 import os
 import hashlib
+import time
 import pandas
 import datetime
 from typing import Dict, List, Optional, Any, Tuple
 from app.core.container import container
 from app.core.config import settings
 from app.services.dataflow_engine import DataFlowEngine
+from app.services.task_store import TaskStore, create_task_store
+from app.services.task_stats import AGGREGATE_EXECUTOR_TYPES, summarize_rollups
+from app.services.cache_retention import open_step_file, resolve_step_file, step_file_path, touch_step_file
+from app.services.execution_state import execution_state
+from app.services.execution_scheduler import execution_scheduler, next_seq, normalize_lane
+from app.services.execution_resources import estimate_request, historical_memory_mb
+from app.services.task_lineage import child_pipeline_config, completed_prefix
+from app.services.sample_runs import SAMPLE_KEY, SAMPLE_LANE
+from app.services.batch_execution import BATCH_EXECUTOR_TYPE, BATCH_KEY, aggregate, dataset_pipeline_config, resolve_datasets
+from app.services.parameter_sweep import (
+    SWEEP_EXECUTOR_TYPE, SWEEP_KEY, SWEEP_LINEAGE_MODE, comparison, find_param, prefix_pipeline_config, variant_operators,
+)
+from app.services.task_journal import JournalCache, TaskJournal, apply_event, empty_view, journal_path_for
 from app.core.logger_setup import get_logger
 
 logger = get_logger(__name__)
@@ -14,42 +29,49 @@ logger = get_logger(__name__)
 class TaskRegistry:
     """任务注册表，用于管理运行任务的生命周期"""
     
-    def __init__(self, path: str | None = None):
+    def __init__(self, path: str | None = None, store: TaskStore | None = None):
         self.path = path or settings.TASK_REGISTRY
-        self._ensure()
-    
-    def _ensure(self):
-        # 只在文件不存在时初始化
-        if not os.path.exists(self.path):
-            initial_data = {"tasks": {}}
-            self._write(initial_data)
-            return
-
-        # 文件存在但为空/损坏时兜底（可选）
-        try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if not isinstance(data, dict) or "tasks" not in data:
-                self._write({"tasks": {}})
-        except Exception:
-            # 读取失败：备份旧文件再重建（推荐）
-            broken = self.path + f".broken.{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
-            try:
-                os.replace(self.path, broken)
-            except Exception:
-                pass
-            self._write({"tasks": {}})
+        # 存储后端（默认 SQLite/WAL，按行读写；见 app/services/task_store.py）
+        self.store = store or create_task_store(self.path)
+        # 每个任务的事件日志折叠视图（增量解析，见 app/services/task_journal.py）
+        self._journal_cache = JournalCache()
+        # 完成回调可能在线程里触发：需要异步处理时交回这个事件循环（start_sweep 时记下），并持有 future 直到结束
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._background: set = set()
 
+    def journal(self, task_id: str) -> TaskJournal:
+        """获取任务的事件日志"""
+        return TaskJournal(journal_path_for(self.path, task_id))
 
-    def _read(self) -> Dict:
-        """读取注册表"""
-        with open(self.path, "r", encoding="utf-8") as f:
-            return json.load(f) or {"tasks": {}}
+    def _execution_view(self, task_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        合并任务存储记录与事件日志，得到执行的当前视图
 
-    def _write(self, data: Dict):
-        """写入注册表"""
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        终态与时间戳以任务存储为准；运行中的状态、算子状态与日志以状态 actor 的
+        内存视图 / 事件日志为准，没有事件日志的旧记录直接使用记录内的字段。
+        """
+        output = record.get("output") or {}
+        operators_detail = {k: dict(v) for k, v in (output.get("operators_detail") or {}).items()}
+        view = {
+            "cursor": 0,
+            "status": record.get("status"),
+            "operators_detail": operators_detail,
+            "operator_logs": output.get("operator_logs", {}),
+            "logs": record.get("logs", []),
+        }
+        # 运行中的任务优先读状态 actor 的内存视图；它没见过的任务再回退到读事件日志
+        journal_view = execution_state.snapshot(task_id) if execution_state.active else None
+        if journal_view is None:
+            journal_view = self._journal_cache.view(self.journal(task_id), task_id)
+        if journal_view is not None:
+            if journal_view.get("status") and view["status"] not in self.TERMINAL_EXECUTION_STATUSES:
+                view["status"] = journal_view["status"]
+            for op_key, fields in journal_view["operators_detail"].items():
+                operators_detail.setdefault(op_key, {}).update(fields)
+            view["operator_logs"] = journal_view["operator_logs"]
+            view["logs"] = journal_view["logs"]
+            view["cursor"] = journal_view["cursor"]
+        return view
 
     def _generate_task_id(self) -> str:
         """生成唯一的任务ID"""
@@ -66,17 +88,8 @@ class TaskRegistry:
             status: 过滤特定状态的任务
             executor_type: 过滤特定类型的执行器 (operator/pipeline)
         """
-        tasks = list(self._read()["tasks"].values())
-        
-        if status:
-            tasks = [t for t in tasks if t.get("status") == status]
-        
-        if executor_type:
-            tasks = [t for t in tasks if t.get("executor_type") == executor_type]
-        
-        # 按创建时间倒序排列
-        tasks.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-        return tasks
+        # 过滤与按创建时间倒序排列都由存储后端完成（SQLite 走索引）
+        return self.store.list(status=status, executor_type=executor_type)
     
     def create(self, task: Dict) -> Dict:
         """
@@ -88,8 +101,6 @@ class TaskRegistry:
         Returns:
             创建的任务（包含生成的ID和时间戳）
         """
-        data = self._read()
-        
         # 生成任务ID
         task_id = self._generate_task_id()
         task["id"] = task_id
@@ -101,16 +112,13 @@ class TaskRegistry:
         task["error_message"] = None
         
         # 保存任务
-        tasks = data.get("tasks", {})
-        tasks[task_id] = task
-        data["tasks"] = tasks
-        self._write(data)
+        self.store.put(task_id, task)
         
         return task
     
     def get(self, task_id: str) -> Dict | None:
         """获取指定任务"""
-        return self._read()["tasks"].get(task_id)
+        return self.store.get(task_id)
     
     def update(self, task_id: str, updates: Dict) -> Dict | None:
         """
@@ -123,32 +131,21 @@ class TaskRegistry:
         Returns:
             更新后的任务，如果任务不存在返回None
         """
-        data = self._read()
-        tasks = data.get("tasks", {})
-        
-        if task_id not in tasks:
-            return None
-        
-        task = tasks[task_id]
-        
-        # 更新字段
-        for key, value in updates.items():
-            if value is not None:  # 只更新非None的值
-                task[key] = value
-        
-        # 自动设置时间戳
-        if "status" in updates:
-            if updates["status"] == "running" and not task.get("started_at"):
-                task["started_at"] = pandas.Timestamp.now().isoformat()
-            elif updates["status"] in ["success", "failed", "cancelled"]:
-                if not task.get("finished_at"):
-                    task["finished_at"] = pandas.Timestamp.now().isoformat()
-        
-        tasks[task_id] = task
-        data["tasks"] = tasks
-        self._write(data)
-        
-        return task
+        def _apply(task: Dict):
+            # 更新字段
+            for key, value in updates.items():
+                if value is not None:  # 只更新非None的值
+                    task[key] = value
+            
+            # 自动设置时间戳
+            if "status" in updates:
+                if updates["status"] == "running" and not task.get("started_at"):
+                    task["started_at"] = pandas.Timestamp.now().isoformat()
+                elif updates["status"] in ["success", "failed", "cancelled"]:
+                    if not task.get("finished_at"):
+                        task["finished_at"] = pandas.Timestamp.now().isoformat()
+        
+        return self.store.update(task_id, _apply)
     
     def delete(self, task_id: str) -> bool:
         """
@@ -160,16 +157,15 @@ class TaskRegistry:
         Returns:
             是否成功删除
         """
-        data = self._read()
-        tasks = data.get("tasks", {})
-        
-        if task_id in tasks:
-            del tasks[task_id]
-            data["tasks"] = tasks
-            self._write(data)
-            return True
-        
-        return False
+        deleted = self.store.delete(task_id)
+        execution_state.forget(task_id)
+        self.journal(task_id).remove()
+        self._journal_cache.invalidate(task_id)
+        return deleted
+    
+    def set_pinned(self, task_id: str, pinned: bool) -> Dict | None:
+        """固定 / 取消固定任务输出；固定的任务不会被缓存回收"""
+        return self.store.patch(task_id, {"pinned": bool(pinned)})
     
     def get_statistics(self) -> Dict:
         """
@@ -178,10 +174,8 @@ class TaskRegistry:
         Returns:
             统计信息字典
         """
-        tasks = self.list()
-        
         stats = {
-            "total": len(tasks),
+            "total": 0,
             "pending": 0,
             "running": 0,
             "success": 0,
@@ -193,16 +187,42 @@ class TaskRegistry:
             }
         }
         
-        for task in tasks:
-            status = task.get("status", "pending")
-            stats[status] = stats.get(status, 0) + 1
-            
-            executor_type = task.get("executor_type", "")
-            if executor_type in stats["by_executor_type"]:
-                stats["by_executor_type"][executor_type] += 1
+        # 计数由存储层在每次写入时增量维护，这里不再扫描全部任务
+        for row in self.store.status_counts():
+            if row["executor_type"] in AGGREGATE_EXECUTOR_TYPES:
+                # 汇总用的父任务，它的子执行已经计入
+                continue
+            count = row["count"]
+            stats["total"] += count
+            stats[row["status"]] = stats.get(row["status"], 0) + count
+            if row["executor_type"] in stats["by_executor_type"]:
+                stats["by_executor_type"][row["executor_type"]] += count
         
         return stats
 
+    def get_rollups(
+        self,
+        granularity: str = "hour",
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        pipeline_id: Optional[str] = None,
+        by_pipeline: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        按分钟 / 小时 / 天聚合的运行统计（启动数、结束数、成功率、平均 / p95 耗时、处理行数）
+        
+        Args:
+            granularity: minute / hour / day
+            since / until: 时间范围（ISO 字符串，闭区间）
+            pipeline_id: 只看某个 Pipeline
+            by_pipeline: False 时同一时间桶内的所有 Pipeline 合并为一行
+        
+        Returns:
+            按时间桶升序的统计行
+        """
+        raw = self.store.rollups(granularity, since=since, until=until, pipeline_id=pipeline_id)
+        return summarize_rollups(granularity, raw, by_pipeline=by_pipeline)
+
     def get_current_time(self):
         """获取当前时间的ISO格式字符串"""
         return datetime.datetime.now().isoformat()
@@ -235,18 +255,65 @@ class TaskRegistry:
             "logs": [f"[{self.get_current_time()}] Pipeline execution queued"]
         }
                 
-        # 直接保存到文件
-        data = self._read()
-        data["tasks"][task_id] = initial_result
-        self._write(data)
+        # 保存执行记录
+        self.store.put(task_id, initial_result)
         
         return task_id, pipeline_config, initial_result
     
-    def list_executions(self) -> List[Dict[str, Any]]:
-        """列出所有任务执行记录"""
-        data = self._read()
-        # 直接返回字典列表，不需要转换为对象
-        return list(data.get("tasks", {}).values())
+    # list_executions 默认只返回这些轻量字段；配置 / 日志 / 输出需通过 fields 显式请求
+    EXECUTION_SUMMARY_FIELDS = (
+        "task_id", "id", "pipeline_id", "status", "executor_name", "executor_type",
+        "created_at", "started_at", "completed_at", "finished_at", "error_message", "sample", "batch_id", "sweep_id",
+    )
+
+    def list_executions(
+        self,
+        status: Optional[List[str]] = None,
+        pipeline_id: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = 50,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        分页列出任务执行记录（按创建时间倒序）
+
+        Args:
+            status: 状态过滤（可多选）
+            pipeline_id: Pipeline ID 过滤
+            created_after / created_before: 创建时间范围（ISO 字符串）
+            cursor: 上一页返回的 next_cursor
+            limit: 每页条数；None 表示不分页，返回全部
+            fields: 需要返回的字段，默认 EXECUTION_SUMMARY_FIELDS
+
+        Returns:
+            (executions, next_cursor)
+        """
+        fields = list(fields) if fields else list(self.EXECUTION_SUMMARY_FIELDS)
+        # task_id 始终返回，便于后续按 ID 查询
+        projected = list(dict.fromkeys(["task_id", "id", *fields]))
+        records, next_cursor = self.store.query(
+            status=status,
+            pipeline_id=pipeline_id,
+            created_after=created_after,
+            created_before=created_before,
+            cursor=cursor,
+            limit=limit,
+            fields=projected,
+        )
+
+        executions = []
+        for record in records:
+            task_id = record.get("task_id") or record.get("id")
+            if "logs" in fields:
+                # 日志在事件日志里，只为本页记录折叠
+                record["logs"] = self._execution_view(task_id, self.store.get(task_id) or {})["logs"]
+            record["task_id"] = task_id
+            if "id" not in fields:
+                record.pop("id", None)
+            executions.append(record)
+        return executions, next_cursor
     
     def get_execution_status(
         self, 
@@ -262,42 +329,166 @@ class TaskRegistry:
             执行状态字典
         """
         # 读取执行记录
-        data = self._read()
-        execution_data = data.get("tasks", {}).get(task_id)
+        execution_data = self.store.get(task_id)
         
         if not execution_data:
             return None
         
         # operator_progress is now deprecated, use operators_detail from output
-        output = execution_data.get("output", {})
+        view = self._execution_view(task_id, execution_data)
         
         return {
             "task_id": task_id,
             "pipeline_id": execution_data.get("pipeline_id"),
             "pipeline_config": execution_data.get("pipeline_config"),
-            "status": execution_data.get("status"),
-            "operators_detail": output.get("operators_detail", {}),
-            "operator_logs": output.get("operator_logs", {}),
-            "logs": execution_data.get("logs", []),
+            "status": view["status"],
+            "operators_detail": view["operators_detail"],
+            "operator_logs": view["operator_logs"],
+            "logs": view["logs"],
             # "output": output, # Output removed as requested to avoid duplication
             "started_at": execution_data.get("started_at"),
             "completed_at": execution_data.get("completed_at"),
+            # 事件流游标：/execution/{task_id}/events?since=cursor 从这里继续推送
+            "cursor": view["cursor"],
+            "lane": (execution_data.get("scheduling") or {}).get("lane"),
+            # 排队中：位置与预计开始时间（只有本进程的调度器知道，其它情况为 None）
+            "queue": execution_scheduler.queue_info(task_id) if view["status"] == "queued" else None,
+            # 资源请求（来源见 sources）与运行后实测的内存
+            "resources": (execution_data.get("scheduling") or {}).get("resources"),
+            "resource_usage": execution_data.get("resource_usage"),
+            # 续跑 / 分叉关系
+            "lineage": execution_data.get("lineage"),
+            "children": execution_data.get("children", []),
+            # 采样运行的采样方式（全量运行为 None）
+            "sample": execution_data.get("sample"),
         }
     
+    # 长轮询：进度按 10% 分桶，桶不变不算变化；delta 中最多附带的新日志行数
+    PROGRESS_BUCKET_PERCENT = 10
+    DELTA_LOG_TAIL = 20
+    TERMINAL_EXECUTION_STATUSES = ("completed", "failed", "cancelled", "success")
+
+    @classmethod
+    def _change_fingerprint(cls, status: Optional[str], operators_detail: Dict[str, Dict]) -> Tuple:
+        """(状态, 当前算子, 当前算子进度桶)：只有它变化才唤醒长轮询"""
+        current_op, bucket = None, None
+        running = [
+            (info.get("index", 0), op_key, info)
+            for op_key, info in operators_detail.items()
+            if info.get("status") == "running"
+        ]
+        if running:
+            _, current_op, info = max(running, key=lambda item: item[0])
+            bucket = int((info.get("progress_percentage") or 0) // cls.PROGRESS_BUCKET_PERCENT)
+        return status, current_op, bucket
+
+    async def wait_execution_change(
+        self,
+        task_id: str,
+        since: Optional[int] = None,
+        timeout_s: float = 30.0,
+        poll_interval: float = 0.2,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        长轮询：阻塞到状态 / 当前算子 / 进度桶发生变化（或超时），只返回增量
+
+        Args:
+            task_id: 执行 ID
+            since: 上次返回的 cursor；None 表示从现在开始等待
+            timeout_s: 最长等待秒数
+            poll_interval: 检查事件日志的间隔
+
+        Returns:
+            增量字典（changed / timed_out / cursor / status / current_operator /
+            progress_percentage / operators / new_log_count / logs），任务不存在返回 None。
+            operators 只包含 since 之后有变化的算子；logs 只附带最后 DELTA_LOG_TAIL 行新日志。
+            任务已处于终态时立即返回。
+        """
+        # 读任务存储 / 事件日志 / 状态 actor 都是阻塞调用，放到线程池里，事件循环上只做 sleep
+        loop = asyncio.get_running_loop()
+        record = await loop.run_in_executor(None, self.store.get, task_id)
+        if not record:
+            return None
+        journal = self.journal(task_id)
+        baseline = await loop.run_in_executor(None, self._wait_baseline, task_id, record, journal, since)
+        if baseline is None:
+            # 没有事件日志的历史任务无从等待，直接返回当前状态
+            return {
+                "task_id": task_id, "changed": False, "timed_out": False, "cursor": 0,
+                "status": record.get("status"), "current_operator": None, "progress_percentage": None,
+                "operators": {}, "new_log_count": 0, "logs": [],
+            }
+        cursor, current = baseline
+        start = self._change_fingerprint(current["status"], current["operators_detail"])
+        current["fields"] = {}
+
+        changed_ops: Dict[str, Dict[str, Any]] = {}
+        deadline = time.monotonic() + max(timeout_s, 0)
+        while True:
+            cursor = await loop.run_in_executor(None, self._fold_new_events, journal, cursor, current, changed_ops)
+
+            changed = self._change_fingerprint(current["status"], current["operators_detail"]) != start
+            finished = current["status"] in self.TERMINAL_EXECUTION_STATUSES
+            timed_out = time.monotonic() >= deadline
+            if changed or finished or timed_out:
+                break
+            await asyncio.sleep(poll_interval)
+
+        status, current_op, _ = self._change_fingerprint(current["status"], current["operators_detail"])
+        current_info = current["operators_detail"].get(current_op, {}) if current_op else {}
+        return {
+            **current["fields"],
+            "task_id": task_id,
+            "changed": changed,
+            "timed_out": timed_out and not changed,
+            "cursor": cursor,
+            "status": status or record.get("status"),
+            "current_operator": current_op,
+            "progress_percentage": current_info.get("progress_percentage"),
+            "operators": changed_ops,
+            "new_log_count": len(current["logs"]),
+            "logs": current["logs"][-self.DELTA_LOG_TAIL:],
+        }
+
+    def _wait_baseline(
+        self, task_id: str, record: Dict[str, Any], journal: TaskJournal, since: Optional[int]
+    ) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """长轮询的基线：(since, since 之前折叠出的状态)；没有事件日志时返回 None"""
+        if not journal.exists():
+            return None
+        if since is None:
+            since = self._execution_view(task_id, record)["cursor"]
+        # 跳过 log 行，只折叠状态 / 算子 / 进度事件
+        current = empty_view()
+        for _, event, _ in journal.iter_events(0, until=since, skip_types=("log",)):
+            apply_event(current, event)
+        return since, current
+
+    @staticmethod
+    def _fold_new_events(
+        journal: TaskJournal, cursor: int, current: Dict[str, Any], changed_ops: Dict[str, Dict[str, Any]]
+    ) -> int:
+        """把 cursor 之后的新事件折叠进 current，记录有变化的算子；返回新的 cursor"""
+        for _, event, next_offset in journal.iter_events(cursor):
+            cursor = next_offset
+            apply_event(current, event)
+            if event.get("type") in ("operator", "progress") and event.get("op_key"):
+                changed_ops[event["op_key"]] = current["operators_detail"][event["op_key"]]
+        return cursor
+
     def get_execution_logs(self, task_id: str, operator_name: Optional[str] = None) -> List[str]:
         """获取任务日志，可选过滤指定算子"""
-        data = self._read()
-        execution_data = data.get("tasks", {}).get(task_id)
+        execution_data = self.store.get(task_id)
         if not execution_data:
             return []
+        view = self._execution_view(task_id, execution_data)
         
         # 如果是查询全局日志/流水线日志
         if not operator_name:
-            return execution_data.get("logs", [])
+            return view["logs"]
         
         # Assuming we only care about completed logs or what's available.
-        output = execution_data.get("output", {})
-        operator_logs = output.get("operator_logs", {})
+        operator_logs = view["operator_logs"]
         
         # Try to find by operator name
         target_logs = []
@@ -315,6 +506,63 @@ class TaskRegistry:
         # Default fallback to searching in main logs?
         return []
 
+    def tail_execution_logs(
+        self,
+        task_id: str,
+        offset: int = 0,
+        max_lines: int = 200,
+        last_n: Optional[int] = None,
+        operator_name: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        增量读取任务日志
+
+        Args:
+            task_id: 执行 ID
+            offset: 上次返回的 next_offset（事件日志的字节偏移）
+            max_lines: 本次最多返回的行数
+            last_n: 指定时忽略 offset，直接返回最后 N 行（从文件末尾倒读）
+            operator_name: 只看某个算子的日志（算子名或 op_key）
+
+        Returns:
+            {lines, next_offset, has_more, offset_unit}，任务不存在返回 None。
+            没有事件日志的历史任务退化为按行号分页（offset_unit = "line"）。
+        """
+        record = self.store.get(task_id)
+        if not record:
+            return None
+
+        op_filter = None
+        if operator_name:
+            op_filter = lambda op_key: op_key == operator_name or op_key.startswith(f"{operator_name}_")
+
+        journal = self.journal(task_id)
+        if journal.exists():
+            if last_n is not None:
+                lines, next_offset = journal.last_logs(last_n, op_filter)
+                has_more = False
+            else:
+                lines, next_offset, has_more = journal.read_logs(offset, max_lines, op_filter)
+            unit = "byte"
+        else:
+            all_lines = self.get_execution_logs(task_id, operator_name)
+            if last_n is not None:
+                lines, next_offset, has_more = all_lines[-last_n:] if last_n > 0 else [], len(all_lines), False
+            else:
+                lines = all_lines[offset:offset + max_lines]
+                next_offset = offset + len(lines)
+                has_more = next_offset < len(all_lines)
+            unit = "line"
+
+        return {
+            "task_id": task_id,
+            "operator_name": operator_name,
+            "lines": lines,
+            "next_offset": next_offset,
+            "has_more": has_more,
+            "offset_unit": unit,
+        }
+
     def get_execution_result(
         self, 
         task_id: str,
@@ -332,20 +580,20 @@ class TaskRegistry:
         Returns:
             执行结果字典
         """
-        data = self._read()
-        execution_data = data.get("tasks", {}).get(task_id)
+        execution_data = self.store.get(task_id)
         
         if not execution_data:
             return None
         
         # 获取输出
         output = execution_data.get("output", {})
-        logs = execution_data.get("logs", [])
+        view = self._execution_view(task_id, execution_data)
+        logs = view["logs"]
         
         # 获取执行结果和算子进度
         execution_results = output.get("execution_results", [])
-        operators_detail = output.get("operators_detail", {})
-        operator_logs = output.get("operator_logs", {})
+        operators_detail = view["operators_detail"]
+        operator_logs = view["operator_logs"]
         
         # 确定要查询的步骤索引
         if step is None:
@@ -366,23 +614,23 @@ class TaskRegistry:
                 else:
                     step = 0
         
-        # 读取缓存文件（使用绝对路径）
-        cache_path = settings.CACHE_DIR
-        cache_file_prefix = "dataflow_cache_step"
-        cache_file = os.path.join(cache_path, f"{cache_file_prefix}_step{step}.jsonl")
+        # 读取缓存文件（任务自己的输出目录，step 为 0 开始的算子索引；中间步骤可能已压缩）
+        evicted = step in (execution_data.get("evicted_steps") or [])
+        cache_file = resolve_step_file(task_id, step)
         
         sample_data = []
         total_count = 0
         file_exists = False
         
         # 如果当前 step 的文件不存在，尝试读取上一步的文件
-        if not os.path.exists(cache_file) and step > 0:
-            cache_file = os.path.join(cache_path, f"{cache_file_prefix}_step{step-1}.jsonl")
+        if cache_file is None and not evicted and step > 0:
+            cache_file = resolve_step_file(task_id, step - 1)
         
-        if os.path.exists(cache_file):
+        if cache_file is not None:
             file_exists = True
+            touch_step_file(cache_file)
             try:
-                with open(cache_file, "r", encoding="utf-8") as f:
+                with open_step_file(cache_file) as f:
                     for line in f:
                         total_count += 1
                         if len(sample_data) < limit:
@@ -417,7 +665,9 @@ class TaskRegistry:
             "sample_count": len(sample_data),
             "total_count": total_count,
             "file_exists": file_exists,
-            "cache_file": cache_file,
+            # 输出文件已被缓存回收（见 app/services/cache_retention.py），不是执行失败
+            "evicted": evicted and not file_exists,
+            "cache_file": cache_file or step_file_path(task_id, step),
             "logs": logs,
             "operator_logs": operator_logs,
             "started_at": execution_data.get("started_at"),
@@ -425,25 +675,59 @@ class TaskRegistry:
             "operators_detail": operators_detail 
         }
     
+    def _input_dataset(self, pipeline_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """输入数据集的注册信息（num_samples / file_size），找不到时返回 None"""
+        input_dataset = pipeline_config.get("input_dataset")
+        dataset_id = input_dataset.get("id") if isinstance(input_dataset, dict) else input_dataset
+        if not dataset_id:
+            return None
+        try:
+            return container.dataset_registry.get(dataset_id)
+        except Exception:
+            return None
+
+    def _default_lane(self, pipeline_config: Dict[str, Any]) -> str:
+        """未指定优先级时：输入数据集不超过 EXECUTION_INTERACTIVE_MAX_ROWS 行走交互队列"""
+        num_samples = (self._input_dataset(pipeline_config) or {}).get("num_samples")
+        if isinstance(num_samples, int) and num_samples <= settings.EXECUTION_INTERACTIVE_MAX_ROWS:
+            return "interactive"
+        return "batch"
+
     async def start_execution_async(
         self, 
         pipeline_id: Optional[str] = None, 
-        config: Optional[Dict[str, Any]] = None
+        config: Optional[Dict[str, Any]] = None,
+        priority: Optional[str] = None,
+        user_id: Optional[str] = None,
+        lineage: Optional[Dict[str, Any]] = None,
+        step_cache: bool = True,
+        sample: Optional[Dict[str, Any]] = None,
+        batch_id: Optional[str] = None,
+        runtime: Optional[Dict[str, Any]] = None,
+        sweep_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         异步开始执行Pipeline（使用 Ray）
         
         Args:
             pipeline_id: 预定义 Pipeline ID
-            config: 自定义 Pipeline 配置
+            config: 自定义 Pipeline 配置；与 pipeline_id 同时给出时以它为准（续跑 / 分叉）
+            priority: 调度队列 "interactive" / "batch"；缺省按输入数据集大小决定
+            user_id: 提交用户，调度器按用户公平分配
+            lineage: 子执行的来源 {"parent_task_id", "from_step", "mode"}（见 task_lineage.py）
+            step_cache: False 时本次运行不复用跨运行步骤缓存（写进本次的 pipeline_config）
+            sample: 采样运行参数（sample_spec() 的结果，见 sample_runs.py）；采样运行固定走交互队列
+            batch_id: 所属批量执行的父任务 ID（见 batch_execution.py）
+            runtime: 批量执行预先解析好的 serving 等元数据，只需再解析本次的 storage
+            sweep_id: 所属参数扫描的父任务 ID（见 parameter_sweep.py）
         
         Returns:
-            包含 task_id 的字典
+            包含 task_id 与排队信息（queue）的字典
         """
-        from app.services.ray_pipeline_executor import ray_executor
+        from app.services.pipeline_executor import get_pipeline_executor
         
         # 获取Pipeline配置
-        if pipeline_id:
+        if pipeline_id and config is None:
             pipeline = container.pipeline_registry.get_pipeline(pipeline_id)
             if not pipeline:
                 raise ValueError(f"Pipeline with id {pipeline_id} not found")
@@ -454,8 +738,25 @@ class TaskRegistry:
             if not config:
                 raise ValueError("Either pipeline_id or config must be provided")
             pipeline_config = config
-            pipeline_name = "Custom Pipeline"
+            pipeline = container.pipeline_registry.get_pipeline(pipeline_id) if pipeline_id else None
+            pipeline_name = pipeline.get("name", "Unknown Pipeline") if pipeline else "Custom Pipeline"
             logger.info("Executing pipeline with provided config asynchronously")
+        if not step_cache:
+            pipeline_config = dict(pipeline_config, step_cache=False)
+        if sample:
+            pipeline_config = dict(pipeline_config, **{SAMPLE_KEY: sample})
+        if pipeline_config.get(SAMPLE_KEY):
+            lane = SAMPLE_LANE
+        else:
+            lane = normalize_lane(priority) if priority else self._default_lane(pipeline_config)
+        # 资源请求：声明 > 历史实测 / 输入数据集大小，调度器据此做准入；
+        # 采样运行的数据量与全量无关，只按声明或基础内存申请
+        full_run = not pipeline_config.get(SAMPLE_KEY)
+        resources = estimate_request(
+            pipeline_config,
+            dataset=self._input_dataset(pipeline_config) if full_run else None,
+            history_mb=historical_memory_mb(self.store, pipeline_id) if full_run else None,
+        ).to_dict()
         
         # 生成执行ID
         task_id = self._generate_task_id()
@@ -475,38 +776,501 @@ class TaskRegistry:
         
         logger.info(f"Task created: {task_id}")
         
-        # 创建初始结果
+        # 创建初始结果；scheduling 是持久化的排队信息，重启后据此重建调度队列
+        scheduling = {
+            "lane": lane,
+            "user_id": user_id or "default",
+            "seq": next_seq(),
+            "enqueued_at": self.get_current_time(),
+            "resources": resources,
+        }
         initial_result = {
             "task_id": task_id,
             "pipeline_id": pipeline_id,
             "pipeline_config": pipeline_config,
             "status": "queued",
             "output": {},
-            "logs": [f"[{self.get_current_time()}] Pipeline execution queued"],
-            "operator_progress": {}
+            "logs": [f"[{self.get_current_time()}] Pipeline execution queued ({lane} lane)"],
+            "operator_progress": {},
+            "scheduling": scheduling
         }
+        if lineage:
+            initial_result["lineage"] = lineage
+        if pipeline_config.get(SAMPLE_KEY):
+            # 标记为采样运行，列表 / 状态接口据此区分
+            initial_result["sample"] = pipeline_config[SAMPLE_KEY]
+        if batch_id:
+            initial_result["batch_id"] = batch_id
+        if sweep_id:
+            initial_result["sweep_id"] = sweep_id
+        
+        # 保存初始状态：合并进刚创建的 task 记录，保留 id / created_at / executor_type
+        # 等字段，列表与统计才能继续按这些索引列过滤、排序
+        self.store.update(task_id, lambda record: record.update(initial_result))
+        if lineage:
+            # 父执行同样记下子执行，双向可查
+            child = {"task_id": task_id, "mode": lineage.get("mode"), "from_step": lineage.get("from_step")}
+            self.store.update(lineage["parent_task_id"], lambda record: record.setdefault("children", []).append(child))
+        # 事件日志从排队开始记录；之后的日志行都由 worker 追加
+        queued_events = [
+            {"type": "status", "status": "queued", "fields": {}},
+            {"type": "log", "line": initial_result["logs"][0]},
+        ]
+        if not execution_state.submit(task_id, queued_events):
+            journal = self.journal(task_id)
+            journal.append_many(queued_events)
+            journal.close()
+        if runtime is not None:
+            dataflow_runtime = dict(runtime, storage=DataFlowEngine.storage_runtime(pipeline_config, task_id))
+        else:
+            dataflow_runtime = DataFlowEngine.decode_hashed_arguments(pipeline_config, task_id)
         
-        # 保存初始状态
-        data = self._read()
-        data["tasks"][task_id] = initial_result
-        self._write(data)
-        dataflow_runtime = DataFlowEngine.decode_hashed_arguments(pipeline_config, task_id)
+        # 新运行要写盘前先按配额回收一次（后台执行，不阻塞提交）；批量执行只在开始时回收一次
+        if container.cache_retention is not None and not batch_id:
+            asyncio.get_running_loop().run_in_executor(None, container.cache_retention.maybe_enforce)
         
-        # 提交到 Ray 异步执行
-        await ray_executor.submit_execution(
+        # 进入调度队列，有空槽位时立即交给执行器（Ray 或本机进程池）
+        await get_pipeline_executor().submit_execution(
             pipeline_config=pipeline_config,
             dataflow_runtime=dataflow_runtime,
             task_id=task_id,
             pipeline_registry_path=self.path,
-            pipeline_execution_path=self.path
+            pipeline_execution_path=self.path,
+            lane=lane,
+            user_id=scheduling["user_id"],
+            pipeline_id=pipeline_id or "custom",
+            seq=scheduling["seq"],
+            enqueued_at=scheduling["enqueued_at"],
+            resources=resources
         )
         
-        logger.info(f"Pipeline execution submitted to Ray: {task_id}")
+        logger.info(f"Pipeline execution submitted to scheduler: {task_id}")
         
         return {
-            "task_id": task_id
+            "task_id": task_id,
+            "lane": lane,
+            "resources": resources,
+            "queue": execution_scheduler.queue_info(task_id)
         }
 
+    def _child_source(self, task_id: str, from_step: Optional[int] = None) -> Tuple[Dict[str, Any], Dict[str, Any], int]:
+        """
+        父执行的 (记录, Pipeline 配置, 连续完成的算子数)；仍在运行时不能续跑 / 分叉
+
+        from_step 为子执行第一个重新运行的算子（None 表示续跑，即连续完成的算子数）；
+        它的输入（第 from_step - 1 步的输出）已被回收时抛 FileNotFoundError，不再排队后才在 worker 里失败
+        """
+        record = self.store.get(task_id)
+        if not record:
+            raise KeyError(task_id)
+        view = self._execution_view(task_id, record)
+        if view["status"] not in self.TERMINAL_EXECUTION_STATUSES:
+            raise ValueError(f"Task {task_id} is still {view['status']}")
+        parent_config = record.get("pipeline_config") or {}
+        total = len(parent_config.get("operators") or [])
+        done = completed_prefix(view["operators_detail"], total)
+        needed = done if from_step is None else from_step
+        # 续跑时所有算子都已完成、或分叉的 from_step 超出完成范围，由调用方报 ValueError
+        if 0 < needed <= done and (from_step is not None or done < total):
+            step = needed - 1
+            if step in (record.get("evicted_steps") or []):
+                raise FileNotFoundError(
+                    f"Output of step {step} of {task_id} was evicted from cache at {record.get('cache_evicted_at')}"
+                )
+            if resolve_step_file(task_id, step) is None:
+                raise FileNotFoundError(f"Output of step {step} of {task_id} is no longer available")
+        return record, parent_config, done
+
+    async def _start_child(
+        self,
+        parent: Dict[str, Any],
+        config: Dict[str, Any],
+        from_step: int,
+        mode: str,
+        priority: Optional[str],
+        user_id: Optional[str],
+    ) -> Dict[str, Any]:
+        lineage = {"parent_task_id": parent["id"], "from_step": from_step, "mode": mode}
+        result = await self.start_execution_async(
+            pipeline_id=parent.get("pipeline_id"),
+            config=config,
+            priority=priority,
+            user_id=user_id,
+            lineage=lineage,
+        )
+        result["lineage"] = lineage
+        return result
+
+    async def resume_execution(
+        self, task_id: str, priority: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        从最后一个完好的步骤续跑：新建子执行，复用父执行已完成算子的输出，只运行剩下的算子
+
+        Raises:
+            KeyError: 任务不存在
+            ValueError: 任务仍在运行，或所有算子都已完成
+            FileNotFoundError: 续跑需要的步骤输出已被回收
+        """
+        parent, parent_config, done = await asyncio.get_running_loop().run_in_executor(None, self._child_source, task_id)
+        if done >= len(parent_config.get("operators") or []):
+            raise ValueError(f"Task {task_id} has no failed or unfinished step to resume")
+        config = child_pipeline_config(parent_config, task_id, done)
+        logger.info(f"Resuming {task_id} from step {done}")
+        return await self._start_child(parent, config, done, "resume", priority, user_id)
+
+    async def fork_execution(
+        self,
+        task_id: str,
+        from_step: int,
+        operators: Optional[List[Dict[str, Any]]] = None,
+        priority: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        从第 from_step 个算子分叉：之前的输出复用父执行，之后可以换成编辑过的算子
+
+        Raises:
+            KeyError: 任务不存在
+            ValueError: 任务仍在运行，或 from_step 之前有算子没有完成
+            FileNotFoundError: 分叉需要的步骤输出已被回收
+        """
+        parent, parent_config, done = await asyncio.get_running_loop().run_in_executor(
+            None, self._child_source, task_id, from_step
+        )
+        if from_step < 0 or from_step > done:
+            raise ValueError(f"Cannot fork {task_id} from step {from_step}: only the first {done} step(s) completed")
+        config = child_pipeline_config(parent_config, task_id, from_step, operators)
+        logger.info(f"Forking {task_id} from step {from_step}")
+        return await self._start_child(parent, config, from_step, "fork", priority, user_id)
+
+    async def start_batch_execution(
+        self,
+        pipeline_id: str,
+        dataset_ids: Optional[List[str]] = None,
+        dataset_glob: Optional[str] = None,
+        priority: Optional[str] = None,
+        user_id: Optional[str] = None,
+        step_cache: bool = True,
+        sample: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        把同一个 Pipeline 分发到多个数据集：建一个批量父任务，每个数据集一个子执行
+
+        Raises:
+            KeyError: Pipeline 或数据集不存在
+            ValueError: 没有选中任何数据集
+        """
+        from app.services.pipeline_executor import get_pipeline_executor
+
+        pipeline = container.pipeline_registry.get_pipeline(pipeline_id)
+        if not pipeline:
+            raise KeyError(pipeline_id)
+        pipeline_config = pipeline.get("config", {})
+        datasets = resolve_datasets(container.dataset_registry.list(), dataset_ids, dataset_glob)
+
+        # serving / 数据库等元数据整批只解析一次，子执行只解析各自的 storage
+        first_config = dataset_pipeline_config(pipeline_config, datasets[0]["id"])
+        runtime = DataFlowEngine.decode_hashed_arguments(first_config, "batch")
+        runtime.pop("storage", None)
+
+        parent = self.create({
+            "dataset_id": "",
+            "executor_name": pipeline.get("name", "Unknown Pipeline"),
+            "executor_type": BATCH_EXECUTOR_TYPE,
+            "meta": {"pipeline_id": pipeline_id},
+        })
+        batch_id = parent["id"]
+        batch = {"started_at": self.get_current_time(), "dataset_glob": dataset_glob, "children": []}
+        self.store.update(batch_id, lambda record: record.update({
+            "task_id": batch_id,
+            "pipeline_id": pipeline_id,
+            "status": "queued",
+            BATCH_KEY: batch,
+        }))
+        get_pipeline_executor().add_finished_listener(self._on_batch_child_finished)
+        if container.cache_retention is not None:
+            asyncio.get_running_loop().run_in_executor(None, container.cache_retention.maybe_enforce)
+
+        try:
+            for dataset in datasets:
+                result = await self.start_execution_async(
+                    pipeline_id=pipeline_id,
+                    config=dataset_pipeline_config(pipeline_config, dataset["id"]),
+                    priority=priority,
+                    user_id=user_id,
+                    step_cache=step_cache,
+                    sample=sample,
+                    batch_id=batch_id,
+                    runtime=runtime,
+                )
+                batch["children"].append({
+                    "task_id": result["task_id"],
+                    "dataset_id": dataset["id"],
+                    "dataset_name": dataset.get("name"),
+                    "num_samples": dataset.get("num_samples"),
+                })
+        finally:
+            # 中途失败时也记下已经提交的子执行
+            self.store.update(batch_id, lambda record: record.update({BATCH_KEY: batch}))
+        logger.info(f"Batch {batch_id}: {len(datasets)} execution(s) of {pipeline_id} submitted")
+        return {"batch_id": batch_id, "total": len(datasets), "children": batch["children"]}
+
+    def batch_status(self, batch_id: str) -> Dict[str, Any]:
+        """
+        批量执行的汇总状态；所有子执行结束后把终态写回父任务
+
+        Raises:
+            KeyError: 批量任务不存在
+        """
+        record = self.store.get(batch_id)
+        if not record or record.get("executor_type") != BATCH_EXECUTOR_TYPE:
+            raise KeyError(batch_id)
+        batch = record.get(BATCH_KEY) or {}
+        children = {}
+        for entry in batch.get("children") or []:
+            child = self.store.get(entry["task_id"])
+            if child is not None:
+                children[entry["task_id"]] = dict(child, status=self._execution_view(entry["task_id"], child)["status"])
+        summary = aggregate(batch, children)
+        if summary["status"] != record.get("status"):
+            def _apply(r: Dict[str, Any]):
+                r["status"] = summary["status"]
+                if summary["finished_at"]:
+                    r["finished_at"] = summary["finished_at"]
+            self.store.update(batch_id, _apply)
+        return dict(
+            summary,
+            batch_id=batch_id,
+            pipeline_id=record.get("pipeline_id"),
+            started_at=batch.get("started_at"),
+            children=[
+                dict(entry, status=(children.get(entry["task_id"]) or {}).get("status"))
+                for entry in batch.get("children") or []
+            ],
+        )
+
+    def _on_batch_child_finished(self, task_id: str):
+        """子执行结束时刷新所属批量任务（完成监视器回调）"""
+        batch_id = (self.store.get(task_id) or {}).get("batch_id")
+        if batch_id:
+            self.batch_status(batch_id)
+
+    async def start_sweep(
+        self,
+        pipeline_id: str,
+        operator_index: int,
+        param: str,
+        values: List[Any],
+        section: Optional[str] = None,
+        priority: Optional[str] = None,
+        user_id: Optional[str] = None,
+        step_cache: bool = True,
+        sample: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        参数扫描：共享前缀只运行一次，完成后按每个取值分叉出一个下游运行
+
+        Raises:
+            KeyError: Pipeline 不存在
+            ValueError: 算子索引 / 参数 / 取值不合法
+        """
+        from app.services.pipeline_executor import get_pipeline_executor
+
+        pipeline = container.pipeline_registry.get_pipeline(pipeline_id)
+        if not pipeline:
+            raise KeyError(pipeline_id)
+        pipeline_config = pipeline.get("config", {})
+        operators = pipeline_config.get("operators") or []
+        if not 0 <= operator_index < len(operators):
+            raise ValueError(f"Operator index {operator_index} out of range (pipeline has {len(operators)} operators)")
+        section = find_param(operators[operator_index], param, section)
+        if not values:
+            raise ValueError("A sweep needs at least one value")
+
+        parent = self.create({
+            "dataset_id": pipeline_config.get("input_dataset", ""),
+            "executor_name": pipeline.get("name", "Unknown Pipeline"),
+            "executor_type": SWEEP_EXECUTOR_TYPE,
+            "meta": {"pipeline_id": pipeline_id},
+        })
+        sweep_id = parent["id"]
+        sweep = {
+            "operator_index": operator_index,
+            "operator_name": operators[operator_index].get("name"),
+            "num_operators": len(operators),
+            "param": param,
+            "section": section,
+            "values": list(values),
+            "started_at": self.get_current_time(),
+            "priority": priority,
+            "user_id": user_id,
+            "prefix_task_id": None,
+            "variants": [],
+        }
+        if not step_cache:
+            pipeline_config = dict(pipeline_config, step_cache=False)
+        if sample:
+            pipeline_config = dict(pipeline_config, **{SAMPLE_KEY: sample})
+        self.store.update(sweep_id, lambda record: record.update({
+            "task_id": sweep_id,
+            "pipeline_id": pipeline_id,
+            "pipeline_config": pipeline_config,
+            "status": "queued",
+            SWEEP_KEY: sweep,
+        }))
+        self._loop = asyncio.get_running_loop()
+        get_pipeline_executor().add_finished_listener(self._on_sweep_run_finished)
+
+        if operator_index == 0:
+            # 没有共享前缀：每个取值都是一次完整运行
+            await self._branch_sweep(sweep_id)
+        else:
+            result = await self.start_execution_async(
+                pipeline_id=pipeline_id,
+                config=prefix_pipeline_config(pipeline_config, operator_index),
+                priority=priority,
+                user_id=user_id,
+                sweep_id=sweep_id,
+            )
+            sweep["prefix_task_id"] = result["task_id"]
+            self.store.update(sweep_id, lambda record: record[SWEEP_KEY].update(prefix_task_id=result["task_id"]))
+        logger.info(f"Sweep {sweep_id}: {param} of operator {operator_index} over {len(values)} value(s)")
+        return {"sweep_id": sweep_id, "prefix_task_id": sweep["prefix_task_id"], "total": len(values)}
+
+    def _claim_sweep_branch(self, sweep_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]]:
+        """
+        前缀已完成且还没分叉时认领分叉，返回 (扫描记录, sweep, 前缀记录)；否则返回 None
+
+        完成回调与状态查询都可能触发分叉，认领保证只提交一次。读任务存储与状态 actor，
+        会阻塞，在线程池中调用。
+        """
+        record = self.store.get(sweep_id) or {}
+        sweep = record.get(SWEEP_KEY)
+        if not sweep or sweep.get("variants") or sweep.get("branched"):
+            return None
+        prefix_id = sweep.get("prefix_task_id")
+        prefix = {}
+        if prefix_id:
+            prefix = self.store.get(prefix_id) or {}
+            if self._execution_view(prefix_id, prefix)["status"] not in ("completed", "success"):
+                return None
+        elif sweep["operator_index"]:
+            # 前缀还没提交
+            return None
+
+        claimed = []
+
+        def _claim(r: Dict[str, Any]):
+            if not r[SWEEP_KEY].get("branched"):
+                r[SWEEP_KEY]["branched"] = True
+                claimed.append(True)
+        self.store.update(sweep_id, _claim)
+        return (record, sweep, prefix) if claimed else None
+
+    async def _branch_sweep(self, sweep_id: str) -> List[Dict[str, Any]]:
+        """共享前缀完成后提交各取值的下游运行；已提交过或前缀未完成时什么也不做"""
+        claimed = await asyncio.get_running_loop().run_in_executor(None, self._claim_sweep_branch, sweep_id)
+        if not claimed:
+            return []
+        record, sweep, prefix = claimed
+        prefix_id = sweep.get("prefix_task_id")
+        index = sweep["operator_index"]
+
+        pipeline_config = record.get("pipeline_config") or {}
+        variants = []
+        try:
+            for value in sweep["values"]:
+                operators = variant_operators(
+                    pipeline_config.get("operators") or [], index, sweep["section"], sweep["param"], value
+                )
+                lineage = None
+                if prefix_id:
+                    config = child_pipeline_config(prefix["pipeline_config"], prefix_id, index, operators[index:])
+                    lineage = {"parent_task_id": prefix_id, "from_step": index, "mode": SWEEP_LINEAGE_MODE}
+                else:
+                    config = dict(pipeline_config, operators=operators)
+                result = await self.start_execution_async(
+                    pipeline_id=record.get("pipeline_id"),
+                    config=config,
+                    priority=sweep.get("priority"),
+                    user_id=sweep.get("user_id"),
+                    lineage=lineage,
+                    sweep_id=sweep_id,
+                )
+                variants.append({"task_id": result["task_id"], "value": value})
+        finally:
+            self.store.update(sweep_id, lambda r: r[SWEEP_KEY].update(variants=variants))
+        logger.info(f"Sweep {sweep_id}: {len(variants)} variant(s) branched from step {index}")
+        return variants
+
+    def sweep_comparison(self, sweep_id: str) -> Dict[str, Any]:
+        """
+        参数扫描的对比表（各取值的输出行数、耗时与样例输出）；结束后把终态写回父任务
+
+        Raises:
+            KeyError: 扫描任务不存在
+        """
+        record = self.store.get(sweep_id)
+        if not record or record.get("executor_type") != SWEEP_EXECUTOR_TYPE:
+            raise KeyError(sweep_id)
+        sweep = record.get(SWEEP_KEY) or {}
+
+        def _load(task_id: str):
+            run = self.store.get(task_id) or {}
+            return run, self._execution_view(task_id, run) if run else {}
+        prefix = _load(sweep["prefix_task_id"]) if sweep.get("prefix_task_id") else None
+        variants = {entry["task_id"]: _load(entry["task_id"]) for entry in sweep.get("variants") or []}
+        table = comparison(sweep, prefix, variants)
+        if table["status"] != record.get("status"):
+            def _apply(r: Dict[str, Any]):
+                r["status"] = table["status"]
+                if table["finished_at"]:
+                    r["finished_at"] = table["finished_at"]
+            self.store.update(sweep_id, _apply)
+        return dict(
+            table,
+            sweep_id=sweep_id,
+            pipeline_id=record.get("pipeline_id"),
+            operator_index=sweep.get("operator_index"),
+            operator_name=sweep.get("operator_name"),
+            param=sweep.get("param"),
+            section=sweep.get("section"),
+            started_at=sweep.get("started_at"),
+        )
+
+    async def sweep_status(self, sweep_id: str) -> Dict[str, Any]:
+        """先补提交（前缀已完成但还没分叉，例如服务重启错过了完成回调），再返回对比表"""
+        await self._branch_sweep(sweep_id)
+        return await asyncio.get_running_loop().run_in_executor(None, self.sweep_comparison, sweep_id)
+
+    def _on_sweep_run_finished(self, task_id: str):
+        """扫描的前缀结束时分叉出各取值的运行；变体结束时刷新父任务状态（完成监视器回调）"""
+        sweep_id = (self.store.get(task_id) or {}).get("sweep_id")
+        if not sweep_id:
+            return
+        sweep = (self.store.get(sweep_id) or {}).get(SWEEP_KEY) or {}
+        if sweep.get("prefix_task_id") == task_id:
+            self._run_on_loop(self.sweep_status(sweep_id), f"Sweep {sweep_id} branch")
+        else:
+            self.sweep_comparison(sweep_id)
+
+    def _run_on_loop(self, coro, label: str):
+        """在记下的事件循环上执行协程，可从任意线程调用；没有可用的事件循环时放弃（查询状态时会补上）"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            coro.close()
+            logger.warning(f"{label} skipped: no event loop")
+            return
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        self._background.add(future)
+
+        def _done(f):
+            self._background.discard(f)
+            if not f.cancelled() and f.exception() is not None:
+                logger.error(f"{label} failed: {f.exception()}")
+        future.add_done_callback(_done)
+
     def kill_execution(self, task_id: str) -> bool:
         """
         终止指定的 Pipeline 执行任务
@@ -517,12 +1281,11 @@ class TaskRegistry:
         Returns:
             是否成功终止
         """
-        from app.services.ray_pipeline_executor import ray_executor
+        from app.services.pipeline_executor import get_pipeline_executor
         from datetime import datetime
         
         # 1. 直接读取最新数据
-        data = self._read()
-        task_record = data.get("tasks", {}).get(task_id)
+        task_record = self.store.get(task_id)
         
         if not task_record:
             logger.warning(f"Task {task_id} not found")
@@ -533,31 +1296,50 @@ class TaskRegistry:
         if status in ["success", "failed", "cancelled"]:
             logger.warning(f"Task {task_id} is already {status}, cannot kill")
             return False
+
+        def _mark_cancelled(error_message: str):
+            now = datetime.now().isoformat()
+            journal = self.journal(task_id)
+            journal_view = execution_state.snapshot(task_id) if execution_state.active else None
+            if journal_view is None:
+                journal_view = self._journal_cache.view(journal, task_id)
+            if journal_view is not None:
+                # 事件日志里仍在运行的算子同样标记为已取消
+                events = [{"type": "status", "status": "cancelled", "fields": {"finished_at": now}}]
+                for op_key, op_info in journal_view["operators_detail"].items():
+                    if op_info.get("status") in ["running", "initializing"]:
+                        events.append({"type": "operator", "op_key": op_key,
+                                       "fields": {"status": "cancelled", "completed_at": now}})
+                # 状态 actor 在线时由它落盘（先写完 worker 尚未落盘的事件），否则直接追加
+                if not execution_state.submit(task_id, events, flush=True):
+                    journal.append_many(events)
+                journal.close()
+
+            def _apply(record: Dict):
+                record["status"] = "cancelled"
+                record["finished_at"] = now
+                record["error_message"] = error_message
+                
+                # ✅ 关键：同步更新内部算子的状态，让 UI 显示更准确
+                if "output" in record and "operators_detail" in record["output"]:
+                    for op_key, op_info in record["output"]["operators_detail"].items():
+                        if op_info.get("status") in ["running", "initializing"]:
+                            op_info["status"] = "cancelled"
+                            op_info["completed_at"] = now
+
+            # 行级读-改-写，不会覆盖 worker 在此期间写入的其它字段
+            self.store.update(task_id, _apply)
         
         try:
             # 2. 物理 Kill
             # 注意：先 Kill 进程，后改状态。
             # 这样即使 Kill 之后 worker 还有最后一丝余力想写文件，也会因为进程被切断而停止
-            killed_via_ray = ray_executor.kill_execution(task_id)
-            
-            # 3. 构造状态更新
-            now = datetime.now().isoformat()
-            task_record["status"] = "cancelled"
-            task_record["finished_at"] = now
-            task_record["error_message"] = "Task was killed by user"
-            
-            # ✅ 关键：同步更新内部算子的状态，让 UI 显示更准确
-            if "output" in task_record and "operators_detail" in task_record["output"]:
-                for op_key, op_info in task_record["output"]["operators_detail"].items():
-                    if op_info.get("status") in ["running", "initializing"]:
-                        op_info["status"] = "cancelled"
-                        op_info["completed_at"] = now
+            killed_via_executor = get_pipeline_executor().kill_execution(task_id)
             
-            # 4. 强制写回磁盘（覆盖式更新）
-            data["tasks"][task_id] = task_record
-            self._write(data)
+            # 3. 写回状态
+            _mark_cancelled("Task was killed by user")
             
-            logger.info(f"Task {task_id} killed. Ray_success: {killed_via_ray}")
+            logger.info(f"Task {task_id} killed. Executor_success: {killed_via_executor}")
             return True
             
         except Exception as e:
@@ -567,20 +1349,7 @@ class TaskRegistry:
             
             # 即使发生异常，也尝试更新任务状态
             try:
-                now = datetime.now().isoformat()
-                task_record["status"] = "cancelled"
-                task_record["finished_at"] = now
-                task_record["error_message"] = f"Task kill failed: {str(e)}"
-                
-                # 同步更新内部算子的状态
-                if "output" in task_record and "operators_detail" in task_record["output"]:
-                    for op_key, op_info in task_record["output"]["operators_detail"].items():
-                        if op_info.get("status") in ["running", "initializing"]:
-                            op_info["status"] = "cancelled"
-                            op_info["completed_at"] = now
-                
-                data["tasks"][task_id] = task_record
-                self._write(data)
+                _mark_cancelled(f"Task kill failed: {str(e)}")
                 logger.info(f"Task {task_id} status updated to cancelled despite error")
                 return True
             except Exception as update_error:
@@ -0,0 +1,280 @@
+"""Incremental task statistics and time rollups.
+
+The task store calls :func:`stats_transition` with the record before and after
+every write. The transition says which status/executor counters move and which
+rollup buckets have to be bumped. The SQLite store applies both inside the same
+transaction as the row write, so ``/tasks/stats`` and
+``/tasks/stats/rollups`` never rescan history.
+
+A rollup bucket is ``(granularity, bucket, pipeline_id)`` where ``bucket`` is a
+prefix of the local ISO timestamp used everywhere else in the registry:
+
+* ``minute``: ``2024-05-01T12:34``
+* ``hour``: ``2024-05-01T12``
+* ``day``: ``2024-05-01``
+
+Runs are counted as *started* in the bucket of ``started_at`` and as *finished*
+in the bucket of ``completed_at`` / ``finished_at``. Durations go into a fixed
+log-scale histogram so that p95 can be derived from merged buckets. "Rows" is
+the sum of the operators' ``sample_count``, i.e. rows processed across all
+operators of the run.
+"""
+from __future__ import annotations
+
+import datetime
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+GRANULARITIES = {"minute": 16, "hour": 13, "day": 10}
+
+TERMINAL_STATUSES = ("success", "completed", "failed", "cancelled")
+SUCCESS_STATUSES = ("success", "completed")
+
+# 耗时直方图的上界（秒），最后一个桶收集更长的运行
+DURATION_BOUNDS: Tuple[float, ...] = (
+    0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, 14400, 28800, 86400,
+)
+
+
+def _parse_ts(value: Any) -> Optional[datetime.datetime]:
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def bucket_key(ts: str, granularity: str) -> str:
+    """时间戳 -> 该粒度下的桶（ISO 字符串前缀）"""
+    return ts[: GRANULARITIES[granularity]]
+
+
+def _finished_at(record: Dict[str, Any]) -> Optional[str]:
+    return record.get("completed_at") or record.get("finished_at")
+
+
+def _rows_processed(record: Dict[str, Any]) -> int:
+    output = record.get("output") or {}
+    details = output.get("operators_detail") if isinstance(output, dict) else None
+    if not isinstance(details, dict):
+        return 0
+    total = 0
+    for detail in details.values():
+        count = detail.get("sample_count") if isinstance(detail, dict) else None
+        if isinstance(count, (int, float)):
+            total += int(count)
+    return total
+
+
+def _duration(record: Dict[str, Any]) -> Optional[float]:
+    started = _parse_ts(record.get("started_at"))
+    finished = _parse_ts(_finished_at(record))
+    if started and finished and finished >= started:
+        return (finished - started).total_seconds()
+    value = record.get("duration_seconds")
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def _pipeline_key(record: Dict[str, Any]) -> str:
+    pipeline_id = record.get("pipeline_id")
+    if not pipeline_id:
+        meta = record.get("meta") or {}
+        pipeline_id = meta.get("pipeline_id") if isinstance(meta, dict) else None
+    return pipeline_id or ""
+
+
+# 批量执行 / 参数扫描的父任务只是子执行的汇总（见 batch_execution.py、parameter_sweep.py）：
+# 子执行各自计入统计，父任务不产生 rollup 事件，/tasks/stats 也不计入，否则同一批运行会被算两次
+AGGREGATE_EXECUTOR_TYPES = ("batch", "sweep")
+
+# stats_transition 只看这些字段；update() 在 mutator 之前据此留一份轻量快照
+STATS_KEYS = ("status", "executor_type", "pipeline_id", "meta", "started_at", "completed_at", "finished_at")
+
+
+def stats_view(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: record.get(k) for k in STATS_KEYS if k in record}
+
+
+def stats_transition(
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+) -> Tuple[List[Tuple[str, str, int]], List[Tuple[str, str, Dict[str, Any]]]]:
+    """
+    一次写入引起的统计变化
+
+    Args:
+        before: 写入前的记录（新建时为 None）
+        after: 写入后的记录（删除时为 None）
+
+    Returns:
+        (counter_deltas, rollup_events)
+        counter_deltas: [(status, executor_type, +1/-1), ...]
+        rollup_events: [("started" | "finished", timestamp, fields), ...]
+    """
+    counters: List[Tuple[str, str, int]] = []
+    old_key = (before.get("status") or "pending", before.get("executor_type") or "") if before else None
+    new_key = (after.get("status") or "pending", after.get("executor_type") or "") if after else None
+    if old_key != new_key:
+        if old_key:
+            counters.append((*old_key, -1))
+        if new_key:
+            counters.append((*new_key, 1))
+
+    events: List[Tuple[str, str, Dict[str, Any]]] = []
+    if after is None:
+        # 删除不回写历史桶：rollup 记录的是已经发生过的运行
+        return counters, events
+    if after.get("executor_type") in AGGREGATE_EXECUTOR_TYPES:
+        return counters, events
+
+    pipeline_id = _pipeline_key(after)
+    if after.get("started_at") and not (before or {}).get("started_at"):
+        events.append(("started", after["started_at"], {"pipeline_id": pipeline_id}))
+
+    was_terminal = bool(before) and before.get("status") in TERMINAL_STATUSES
+    if after.get("status") in TERMINAL_STATUSES and not was_terminal:
+        finished_at = _finished_at(after) or datetime.datetime.now().isoformat()
+        events.append(("finished", finished_at, {
+            "pipeline_id": pipeline_id,
+            "status": after["status"],
+            "duration": _duration(after),
+            "rows": _rows_processed(after),
+        }))
+    return counters, events
+
+
+def duration_bucket(duration: float) -> int:
+    return bisect_left(DURATION_BOUNDS, duration)
+
+
+def empty_histogram() -> List[int]:
+    return [0] * (len(DURATION_BOUNDS) + 1)
+
+
+def percentile_from_histogram(hist: Sequence[int], q: float) -> Optional[float]:
+    """直方图估算分位数：落在哪个桶就在桶内线性插值"""
+    total = sum(hist)
+    if total == 0:
+        return None
+    target = q * total
+    seen = 0
+    for i, count in enumerate(hist):
+        if count and seen + count >= target:
+            lower = DURATION_BOUNDS[i - 1] if i > 0 else 0.0
+            upper = DURATION_BOUNDS[i] if i < len(DURATION_BOUNDS) else DURATION_BOUNDS[-1] * 2
+            return round(lower + (upper - lower) * (target - seen) / count, 3)
+        seen += count
+    return float(DURATION_BOUNDS[-1])
+
+
+def empty_rollup() -> Dict[str, Any]:
+    return {
+        "started": 0,
+        "finished": 0,
+        "succeeded": 0,
+        "failed": 0,
+        "cancelled": 0,
+        "duration_sum": 0.0,
+        "duration_count": 0,
+        "duration_hist": empty_histogram(),
+        "rows": 0,
+    }
+
+
+def apply_rollup_event(rollup: Dict[str, Any], kind: str, fields: Dict[str, Any]) -> None:
+    """把一个 started / finished 事件加到桶上（内存版，SQLite 版见 SqliteTaskStore）"""
+    if kind == "started":
+        rollup["started"] += 1
+        return
+    rollup["finished"] += 1
+    status = fields.get("status")
+    if status in SUCCESS_STATUSES:
+        rollup["succeeded"] += 1
+    elif status == "failed":
+        rollup["failed"] += 1
+    elif status == "cancelled":
+        rollup["cancelled"] += 1
+    duration = fields.get("duration")
+    if duration is not None:
+        rollup["duration_sum"] += duration
+        rollup["duration_count"] += 1
+        rollup["duration_hist"][duration_bucket(duration)] += 1
+    rollup["rows"] += fields.get("rows") or 0
+
+
+def summarize_rollup(granularity: str, bucket: str, pipeline_id: str, rollup: Dict[str, Any]) -> Dict[str, Any]:
+    """接口输出：计数 + 成功率 + 平均 / p95 耗时"""
+    finished = rollup["finished"]
+    count = rollup["duration_count"]
+    return {
+        "granularity": granularity,
+        "bucket": bucket,
+        "pipeline_id": pipeline_id or None,
+        "started": rollup["started"],
+        "finished": finished,
+        "succeeded": rollup["succeeded"],
+        "failed": rollup["failed"],
+        "cancelled": rollup["cancelled"],
+        "success_rate": round(rollup["succeeded"] / finished, 4) if finished else None,
+        "mean_duration_s": round(rollup["duration_sum"] / count, 3) if count else None,
+        "p95_duration_s": percentile_from_histogram(rollup["duration_hist"], 0.95),
+        "rows": rollup["rows"],
+    }
+
+
+def merge_rollup(into: Dict[str, Any], other: Dict[str, Any]) -> None:
+    for key in ("started", "finished", "succeeded", "failed", "cancelled", "duration_sum", "duration_count", "rows"):
+        into[key] += other[key]
+    into["duration_hist"] = [a + b for a, b in zip(into["duration_hist"], other["duration_hist"])]
+
+
+def summarize_rollups(
+    granularity: str,
+    raw: Iterable[Tuple[str, str, Dict[str, Any]]],
+    by_pipeline: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    (bucket, pipeline_id, rollup) -> 接口输出，按 bucket 升序
+
+    by_pipeline=False 时同一桶内的各 Pipeline 合并（直方图相加后再算 p95）。
+    """
+    merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for bucket, pid, rollup in raw:
+        key = (bucket, pid if by_pipeline else "")
+        if key not in merged:
+            merged[key] = empty_rollup()
+        merge_rollup(merged[key], rollup)
+    return [
+        summarize_rollup(granularity, bucket, pid, rollup)
+        for (bucket, pid), rollup in sorted(merged.items())
+    ]
+
+
+def rollups_from_records(
+    records: Iterable[Dict[str, Any]],
+    granularity: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    pipeline_id: Optional[str] = None,
+) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """从完整记录现算 rollup 桶（JSON 后端使用），返回 (bucket, pipeline_id, rollup)"""
+    buckets: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for record in records:
+        _, events = stats_transition(None, record)
+        for kind, ts, fields in events:
+            key = (bucket_key(ts, granularity), fields["pipeline_id"])
+            apply_rollup_event(buckets.setdefault(key, empty_rollup()), kind, fields)
+    return [
+        (bucket, pid, rollup)
+        for (bucket, pid), rollup in buckets.items()
+        if in_range(bucket, since, until, granularity) and (pipeline_id is None or pid == pipeline_id)
+    ]
+
+
+def in_range(bucket: str, since: Optional[str], until: Optional[str], granularity: str) -> bool:
+    if since and bucket < bucket_key(since, granularity):
+        return False
+    if until and bucket > bucket_key(until, granularity):
+        return False
+    return True
@@ -0,0 +1,734 @@
+"""Task storage backends for ``TaskRegistry``.
+
+``TaskRegistry`` used to read and rewrite the whole ``task_registry.json`` on
+every call, and Ray workers rewrote the same file on every progress tick. This
+module puts a small storage interface (:class:`TaskStore`) behind the registry
+with two implementations:
+
+- :class:`SqliteTaskStore` (default): one row per task in an SQLite database in
+  WAL mode. ``status`` / ``executor_type`` / ``created_at`` are real indexed
+  columns, the full record lives in a JSON ``data`` column, and every update is
+  a single-row read-modify-write inside ``BEGIN IMMEDIATE``, so concurrent
+  writers (API process + Ray workers) no longer lose each other's updates.
+- :class:`JsonTaskStore`: the legacy whole-file JSON layout, kept for
+  ``TASK_STORE_BACKEND=json``.
+
+An existing JSON registry is imported into SQLite exactly once, after which the
+JSON file is renamed to ``<name>.migrated``.
+"""
+from __future__ import annotations
+
+import base64
+import copy
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.registry_io import RegistryFile
+from app.services.task_stats import (
+    GRANULARITIES,
+    apply_rollup_event,
+    bucket_key,
+    empty_rollup,
+    rollups_from_records,
+    stats_transition,
+    stats_view,
+)
+
+logger = get_logger(__name__)
+
+# 写入 data 列之外、单独建列（可建索引）的字段
+INDEXED_COLUMNS = ("status", "executor_type", "pipeline_id", "created_at")
+
+
+# 可用于投影的字段名（顶层 key）
+_FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat()
+
+
+def encode_cursor(created_at: str, task_id: str) -> str:
+    """分页游标：最后一条记录的 (created_at, id)，base64url 编码后对调用方不透明"""
+    raw = json.dumps([created_at, task_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """解析分页游标，非法游标抛 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(created_at, str) or not isinstance(task_id, str):
+            raise TypeError
+        return created_at, task_id
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def validate_fields(fields: Optional[Sequence[str]]) -> Optional[List[str]]:
+    """校验投影字段名，非法字段名抛 ValueError"""
+    if fields is None:
+        return None
+    invalid = [f for f in fields if not _FIELD_NAME_RE.match(f)]
+    if invalid:
+        raise ValueError(f"Invalid field name(s): {', '.join(invalid)}")
+    return list(dict.fromkeys(fields))
+
+
+def _pipeline_id_of(record: Dict[str, Any]) -> Optional[str]:
+    """execution 记录直接带 pipeline_id；普通 task 记录把它放在 meta 里"""
+    pipeline_id = record.get("pipeline_id")
+    if pipeline_id:
+        return pipeline_id
+    meta = record.get("meta") or {}
+    return meta.get("pipeline_id") if isinstance(meta, dict) else None
+
+
+class TaskStore(ABC):
+    """任务存储后端接口，TaskRegistry 只通过它读写任务记录"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """读取单条任务记录，不存在返回 None"""
+
+    @abstractmethod
+    def put(self, task_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """插入或整体替换一条任务记录"""
+
+    @abstractmethod
+    def update(self, task_id: str, mutator: Callable[[Dict[str, Any]], Any]) -> Optional[Dict[str, Any]]:
+        """
+        原子地读-改-写单条记录
+
+        Args:
+            task_id: 任务ID
+            mutator: 就地修改记录的回调
+
+        Returns:
+            修改后的记录；任务不存在时返回 None（mutator 不会被调用）
+        """
+
+    @abstractmethod
+    def delete(self, task_id: str) -> bool:
+        """删除任务记录"""
+
+    @abstractmethod
+    def list(self, status: Optional[str] = None, executor_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按过滤条件列出任务，按 created_at 倒序"""
+
+    def query(
+        self,
+        status: Optional[Sequence[str]] = None,
+        pipeline_id: Optional[str] = None,
+        executor_type: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = 50,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        按 (created_at DESC, id DESC) 分页查询
+
+        Args:
+            status: 状态过滤（可多选）
+            pipeline_id: Pipeline ID 过滤
+            executor_type: 执行器类型过滤
+            created_after / created_before: 创建时间范围（ISO 字符串，闭区间）
+            cursor: 上一页返回的 next_cursor
+            limit: 每页条数；None 表示不分页，返回全部
+            fields: 只返回这些顶层字段；None 返回完整记录
+
+        Returns:
+            (records, next_cursor)，没有下一页时 next_cursor 为 None
+
+        默认实现基于 list() 在内存中过滤，供 JSON 后端使用；SQLite 后端走索引。
+        """
+        fields = validate_fields(fields)
+        after = decode_cursor(cursor) if cursor else None
+        statuses = set(status) if status else None
+
+        keyed = []
+        for record in self.list(executor_type=executor_type):
+            task_id = record.get("id") or record.get("task_id") or ""
+            created_at = record.get("created_at") or ""
+            if statuses and record.get("status") not in statuses:
+                continue
+            if pipeline_id and _pipeline_id_of(record) != pipeline_id:
+                continue
+            if created_after and created_at < created_after:
+                continue
+            if created_before and created_at > created_before:
+                continue
+            if after and (created_at, task_id) >= after:
+                continue
+            keyed.append(((created_at, task_id), record))
+        keyed.sort(key=lambda item: item[0], reverse=True)
+
+        page = keyed if limit is None else keyed[:limit]
+        next_cursor = encode_cursor(*page[-1][0]) if limit is not None and len(keyed) > limit else None
+        records = [r for _, r in page]
+        if fields is not None:
+            records = [{f: r.get(f) for f in fields} for r in records]
+        return records, next_cursor
+
+    def patch(
+        self,
+        task_id: str,
+        fields: Optional[Dict[str, Any]] = None,
+        output: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        合并更新：顶层字段直接覆盖，output 做一层 dict.update
+
+        这是执行过程中最常见的写法（状态 + 部分 output），原先散落在 worker 里
+        的 "读整个文件 -> 改一条 -> 写整个文件" 都收敛到这里。
+        """
+        def _apply(record: Dict[str, Any]):
+            if fields:
+                record.update(fields)
+            if output:
+                record.setdefault("output", {})
+                if not isinstance(record["output"], dict):
+                    record["output"] = {}
+                record["output"].update(output)
+
+        return self.update(task_id, _apply)
+
+    def status_counts(self) -> List[Dict[str, Any]]:
+        """
+        按 (status, executor_type) 计数
+
+        默认实现扫描 list()，供 JSON 后端使用；SQLite 后端读增量维护的计数表。
+        """
+        counts: Dict[Tuple[str, str], int] = {}
+        for record in self.list():
+            key = (record.get("status") or "pending", record.get("executor_type") or "")
+            counts[key] = counts.get(key, 0) + 1
+        return [{"status": k[0], "executor_type": k[1], "count": v} for k, v in sorted(counts.items())]
+
+    def rollups(
+        self,
+        granularity: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        pipeline_id: Optional[str] = None,
+    ) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        返回时间桶原始数据 [(bucket, pipeline_id, rollup), ...]（见 app/services/task_stats.py）
+
+        默认实现从全部记录现算；SQLite 后端读增量维护的 rollup 表。
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Invalid granularity: {granularity}")
+        return rollups_from_records(self.list(), granularity, since, until, pipeline_id)
+
+    def close(self):
+        """释放底层资源（默认无操作）"""
+
+
+class JsonTaskStore(TaskStore):
+    """
+    旧版存储：整个注册表是一个 {"tasks": {...}} JSON 文件
+
+    读写经由 registry_io.RegistryFile：进程间加锁、原子替换写入、按版本戳缓存解析结果。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = RegistryFile(path, fmt="json", default={"tasks": {}})
+        self._ensure()
+
+    def _ensure(self):
+        # 只在文件不存在时初始化
+        with self._file.locked():
+            if not self._file.exists():
+                self._file.write({"tasks": {}})
+                return
+
+            # 文件存在但为空/损坏时兜底
+            try:
+                data = self._file.read(copy_result=False)
+                if not isinstance(data, dict) or "tasks" not in data:
+                    self._file.write({"tasks": {}})
+            except Exception:
+                # 读取失败：备份旧文件再重建
+                broken = self.path + f".broken.{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+                try:
+                    os.replace(self.path, broken)
+                except Exception:
+                    pass
+                self._file.write({"tasks": {}})
+
+    def _tasks(self) -> Dict[str, Dict[str, Any]]:
+        """只读视图（缓存对象，不要修改）"""
+        return (self._file.read(copy_result=False) or {}).get("tasks", {})
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        record = self._tasks().get(task_id)
+        return copy.deepcopy(record) if record is not None else None
+
+    def put(self, task_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        with self._file.transaction() as data:
+            data.setdefault("tasks", {})[task_id] = record
+        return record
+
+    def update(self, task_id: str, mutator: Callable[[Dict[str, Any]], Any]) -> Optional[Dict[str, Any]]:
+        with self._file.locked():
+            data = self._file.read()
+            tasks = data.setdefault("tasks", {})
+            if task_id not in tasks:
+                return None
+            record = tasks[task_id]
+            mutator(record)
+            self._file.write(data)
+        return record
+
+    def delete(self, task_id: str) -> bool:
+        with self._file.locked():
+            data = self._file.read()
+            tasks = data.setdefault("tasks", {})
+            if task_id not in tasks:
+                return False
+            del tasks[task_id]
+            self._file.write(data)
+        return True
+
+    def list(self, status: Optional[str] = None, executor_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        tasks = copy.deepcopy(list(self._tasks().values()))
+        if status:
+            tasks = [t for t in tasks if t.get("status") == status]
+        if executor_type:
+            tasks = [t for t in tasks if t.get("executor_type") == executor_type]
+        tasks.sort(key=lambda x: x.get("created_at", "") or "", reverse=True)
+        return tasks
+
+
+class SqliteTaskStore(TaskStore):
+    """
+    SQLite (WAL) 存储：每个任务一行，状态等字段单独建索引，按行更新
+
+    每个线程持有自己的连接（sqlite3 连接不能跨线程共享），写事务统一使用
+    BEGIN IMMEDIATE，保证多进程 / 多线程下的读-改-写不会互相覆盖。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id TEXT PRIMARY KEY,
+        status TEXT,
+        executor_type TEXT,
+        pipeline_id TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, created_at);
+    CREATE INDEX IF NOT EXISTS idx_tasks_executor_type ON tasks(executor_type, created_at);
+    CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+    CREATE INDEX IF NOT EXISTS idx_tasks_pipeline_id ON tasks(pipeline_id, created_at);
+    CREATE TABLE IF NOT EXISTS store_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE TABLE IF NOT EXISTS task_counts (
+        status TEXT NOT NULL,
+        executor_type TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (status, executor_type)
+    );
+    CREATE TABLE IF NOT EXISTS task_rollups (
+        granularity TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        pipeline_id TEXT NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (granularity, bucket, pipeline_id)
+    );
+    """
+
+    # 统计表的结构 / 口径变化时加一，启动时会从 tasks 表重建一次
+    STATS_VERSION = "1"
+
+    def __init__(self, db_path: str, legacy_json_path: Optional[str] = None, busy_timeout_ms: int = 10000):
+        self.db_path = db_path
+        self.legacy_json_path = legacy_json_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._init_schema()
+        if legacy_json_path:
+            self._import_legacy_json(legacy_json_path)
+        self._backfill_stats()
+
+    # ------------------------------------------------------------------
+    # connection / transaction helpers
+    # ------------------------------------------------------------------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None：自己控制事务边界
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._conn())
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    @staticmethod
+    def _row_values(task_id: str, record: Dict[str, Any], created_at: str) -> tuple:
+        return (
+            task_id,
+            record.get("status"),
+            record.get("executor_type"),
+            _pipeline_id_of(record),
+            created_at,
+            _now(),
+            json.dumps(record, ensure_ascii=False),
+        )
+
+    def _write_row(
+        self,
+        conn: sqlite3.Connection,
+        task_id: str,
+        record: Dict[str, Any],
+        existing_created_at: Optional[str],
+        before: Optional[Dict[str, Any]] = None,
+    ):
+        self._apply_stats(conn, before, record)
+        # execution 记录里不一定有 created_at，此时沿用已有行（或首次写入时间），
+        # 保证 created_at 索引列始终可用于排序 / 分页
+        created_at = record.get("created_at") or existing_created_at or _now()
+        conn.execute(
+            """
+            INSERT INTO tasks (id, status, executor_type, pipeline_id, created_at, updated_at, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                status = excluded.status,
+                executor_type = excluded.executor_type,
+                pipeline_id = excluded.pipeline_id,
+                created_at = excluded.created_at,
+                updated_at = excluded.updated_at,
+                data = excluded.data
+            """,
+            self._row_values(task_id, record, created_at),
+        )
+
+    # ------------------------------------------------------------------
+    # incremental statistics (same transaction as the row write)
+    # ------------------------------------------------------------------
+    def _apply_stats(self, conn: sqlite3.Connection, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        counters, events = stats_transition(before, after)
+        for status, executor_type, delta in counters:
+            conn.execute(
+                """
+                INSERT INTO task_counts (status, executor_type, count) VALUES (?, ?, ?)
+                ON CONFLICT(status, executor_type) DO UPDATE SET count = count + excluded.count
+                """,
+                (status, executor_type, delta),
+            )
+        for kind, ts, fields in events:
+            for granularity in GRANULARITIES:
+                key = (granularity, bucket_key(ts, granularity), fields["pipeline_id"])
+                row = conn.execute(
+                    "SELECT data FROM task_rollups WHERE granularity = ? AND bucket = ? AND pipeline_id = ?", key
+                ).fetchone()
+                rollup = json.loads(row["data"]) if row else empty_rollup()
+                apply_rollup_event(rollup, kind, fields)
+                conn.execute(
+                    "INSERT OR REPLACE INTO task_rollups (granularity, bucket, pipeline_id, data) VALUES (?, ?, ?, ?)",
+                    (*key, json.dumps(rollup)),
+                )
+        if any(kind == "finished" for kind, _, _ in events):
+            self._prune_minute_rollups(conn)
+
+    def _prune_minute_rollups(self, conn: sqlite3.Connection):
+        hours = settings.STATS_MINUTE_RETENTION_HOURS
+        if not hours:
+            return
+        cutoff = (datetime.datetime.now() - datetime.timedelta(hours=hours)).isoformat()
+        conn.execute(
+            "DELETE FROM task_rollups WHERE granularity = 'minute' AND bucket < ?",
+            (bucket_key(cutoff, "minute"),),
+        )
+
+    def _backfill_stats(self):
+        """统计表第一次出现（或口径升级）时，从已有任务重建一次"""
+        if self._get_meta("stats_version") == self.STATS_VERSION:
+            return
+        with self._transaction() as conn:
+            row = conn.execute("SELECT value FROM store_meta WHERE key = 'stats_version'").fetchone()
+            if row is not None and row["value"] == self.STATS_VERSION:
+                return
+            conn.execute("DELETE FROM task_counts")
+            conn.execute("DELETE FROM task_rollups")
+            count = 0
+            for r in conn.execute("SELECT data FROM tasks"):
+                self._apply_stats(conn, None, json.loads(r["data"]))
+                count += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('stats_version', ?)",
+                (self.STATS_VERSION,),
+            )
+        if count:
+            logger.info(f"Rebuilt task statistics from {count} task(s) in {self.db_path}")
+
+    # ------------------------------------------------------------------
+    # one-time import of the legacy JSON registry
+    # ------------------------------------------------------------------
+    def _import_legacy_json(self, json_path: str):
+        if not os.path.exists(json_path) or self._get_meta("json_imported") is not None:
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f) or {}
+            tasks = data.get("tasks", {}) if isinstance(data, dict) else {}
+        except Exception as e:
+            logger.warning(f"Skip importing legacy task registry {json_path}: {e}")
+            return
+
+        with self._transaction() as conn:
+            # 事务内再检查一次，避免多个进程同时导入
+            row = conn.execute("SELECT value FROM store_meta WHERE key = 'json_imported'").fetchone()
+            if row is not None:
+                return
+            imported = 0
+            for task_id, record in tasks.items():
+                if not isinstance(record, dict):
+                    continue
+                exists = conn.execute("SELECT 1 FROM tasks WHERE id = ?", (task_id,)).fetchone()
+                if exists:
+                    continue
+                self._write_row(conn, task_id, record, None)
+                imported += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('json_imported', ?)",
+                (json.dumps({"source": json_path, "count": imported, "at": _now()}),),
+            )
+
+        try:
+            os.replace(json_path, json_path + ".migrated")
+        except OSError as e:
+            logger.warning(f"Imported {json_path} but failed to rename it: {e}")
+        logger.info(f"Imported {imported} task(s) from legacy registry {json_path} into {self.db_path}")
+
+    # ------------------------------------------------------------------
+    # TaskStore interface
+    # ------------------------------------------------------------------
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def put(self, task_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT created_at, data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            before = stats_view(json.loads(row["data"])) if row else None
+            self._write_row(conn, task_id, record, row["created_at"] if row else None, before)
+        return record
+
+    def update(self, task_id: str, mutator: Callable[[Dict[str, Any]], Any]) -> Optional[Dict[str, Any]]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT created_at, data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                return None
+            record = json.loads(row["data"])
+            before = stats_view(record)
+            mutator(record)
+            self._write_row(conn, task_id, record, row["created_at"], before)
+        return record
+
+    def delete(self, task_id: str) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status, executor_type FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self._apply_stats(conn, {"status": row["status"], "executor_type": row["executor_type"]}, None)
+            return True
+
+    def list(self, status: Optional[str] = None, executor_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if executor_type:
+            clauses.append("executor_type = ?")
+            params.append(executor_type)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT data FROM tasks {where} ORDER BY created_at DESC, id DESC", params
+        ).fetchall()
+        return [json.loads(r["data"]) for r in rows]
+
+    def query(
+        self,
+        status: Optional[Sequence[str]] = None,
+        pipeline_id: Optional[str] = None,
+        executor_type: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = 50,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        fields = validate_fields(fields)
+        clauses, params = [], []
+        if status:
+            clauses.append(f"status IN ({', '.join('?' * len(status))})")
+            params.extend(status)
+        if pipeline_id:
+            clauses.append("pipeline_id = ?")
+            params.append(pipeline_id)
+        if executor_type:
+            clauses.append("executor_type = ?")
+            params.append(executor_type)
+        if created_after:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        if created_before:
+            clauses.append("created_at <= ?")
+            params.append(created_before)
+        if cursor:
+            # keyset 分页：与 ORDER BY 使用同一组键，翻页代价与页码无关
+            after_created_at, after_id = decode_cursor(cursor)
+            clauses.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([after_created_at, after_created_at, after_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        if fields is None:
+            payload = "data"
+            select_params: List[Any] = []
+        else:
+            # 投影在 SQLite 里完成，日志 / 配置等大字段不会被读出、解析
+            payload = "json_object(" + ", ".join("?, json_extract(data, ?)" for _ in fields) + ")" if fields else "'{}'"
+            select_params = [p for f in fields for p in (f, f"$.{f}")]
+
+        rows = self._conn().execute(
+            f"SELECT id, created_at, {payload} AS payload FROM tasks {where} "
+            f"ORDER BY created_at DESC, id DESC LIMIT ?",
+            # LIMIT -1 即不限条数
+            [*select_params, *params, -1 if limit is None else limit + 1],
+        ).fetchall()
+
+        page = rows if limit is None else rows[:limit]
+        next_cursor = (
+            encode_cursor(page[-1]["created_at"], page[-1]["id"]) if limit is not None and len(rows) > limit else None
+        )
+        records = []
+        for r in page:
+            record = json.loads(r["payload"])
+            if fields is None or "created_at" in fields:
+                # 记录里可能没有 created_at（早期 execution 记录），用索引列补齐
+                record["created_at"] = record.get("created_at") or r["created_at"]
+            records.append(record)
+        return records, next_cursor
+
+    def status_counts(self) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT status, executor_type, count FROM task_counts WHERE count > 0 ORDER BY status, executor_type"
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def rollups(
+        self,
+        granularity: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        pipeline_id: Optional[str] = None,
+    ) -> List[Tuple[str, str, Dict[str, Any]]]:
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Invalid granularity: {granularity}")
+        clauses, params = ["granularity = ?"], [granularity]
+        if since:
+            clauses.append("bucket >= ?")
+            params.append(bucket_key(since, granularity))
+        if until:
+            clauses.append("bucket <= ?")
+            params.append(bucket_key(until, granularity))
+        if pipeline_id is not None:
+            clauses.append("pipeline_id = ?")
+            params.append(pipeline_id)
+        rows = self._conn().execute(
+            f"SELECT bucket, pipeline_id, data FROM task_rollups WHERE {' AND '.join(clauses)} ORDER BY bucket",
+            params,
+        ).fetchall()
+        return [(r["bucket"], r["pipeline_id"], json.loads(r["data"])) for r in rows]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK 上下文，进入时即拿到写锁"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+def sqlite_path_for(registry_path: str) -> str:
+    """task_registry.json -> task_registry.db（同目录同名）"""
+    return os.path.splitext(registry_path)[0] + ".db"
+
+
+# 进程内按 (路径, 后端) 复用存储实例：建库脚本、旧 JSON 导入检查与统计回填只做一次，
+# 连接按线程复用（调度、完成回调、worker 上报等热路径每次操作都会取一次存储）
+_stores: Dict[Tuple[str, str], TaskStore] = {}
+_stores_lock = threading.Lock()
+
+
+def create_task_store(registry_path: str, backend: Optional[str] = None) -> TaskStore:
+    """
+    根据配置返回存储后端（同一进程内同一路径复用同一个实例）
+
+    Args:
+        registry_path: 注册表路径（settings.TASK_REGISTRY 或测试传入的临时路径）。
+            sqlite 后端把数据库放在同目录的 ``<name>.db``，并一次性导入该路径上的旧 JSON。
+        backend: "sqlite" / "json"，默认取 settings.TASK_STORE_BACKEND
+    """
+    backend = (backend or settings.TASK_STORE_BACKEND or "sqlite").lower()
+    if backend not in ("json", "sqlite"):
+        raise ValueError(f"Unsupported task store backend: {backend}")
+    key = (os.path.abspath(registry_path), backend)
+    with _stores_lock:
+        store = _stores.get(key)
+        # 数据库文件被删掉（例如清理了数据目录）时重新建库
+        if store is None or (backend == "sqlite" and not os.path.exists(store.db_path)):
+            if backend == "json":
+                store = JsonTaskStore(registry_path)
+            else:
+                store = SqliteTaskStore(sqlite_path_for(registry_path), legacy_json_path=registry_path)
+            _stores[key] = store
+        return store
@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import Dict, Any, List, Optional
 
 from app.core.config import settings
+from app.services.registry_io import RegistryFile
 
 try:
     from dataflow.utils.text2sql.database_manager import DatabaseManager
@@ -57,22 +58,19 @@ class Text2SQLDatabaseRegistry:
     def __init__(self, path: str | None = None, sqlite_root: str | None = None):
         self.path = path or settings.TEXT2SQL_DATABASE_REGISTRY
         self.sqlite_root = sqlite_root or settings.SQLITE_DB_DIR
+        # 多进程安全：进程间锁 + 原子替换写入 + 版本戳缓存（见 registry_io.py）
+        self._file = RegistryFile(self.path, fmt="yaml", default={})
         self._ensure()
 
     def _ensure(self):
-        os.makedirs(os.path.dirname(self.path), exist_ok=True)
         os.makedirs(self.sqlite_root, exist_ok=True)
-        if not os.path.exists(self.path):
-            with open(self.path, "w", encoding="utf-8") as f:
-                yaml.safe_dump({}, f, allow_unicode=True)
+        self._file.ensure()
 
     def _get_all(self) -> Dict[str, Any]:
-        with open(self.path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f) or {}
+        return self._file.read()
 
     def _write_all(self, data: Dict[str, Any]):
-        with open(self.path, "w", encoding="utf-8") as f:
-            yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+        self._file.write(data)
 
     def _get(self, db_id: str) -> Optional[Dict[str, Any]]:
         data = self._get_all()
@@ -135,35 +133,37 @@ class Text2SQLDatabaseRegistry:
                 os.remove(dest_path)
             raise
 
-        data = self._get_all() or {}
-        if db_id in data:
-            if os.path.exists(dest_path):
-                os.remove(dest_path)
-            raise ValueError(f"Database name '{db_id}' already exists, please use another name")
+        with self._file.locked():
+            data = self._get_all() or {}
+            if db_id in data:
+                if os.path.exists(dest_path):
+                    os.remove(dest_path)
+                raise ValueError(f"Database name '{db_id}' already exists, please use another name")
         
-        data[db_id] = {
-            "name": db_id,
-            "file_name": safe_filename,
-            "path": dest_path,
-            "uploaded_at": datetime.now().isoformat(),
-            "size": os.path.getsize(dest_path),
-            "description": description,
-        }
-        self._write_all(data)
+            data[db_id] = {
+                "name": db_id,
+                "file_name": safe_filename,
+                "path": dest_path,
+                "uploaded_at": datetime.now().isoformat(),
+                "size": os.path.getsize(dest_path),
+                "description": description,
+            }
+            self._write_all(data)
         return db_id
 
     def _delete(self, db_id: str, remove_files: bool = True) -> bool:
-        data = self._get_all() or {}
-        if db_id not in data:
-            return False
-
-        if remove_files:
-            db_path = data[db_id].get("path")
-            if db_path and os.path.exists(db_path):
-                os.remove(db_path)
-
-        del data[db_id]
-        self._write_all(data)
+        with self._file.locked():
+            data = self._get_all() or {}
+            if db_id not in data:
+                return False
+
+            if remove_files:
+                db_path = data[db_id].get("path")
+                if db_path and os.path.exists(db_path):
+                    os.remove(db_path)
+
+            del data[db_id]
+            self._write_all(data)
         return True
 
     def get_manager(self, selected_db_ids: Optional[List[str]] = None):
@@ -196,21 +196,18 @@ class Text2SQLDatabaseManagerRegistry:
 
     def __init__(self, path: str | None = None):
         self.path = path or settings.TEXT2SQL_DATABASE_MANAGER_REGISTRY
+        # 多进程安全：进程间锁 + 原子替换写入 + 版本戳缓存（见 registry_io.py）
+        self._file = RegistryFile(self.path, fmt="yaml", default={})
         self._ensure()
 
     def _ensure(self):
-        os.makedirs(os.path.dirname(self.path), exist_ok=True)
-        if not os.path.exists(self.path):
-            with open(self.path, "w", encoding="utf-8") as f:
-                yaml.safe_dump({}, f, allow_unicode=True)
+        self._file.ensure()
 
     def _get_all(self) -> Dict[str, Any]:
-        with open(self.path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f) or {}
+        return self._file.read()
 
     def _write_all(self, data: Dict[str, Any]):
-        with open(self.path, "w", encoding="utf-8") as f:
-            yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+        self._file.write(data)
 
     def list(self) -> List[Dict[str, Any]]:
         data = self._get_all()
@@ -238,17 +235,18 @@ class Text2SQLDatabaseManagerRegistry:
         selected_db_ids: Optional[List[str]] = None,
         description: Optional[str] = None,
     ) -> str:
-        data = self._get_all() or {}
-        mgr_id = os.urandom(8).hex()
-        data[mgr_id] = {
-            "name": name,
-            "cls_name": cls_name,
-            "db_type": db_type,
-            "selected_db_ids": selected_db_ids or [],
-            "description": description,
-            "created_at": datetime.now().isoformat(),
-        }
-        self._write_all(data)
+        with self._file.locked():
+            data = self._get_all() or {}
+            mgr_id = os.urandom(8).hex()
+            data[mgr_id] = {
+                "name": name,
+                "cls_name": cls_name,
+                "db_type": db_type,
+                "selected_db_ids": selected_db_ids or [],
+                "description": description,
+                "created_at": datetime.now().isoformat(),
+            }
+            self._write_all(data)
         return mgr_id
 
     def _update(
@@ -258,24 +256,26 @@ class Text2SQLDatabaseManagerRegistry:
         selected_db_ids: Optional[List[str]] = None,
         description: str | None = None,
     ) -> bool:
-        data = self._get_all() or {}
-        if mgr_id not in data:
-            return False
-        if name is not None:
-            data[mgr_id]["name"] = name
-        if selected_db_ids is not None:
-            data[mgr_id]["selected_db_ids"] = selected_db_ids
-        if description is not None:
-            data[mgr_id]["description"] = description
-        self._write_all(data)
+        with self._file.locked():
+            data = self._get_all() or {}
+            if mgr_id not in data:
+                return False
+            if name is not None:
+                data[mgr_id]["name"] = name
+            if selected_db_ids is not None:
+                data[mgr_id]["selected_db_ids"] = selected_db_ids
+            if description is not None:
+                data[mgr_id]["description"] = description
+            self._write_all(data)
         return True
 
     def _delete(self, mgr_id: str) -> bool:
-        data = self._get_all() or {}
-        if mgr_id not in data:
-            return False
-        del data[mgr_id]
-        self._write_all(data)
+        with self._file.locked():
+            data = self._get_all() or {}
+            if mgr_id not in data:
+                return False
+            del data[mgr_id]
+            self._write_all(data)
         return True
 
     def get_manager_classes(self) -> List[Dict[str, Any]]:
@@ -21,7 +21,6 @@ prompt 类的反射入口，本 Registry 仅服务"用户在 WebUI 上写的 f-s
 运行时解引用：算子参数中出现 "user_prompt:<id>" 字符串时，由
 param_coercion.resolve_user_prompt_ref(...) 拿到对应模板文本。
 """
-import json
 import re
 import uuid
 from datetime import datetime
@@ -29,6 +28,7 @@ from pathlib import Path
 from typing import Dict, List, Optional, Any
 from loguru import logger as log
 from app.core.config import settings
+from app.services.registry_io import RegistryFile
 
 
 BACKEND_DIR = Path(__file__).parent.parent.parent
@@ -74,31 +74,25 @@ class UserPromptRegistry:
     """CRUD + template rendering for user-defined prompt templates."""
 
     def __init__(self):
+        # 文件即唯一真相：多个 API worker 各自缓存，文件变化（版本戳）时重新加载
+        self._file = RegistryFile(str(PROMPTS_FILE), fmt="json", default={})
         self._ensure_storage()
-        self._templates: Dict[str, Dict[str, Any]] = self._load()
 
     # ── storage ──────────────────────────────────────────────
     def _ensure_storage(self):
         PROMPTS_DIR.mkdir(parents=True, exist_ok=True)
-        if not PROMPTS_FILE.exists():
-            PROMPTS_FILE.write_text("{}")
+        self._file.ensure()
 
     def _load(self) -> Dict[str, Dict[str, Any]]:
         try:
-            content = PROMPTS_FILE.read_text()
-            return json.loads(content) if content.strip() else {}
+            return self._file.read()
         except Exception as e:
             log.warning(f"Failed to load user prompt templates: {e}")
             return {}
 
-    def _save(self):
-        try:
-            PROMPTS_FILE.write_text(
-                json.dumps(self._templates, ensure_ascii=False, indent=2)
-            )
-        except Exception as e:
-            log.error(f"Failed to save user prompt templates: {e}")
-            raise
+    @property
+    def _templates(self) -> Dict[str, Dict[str, Any]]:
+        return self._load()
 
     # ── CRUD ─────────────────────────────────────────────────
     def create(
@@ -121,8 +115,8 @@ class UserPromptRegistry:
             "created_at": now,
             "updated_at": now,
         }
-        self._templates[tpl_id] = rec
-        self._save()
+        with self._file.transaction() as templates:
+            templates[tpl_id] = rec
         log.info(f"Created user prompt template {tpl_id}")
         return rec
 
@@ -133,26 +127,30 @@ class UserPromptRegistry:
         return list(self._templates.values())
 
     def update(self, tpl_id: str, **fields) -> Optional[Dict[str, Any]]:
-        rec = self._templates.get(tpl_id)
-        if not rec:
-            return None
-        for k in ("name", "description", "template"):
-            if fields.get(k) is not None:
-                rec[k] = fields[k]
-        if fields.get("allowed_operators") is not None:
-            rec["allowed_operators"] = list(fields["allowed_operators"])
-        if fields.get("example_variables") is not None:
-            rec["example_variables"] = dict(fields["example_variables"])
-        rec["updated_at"] = datetime.utcnow().isoformat()
-        self._save()
+        with self._file.locked():
+            templates = self._load()
+            rec = templates.get(tpl_id)
+            if not rec:
+                return None
+            for k in ("name", "description", "template"):
+                if fields.get(k) is not None:
+                    rec[k] = fields[k]
+            if fields.get("allowed_operators") is not None:
+                rec["allowed_operators"] = list(fields["allowed_operators"])
+            if fields.get("example_variables") is not None:
+                rec["example_variables"] = dict(fields["example_variables"])
+            rec["updated_at"] = datetime.utcnow().isoformat()
+            self._file.write(templates)
         return rec
 
     def delete(self, tpl_id: str) -> bool:
-        if tpl_id in self._templates:
-            del self._templates[tpl_id]
-            self._save()
-            return True
-        return False
+        with self._file.locked():
+            templates = self._load()
+            if tpl_id not in templates:
+                return False
+            del templates[tpl_id]
+            self._file.write(templates)
+        return True
 
     # ── helpers ──────────────────────────────────────────────
     def preview(self, template: str, variables: Dict[str, Any]) -> Dict[str, Any]:
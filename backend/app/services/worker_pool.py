@@ -0,0 +1,300 @@
+"""Warm pool of long-lived Ray worker actors for pipeline executions.
+
+A plain ``@ray.remote`` task pays the whole cold start on every run: importing
+``dataflow_engine`` and the DataFlow extensions, loading the operator / prompt
+registries and preparing the process. :class:`PipelineWorker` does that once in
+its constructor and then runs jobs back to back, so a job only pays for its own
+operators.
+
+:class:`WorkerPool` (driver side) keeps up to ``EXECUTION_WORKER_POOL_SIZE``
+actors. The scheduler already bounds how many jobs run at once, so a job just
+takes an idle actor (or starts one). After each job the pool asks the actor for
+its stats. An actor is recycled (killed, and a fresh one pre-warmed) after
+``EXECUTION_WORKER_MAX_JOBS`` jobs or once its RSS grew by more than
+``EXECUTION_WORKER_MAX_RSS_GROWTH_MB`` since warm-up, so operator leaks do not
+pile up. Killing a running job kills its actor, because Ray cannot force-cancel
+an actor task.
+
+With ``EXECUTION_WORKER_CONCURRENCY > 1`` (which also turns on the isolated
+context, see ``execution_context.py``) each actor is a threaded actor that runs
+up to that many jobs at once, which suits I/O-bound pipelines (LLM serving calls).
+A worker due for recycling stops taking jobs and is recycled once its running
+jobs finished; killing one job still kills the jobs sharing its actor.
+"""
+from __future__ import annotations
+
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.logger_setup import get_logger
+from app.services.execution_context import isolated_context_enabled
+
+logger = get_logger(__name__)
+
+POOL_ACTOR_PREFIX = "dataflow_pipeline_worker"
+STATS_TIMEOUT_S = 5.0
+
+
+def current_rss_mb() -> float:
+    """当前进程常驻内存（MB）；没有 /proc 时退回峰值 RSS"""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """进程启动以来的峰值常驻内存（MB）"""
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def warm_up_process():
+    """常驻 worker 进程的预热：准备进程、导入引擎依赖、加载算子 / Prompt 注册表"""
+    from app.services.ray_pipeline_executor import prepare_worker_process
+    from app.services.dataflow_engine import DataFlowEngine  # noqa: F401  预热引擎依赖
+    from dataflow.utils.registry import OPERATOR_REGISTRY, PROMPT_REGISTRY
+
+    prepare_worker_process()
+    for registry in (OPERATOR_REGISTRY, PROMPT_REGISTRY):
+        try:
+            registry._get_all()
+        except Exception as e:
+            # 个别算子导入失败不影响预热；真正用到时由任务自己报错
+            logger.warning(f"[Pipeline Worker {os.getpid()}] registry warm-up incomplete: {e}")
+
+
+class PipelineWorker:
+    """常驻 worker：构造时预热 DataFlow，之后执行 Pipeline 任务（threaded actor 时可并发）"""
+
+    def __init__(self):
+        started = time.perf_counter()
+        warm_up_process()
+        self.jobs = 0
+        self._jobs_lock = threading.Lock()
+        self.warmup_s = time.perf_counter() - started
+        self.baseline_rss_mb = current_rss_mb()
+        logger.info(f"[Pipeline Worker {os.getpid()}] warmed up in {self.warmup_s:.2f}s, rss={self.baseline_rss_mb:.0f}MB")
+
+    def run(
+        self,
+        pipeline_config: Dict[str, Any],
+        dataflow_runtime: Dict[str, Any],
+        task_id: str,
+        pipeline_execution_path: str,
+        state_actor=None,
+    ) -> Dict[str, Any]:
+        from app.services.ray_pipeline_executor import run_pipeline_job
+
+        print(f"[RAY WORKER] Starting execution: {task_id} (warm worker {os.getpid()}, job {self.jobs + 1})")
+        try:
+            return run_pipeline_job(pipeline_config, dataflow_runtime, task_id, pipeline_execution_path, state_actor)
+        finally:
+            with self._jobs_lock:
+                self.jobs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        rss = current_rss_mb()
+        return {
+            "pid": os.getpid(),
+            "jobs": self.jobs,
+            "warmup_s": round(self.warmup_s, 3),
+            "rss_mb": round(rss, 1),
+            "rss_growth_mb": round(rss - self.baseline_rss_mb, 1),
+        }
+
+
+class _PooledWorker:
+    """驱动侧对一个 actor 的记录"""
+
+    def __init__(self, actor, name: str):
+        self.actor = actor
+        self.name = name
+        self.task_ids: Set[str] = set()
+        self.stats_ref = None
+        self.stats: Dict[str, Any] = {}
+        self.draining = False
+
+
+class WorkerPool:
+    """
+    常驻 worker actor 池
+
+    Args:
+        size: actor 数量上限（0 表示禁用，执行器退回普通 Ray 任务）
+        max_jobs: 每个 actor 最多执行的任务数，到达后回收
+        max_rss_growth_mb: 相对预热后的 RSS 增长上限（MB），超过后回收
+        worker_cls: actor 类，需提供 run(...) 与 stats()；默认 PipelineWorker
+        concurrency: 每个 actor 同时执行的任务数（>1 需要隔离模式，见 execution_context.isolated_context_enabled）
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_jobs: Optional[int] = None,
+        max_rss_growth_mb: Optional[float] = None,
+        worker_cls: type = PipelineWorker,
+        concurrency: Optional[int] = None,
+    ):
+        self.size = settings.EXECUTION_WORKER_POOL_SIZE if size is None else size
+        self.max_jobs = settings.EXECUTION_WORKER_MAX_JOBS if max_jobs is None else max_jobs
+        self.max_rss_growth_mb = (
+            settings.EXECUTION_WORKER_MAX_RSS_GROWTH_MB if max_rss_growth_mb is None else max_rss_growth_mb
+        )
+        concurrency = settings.EXECUTION_WORKER_CONCURRENCY if concurrency is None else concurrency
+        if concurrency > 1 and not isolated_context_enabled():
+            # chdir / redirect_stdout 是进程级的，同一进程里的任务会互相干扰
+            logger.warning("Worker concurrency > 1 needs the isolated execution context; running one job per worker")
+            concurrency = 1
+        self.concurrency = max(1, concurrency)
+        self._workers: List[_PooledWorker] = []
+        self._busy: Dict[str, _PooledWorker] = {}
+        self._spawned = 0
+        self.worker_cls = worker_cls
+        self._actor_cls = None
+        self._lock = threading.RLock()
+        self.recycled_count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def busy(self, task_id: str) -> bool:
+        return task_id in self._busy
+
+    def _spawn(self) -> _PooledWorker:
+        import ray
+
+        if self._actor_cls is None:
+            self._actor_cls = ray.remote(max_restarts=0, max_task_retries=0)(self.worker_cls)
+        self._spawned += 1
+        name = f"{POOL_ACTOR_PREFIX}_{os.getpid()}_{self._spawned}"
+        options = {"name": name}
+        if self.concurrency > 1:
+            options["max_concurrency"] = self.concurrency
+        worker = _PooledWorker(self._actor_cls.options(**options).remote(), name)
+        self._workers.append(worker)
+        return worker
+
+    def _live(self) -> List[_PooledWorker]:
+        return [w for w in self._workers if not w.draining]
+
+    def warm(self):
+        """预先启动 actor 到池大小（在 ray.init 之后调用；actor 在后台预热）"""
+        with self._lock:
+            while self.enabled and len(self._live()) < self.size:
+                self._spawn()
+
+    def submit(
+        self,
+        task_id: str,
+        pipeline_config: Dict[str, Any],
+        dataflow_runtime: Dict[str, Any],
+        pipeline_execution_path: str,
+        state_actor=None,
+    ):
+        """把任务交给一个空闲 actor，返回结果的 ObjectRef"""
+        with self._lock:
+            # 先占满空闲的 actor，再往已有任务的 actor 上叠加
+            free = [w for w in self._live() if len(w.task_ids) < self.concurrency]
+            worker = min(free, key=lambda w: len(w.task_ids)) if free else self._spawn()
+            ref = worker.actor.run.remote(pipeline_config, dataflow_runtime, task_id, pipeline_execution_path, state_actor)
+            if self.concurrency == 1:
+                # actor 串行执行：stats 紧跟在 run 之后完成，release 时几乎不用等
+                worker.stats_ref = worker.actor.stats.remote()
+            worker.task_ids.add(task_id)
+            self._busy[task_id] = worker
+        return ref
+
+    def release(self, task_id: str):
+        """任务结束：读取 actor 状态，需要时回收，否则放回空闲队列"""
+        import ray
+
+        with self._lock:
+            worker = self._busy.pop(task_id, None)
+            if worker is None:
+                return
+            worker.task_ids.discard(task_id)
+            stats_ref, worker.stats_ref = worker.stats_ref, None
+        reason = None
+        try:
+            # threaded actor 的 stats 不排在 run 之后，结束时再取
+            worker.stats = ray.get(stats_ref or worker.actor.stats.remote(), timeout=STATS_TIMEOUT_S)
+        except Exception as e:
+            reason = f"stats unavailable ({type(e).__name__})"
+        if reason is None:
+            if self.max_jobs and worker.stats["jobs"] >= self.max_jobs:
+                reason = f"{worker.stats['jobs']} jobs"
+            elif self.max_rss_growth_mb and worker.stats["rss_growth_mb"] > self.max_rss_growth_mb:
+                reason = f"rss grew by {worker.stats['rss_growth_mb']}MB"
+        with self._lock:
+            if worker not in self._workers:
+                return
+            if reason is None and not worker.draining and len(self._live()) <= self.size:
+                return
+            # 到期的 actor 不再接新任务，等它手上的任务都结束再回收
+            worker.draining = True
+            if worker.task_ids:
+                return
+        self._recycle(worker, reason or "pool shrunk")
+
+    def kill(self, task_id: str) -> bool:
+        """终止正在执行某任务的 actor（actor 任务无法 force cancel）"""
+        with self._lock:
+            worker = self._busy.pop(task_id, None)
+            if worker is None:
+                return False
+            # 同一 actor 上的其它任务随 actor 一起结束，由 watcher 按 worker_crashed 收尾
+            for other in worker.task_ids - {task_id}:
+                self._busy.pop(other, None)
+            worker.task_ids.clear()
+        self._recycle(worker, "killed")
+        return True
+
+    def _recycle(self, worker: _PooledWorker, reason: str):
+        import ray
+
+        with self._lock:
+            if worker not in self._workers:
+                return
+            self._workers.remove(worker)
+        try:
+            ray.kill(worker.actor, no_restart=True)
+        except Exception as e:
+            logger.warning(f"Failed to kill pipeline worker {worker.name}: {e}")
+        self.recycled_count += 1
+        logger.info(f"Recycled pipeline worker {worker.name}: {reason}")
+        # 补一个新的预热 actor，下一次任务不必冷启动
+        self.warm()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "idle": sum(1 for w in self._live() if not w.task_ids),
+            "busy": {task_id: worker.name for task_id, worker in self._busy.items()},
+            "recycled": self.recycled_count,
+        }
+
+    def shutdown(self):
+        import ray
+
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+            self._busy.clear()
+            self._actor_cls = None
+        for worker in workers:
+            try:
+                ray.kill(worker.actor, no_restart=True)
+            except Exception:
+                pass
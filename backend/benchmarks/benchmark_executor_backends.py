@@ -0,0 +1,128 @@
+"""
+执行器 backend 基准：启动耗时与空闲内存（Ray vs 本机进程池）
+
+每个 backend 在独立的子进程里测：从启动执行器到所有常驻 worker 预热完成的耗时，
+以及空闲几秒后整棵进程树（API 进程 + Ray 的 raylet / GCS / dashboard / worker，
+或本机 worker 进程）的内存。内存取 PSS（共享页按进程数分摊），没有 smaps_rollup 时退回 RSS。
+
+不是 pytest 用例，直接运行:
+    python benchmarks/benchmark_executor_backends.py --workers 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _children() -> dict:
+    tree = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        tree.setdefault(ppid, []).append(int(entry))
+    return tree
+
+
+def _memory_mb(pid: int) -> float:
+    for path, field in ((f"/proc/{pid}/smaps_rollup", "Pss:"), (f"/proc/{pid}/status", "VmRSS:")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            continue
+    return 0.0
+
+
+def tree_memory_mb(root: int) -> dict:
+    """root 及其所有子孙进程的内存（MB）"""
+    tree, pending, pids = _children(), [root], []
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(tree.get(pid, []))
+    own = _memory_mb(root)
+    total = sum(_memory_mb(pid) for pid in pids)
+    return {"driver_mb": round(own, 1), "processes": len(pids), "total_mb": round(total, 1)}
+
+
+def measure(backend: str, workers: int, idle_s: float) -> dict:
+    from app.core.config import settings
+
+    settings.EXECUTION_BACKEND = backend
+    settings.EXECUTION_WORKER_POOL_SIZE = workers
+    settings.EXECUTION_LOCAL_WORKERS = workers
+    before = tree_memory_mb(os.getpid())
+
+    started = time.perf_counter()
+    if backend == "ray":
+        import ray
+        from app.services.ray_pipeline_executor import ray_executor
+
+        ray_executor._ensure_initialized()
+        ray.get([w.actor.stats.remote() for w in ray_executor.pool._workers], timeout=600)
+        executor = ray_executor
+    else:
+        from app.services.local_pipeline_executor import local_executor
+
+        local_executor.pool.warm()
+        for worker in local_executor.pool._idle:
+            worker.ready.wait(timeout=600)
+        executor = local_executor
+    startup_s = time.perf_counter() - started
+
+    time.sleep(idle_s)
+    idle = tree_memory_mb(os.getpid())
+    executor.shutdown()
+    return {
+        "backend": backend,
+        "workers": workers,
+        "startup_s": round(startup_s, 2),
+        "api_process_mb": before["driver_mb"],
+        "idle_processes": idle["processes"],
+        "idle_total_mb": idle["total_mb"],
+        "added_mb": round(idle["total_mb"] - before["total_mb"], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("ray", "local"), help="只测一个 backend（内部使用）")
+    parser.add_argument("--workers", type=int, default=2, help="常驻 worker 数")
+    parser.add_argument("--idle", type=float, default=5.0, help="测内存前空闲的秒数")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(measure(args.backend, args.workers, args.idle)))
+        return
+
+    rows = []
+    for backend in ("ray", "local"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--backend", backend, "--workers", str(args.workers), "--idle", str(args.idle)],
+            capture_output=True, text=True,
+        )
+        lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+        if out.returncode != 0 or not lines:
+            print(f"{backend} failed:\n{out.stderr[-2000:]}")
+            continue
+        rows.append(json.loads(lines[-1]))
+
+    columns = ("backend", "workers", "startup_s", "idle_processes", "idle_total_mb", "added_mb")
+    print(" | ".join(f"{c:>14}" for c in columns))
+    for row in rows:
+        print(" | ".join(f"{row[c]!s:>14}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+批量执行测试：数据集选择、子执行配置、进度 / 吞吐 / 失败汇总
+
+使用 pytest 运行:
+    pytest tests/test_batch_execution.py -v
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.batch_execution import aggregate, dataset_pipeline_config, resolve_datasets
+
+DATASETS = [
+    {"id": "d1", "name": "part-001", "root": "/data/shards/part-001.jsonl"},
+    {"id": "d2", "name": "part-002", "root": "/data/shards/part-002.jsonl"},
+    {"id": "d3", "name": "eval", "root": "/data/eval.jsonl"},
+]
+
+
+def test_resolve_datasets_by_ids_and_glob():
+    assert [d["id"] for d in resolve_datasets(DATASETS, ["d3"], "/data/shards/*.jsonl")] == ["d3", "d1", "d2"]
+    assert [d["id"] for d in resolve_datasets(DATASETS, ["d2", "d2"])] == ["d2"]
+    assert [d["id"] for d in resolve_datasets(DATASETS, pattern="eval")] == ["d3"]
+    with pytest.raises(KeyError):
+        resolve_datasets(DATASETS, ["d1", "missing"])
+    with pytest.raises(ValueError):
+        resolve_datasets(DATASETS, pattern="*.parquet")
+
+
+def test_dataset_pipeline_config_only_swaps_the_input():
+    config = {"input_dataset": {"id": "d1", "location": [0, 0]}, "operators": [{"name": "A"}]}
+    child = dataset_pipeline_config(config, "d2")
+    assert child["input_dataset"] == {"id": "d2", "location": [0, 0]}
+    assert config["input_dataset"]["id"] == "d1"
+    assert dataset_pipeline_config({"input_dataset": "d1"}, "d3")["input_dataset"] == "d3"
+
+
+def test_aggregate_counts_progress_throughput_and_failures():
+    start = datetime.now() - timedelta(seconds=10)
+    batch = {
+        "started_at": start.isoformat(),
+        "children": [
+            {"task_id": "c1", "dataset_id": "d1", "num_samples": 100},
+            {"task_id": "c2", "dataset_id": "d2", "num_samples": 50},
+            {"task_id": "c3", "dataset_id": "d3", "num_samples": 30},
+        ],
+    }
+    children = {
+        "c1": {"status": "completed", "finished_at": (start + timedelta(seconds=4)).isoformat()},
+        "c2": {"status": "running"},
+        "c3": {"status": "failed", "error_message": "boom"},
+    }
+
+    summary = aggregate(batch, children)
+    assert summary["status"] == "running" and summary["finished_at"] is None
+    assert summary["counts"] == {"completed": 1, "running": 1, "failed": 1}
+    assert summary["progress_percentage"] == 66.7
+    assert summary["rows_processed"] == 100
+    assert 0 < summary["throughput_rows_per_s"] <= 10.1
+    assert summary["failures"] == [{"task_id": "c3", "dataset_id": "d3", "status": "failed", "error": "boom"}]
+
+    children["c2"] = {"status": "completed", "finished_at": (start + timedelta(seconds=5)).isoformat()}
+    summary = aggregate(batch, children)
+    assert summary["status"] == "failed"
+    assert summary["finished_at"] == children["c2"]["finished_at"]
+    assert summary["throughput_rows_per_s"] == 30.0
+    assert aggregate({"children": batch["children"]}, {})["status"] == "queued"
+
+
+def test_batch_status_persists_the_terminal_status(task_registry):
+    children = []
+    for i in range(2):
+        child = task_registry.create({"executor_type": "pipeline", "executor_name": "P"})
+        task_registry.store.update(child["id"], lambda r: r.update({
+            "status": "completed", "finished_at": datetime.now().isoformat(),
+        }))
+        children.append({"task_id": child["id"], "dataset_id": f"d{i}", "num_samples": 10})
+    parent = task_registry.create({"executor_type": "batch", "executor_name": "P"})
+    task_registry.store.update(parent["id"], lambda r: r.update({
+        "status": "queued",
+        "batch": {"started_at": datetime.now().isoformat(), "children": children},
+    }))
+
+    status = task_registry.batch_status(parent["id"])
+    assert status["status"] == "completed" and status["rows_processed"] == 20
+    assert [c["status"] for c in status["children"]] == ["completed", "completed"]
+    assert task_registry.store.get(parent["id"])["status"] == "completed"
+    with pytest.raises(KeyError):
+        task_registry.batch_status(children[0]["task_id"])
@@ -0,0 +1,146 @@
+"""
+分支并行执行测试：key 依赖图、并行块划分、按列合并与顺序执行的一致性、回退与失败
+
+使用 pytest 运行:
+    pytest tests/test_branch_execution.py -v
+"""
+import json
+import os
+import time
+
+import pytest
+from dataflow.utils.storage import FileStorage
+
+from app.core.config import settings
+from app.services.branch_execution import (
+    BranchFallback,
+    BranchOp,
+    BranchOpError,
+    dependencies,
+    parallel_blocks,
+    run_branch_block,
+)
+
+
+@pytest.fixture(autouse=True)
+def pipeline_dir(tmp_path, monkeypatch):
+    """算子工作目录指向临时目录（并行块整体在其中运行）"""
+    monkeypatch.setattr(settings, "DATAFLOW_CORE_DIR", str(tmp_path / "core"))
+    monkeypatch.setattr(settings, "BASE_DIR", os.getcwd())
+    workdir = tmp_path / "core" / "api_pipelines"
+    workdir.mkdir(parents=True)
+    return str(workdir)
+
+
+class _Tag:
+    def __init__(self, suffix, delay=0.0, drop=None, fail=False):
+        self.suffix, self.delay, self.drop, self.fail = suffix, delay, drop, fail
+
+    def run(self, storage, input_key, output_key):
+        df = storage.read("dataframe")
+        if self.fail:
+            raise RuntimeError("bad op")
+        time.sleep(self.delay)
+        df[output_key] = df[input_key] + self.suffix
+        storage.write(df[df[input_key] != self.drop] if self.drop else df)
+
+
+def _params(input_key, output_key):
+    return {"input_key": input_key, "output_key": output_key}
+
+
+def _storage(tmp_path, rows=("a", "b", "c")):
+    dataset = tmp_path / "data.jsonl"
+    dataset.write_text("".join(json.dumps({"text": r}) + "\n" for r in rows), encoding="utf-8")
+    return FileStorage(first_entry_file_name=str(dataset), cache_path=str(tmp_path / "out"),
+                       file_name_prefix="dataflow_cache_step", cache_type="jsonl")
+
+
+def _ops(*specs):
+    return [
+        BranchOp(operator, _params(i, o), f"Op_{n}", inputs={i}, outputs={o})
+        for n, (operator, i, o) in enumerate(specs)
+    ]
+
+
+def _rows(storage, step):
+    with open(storage._get_cache_file_path(step), encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_dependencies_follow_the_key_flow():
+    flows = [("A", {"text"}, {"a"}), ("B", {"a"}, {"b"}), ("C", {"text"}, {"c"}), ("D", {"b", "c"}, {"d"})]
+    assert dependencies(flows) == {"A": set(), "B": {"A"}, "C": set(), "D": {"B", "C"}}
+    assert dependencies([("A", {"x"}, {"y"}), ("B", {"z"}, {"y"})])["B"] == {"A"}
+
+
+def test_blocks_need_independent_operators_and_stop_at_barriers():
+    entries = [
+        ("A", _params("text", "a"), True),
+        ("B", _params("text", "b"), True),
+        ("F", {"input_key": "a"}, True),  # 没有 output key：可能改变行数，作为分隔
+        ("C", _params("a", "c"), True),
+        ("D", _params("c", "d"), True),  # 纯链，没有并行收益
+        ("E", _params("text", "e"), False),
+        ("G", _params("text", "g"), True),
+    ]
+    assert parallel_blocks(entries) == [["A", "B"]]
+
+
+def test_block_runs_branches_concurrently_and_writes_sequential_steps(tmp_path):
+    storage = _storage(tmp_path)
+    ops = _ops((_Tag("1", 0.5), "text", "a"), (_Tag("2"), "a", "b"), (_Tag("3", 0.5), "text", "c"))
+
+    started = time.monotonic()
+    run_branch_block(ops, storage.step(), workers=3)
+    assert time.monotonic() - started < 0.9  # 顺序执行至少 1s
+
+    assert [op.rows for op in ops] == [3, 3, 3]
+    assert _rows(storage, 1)[0] == {"text": "a", "a": "a1"}
+    assert _rows(storage, 2)[0] == {"text": "a", "a": "a1", "b": "a12"}
+    assert _rows(storage, 3) == [
+        {"text": t, "a": t + "1", "b": t + "12", "c": t + "3"} for t in ("a", "b", "c")
+    ]
+
+
+def test_row_changing_operator_keeps_the_finished_prefix_and_falls_back(tmp_path):
+    storage = _storage(tmp_path)
+    ops = _ops((_Tag("1"), "text", "a"), (_Tag("2", drop="b"), "text", "b"), (_Tag("3"), "text", "c"))
+
+    with pytest.raises(BranchFallback) as err:
+        run_branch_block(ops, storage.step(), workers=1)
+    # 排在不能合并的算子之前的输出保留下来，之后的算子不再启动
+    assert err.value.completed == ops[:1]
+    assert _rows(storage, 1) == [{"text": t, "a": t + "1"} for t in ("a", "b", "c")]
+    assert not os.path.exists(storage._get_cache_file_path(2))
+    assert ops[2].started_at is None
+
+    with pytest.raises(BranchFallback, match="rewrite") as err:
+        run_branch_block(_ops((_Tag("1"), "text", "text"), (_Tag("2"), "text", "b")), storage.reset().step())
+    assert err.value.completed == []
+
+
+def test_failing_branch_reports_the_operator(tmp_path):
+    storage = _storage(tmp_path)
+    ops = _ops((_Tag("1", 0.1), "text", "a"), (_Tag("2", fail=True), "text", "b"), (_Tag("3"), "b", "c"))
+
+    with pytest.raises(BranchOpError) as err:
+        run_branch_block(ops, storage.step())
+    assert err.value.op_key == "Op_1"
+    assert ops[2].started_at is None
+
+
+def test_branches_run_in_the_pipeline_workdir(tmp_path, monkeypatch, pipeline_dir):
+    monkeypatch.setattr(settings, "EXECUTION_ISOLATED_CONTEXT", False)
+    cwd = os.getcwd()
+    seen = []
+
+    class _Cwd(_Tag):
+        def run(self, storage, input_key, output_key):
+            seen.append(os.getcwd())
+            super().run(storage, input_key, output_key)
+
+    storage = _storage(tmp_path)
+    run_branch_block(_ops((_Cwd("1"), "text", "a"), (_Cwd("2"), "text", "b")), storage.step())
+    assert seen == [pipeline_dir, pipeline_dir]
+    assert os.getcwd() == cwd
@@ -0,0 +1,138 @@
+"""
+cache_local 回收测试
+
+使用 pytest 运行:
+    pytest tests/test_cache_retention.py -v
+"""
+import os
+import time
+
+import pytest
+
+from app.services.cache_retention import (
+    CacheRetentionManager,
+    compress_task_steps,
+    open_step_file,
+    resolve_step_file,
+    step_file_path,
+    touch_step_file,
+)
+from app.services.task_store import SqliteTaskStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SqliteTaskStore(str(tmp_path / "tasks.db"))
+    yield s
+    s.close()
+
+
+def _make_run(cache_dir, store, task_id, steps=3, size=100, age=0.0, **record):
+    """写一次运行的输出：steps 个算子，每个 size 字节，mtime 往前推 age 秒"""
+    store.put(task_id, {"id": task_id, "status": "completed", **record})
+    stamp = time.time() - age
+    for step in range(steps):
+        path = step_file_path(task_id, step, str(cache_dir))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("x" * size)
+        os.utime(path, (stamp + step, stamp + step))
+
+
+def _exists(cache_dir, task_id, step):
+    return os.path.exists(step_file_path(task_id, step, str(cache_dir)))
+
+
+def test_quota_evicts_lru_intermediates_first(tmp_path, store):
+    cache_dir = tmp_path / "cache_local"
+    _make_run(cache_dir, store, "old", age=200)
+    _make_run(cache_dir, store, "new", age=100)
+    # 读过一次的中间步骤比没读过的更"新"
+    touch_step_file(step_file_path("old", 0, str(cache_dir)))
+
+    manager = CacheRetentionManager(str(cache_dir), store, quota_bytes=350)
+    summary = manager.enforce()
+
+    assert summary["total_bytes"] <= 350
+    assert not _exists(cache_dir, "old", 1)
+    assert not _exists(cache_dir, "new", 0) and not _exists(cache_dir, "new", 1)
+    # 最终输出保留
+    assert _exists(cache_dir, "old", 2) and _exists(cache_dir, "new", 2)
+    assert _exists(cache_dir, "old", 0)
+    assert store.get("new")["evicted_steps"] == [0, 1]
+    assert store.get("old")["cache_evicted_reason"] == "quota"
+
+
+def test_pinned_and_running_tasks_are_protected(tmp_path, store):
+    cache_dir = tmp_path / "cache_local"
+    _make_run(cache_dir, store, "pinned", age=10 * 86400, pinned=True)
+    _make_run(cache_dir, store, "running", age=10 * 86400)
+    store.patch("running", {"status": "running"})
+    _make_run(cache_dir, store, "stale", age=10 * 86400)
+
+    manager = CacheRetentionManager(str(cache_dir), store, quota_bytes=1, max_age_days=1)
+    summary = manager.enforce()
+
+    assert summary["evicted_tasks"] == ["stale"]
+    assert not os.path.exists(os.path.dirname(step_file_path("stale", 0, str(cache_dir))))
+    assert store.get("stale")["evicted_steps"] == [0, 1, 2]
+    assert all(_exists(cache_dir, t, s) for t in ("pinned", "running") for s in range(3))
+
+
+def test_max_runs_keeps_newest(tmp_path, store):
+    cache_dir = tmp_path / "cache_local"
+    for i in range(4):
+        _make_run(cache_dir, store, f"t{i}", steps=1, age=100 - i)
+
+    CacheRetentionManager(str(cache_dir), store, max_runs=2).enforce()
+
+    assert [t for t in ("t0", "t1", "t2", "t3") if _exists(cache_dir, t, 0)] == ["t2", "t3"]
+    usage = CacheRetentionManager(str(cache_dir), store).usage()
+    assert usage["task_count"] == 2 and usage["total_bytes"] == 200
+
+
+def test_maybe_enforce_skips_full_scan_under_quota(tmp_path, store, monkeypatch):
+    cache_dir = tmp_path / "cache_local"
+    _make_run(cache_dir, store, "a")
+    manager = CacheRetentionManager(str(cache_dir), store, quota_bytes=1000)
+    # 没有记录时做一次全量扫描并记下占用
+    assert manager.maybe_enforce("a")["total_bytes"] == 300
+
+    scans = []
+    real_scan = manager._scan
+    monkeypatch.setattr(manager, "_scan", lambda: scans.append(1) or real_scan())
+    _make_run(cache_dir, store, "b")
+    # 估算仍在配额内：只统计新任务的目录
+    assert manager.maybe_enforce("b") is None
+    assert scans == []
+
+    # 估算超出配额：全量扫描并回收
+    _make_run(cache_dir, store, "c", size=200)
+    summary = manager.maybe_enforce("c")
+    assert scans == [1]
+    assert summary["total_bytes"] <= 1000
+
+
+def test_compress_intermediate_steps_and_read_back(tmp_path, store):
+    cache_dir = tmp_path / "cache_local"
+    store.put("t1", {"id": "t1", "status": "completed"})
+    rows = "".join(f'{{"id": {i}, "text": "hello world"}}\n' for i in range(200))
+    for step in range(3):
+        path = step_file_path("t1", step, str(cache_dir))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(rows)
+
+    summary = compress_task_steps("t1", str(cache_dir))
+
+    assert summary["files"] == 2
+    assert summary["bytes_after"] < summary["bytes_before"] / 3
+    # 最终步骤保持原样
+    assert resolve_step_file("t1", 2, str(cache_dir)) == step_file_path("t1", 2, str(cache_dir))
+    compressed = resolve_step_file("t1", 0, str(cache_dir))
+    assert compressed.endswith(".jsonl.gz")
+    with open_step_file(compressed) as f:
+        assert f.read() == rows
+    # 再次压缩不会重复处理；回收器照常统计压缩文件
+    assert compress_task_steps("t1", str(cache_dir))["files"] == 0
+    assert CacheRetentionManager(str(cache_dir), store).usage()["file_count"] == 3
@@ -0,0 +1,145 @@
+"""
+进程内隔离执行测试：按线程捕获输出、不改 cwd、相对路径参数解析、旧模式兼容、threaded worker
+
+使用 pytest 运行:
+    pytest tests/test_execution_context.py -v
+"""
+import io
+import os
+import sys
+import threading
+import time
+
+import pytest
+import ray
+
+from app.core.config import settings
+from app.services.execution_context import (
+    capture_output,
+    current_workdir,
+    isolated_context_enabled,
+    operator_io,
+    operator_param,
+    pipeline_workdir,
+    resolve_path_param,
+    working_directory,
+)
+from app.services.worker_pool import WorkerPool, current_rss_mb
+
+
+def test_concurrent_threads_capture_their_own_output():
+    streams = {name: io.StringIO() for name in ("a", "b")}
+    barrier = threading.Barrier(2)
+
+    def run(name):
+        with capture_output(streams[name]):
+            barrier.wait()
+            for i in range(50):
+                print(f"{name}{i}")
+                time.sleep(0.001)
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in streams]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, stream in streams.items():
+        assert stream.getvalue().split() == [f"{name}{i}" for i in range(50)]
+    print("after capture")  # 没有绑定时回到原来的 stdout，不应写进任何一个 buffer
+    assert "after capture" not in streams["a"].getvalue() + streams["b"].getvalue()
+
+
+def test_operator_io_keeps_the_process_cwd(monkeypatch):
+    monkeypatch.setattr(settings, "EXECUTION_ISOLATED_CONTEXT", True)
+    cwd = os.getcwd()
+    out, err = io.StringIO(), io.StringIO()
+    with operator_io(out, err):
+        print("hello")
+        sys.stderr.write("oops\n")
+        assert os.getcwd() == cwd
+        assert current_workdir() == os.path.abspath(pipeline_workdir())
+    assert (out.getvalue(), err.getvalue()) == ("hello\n", "oops\n")
+    assert current_workdir() == cwd
+
+
+def test_relative_path_params_resolve_against_the_run_workdir(tmp_path, monkeypatch):
+    assert resolve_path_param("./data/in.jsonl", str(tmp_path)) == str(tmp_path / "data" / "in.jsonl")
+    assert resolve_path_param("../x.json", str(tmp_path / "sub")) == str(tmp_path / "x.json")
+    for value in ("text", "/abs/path", "./a\n./b", 3, None, ["./a"]):
+        assert resolve_path_param(value, str(tmp_path)) == value
+    with working_directory(str(tmp_path)):
+        assert resolve_path_param("./a") == str(tmp_path / "a")
+
+    monkeypatch.setattr(settings, "EXECUTION_ISOLATED_CONTEXT", True)
+    assert operator_param("./prompts") == os.path.join(pipeline_workdir(), "prompts")
+    monkeypatch.setattr(settings, "EXECUTION_ISOLATED_CONTEXT", False)
+    assert operator_param("./prompts") == "./prompts"
+
+
+def test_isolation_is_opt_in_unless_workers_run_jobs_concurrently(monkeypatch):
+    monkeypatch.setattr(settings, "EXECUTION_ISOLATED_CONTEXT", False)
+    monkeypatch.setattr(settings, "EXECUTION_WORKER_CONCURRENCY", 1)
+    assert not isolated_context_enabled()
+    monkeypatch.setattr(settings, "EXECUTION_WORKER_CONCURRENCY", 4)
+    assert isolated_context_enabled()
+    assert operator_param("./prompts") == os.path.join(pipeline_workdir(), "prompts")
+
+
+def test_legacy_mode_changes_and_restores_the_cwd(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EXECUTION_ISOLATED_CONTEXT", False)
+    monkeypatch.setattr(settings, "DATAFLOW_CORE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "BASE_DIR", os.getcwd())
+    (tmp_path / "api_pipelines").mkdir()
+    out = io.StringIO()
+    with operator_io(out):
+        assert os.getcwd() == str(tmp_path / "api_pipelines")
+        print("legacy")
+    assert os.getcwd() == settings.BASE_DIR
+    assert out.getvalue() == "legacy\n"
+
+
+class _SleepWorker:
+    def __init__(self):
+        self.jobs = 0
+        self.baseline_rss_mb = current_rss_mb()
+
+    def run(self, pipeline_config, dataflow_runtime, task_id, pipeline_execution_path, state_actor=None):
+        time.sleep(pipeline_config.get("sleep", 0))
+        self.jobs += 1
+        return {"task_id": task_id, "pid": os.getpid()}
+
+    def stats(self):
+        return {"pid": os.getpid(), "jobs": self.jobs, "rss_growth_mb": 0.0}
+
+
+@pytest.mark.ray
+def test_threaded_worker_runs_jobs_concurrently(monkeypatch):
+    monkeypatch.setattr(settings, "EXECUTION_ISOLATED_CONTEXT", True)
+    started_ray = not ray.is_initialized()
+    if started_ray:
+        ray.init(num_cpus=2, include_dashboard=False, logging_level="error", log_to_driver=False)
+    pool = WorkerPool(size=1, max_jobs=3, max_rss_growth_mb=0, worker_cls=_SleepWorker, concurrency=2)
+    try:
+        ray.get(pool.submit("warm", {}, {}, "unused"), timeout=60)
+        pool.release("warm")
+        started = time.monotonic()
+        refs = [pool.submit(task_id, {"sleep": 1.0}, {}, "unused") for task_id in ("a", "b")]
+        results = ray.get(refs, timeout=60)
+        assert time.monotonic() - started < 1.8
+        assert results[0]["pid"] == results[1]["pid"]
+
+        # 到期的 actor 等手上的任务都结束才回收
+        pool.release("a")
+        assert pool.recycled_count == 0 and pool.busy("b")
+        pool.release("b")
+        assert pool.recycled_count == 1
+        assert ray.get(pool.submit("next", {}, {}, "unused"), timeout=60)["pid"] != results[0]["pid"]
+    finally:
+        pool.shutdown()
+        if started_ray:
+            ray.shutdown()
+
+    monkeypatch.setattr(settings, "EXECUTION_ISOLATED_CONTEXT", False)
+    monkeypatch.setattr(settings, "EXECUTION_WORKER_CONCURRENCY", 1)
+    assert WorkerPool(size=1, concurrency=4).concurrency == 1
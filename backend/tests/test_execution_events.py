@@ -0,0 +1,64 @@
+"""
+执行事件推送测试
+
+使用 pytest 运行:
+    pytest tests/test_execution_events.py -v
+"""
+import asyncio
+
+from app.services.execution_events import ExecutionEventHub
+from app.services.task_journal import TaskJournal
+
+
+async def _collect(hub, task_id, journal, since=0):
+    events = []
+    async for event in hub.subscribe(task_id, journal, since):
+        if event is not None:
+            events.append(event)
+    return events
+
+
+def test_replay_then_live_until_terminal(tmp_path):
+    async def scenario():
+        hub = ExecutionEventHub(poll_interval=0.01)
+        journal = TaskJournal(str(tmp_path / "t1.jsonl"))
+        journal.append("status", status="running", fields={})
+        journal.append("log", line="replayed")
+
+        # 同一任务的两个订阅者共用一个广播通道
+        readers = [asyncio.create_task(_collect(hub, "t1", journal)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert hub.subscriber_count("t1") == 2
+
+        journal.append("operator", op_key="Op_0", fields={"status": "running"})
+        journal.append("log", op_key="Op_0", line="live")
+        journal.append("status", status="completed", fields={})
+
+        results = await asyncio.wait_for(asyncio.gather(*readers), timeout=2)
+        assert hub.subscriber_count("t1") == 0
+        journal.close()
+        return results
+
+    first, second = asyncio.run(scenario())
+    assert [e["type"] for e in first] == ["status", "log", "operator", "log", "status"]
+    assert first == second
+    cursors = [e["cursor"] for e in first]
+    assert cursors == sorted(set(cursors))
+
+
+def test_resume_from_cursor_skips_seen_events(tmp_path):
+    journal = TaskJournal(str(tmp_path / "t1.jsonl"))
+    journal.append("log", line="a")
+    journal.append("log", line="b")
+    journal.append("status", status="failed", fields={})
+    journal.close()
+
+    async def scenario():
+        hub = ExecutionEventHub(poll_interval=0.01)
+        everything = await _collect(hub, "t1", journal)
+        resumed = await _collect(hub, "t1", journal, since=everything[0]["cursor"])
+        return everything, resumed
+
+    everything, resumed = asyncio.run(scenario())
+    assert [e.get("line") for e in resumed] == ["b", None]
+    assert resumed[-1]["status"] == "failed"
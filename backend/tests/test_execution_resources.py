@@ -0,0 +1,143 @@
+"""
+执行资源请求与准入测试：声明 / 历史 / 数据集估算、空闲资源判断、调度器排队等待
+
+使用 pytest 运行:
+    pytest tests/test_execution_resources.py -v
+"""
+import pytest
+
+from app.core.config import settings
+from app.services.execution_resources import (
+    MB,
+    ResourceRequest,
+    dataset_memory_mb,
+    estimate_request,
+    fits,
+    historical_memory_mb,
+)
+from app.services.execution_scheduler import ExecutionScheduler, QueuedExecution
+from app.services.task_store import create_task_store
+
+
+def test_declared_resources_take_the_largest_operator_and_smallest_limit():
+    config = {
+        "resources": {"num_cpus": 1, "max_concurrent": 3},
+        "operators": [
+            {"name": "Embed", "resources": {"num_cpus": 4, "memory_mb": 6000, "max_concurrent": 1}},
+            {"name": "Filter", "resources": {"memory_mb": 500}},
+            {"name": "Plain"},
+        ],
+    }
+    request = estimate_request(config, dataset={"file_size": 10 * MB}, history_mb=9000)
+
+    assert request.num_cpus == 4
+    assert request.memory_mb == 6000
+    assert request.max_concurrent == 1
+    assert request.sources == {"num_cpus": "declared", "memory_mb": "declared"}
+
+
+def test_memory_is_estimated_from_dataset_and_history():
+    by_size = dataset_memory_mb({"file_size": 100 * MB, "num_samples": 10})
+    assert by_size == pytest.approx(settings.EXECUTION_MEMORY_BASE_MB + 100 * settings.EXECUTION_MEMORY_PER_INPUT_MB)
+    by_rows = dataset_memory_mb({"file_size": 0, "num_samples": 1024})
+    assert by_rows == pytest.approx(settings.EXECUTION_MEMORY_BASE_MB + settings.EXECUTION_MEMORY_PER_ROW_KB)
+    assert dataset_memory_mb(None) is None
+
+    request = estimate_request({}, dataset={"file_size": 100 * MB}, history_mb=by_size + 1000)
+    assert request.sources["memory_mb"] == "history"
+    assert estimate_request({}, dataset={"file_size": 100 * MB}).sources["memory_mb"] == "dataset"
+    assert estimate_request({}).memory_mb == settings.EXECUTION_MEMORY_BASE_MB
+
+    restored = ResourceRequest.from_dict(request.to_dict())
+    assert restored == request
+
+
+def test_history_uses_measured_memory_of_finished_runs(tmp_path):
+    store = create_task_store(str(tmp_path / "task_registry.json"))
+    store.put("a", {"id": "a", "pipeline_id": "p1", "status": "completed", "resource_usage": {"memory_mb": 500}})
+    store.put("b", {"id": "b", "pipeline_id": "p1", "status": "completed", "resource_usage": {"memory_mb": 800}})
+    store.put("c", {"id": "c", "pipeline_id": "p1", "status": "failed", "resource_usage": {"memory_mb": 9000}})
+    store.put("d", {"id": "d", "pipeline_id": "p2", "status": "completed", "resource_usage": {"memory_mb": 7000}})
+    # 采样运行不算历史
+    store.put("e", {"id": "e", "pipeline_id": "p1", "status": "completed", "sample": {"mode": "head", "size": 10},
+                    "resource_usage": {"memory_mb": 5000}})
+
+    assert historical_memory_mb(store, "p1") == pytest.approx(800 * settings.EXECUTION_MEMORY_HISTORY_HEADROOM)
+    assert historical_memory_mb(store, "p3") is None
+    assert historical_memory_mb(store, "custom") is None
+
+
+def test_fits_accounts_for_reserved_requests_and_oversized_runs():
+    total = {"CPU": 4.0, "memory": 8000 * MB}
+    request = ResourceRequest(num_cpus=2, memory_mb=3000)
+
+    assert fits(request, total, total)
+    assert not fits(request, total, total, reserved=ResourceRequest(num_cpus=1, memory_mb=6000))
+    assert not fits(request, {"CPU": 1.0, "memory": 8000 * MB}, total)
+
+    huge = ResourceRequest(num_cpus=1, memory_mb=20000)
+    assert not fits(huge, total, total)
+    assert fits(huge, total, total, idle=True)
+
+
+def _entry(task_id, seq, pipeline_id="p", **resources):
+    return QueuedExecution(
+        task_id=task_id,
+        lane="batch",
+        user_id="default",
+        seq=seq,
+        enqueued_at="2024-05-01T12:00:00",
+        registry_path="unused",
+        pipeline_id=pipeline_id,
+        resources=resources,
+    )
+
+
+def test_scheduler_waits_for_resources_in_policy_order():
+    launched = []
+    free = {"memory_mb": 1000}
+
+    def admit(entry, running):
+        used = sum(e.resources.get("memory_mb", 0) for e in running)
+        return entry.resources.get("memory_mb", 0) + used <= free["memory_mb"]
+
+    scheduler = ExecutionScheduler(
+        max_concurrency=3,
+        interactive_reserved=0,
+        launcher=lambda entry: launched.append(entry.task_id) or True,
+        estimator=lambda entry: 10.0,
+        admit=admit,
+    )
+    scheduler.enqueue(_entry("small", 1, memory_mb=600))
+    scheduler.enqueue(_entry("big", 2, memory_mb=900))
+    # big 放不下时，后面更小的任务也不插队
+    scheduler.enqueue(_entry("tiny", 3, memory_mb=100))
+    try:
+        assert launched == ["small"]
+        assert scheduler.blocked == "big"
+        assert scheduler.queue_info("big")["waiting_for"] == "resources"
+        assert "waiting_for" not in scheduler.queue_info("tiny")
+
+        scheduler.finished("small")
+        assert launched == ["small", "big", "tiny"]
+        assert scheduler.blocked is None
+    finally:
+        scheduler.reset()
+
+
+def test_max_concurrent_limits_runs_of_one_pipeline():
+    launched = []
+    scheduler = ExecutionScheduler(
+        max_concurrency=3,
+        interactive_reserved=0,
+        launcher=lambda entry: launched.append(entry.task_id) or True,
+        estimator=lambda entry: 10.0,
+    )
+    scheduler.enqueue(_entry("gpu-1", 1, pipeline_id="gpu", max_concurrent=1))
+    scheduler.enqueue(_entry("gpu-2", 2, pipeline_id="gpu", max_concurrent=1))
+    scheduler.enqueue(_entry("other", 3, pipeline_id="cpu"))
+
+    assert launched == ["gpu-1", "other"]
+    assert scheduler.plan()["gpu-2"]["estimated_wait_s"] == pytest.approx(10, abs=1)
+    scheduler.finished("gpu-1")
+    assert launched[-1] == "gpu-2"
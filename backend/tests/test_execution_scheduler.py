@@ -0,0 +1,141 @@
+"""
+执行调度器测试：并发上限、交互 / 批量队列、按用户公平分配、排队 ETA、重启恢复
+
+使用 pytest 运行:
+    pytest tests/test_execution_scheduler.py -v
+"""
+import pytest
+
+from app.core.config import settings
+from app.services.execution_scheduler import ExecutionScheduler, QueuedExecution, execution_scheduler
+from app.services.task_store import create_task_store
+
+
+def _entry(task_id, seq, lane="batch", user_id="default"):
+    return QueuedExecution(
+        task_id=task_id,
+        lane=lane,
+        user_id=user_id,
+        seq=seq,
+        enqueued_at="2024-05-01T12:00:00",
+        registry_path="unused",
+    )
+
+
+@pytest.fixture
+def launched():
+    return []
+
+
+def _scheduler(launched, max_concurrency=1, interactive_reserved=0, estimate=100.0):
+    return ExecutionScheduler(
+        max_concurrency=max_concurrency,
+        interactive_reserved=interactive_reserved,
+        launcher=lambda entry: launched.append(entry.task_id) or True,
+        estimator=lambda entry: estimate,
+    )
+
+
+def test_concurrency_limit_and_dispatch_on_finish(launched):
+    scheduler = _scheduler(launched, max_concurrency=2)
+    for i in range(4):
+        scheduler.enqueue(_entry(f"t{i}", seq=i))
+
+    assert launched == ["t0", "t1"]
+    assert scheduler.queued_count() == 2
+
+    scheduler.finished("t0")
+    assert launched == ["t0", "t1", "t2"]
+    assert scheduler.remove("t3") is True
+    scheduler.finished("t1")
+    assert launched == ["t0", "t1", "t2"]
+
+
+def test_interactive_lane_goes_first_and_keeps_reserved_slot(launched):
+    scheduler = _scheduler(launched, max_concurrency=2, interactive_reserved=1)
+    scheduler.enqueue(_entry("batch-1", seq=1))
+    scheduler.enqueue(_entry("batch-2", seq=2))
+    # 预留槽位不给批量任务
+    assert launched == ["batch-1"]
+
+    scheduler.enqueue(_entry("sample", seq=3, lane="interactive"))
+    assert launched == ["batch-1", "sample"]
+
+    # 槽位已满，后到的 interactive 也在等，但空出槽位时排在 batch-2 前面
+    scheduler.enqueue(_entry("sample-2", seq=4, lane="interactive"))
+    scheduler.finished("batch-1")
+    assert launched == ["batch-1", "sample", "sample-2"]
+
+    scheduler.finished("sample")
+    assert launched[-1] == "batch-2"
+
+
+def test_fair_share_between_users(launched):
+    scheduler = _scheduler(launched, max_concurrency=1)
+    for i in range(3):
+        scheduler.enqueue(_entry(f"alice-{i}", seq=i, user_id="alice"))
+    scheduler.enqueue(_entry("bob-0", seq=10, user_id="bob"))
+
+    scheduler.finished("alice-0")
+    scheduler.finished(launched[-1])
+    assert launched == ["alice-0", "bob-0", "alice-1"]
+
+
+def test_plan_reports_position_and_eta(launched):
+    scheduler = _scheduler(launched, max_concurrency=1, estimate=100.0)
+    scheduler.enqueue(_entry("running", seq=0))
+    scheduler.enqueue(_entry("next", seq=1))
+    scheduler.enqueue(_entry("last", seq=2))
+
+    plan = scheduler.plan()
+    assert plan["next"]["position"] == 1
+    assert plan["last"]["position"] == 2
+    assert plan["last"]["ahead"] == 1
+    assert plan["next"]["estimated_wait_s"] == pytest.approx(100, abs=1)
+    assert plan["last"]["estimated_wait_s"] == pytest.approx(200, abs=1)
+    assert scheduler.queue_info("running") is None
+    assert scheduler.queue_info("last")["estimated_start_at"]
+
+
+def test_invalid_lane_is_rejected(launched):
+    scheduler = _scheduler(launched)
+    with pytest.raises(ValueError):
+        scheduler.enqueue(_entry("t", seq=1, lane="urgent"))
+
+
+@pytest.fixture
+def executor(launched):
+    from app.services.ray_pipeline_executor import RayPipelineExecutor, ray_executor
+
+    executor = RayPipelineExecutor(max_concurrency=1)
+    executor.scheduler = _scheduler(launched, max_concurrency=1)
+    yield executor
+    # 全局调度器仍然交给全局执行器
+    execution_scheduler.launcher = ray_executor._launch
+    execution_scheduler.max_concurrency = ray_executor.max_concurrency
+    execution_scheduler.admit = ray_executor._admit if settings.EXECUTION_RESOURCE_ADMISSION else None
+
+
+def test_recover_queue_from_task_store(tmp_path, executor, launched):
+    path = str(tmp_path / "task_registry.json")
+    store = create_task_store(path)
+
+    def _queued(task_id, seq, lane="batch", dispatched=False):
+        scheduling = {"lane": lane, "user_id": "default", "seq": seq, "enqueued_at": "2024-05-01T12:00:00"}
+        if dispatched:
+            scheduling["dispatched_at"] = "2024-05-01T12:00:01"
+        store.put(task_id, {"id": task_id, "status": "queued", "pipeline_config": {}, "scheduling": scheduling})
+
+    _queued("batch-old", seq=1)
+    _queued("batch-new", seq=3)
+    _queued("sample", seq=2, lane="interactive")
+    _queued("orphan", seq=0, dispatched=True)
+    store.put("running", {"id": "running", "status": "running", "scheduling": {"lane": "batch", "seq": 5}})
+    store.put("legacy", {"id": "legacy", "status": "queued"})
+
+    assert executor.recover_queue(path) == 4
+    # 交互队列先走；本地 Ray 随进程退出，已派发但未运行的任务重新排队
+    assert launched == ["sample"]
+    assert executor.scheduler.queued_count() == 3
+    assert "dispatched_at" not in store.get("orphan")["scheduling"]
+    assert executor.scheduler.plan()["orphan"]["position"] == 1
@@ -0,0 +1,137 @@
+"""
+执行状态单写者测试
+
+使用 pytest 运行:
+    pytest tests/test_execution_state.py -v
+"""
+import threading
+import time
+
+import pytest
+
+from app.services.execution_state import (
+    BufferedExecutionReporter,
+    ExecutionStateService,
+    execution_state_actor_name,
+)
+from app.services.task_journal import JournalCache, TaskJournal, journal_path_for
+
+
+@pytest.fixture
+def service(tmp_path):
+    registry_path = str(tmp_path / "task_registry.json")
+    svc = ExecutionStateService(registry_path)
+    svc.store.put("t1", {"id": "t1", "status": "queued", "created_at": "2024-01-01T00:00:00"})
+    yield svc
+    svc.stop()
+    svc.store.close()
+
+
+def _journal(service, task_id="t1"):
+    return TaskJournal(journal_path_for(service.registry_path, task_id))
+
+
+def test_flush_coalesces_progress_and_merges_status(service):
+    service.submit("t1", [
+        {"type": "status", "status": "running", "fields": {"started_at": "t0"}},
+        {"type": "operator", "op_key": "Op_0", "fields": {"status": "running"}},
+    ])
+    service.submit("t1", [
+        {"type": "progress", "op_key": "Op_0", "percentage": p, "progress": f"{p}%"}
+        for p in (10.0, 20.0, 30.0)
+    ] + [{"type": "log", "op_key": "Op_0", "line": "hello"}])
+
+    # 落盘之前什么都不写
+    assert service.snapshot("t1") is None
+    assert not _journal(service).exists()
+
+    assert service.flush() == 4
+    assert service.stats["coalesced"] == 2
+
+    record = service.store.get("t1")
+    assert record["status"] == "running" and record["started_at"] == "t0"
+
+    snapshot = service.snapshot("t1")
+    assert snapshot["status"] == "running"
+    assert snapshot["operators_detail"]["Op_0"]["progress_percentage"] == 30.0
+    assert snapshot["logs"] == ["hello"]
+    # 内存视图与日志文件一致：cursor 就是日志的字节偏移
+    assert snapshot["cursor"] == _journal(service).size()
+    assert JournalCache().view(_journal(service), "t1")["operators_detail"] == snapshot["operators_detail"]
+
+
+def test_progress_is_not_moved_across_operator_transition(service):
+    service.submit("t1", [
+        {"type": "progress", "op_key": "Op_0", "percentage": 90.0},
+        {"type": "operator", "op_key": "Op_0", "fields": {"status": "completed"}},
+        {"type": "progress", "op_key": "Op_0", "percentage": 100.0},
+    ], flush=True)
+    events, _ = _journal(service).read()
+    assert [e["type"] for _, e in events] == ["progress", "operator", "progress"]
+
+
+def test_buffered_reporter_batches_and_finish_is_durable(service):
+    sent = []
+
+    def send(task_id, events, wait):
+        sent.append(len(events))
+        service.submit(task_id, events, flush=wait)
+
+    reporter = BufferedExecutionReporter("t1", send, max_batch=3, max_delay=0)
+    reporter.status("running", started_at="t0")
+    for i in range(5):
+        reporter.log(f"line {i}", "Op_0")
+    reporter.finish({
+        "status": "completed",
+        "completed_at": "t1",
+        "logs": [f"line {i}" for i in range(5)],
+        "output": {"operators_detail": {"Op_0": {"status": "completed"}}, "operator_logs": {}},
+    })
+    reporter.close()
+
+    # status 立即发送，日志与 finish 按 3 条一批；最后一次空批次只是等待落盘
+    assert sent == [1, 3, 3, 0]
+    record = service.store.get("t1")
+    assert record["status"] == "completed"
+    assert record["started_at"] == "t0" and record["completed_at"] == "t1"
+    assert "logs" not in record
+    snapshot = service.snapshot("t1")
+    assert snapshot["status"] == "completed"
+    assert snapshot["logs"] == [f"line {i}" for i in range(5)]
+
+
+def test_reporter_sends_batches_in_buffer_order(service):
+    sent = []
+    first_sending = threading.Event()
+
+    def send(task_id, events, wait):
+        if not sent:
+            first_sending.set()
+            # 第一批发得慢：另一个线程的 flush 不能抢在它前面
+            time.sleep(0.1)
+        sent.append([e["line"] for e in events])
+
+    reporter = BufferedExecutionReporter("t1", send, max_batch=100, max_delay=0)
+    reporter.log("a")
+    slow = threading.Thread(target=reporter.flush)
+    slow.start()
+    first_sending.wait(1)
+    reporter.log("b")
+    reporter.flush()
+    slow.join()
+
+    assert sent == [["a"], ["b"]]
+
+
+def test_actor_name_is_keyed_by_registry_path(tmp_path):
+    first = execution_state_actor_name(str(tmp_path / "a" / "task_registry.json"))
+    second = execution_state_actor_name(str(tmp_path / "b" / "task_registry.json"))
+    assert first != second
+    assert first == execution_state_actor_name(str(tmp_path / "a" / ".." / "a" / "task_registry.json"))
+
+
+def test_forget_drops_state(service):
+    service.submit("t1", [{"type": "log", "line": "x"}], flush=True)
+    assert service.snapshot("t1") is not None
+    service.forget("t1")
+    assert service.snapshot("t1") is None
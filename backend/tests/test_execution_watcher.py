@@ -0,0 +1,97 @@
+"""
+执行完成监视器测试（本地 Ray）
+
+使用 pytest 运行:
+    pytest tests/test_execution_watcher.py -m ray -v
+"""
+import asyncio
+import os
+
+import pytest
+import ray
+
+from app.services.execution_watcher import ExecutionCompletionWatcher
+from app.services.task_store import create_task_store
+
+
+# 整个模块都要启动本地 Ray，默认不运行（pytest -m ray）
+pytestmark = pytest.mark.ray
+
+
+@pytest.fixture(scope="module", autouse=True)
+def local_ray():
+    started = not ray.is_initialized()
+    if started:
+        ray.init(num_cpus=2, include_dashboard=False, logging_level="error", log_to_driver=False)
+    yield
+    if started:
+        ray.shutdown()
+
+
+@ray.remote(max_retries=0)
+def _finish(status, write_store_path=None):
+    if write_store_path:
+        create_task_store(write_store_path).patch("t", {"status": status})
+    return {"task_id": "t", "status": status, "output": {"error": "boom"} if status == "failed" else {}}
+
+
+@ray.remote(max_retries=0)
+def _crash():
+    os._exit(1)
+
+
+@pytest.fixture
+def registry_path(tmp_path):
+    path = str(tmp_path / "task_registry.json")
+    create_task_store(path).put("t", {"id": "t", "status": "running", "created_at": "2024-01-01T00:00:00"})
+    return path
+
+
+def _run_until_idle(watcher):
+    async def scenario():
+        for _ in range(60):
+            await watcher.poll_once()
+            if watcher.pending_count == 0:
+                return
+        raise AssertionError("watcher did not finish")
+
+    asyncio.run(scenario())
+
+
+def test_completed_run_records_duration_and_releases_ref(registry_path):
+    watcher = ExecutionCompletionWatcher(poll_timeout=0.5)
+    watcher.track("t", _finish.remote("completed", registry_path), registry_path)
+
+    _run_until_idle(watcher)
+
+    record = create_task_store(registry_path).get("t")
+    assert record["status"] == "completed"
+    assert record["exit_reason"] == "completed"
+    assert record["duration_seconds"] >= 0
+    assert watcher.refs == {} and watcher.finalized_count == 1
+
+
+def test_returned_failure_is_persisted_by_driver(registry_path):
+    watcher = ExecutionCompletionWatcher(poll_timeout=0.5)
+    # worker 没来得及写终态，只返回了失败结果
+    watcher.track("t", _finish.remote("failed"), registry_path)
+
+    _run_until_idle(watcher)
+
+    record = create_task_store(registry_path).get("t")
+    assert record["status"] == "failed"
+    assert record["exit_reason"] == "failed"
+    assert record["output"]["error"] == "boom"
+
+
+def test_crashed_worker_is_detected(registry_path):
+    watcher = ExecutionCompletionWatcher(poll_timeout=0.5)
+    watcher.track("t", _crash.remote(), registry_path)
+
+    _run_until_idle(watcher)
+
+    record = create_task_store(registry_path).get("t")
+    assert record["status"] == "failed"
+    assert record["exit_reason"] == "worker_crashed"
+    assert "WorkerCrashedError" in record["output"]["error"]
+    assert watcher.pending_count == 0
@@ -0,0 +1,180 @@
+"""
+本机进程池执行器测试：worker 复用与回收、终止、进程崩溃、结束信息、backend 选择
+
+使用 pytest 运行:
+    pytest tests/test_local_executor.py -v
+"""
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import pipeline_executor
+from app.services.execution_scheduler import QueuedExecution
+from app.services.local_pipeline_executor import LocalPipelineExecutor, LocalWorkerCrashed, LocalWorkerPool
+from app.services.task_store import create_task_store
+
+
+def _job(pipeline_config, dataflow_runtime, task_id, pipeline_execution_path):
+    """与 run_local_job 签名一致的轻量任务，不加载 DataFlow"""
+    if pipeline_config.get("crash"):
+        os._exit(3)
+    time.sleep(pipeline_config.get("sleep", 0))
+    status = pipeline_config.get("status", "completed")
+    if pipeline_execution_path != "unused":
+        create_task_store(pipeline_execution_path).patch(task_id, {"status": status})
+    return {"task_id": task_id, "status": status, "pid": os.getpid()}
+
+
+def _pool(**kwargs):
+    return LocalWorkerPool(job=_job, warm_up=None, **dict({"size": 1, "max_jobs": 0, "max_rss_growth_mb": 0}, **kwargs))
+
+
+def _run(pool, task_id, **config):
+    message = pool.submit(task_id, (config, {}, task_id, "unused")).result(timeout=60)
+    pool.release(task_id)
+    return message["result"]
+
+
+def test_workers_are_reused_and_recycled_after_max_jobs():
+    pool = _pool(max_jobs=2)
+    pool.warm()
+    try:
+        first = _run(pool, "t1")["pid"]
+        assert _run(pool, "t2")["pid"] == first
+        assert pool.recycled_count == 1
+        assert _run(pool, "t3")["pid"] != first
+        assert pool.snapshot()["idle"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_kill_and_crash_end_the_future_and_refill_the_pool():
+    pool = _pool()
+    try:
+        future = pool.submit("slow", ({"sleep": 60}, {}, "slow", "unused"))
+        assert pool.busy("slow") and pool.kill("slow") is True
+        with pytest.raises(LocalWorkerCrashed):
+            future.result(timeout=30)
+        assert pool.snapshot() == {"size": 1, "idle": 1, "busy": {}, "recycled": 1}
+
+        with pytest.raises(LocalWorkerCrashed, match="code 3"):
+            pool.submit("crash", ({"crash": True}, {}, "crash", "unused")).result(timeout=60)
+        pool.release("crash")
+        assert pool.recycled_count == 2
+        assert _run(pool, "next")["status"] == "completed"
+    finally:
+        pool.shutdown()
+
+
+def test_dead_idle_workers_are_skipped_and_failed_submits_free_the_slot():
+    pool = _pool()
+    pool.warm()
+    try:
+        dead = pool._idle[0]
+        dead.process.kill()
+        dead.process.join(timeout=30)
+        assert _run(pool, "after_dead")["status"] == "completed"
+        assert pool.recycled_count == 1
+
+        def broken_send(message):
+            raise BrokenPipeError("pipe closed")
+
+        pool._idle[0].send = broken_send
+        with pytest.raises(LocalWorkerCrashed, match="pipe closed"):
+            pool.submit("lost", ({}, {}, "lost", "unused"))
+        assert not pool.busy("lost")
+        assert pool.recycled_count == 2
+        assert _run(pool, "next")["status"] == "completed"
+    finally:
+        pool.shutdown()
+
+
+@pytest.fixture
+def registry_path(tmp_path):
+    path = str(tmp_path / "task_registry.json")
+    for task_id in ("ok", "bad", "crash", "slow"):
+        create_task_store(path).put(task_id, {"id": task_id, "status": "queued", "created_at": "2024-01-01T00:00:00"})
+    return path
+
+
+def _launch(executor, registry_path, task_id, **config):
+    entry = QueuedExecution(
+        task_id=task_id, lane="batch", user_id="u", seq=1, enqueued_at="2024-01-01T00:00:00",
+        registry_path=registry_path,
+        payload={"pipeline_config": config, "dataflow_runtime": {}, "pipeline_execution_path": registry_path},
+    )
+    assert executor._launch(entry) is True
+
+
+def _wait_finalized(executor, count):
+    deadline = time.monotonic() + 60
+    while executor.finalized_count < count:
+        assert time.monotonic() < deadline, "execution was not finalized"
+        time.sleep(0.05)
+
+
+def test_executor_records_exit_reasons_and_notifies(registry_path):
+    executor = LocalPipelineExecutor(max_concurrency=2, pool=_pool(size=2))
+    finished = []
+    executor.add_finished_listener(finished.append)
+    store = create_task_store(registry_path)
+    try:
+        _launch(executor, registry_path, "ok")
+        _launch(executor, registry_path, "bad", status="failed")
+        _wait_finalized(executor, 2)
+        _launch(executor, registry_path, "crash", crash=True)
+        _wait_finalized(executor, 3)
+
+        assert store.get("ok")["status"] == "completed" and store.get("ok")["exit_reason"] == "completed"
+        assert store.get("bad")["exit_reason"] == "failed"
+        crashed = store.get("crash")
+        assert (crashed["status"], crashed["exit_reason"]) == ("failed", "worker_crashed")
+        assert "dispatched_at" in crashed["scheduling"]
+        assert sorted(finished) == ["bad", "crash", "ok"]
+
+        _launch(executor, registry_path, "slow", sleep=60)
+        assert executor.kill_execution("slow") is True
+        time.sleep(0.5)
+        assert executor.finalized_count == 3 and "slow" not in finished
+        assert executor.kill_execution("slow") is False
+    finally:
+        executor.pool.shutdown()
+
+
+def test_completion_and_listeners_run_off_the_event_loop(registry_path):
+    # 回收 worker 会 join 进程，不能占住事件循环
+    executor = LocalPipelineExecutor(max_concurrency=1, pool=_pool(max_jobs=1))
+    threads = []
+    executor.add_finished_listener(lambda task_id: threads.append(threading.get_ident()))
+
+    async def run():
+        executor._remember_loop()
+        _launch(executor, registry_path, "ok")
+        while not threads:
+            await asyncio.sleep(0.05)
+        return threading.get_ident()
+
+    try:
+        loop_thread = asyncio.run(asyncio.wait_for(run(), 60))
+        assert threads[0] != loop_thread
+        assert executor.finalized_count == 1 and executor.pool.recycled_count == 1
+    finally:
+        executor.pool.shutdown()
+
+
+def test_backend_is_selected_by_config(monkeypatch):
+    monkeypatch.setattr(pipeline_executor, "_executor", None)
+    monkeypatch.setattr(settings, "EXECUTION_BACKEND", "celery")
+    with pytest.raises(ValueError, match="EXECUTION_BACKEND"):
+        pipeline_executor.get_pipeline_executor()
+
+    from app.services.ray_pipeline_executor import ray_executor
+
+    monkeypatch.setattr(settings, "EXECUTION_BACKEND", "ray")
+    assert pipeline_executor.get_pipeline_executor() is ray_executor
+    assert pipeline_executor.get_pipeline_executor() is ray_executor
+    assert ray_executor.scheduler.launcher == ray_executor._launch
@@ -0,0 +1,140 @@
+"""
+参数扫描测试：参数定位、共享前缀后分叉、对比表
+
+使用 pytest 运行:
+    pytest tests/test_parameter_sweep.py -v
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.services.parameter_sweep import comparison, find_param, prefix_pipeline_config, variant_operators
+
+OPERATORS = [
+    {"name": "Clean", "params": {"init": [], "run": [{"name": "input_key", "value": "text"}]}},
+    {"name": "Score", "params": {"init": [{"name": "llm_serving", "value": "s1"}], "run": []}},
+    {"name": "Filter", "params": {"init": [{"name": "min_score", "value": 0.5}], "run": [{"name": "input_key", "value": "score"}]}},
+]
+
+
+def _detail(index, status, rows=None, seconds=0):
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    detail = {"index": index, "status": status, "started_at": start.isoformat()}
+    if status == "completed":
+        detail.update(sample_count=rows, completed_at=(start + timedelta(seconds=seconds)).isoformat())
+    return detail
+
+
+def _write_step(task_id, step, rows):
+    path = os.path.join(settings.CACHE_DIR, f"{task_id}_output", f"dataflow_cache_step_step{step + 1}.jsonl")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in rows)
+
+
+def test_param_lookup_and_variant_operators():
+    assert find_param(OPERATORS[2], "min_score") == "init"
+    assert find_param(OPERATORS[2], "input_key") == "run"
+    with pytest.raises(ValueError):
+        find_param(OPERATORS[2], "min_score", "run")
+
+    variant = variant_operators(OPERATORS, 2, "init", "min_score", 0.8)
+    assert variant[2]["params"]["init"][0]["value"] == 0.8
+    assert OPERATORS[2]["params"]["init"][0]["value"] == 0.5
+    assert [op["name"] for op in prefix_pipeline_config({"operators": OPERATORS}, 2)["operators"]] == ["Clean", "Score"]
+
+
+def test_comparison_table_lists_rows_durations_and_samples(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path))
+    _write_step("v1", 2, [{"text": f"t{i}"} for i in range(5)])
+    sweep = {
+        "operator_index": 2, "num_operators": 3, "prefix_task_id": "p",
+        "started_at": datetime.now().isoformat(),
+        "variants": [{"task_id": "v1", "value": 0.5}, {"task_id": "v2", "value": 0.9}],
+    }
+    prefix = ({}, {"status": "completed", "operators_detail": {"A": _detail(0, "completed", 10, 1), "B": _detail(1, "completed", 10, 30)}})
+    variants = {
+        "v1": ({}, {"status": "completed", "operators_detail": {"A": {"index": 0, "status": "reused"}, "C": _detail(2, "completed", 5, 2)}}),
+        "v2": ({}, {"status": "running", "operators_detail": {"C": _detail(2, "running")}}),
+    }
+
+    table = comparison(sweep, prefix, variants, sample_rows=2)
+    assert table["status"] == "running" and table["progress_percentage"] == 50.0
+    assert table["prefix"]["rows"] == 10 and table["prefix"]["duration_s"] == 31.0
+    first, second = table["variants"]
+    assert (first["value"], first["rows"], first["duration_s"]) == (0.5, 5, 2.0)
+    assert first["samples"] == [{"text": "t0"}, {"text": "t1"}]
+    assert (second["status"], second["rows"], second["samples"]) == ("running", None, [])
+
+
+def test_failed_prefix_fails_the_sweep():
+    sweep = {"operator_index": 1, "num_operators": 2, "prefix_task_id": "p", "variants": []}
+    prefix = ({"finished_at": "2026-01-01T00:00:00"}, {"status": "failed", "operators_detail": {}})
+    table = comparison(sweep, prefix, {})
+    assert table["status"] == "failed" and table["variants"] == []
+    assert comparison(sweep, ({}, {"status": "running"}), {})["status"] == "running"
+
+
+def test_branch_forks_one_variant_per_value_from_the_prefix(task_registry, monkeypatch):
+    pipeline_config = {"input_dataset": "ds", "operators": OPERATORS}
+    prefix = task_registry.create({"executor_type": "pipeline", "executor_name": "P"})
+    task_registry.store.update(prefix["id"], lambda r: r.update({
+        "status": "running", "pipeline_config": prefix_pipeline_config(pipeline_config, 2),
+    }))
+    sweep = task_registry.create({"executor_type": "sweep", "executor_name": "P"})
+    task_registry.store.update(sweep["id"], lambda r: r.update({
+        "status": "queued", "pipeline_id": "pl", "pipeline_config": pipeline_config,
+        "sweep": {"operator_index": 2, "num_operators": 3, "param": "min_score", "section": "init",
+                  "values": [0.3, 0.7], "prefix_task_id": prefix["id"], "variants": []},
+    }))
+    submitted = []
+
+    async def fake_start(**kwargs):
+        submitted.append(kwargs)
+        return {"task_id": f"variant-{len(submitted)}"}
+    monkeypatch.setattr(task_registry, "start_execution_async", fake_start)
+
+    assert asyncio.run(task_registry._branch_sweep(sweep["id"])) == []
+    task_registry.store.update(prefix["id"], lambda r: r.update({"status": "completed"}))
+    variants = asyncio.run(task_registry._branch_sweep(sweep["id"]))
+    assert asyncio.run(task_registry._branch_sweep(sweep["id"])) == []
+
+    assert [v["value"] for v in variants] == [0.3, 0.7]
+    config = submitted[1]["config"]
+    assert config["resume"] == {"parent_task_id": prefix["id"], "from_step": 2}
+    assert config["operators"][2]["params"]["init"][0]["value"] == 0.7
+    assert submitted[1]["sweep_id"] == sweep["id"] and submitted[1]["lineage"]["mode"] == "sweep"
+    assert task_registry.store.get(sweep["id"])["sweep"]["variants"] == variants
+
+
+def test_prefix_finished_callback_branches_from_a_worker_thread(task_registry, monkeypatch):
+    prefix = task_registry.create({"executor_type": "pipeline", "executor_name": "P"})
+    sweep = task_registry.create({"executor_type": "sweep", "executor_name": "P"})
+    task_registry.store.update(prefix["id"], lambda r: r.update({
+        "status": "completed", "sweep_id": sweep["id"],
+        "pipeline_config": prefix_pipeline_config({"operators": OPERATORS}, 1),
+    }))
+    task_registry.store.update(sweep["id"], lambda r: r.update({
+        "status": "queued", "pipeline_id": "pl", "pipeline_config": {"operators": OPERATORS},
+        "sweep": {"operator_index": 1, "num_operators": 3, "param": "llm_serving", "section": "init",
+                  "values": ["s1", "s2"], "prefix_task_id": prefix["id"], "variants": []},
+    }))
+
+    async def fake_start(**kwargs):
+        return {"task_id": f"variant-{kwargs['config']['operators'][1]['params']['init'][0]['value']}"}
+    monkeypatch.setattr(task_registry, "start_execution_async", fake_start)
+
+    async def finish_in_thread():
+        task_registry._loop = asyncio.get_running_loop()
+        # 本机执行器的读线程 / 完成监视器的线程池里没有运行中的事件循环
+        await asyncio.to_thread(task_registry._on_sweep_run_finished, prefix["id"])
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in list(task_registry._background)))
+
+    asyncio.run(finish_in_thread())
+    variants = task_registry.store.get(sweep["id"])["sweep"]["variants"]
+    assert [v["task_id"] for v in variants] == ["variant-s1", "variant-s2"]
+    assert not task_registry._background
@@ -0,0 +1,79 @@
+"""
+注册表文件多进程安全测试
+
+使用 pytest 运行:
+    pytest tests/test_registry_io.py -v
+"""
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from app.services.registry_io import RegistryFile, atomic_write_text
+
+
+def _increment(path: str, times: int):
+    registry_file = RegistryFile(path, fmt="json", default={"count": 0})
+    for _ in range(times):
+        with registry_file.transaction() as data:
+            data["count"] += 1
+
+
+def test_transactions_do_not_lose_updates_across_processes(tmp_path):
+    path = str(tmp_path / "counter.json")
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_increment, args=(path, 25)) for _ in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(timeout=60)
+        assert proc.exitcode == 0
+
+    assert RegistryFile(path, fmt="json").read()["count"] == 100
+
+
+def test_instances_see_each_others_writes(tmp_path):
+    path = str(tmp_path / "registry.yaml")
+    writer = RegistryFile(path, fmt="yaml", default={})
+    reader = RegistryFile(path, fmt="yaml", default={})
+    writer.ensure()
+    assert reader.read() == {}
+
+    version = reader.version
+    with writer.transaction() as data:
+        data["a"] = {"name": "数据集"}
+
+    assert reader.version != version
+    assert reader.read() == {"a": {"name": "数据集"}}
+
+
+def test_read_returns_a_copy_and_missing_file_uses_default(tmp_path):
+    registry_file = RegistryFile(str(tmp_path / "missing.json"), default={"pipelines": {}})
+    assert not registry_file.exists()
+    assert registry_file.version is None
+
+    data = registry_file.read()
+    data["pipelines"]["x"] = 1
+    assert registry_file.read() == {"pipelines": {}}
+
+
+def test_failed_transaction_does_not_write(tmp_path):
+    registry_file = RegistryFile(str(tmp_path / "registry.json"), default={})
+    registry_file.write({"a": 1})
+
+    with pytest.raises(ValueError):
+        with registry_file.transaction() as data:
+            data["a"] = 2
+            raise ValueError("boom")
+
+    assert registry_file.read() == {"a": 1}
+
+
+def test_atomic_write_leaves_no_temp_files(tmp_path):
+    path = tmp_path / "prefs.json"
+    atomic_write_text(str(path), json.dumps({"theme": "dark"}))
+    atomic_write_text(str(path), json.dumps({"theme": "light"}))
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"theme": "light"}
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
@@ -0,0 +1,62 @@
+"""
+采样运行测试：采样参数校验、head / random / percent 采样、非 JSONL 数据源
+
+使用 pytest 运行:
+    pytest tests/test_sample_runs.py -v
+"""
+import json
+
+import pandas as pd
+import pytest
+
+from app.services.sample_runs import materialize_sample, sample_spec
+
+
+def _dataset(tmp_path, rows=20):
+    path = tmp_path / "data.jsonl"
+    path.write_text("".join(json.dumps({"id": i}) + "\n" for i in range(rows)) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def _ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def test_sample_spec_validates_and_normalizes():
+    assert sample_spec(None) is None
+    assert sample_spec("head", 5.0) == {"mode": "head", "size": 5}
+    assert sample_spec("random", 3, None) == {"mode": "random", "size": 3, "seed": 0}
+    assert sample_spec("percent", 12.5, 7) == {"mode": "percent", "size": 12.5, "seed": 7}
+    for mode, size in (("head", None), ("head", 0), ("random", 2.5), ("percent", 150), ("tail", 3)):
+        with pytest.raises(ValueError):
+            sample_spec(mode, size)
+
+
+def test_head_random_and_percent_samples(tmp_path):
+    source = _dataset(tmp_path)
+
+    path, rows = materialize_sample(source, sample_spec("head", 5), str(tmp_path / "head"))
+    assert rows == 5 and _ids(path) == [0, 1, 2, 3, 4]
+    assert path.endswith("dataflow_cache_step_step0.jsonl")
+
+    path, rows = materialize_sample(source, sample_spec("random", 6, 42), str(tmp_path / "r1"))
+    first = _ids(path)
+    assert rows == 6 and first == sorted(first) and len(set(first)) == 6
+    path, _ = materialize_sample(source, sample_spec("random", 6, 42), str(tmp_path / "r2"))
+    assert _ids(path) == first
+    path, _ = materialize_sample(source, sample_spec("random", 6, 43), str(tmp_path / "r3"))
+    assert _ids(path) != first
+
+    path, rows = materialize_sample(source, sample_spec("percent", 25, 1), str(tmp_path / "pct"))
+    assert rows == 5 and len(_ids(path)) == 5
+    _, rows = materialize_sample(source, sample_spec("random", 100), str(tmp_path / "all"))
+    assert rows == 20
+
+
+def test_other_formats_are_sampled_through_the_storage_reader(tmp_path):
+    source = tmp_path / "data.csv"
+    pd.DataFrame({"id": range(10)}).to_csv(source, index=False)
+
+    path, rows = materialize_sample(str(source), sample_spec("head", 3), str(tmp_path / "out"))
+    assert rows == 3 and _ids(path) == [0, 1, 2]
@@ -0,0 +1,192 @@
+"""
+逐行算子分片并行执行测试：切片、并行运行、按顺序合并回标准 step 文件
+
+切片 / 合并 / 分片数用进程内的假 Ray 测试；真正启动本地 Ray 的用例标记为 ray，默认不运行。
+
+使用 pytest 运行:
+    pytest tests/test_sharded_execution.py -v
+    pytest tests/test_sharded_execution.py -m ray -v
+"""
+import contextlib
+import io
+import json
+import os
+import pickle
+
+import pytest
+import ray
+from dataflow.utils.storage import FileStorage
+
+from app.core.config import settings
+from app.services import sharded_execution
+from app.services.sharded_execution import SHARD_DIR, run_operator_sharded, shard_count
+
+
+@pytest.fixture(scope="module")
+def local_ray(tmp_path_factory):
+    started = not ray.is_initialized()
+    if started:
+        # 分片任务在 operator_io 里进入算子工作目录；给 worker 一个一定存在的目录，不依赖 data/dataflow_core 是否已初始化
+        core_dir = tmp_path_factory.mktemp("dataflow_core")
+        (core_dir / "api_pipelines").mkdir()
+        ray.init(num_cpus=2, include_dashboard=False, logging_level="error", log_to_driver=False,
+                 runtime_env={"env_vars": {"DATAFLOW_CORE_DIR": str(core_dir)}})
+    yield
+    if started:
+        ray.shutdown()
+
+
+class _UpperOperator:
+    """逐行算子：丢掉 text == "drop" 的行，其余加一列大写"""
+
+    def run(self, storage, input_key="text", output_key="upper"):
+        df = storage.read("dataframe")
+        df = df[df[input_key] != "drop"]
+        if df[input_key].eq("boom").any():
+            raise ValueError("bad row")
+        df[output_key] = df[input_key].str.upper()
+        print(f"shard rows {len(df)}")
+        storage.write(df)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EXECUTION_SHARD_MIN_ROWS", 2)
+    rows = [{"text": t} for t in ["a", "b", "drop", "c", "d", "e", "drop", "f", "g", "h"]]
+    source = tmp_path / "input.jsonl"
+    source.write_text("\n".join(json.dumps(r) for r in rows) + "\n", encoding="utf-8")
+    return FileStorage(
+        first_entry_file_name=str(source),
+        cache_path=str(tmp_path / "out"),
+        file_name_prefix="dataflow_cache_step",
+        cache_type="jsonl",
+    )
+
+
+class _FakeRay:
+    """进程内的 ray 替身：put 走一遍 pickle，分片在 get 时就地执行"""
+
+    def __init__(self):
+        self.cancelled = []
+
+    def is_initialized(self):
+        return True
+
+    def put(self, obj):
+        return pickle.loads(pickle.dumps(obj))
+
+    def wait(self, refs, num_returns=1):
+        return refs[:num_returns], refs[num_returns:]
+
+    def get(self, ref):
+        return ref()
+
+    def cancel(self, ref, force=False):
+        self.cancelled.append(ref)
+
+
+class _FakeShardTask:
+    """与 _run_shard 一样的返回值，只是不进 Ray"""
+
+    @staticmethod
+    def remote(operator, run_params, shard, index):
+        def run():
+            out, err = io.StringIO(), io.StringIO()
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                operator.run(**dict(run_params, storage=shard))
+            return {"index": index, "stdout": out.getvalue(), "stderr": err.getvalue()}
+        return run
+
+
+@pytest.fixture
+def fake_ray(monkeypatch):
+    fake = _FakeRay()
+    monkeypatch.setattr(sharded_execution, "ray", fake)
+    monkeypatch.setattr(sharded_execution, "_run_shard", _FakeShardTask)
+    return fake
+
+
+def _read_step(storage, step):
+    path = os.path.join(storage.cache_path, f"dataflow_cache_step_step{step}.jsonl")
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_shard_count_respects_min_rows(monkeypatch):
+    monkeypatch.setattr(settings, "EXECUTION_SHARD_MIN_ROWS", 100)
+    assert shard_count(None, 1000) == 1
+    assert shard_count(4, 1000) == 4
+    assert shard_count(8, 250) == 3
+    assert shard_count(4, 50) == 1
+
+
+def test_split_runs_every_shard_and_merges_in_order(storage, fake_ray):
+    progress = []
+    result = run_operator_sharded(
+        _UpperOperator(), {"storage": storage.step()}, 3, lambda done, total: progress.append((done, total))
+    )
+
+    assert result == {"shards": 3, "rows": 8, "stdout": "shard rows 2\nshard rows 3\nshard rows 3\n", "stderr": ""}
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert [r["upper"] for r in _read_step(storage, 1)] == list("ABCDEFGH")
+    assert not os.path.exists(os.path.join(storage.cache_path, SHARD_DIR))
+
+    # 分片数受最少行数限制；下一个算子从合并后的 step 文件继续
+    again = run_operator_sharded(_UpperOperator(), {"storage": storage.step(), "input_key": "upper", "output_key": "again"}, 10)
+    assert again["shards"] == 4
+    assert [r["again"] for r in _read_step(storage, 2)] == list("ABCDEFGH")
+
+
+def test_fully_filtered_shards_still_write_the_step(storage, fake_ray, tmp_path):
+    source = tmp_path / "input.jsonl"
+    source.write_text("\n".join(json.dumps({"text": "drop"}) for _ in range(4)) + "\n", encoding="utf-8")
+    result = run_operator_sharded(_UpperOperator(), {"storage": storage.step()}, 2)
+    assert result["rows"] == 0
+    assert os.path.getsize(os.path.join(storage.cache_path, "dataflow_cache_step_step1.jsonl")) == 0
+
+
+def test_failing_shard_cancels_the_rest(storage, fake_ray, tmp_path):
+    source = tmp_path / "input.jsonl"
+    source.write_text("\n".join(json.dumps({"text": t}) for t in ["boom", "a", "b", "c"]) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="bad row"):
+        run_operator_sharded(_UpperOperator(), {"storage": storage.step()}, 2)
+    assert len(fake_ray.cancelled) == 1
+    assert not os.path.exists(os.path.join(storage.cache_path, SHARD_DIR))
+
+
+@pytest.mark.ray
+@pytest.mark.usefixtures("local_ray")
+def test_sharded_steps_merge_in_order(storage):
+    progress = []
+    result = run_operator_sharded(
+        _UpperOperator(), {"storage": storage.step()}, 3, lambda done, total: progress.append((done, total))
+    )
+
+    assert result["shards"] == 3
+    assert result["rows"] == 8
+    assert result["stdout"].count("shard rows") == 3
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert [r["upper"] for r in _read_step(storage, 1)] == list("ABCDEFGH")
+    assert not os.path.exists(os.path.join(storage.cache_path, SHARD_DIR))
+
+    # 下一个算子从合并后的 step 文件继续，同样可以分片
+    again = run_operator_sharded(_UpperOperator(), {"storage": storage.step(), "input_key": "upper", "output_key": "again"}, 4)
+    assert again["shards"] == 4
+    assert [r["again"] for r in _read_step(storage, 2)] == list("ABCDEFGH")
+
+
+def test_unsharded_operators_fall_back_to_a_single_call(storage):
+    view = storage.step()
+    assert run_operator_sharded(_UpperOperator(), {"storage": view}, None) is None
+    assert run_operator_sharded(_UpperOperator(), {"storage": view}, 1) is None
+    assert not os.path.exists(os.path.join(storage.cache_path, "dataflow_cache_step_step1.jsonl"))
+
+
+@pytest.mark.ray
+@pytest.mark.usefixtures("local_ray")
+def test_failing_shard_fails_the_operator(storage, tmp_path):
+    source = tmp_path / "input.jsonl"
+    source.write_text("\n".join(json.dumps({"text": t}) for t in ["a", "b", "c", "boom"]) + "\n", encoding="utf-8")
+    with pytest.raises(ray.exceptions.RayTaskError):
+        run_operator_sharded(_UpperOperator(), {"storage": storage.step()}, 2)
+    assert not os.path.exists(os.path.join(storage.cache_path, SHARD_DIR))
@@ -0,0 +1,129 @@
+"""
+跨运行步骤缓存测试：缓存键、命中时链接输出、LRU 淘汰、运行级开关
+
+使用 pytest 运行:
+    pytest tests/test_step_cache.py -v
+"""
+import os
+
+from dataflow.utils.storage import FileStorage
+
+from app.core.config import settings
+from app.services.step_cache import StepCache, cache_enabled, step_key, view_key
+
+
+class _Upper:
+    def run(self, storage, input_key="text"):
+        pass
+
+
+class _Lower:
+    def run(self, storage, input_key="text"):
+        pass
+
+
+def _op(run=(), init=()):
+    return {
+        "name": "Op",
+        "params": {
+            "init": [{"name": k, "value": v} for k, v in init],
+            "run": [{"name": k, "value": v} for k, v in run],
+        },
+    }
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_key_covers_input_operator_and_params():
+    base = step_key("sha-a", _Upper, _op(run=[("input_key", "text"), ("output_key", "out")]))
+
+    assert base == step_key("sha-a", _Upper, _op(run=[("output_key", "out"), ("input_key", "text"), ("storage", None)]))
+    assert base != step_key("sha-b", _Upper, _op(run=[("input_key", "text"), ("output_key", "out")]))
+    assert base != step_key("sha-a", _Lower, _op(run=[("input_key", "text"), ("output_key", "out")]))
+    assert base != step_key("sha-a", _Upper, _op(run=[("input_key", "text"), ("output_key", "other")]))
+
+
+def test_key_follows_serving_params_but_not_api_key():
+    def runtime(model, api_key):
+        params = [{"name": "model_name", "value": model}, {"name": "api_key", "value": api_key}]
+        return {"serving_map": {"s1": {"cls_name": "APILLMServing_request", "params": params}}}
+
+    op = _op(init=[("llm_serving", "s1")])
+    key = step_key("sha", _Upper, op, runtime("gpt-a", "secret-1"))
+
+    assert key == step_key("sha", _Upper, op, runtime("gpt-a", "secret-2"))
+    assert key != step_key("sha", _Upper, op, runtime("gpt-b", "secret-1"))
+
+
+def test_store_and_restore_link_the_output(tmp_path):
+    cache = StepCache(root=str(tmp_path / "step_cache"), quota_bytes=0)
+    output = str(tmp_path / "run1" / "step1.jsonl")
+    _write(output, '{"a": 1}\n')
+
+    stored = cache.store("ab" * 32, output, rows=1)
+    assert stored["rows"] == 1 and stored["output_sha256"]
+    assert cache.restore("cd" * 32, str(tmp_path / "run2" / "step1.jsonl")) is None
+
+    target = str(tmp_path / "run2" / "step1.jsonl")
+    _write(target, "stale\n")
+    hit = cache.restore("ab" * 32, target)
+    assert hit["hits"] == 1 and hit["output_sha256"] == stored["output_sha256"]
+    assert os.stat(target).st_ino == os.stat(output).st_ino
+
+
+def test_lru_eviction_keeps_recently_used_entries(tmp_path):
+    cache = StepCache(root=str(tmp_path / "step_cache"), quota_bytes=25)
+    for i, key in enumerate(("aa" * 32, "bb" * 32)):
+        output = str(tmp_path / f"out{i}.jsonl")
+        _write(output, "x" * 10)
+        cache.store(key, output)
+    # 命中让 aa 变成最近使用，超额时先淘汰 bb
+    assert cache.restore("aa" * 32, str(tmp_path / "hit.jsonl")) is not None
+    output = str(tmp_path / "out2.jsonl")
+    _write(output, "y" * 10)
+    cache.store("cc" * 32, output)
+
+    assert cache.restore("bb" * 32, str(tmp_path / "miss.jsonl")) is None
+    assert cache.restore("aa" * 32, str(tmp_path / "hit.jsonl")) is not None
+    assert cache.usage()["entries"] == 2
+
+
+def test_store_scans_only_when_the_running_total_exceeds_the_quota(tmp_path, monkeypatch):
+    cache = StepCache(root=str(tmp_path / "step_cache"), quota_bytes=25)
+    scans = []
+    real_entries = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: scans.append(1) or real_entries())
+
+    for i, key in enumerate(("aa" * 32, "bb" * 32)):
+        output = str(tmp_path / f"out{i}.jsonl")
+        _write(output, "x" * 10)
+        cache.store(key, output)
+    # 第一次建立累计值时扫描一次，之后只加上新条目的大小
+    assert len(scans) == 1
+    assert cache._read_meta(cache._index_path)["total_bytes"] == 20
+
+    output = str(tmp_path / "out2.jsonl")
+    _write(output, "y" * 10)
+    cache.store("cc" * 32, output)
+    assert len(scans) == 2
+    assert cache._read_meta(cache._index_path)["total_bytes"] == 20
+
+
+def test_view_key_hashes_the_step_input(tmp_path, monkeypatch):
+    dataset = str(tmp_path / "data.jsonl")
+    _write(dataset, '{"text": "a"}\n')
+    storage = FileStorage(first_entry_file_name=dataset, cache_path=str(tmp_path / "out"),
+                          file_name_prefix="dataflow_cache_step", cache_type="jsonl")
+    digests = {}
+    key = view_key(storage.step(), _Upper, _op(), None, digests)
+    assert key and dataset in digests
+    assert view_key(storage.step(), _Upper, _op(), None, digests) is None  # 上一步输出还不存在
+
+    monkeypatch.setattr(settings, "STEP_CACHE_ENABLED", True)
+    assert cache_enabled({}) and not cache_enabled({"step_cache": False})
+    monkeypatch.setattr(settings, "STEP_CACHE_ENABLED", False)
+    assert not cache_enabled({})
@@ -0,0 +1,154 @@
+"""
+流式执行测试：流式组划分、按块流水执行、背压、失败传播
+
+使用 pytest 运行:
+    pytest tests/test_streaming_execution.py -v
+"""
+import json
+import os
+import threading
+import time
+
+import pytest
+from dataflow.utils.storage import FileStorage
+
+from app.core.config import settings
+from app.services.execution_context import current_workdir
+from app.services.streaming_execution import (
+    StreamStage,
+    StreamingStageError,
+    run_streaming_group,
+    stream_groups,
+)
+
+
+class _Suffix:
+    def __init__(self, suffix, delay=0.0, fail_on=None, seen=None, drop=None):
+        self.suffix, self.delay, self.fail_on, self.seen, self.drop = suffix, delay, fail_on, seen, drop
+
+    def run(self, storage, input_key, output_key):
+        df = storage.read("dataframe")
+        if self.seen is not None:
+            self.seen.append((self.suffix, len(df), time.monotonic()))
+        if self.fail_on is not None and (df[input_key] == self.fail_on).any():
+            raise RuntimeError("bad row")
+        time.sleep(self.delay)
+        print(f"{self.suffix}: {len(df)} rows")
+        df[output_key] = df[input_key] + self.suffix
+        storage.write(df[df[input_key] != self.drop])
+
+
+@pytest.fixture(autouse=True)
+def pipeline_dir(tmp_path, monkeypatch):
+    """算子工作目录指向临时目录（流式组整体在其中运行）"""
+    monkeypatch.setattr(settings, "DATAFLOW_CORE_DIR", str(tmp_path / "core"))
+    monkeypatch.setattr(settings, "BASE_DIR", os.getcwd())
+    workdir = tmp_path / "core" / "api_pipelines"
+    workdir.mkdir(parents=True)
+    return str(workdir)
+
+
+class _Workdir(_Suffix):
+    """记下运行时看到的进程 cwd 与上下文工作目录"""
+
+    def __init__(self, seen):
+        super().__init__("w")
+        self.dirs = seen
+
+    def run(self, storage, input_key, output_key):
+        self.dirs.append((os.getcwd(), current_workdir()))
+        super().run(storage, input_key, output_key)
+
+
+class _Buffer:
+    def __init__(self):
+        self.text = ""
+
+    def write(self, s):
+        self.text += s
+
+
+def _storage(tmp_path, rows):
+    dataset = tmp_path / "data.jsonl"
+    dataset.write_text("".join(json.dumps({"text": r}) + "\n" for r in rows), encoding="utf-8")
+    return FileStorage(first_entry_file_name=str(dataset), cache_path=str(tmp_path / "out"),
+                       file_name_prefix="dataflow_cache_step", cache_type="jsonl")
+
+
+def _stages(storage, *operators):
+    stages, key = [], "text"
+    for i, operator in enumerate(operators):
+        stages.append(StreamStage(operator, {"input_key": key, "output_key": f"o{i}"}, f"Op_{i}",
+                                  storage.step(), stdout=_Buffer()))
+        key = f"o{i}"
+    return stages
+
+
+def _rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_stream_groups_join_adjacent_streaming_operators():
+    ops = [{"stream": True}, {"stream": True}, {}, {"stream": True}, {"stream": True}, {"stream": True}]
+    assert stream_groups(ops, [0, 1, 2, 3, 4, 5]) == [[0, 1], [3, 4, 5]]
+    assert stream_groups(ops, [1, 2, 3]) == [[1], [3]]
+    assert stream_groups([{}, {}], [0, 1]) == []
+
+
+def test_chunks_flow_through_all_stages_and_step_files_are_written(tmp_path):
+    storage = _storage(tmp_path, ["a", "drop", "c", "d", "e"])
+    stages = _stages(storage, _Suffix("1"), _Suffix("2", drop="drop1"))
+
+    run_streaming_group(stages, chunk_rows=2, queue_chunks=1)
+
+    assert [s.chunks for s in stages] == [3, 3]
+    assert (stages[0].rows_out, stages[1].rows_out) == (5, 4)
+    assert [r["o1"] for r in _rows(stages[1].output_path)] == ["a12", "c12", "d12", "e12"]
+    assert len(_rows(stages[0].output_path)) == 5
+    assert stages[1].stdout.text.count("rows") == 3
+
+
+def test_downstream_starts_before_upstream_finishes_and_backpressure_bounds_buffering(tmp_path):
+    seen = []
+    storage = _storage(tmp_path, [f"r{i}" for i in range(8)])
+    stages = _stages(storage, _Suffix("a", seen=seen), _Suffix("b", delay=0.05, seen=seen))
+
+    run_streaming_group(stages, chunk_rows=1, queue_chunks=1)
+
+    first_downstream = next(t for name, _, t in seen if name == "b")
+    last_upstream = max(t for name, _, t in seen if name == "a")
+    assert first_downstream < last_upstream
+    # 下游每块 50ms，上游最多领先 队列容量 + 在手的块
+    order = [name for name, _, _ in seen]
+    for i in range(len(order)):
+        ahead = order[:i].count("a") - order[:i].count("b")
+        assert ahead <= 3
+
+
+def test_first_failing_stage_stops_the_group(tmp_path):
+    storage = _storage(tmp_path, [f"r{i}" for i in range(20)])
+    stages = _stages(storage, _Suffix("x"), _Suffix("y", fail_on="r3x"))
+
+    with pytest.raises(StreamingStageError) as err:
+        run_streaming_group(stages, chunk_rows=2, queue_chunks=1)
+
+    assert err.value.op_key == "Op_1"
+    assert isinstance(err.value.original, RuntimeError)
+    assert stages[0].rows_in < 20
+    assert threading.active_count() < 10
+    assert os.path.exists(stages[1].output_path)
+
+
+@pytest.mark.parametrize("isolated", [False, True])
+def test_stages_run_in_the_pipeline_workdir(tmp_path, monkeypatch, pipeline_dir, isolated):
+    monkeypatch.setattr(settings, "EXECUTION_ISOLATED_CONTEXT", isolated)
+    cwd = os.getcwd()
+    dirs = []
+    storage = _storage(tmp_path, ["a", "b"])
+    run_streaming_group(_stages(storage, _Workdir(dirs), _Workdir(dirs)), chunk_rows=1)
+
+    assert dirs and all(workdir == pipeline_dir for _, workdir in dirs)
+    # 隔离模式不动进程 cwd；旧模式整组 chdir 一次，结束后回到 BASE_DIR
+    assert all(process_cwd == (cwd if isolated else pipeline_dir) for process_cwd, _ in dirs)
+    assert os.getcwd() == cwd
@@ -0,0 +1,169 @@
+"""
+任务事件日志测试
+
+使用 pytest 运行:
+    pytest tests/test_task_journal.py -v
+"""
+import pytest
+
+from app.services.task_journal import (
+    ExecutionReporter,
+    JournalCache,
+    TaskJournal,
+    journal_path_for,
+)
+from app.services.task_store import create_task_store
+
+
+@pytest.fixture
+def journal(tmp_path):
+    j = TaskJournal(str(tmp_path / "task_journals" / "t1.jsonl"))
+    yield j
+    j.close()
+
+
+class TestTaskJournal:
+
+    def test_offsets_are_cursors(self, journal):
+        journal.append("log", line="a")
+        journal.append("log", line="b")
+
+        events, next_offset = journal.read()
+        assert [e["line"] for _, e in events] == ["a", "b"]
+        assert next_offset == journal.size()
+
+        journal.append("log", line="c")
+        new_events, _ = journal.read(next_offset)
+        assert [e["line"] for _, e in new_events] == ["c"]
+
+        # 任意一条事件的 offset 都可以作为续读游标
+        second_offset = events[1][0]
+        tail, _ = journal.read(second_offset)
+        assert [e["line"] for _, e in tail] == ["b", "c"]
+
+    def test_partial_line_is_not_consumed(self, journal):
+        journal.append("log", line="done")
+        journal.close()
+        with open(journal.path, "a", encoding="utf-8") as f:
+            f.write('{"type": "log", "line": "half')
+
+        events, next_offset = journal.read()
+        assert [e["line"] for _, e in events] == ["done"]
+        assert next_offset < journal.size()
+
+    def test_missing_file_reads_empty(self, tmp_path):
+        journal = TaskJournal(str(tmp_path / "nope.jsonl"))
+        assert journal.read(0) == ([], 0)
+
+
+class TestJournalCache:
+
+    def test_folds_events_into_view(self, journal):
+        journal.append("status", status="running", fields={"started_at": "t0"})
+        journal.append("operator", op_key="Op_0", fields={"status": "running", "index": 0})
+        journal.append("progress", op_key="Op_0", percentage=50.0, progress="1/2")
+        journal.append("log", op_key="Op_0", line="[STDOUT] hi")
+        journal.append("log", line="pipeline line")
+
+        view = JournalCache().view(journal, "t1")
+
+        assert view["status"] == "running"
+        assert view["fields"] == {"started_at": "t0"}
+        assert view["operators_detail"]["Op_0"] == {
+            "status": "running", "index": 0, "progress_percentage": 50.0, "progress": "1/2",
+        }
+        assert view["operator_logs"] == {"Op_0": ["[STDOUT] hi"]}
+        assert view["logs"] == ["[STDOUT] hi", "pipeline line"]
+
+    def test_incremental_and_isolated_copies(self, journal):
+        cache = JournalCache()
+        journal.append("log", line="a")
+        first = cache.view(journal, "t1")
+        first["logs"].append("mutated by caller")
+
+        journal.append("log", line="b")
+        second = cache.view(journal, "t1")
+        assert second["logs"] == ["a", "b"]
+
+    def test_missing_journal_returns_none(self, tmp_path):
+        assert JournalCache().view(TaskJournal(str(tmp_path / "x.jsonl")), "x") is None
+
+
+def test_reporter_finish_keeps_logs_out_of_store(tmp_path):
+    registry_path = str(tmp_path / "task_registry.json")
+    store = create_task_store(registry_path, backend="sqlite")
+    store.put("t1", {"id": "t1", "status": "queued", "created_at": "2024-01-01T00:00:00"})
+    journal = TaskJournal(journal_path_for(registry_path, "t1"))
+    reporter = ExecutionReporter("t1", journal=journal, store=store)
+
+    reporter.status("running", started_at="t0")
+    reporter.log("line", "Op_0")
+    reporter.finish({
+        "status": "completed",
+        "completed_at": "t1",
+        "logs": ["line"],
+        "output": {"operators_detail": {"Op_0": {"status": "completed"}}, "operator_logs": {"Op_0": ["line"]}},
+    })
+    reporter.close()
+
+    record = store.get("t1")
+    assert record["status"] == "completed"
+    assert record["started_at"] == "t0"
+    assert "logs" not in record
+    assert record["output"] == {"operators_detail": {"Op_0": {"status": "completed"}}}
+    assert JournalCache().view(journal, "t1")["logs"] == ["line"]
+    store.close()
+
+
+class TestLogTail:
+
+    def _fill(self, journal, n=30):
+        journal.append("status", status="running", fields={})
+        for i in range(n):
+            journal.append("log", op_key="A_0" if i % 2 else "B_1", line=f"line {i}")
+            if i == 10:
+                journal.append("operator", op_key="A_0", fields={"status": "running"})
+
+    def test_read_logs_pages_with_offsets(self, journal):
+        self._fill(journal)
+
+        first, offset, has_more = journal.read_logs(0, max_lines=12)
+        assert first == [f"line {i}" for i in range(12)]
+        assert has_more is True
+
+        rest, offset, has_more = journal.read_logs(offset, max_lines=100)
+        assert rest == [f"line {i}" for i in range(12, 30)]
+        assert has_more is False and offset == journal.size()
+
+        journal.append("log", line="new")
+        assert journal.read_logs(offset)[0] == ["new"]
+
+    def test_read_logs_filters_operator(self, journal):
+        self._fill(journal, n=6)
+        lines, _, _ = journal.read_logs(0, op_filter=lambda k: k.startswith("A_"))
+        assert lines == ["line 1", "line 3", "line 5"]
+
+    def test_last_logs_reads_backwards_across_blocks(self, journal):
+        self._fill(journal)
+        lines, end = journal.last_logs(5, block_size=64)
+        assert lines == [f"line {i}" for i in range(25, 30)]
+        assert end == journal.size()
+
+        only_b, _ = journal.last_logs(2, op_filter=lambda k: k == "B_1", block_size=64)
+        assert only_b == ["line 26", "line 28"]
+
+        everything, _ = journal.last_logs(1000, block_size=64)
+        assert everything == [f"line {i}" for i in range(30)]
+
+    def test_type_is_the_line_prefix_and_old_lines_still_filter(self, journal):
+        journal.append("log", seq=1, line="new")
+        journal.append_many([{"seq": 2, "type": "status", "status": "running", "fields": {}}])
+        with open(journal.path, "rb") as f:
+            assert all(raw.startswith(b'{"type": ') for raw in f)
+        # 旧格式：ts 在前，还可能有别的前导键
+        with open(journal.path, "a", encoding="utf-8") as f:
+            f.write('{"ts": "2024-01-01T00:00:00", "seq": 3, "type": "log", "line": "old"}\n')
+
+        types = [e["type"] for _, e, _ in journal.iter_events(0, skip_types=("log",))]
+        assert types == ["status"]
+        assert journal.last_logs(10)[0] == ["new", "old"]
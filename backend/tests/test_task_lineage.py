@@ -0,0 +1,109 @@
+"""
+续跑 / 分叉测试：完好步骤判定、子执行配置、从父执行复用步骤文件
+
+使用 pytest 运行:
+    pytest tests/test_task_lineage.py -v
+"""
+import asyncio
+import gzip
+import os
+
+import pytest
+
+from app.services.cache_retention import step_file_path
+from app.services.task_lineage import (
+    RESUME_KEY,
+    child_pipeline_config,
+    completed_prefix,
+    seed_resumed_steps,
+)
+
+
+def _detail(*statuses):
+    return {f"Op{i}_{i}": {"name": f"Op{i}", "index": i, "status": s} for i, s in enumerate(statuses)}
+
+
+def test_completed_prefix_stops_at_first_unfinished_step():
+    assert completed_prefix(_detail("completed", "completed", "failed", "initialized"), 4) == 2
+    assert completed_prefix(_detail("reused", "completed", "completed"), 3) == 3
+    assert completed_prefix(_detail("failed", "completed"), 2) == 0
+    assert completed_prefix({}, 3) == 0
+
+
+def test_child_config_keeps_upstream_and_replaces_downstream():
+    parent = {"input_dataset": "ds", "operators": [{"name": "A"}, {"name": "B"}, {"name": "C"}]}
+
+    resumed = child_pipeline_config(parent, "parent-1", 2)
+    assert [op["name"] for op in resumed["operators"]] == ["A", "B", "C"]
+    assert resumed[RESUME_KEY] == {"parent_task_id": "parent-1", "from_step": 2}
+
+    forked = child_pipeline_config(parent, "parent-1", 1, operators=[{"name": "B2"}, {"name": "D"}])
+    assert [op["name"] for op in forked["operators"]] == ["A", "B2", "D"]
+    assert parent["operators"][1]["name"] == "B"
+
+    assert RESUME_KEY not in child_pipeline_config(dict(parent, resume={"from_step": 1}), "parent-1", 0)
+    with pytest.raises(ValueError):
+        child_pipeline_config(parent, "parent-1", 2, operators=[])
+
+
+def test_seed_links_upstream_steps_and_decompresses_the_resume_input(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    step0 = step_file_path("parent", 0, cache_dir)
+    step1 = step_file_path("parent", 1, cache_dir)
+    os.makedirs(os.path.dirname(step0))
+    with open(step0, "w", encoding="utf-8") as f:
+        f.write('{"a": 1}\n')
+    with gzip.open(step1 + ".gz", "wt", encoding="utf-8") as f:
+        f.write('{"a": 1, "b": 2}\n')
+
+    child_dir = str(tmp_path / "cache" / "child_output")
+    seeded = seed_resumed_steps("parent", child_dir, 2, cache_dir)
+
+    assert [os.path.basename(p) for p in seeded] == ["dataflow_cache_step_step1.jsonl", "dataflow_cache_step_step2.jsonl"]
+    assert os.stat(seeded[0]).st_ino == os.stat(step0).st_ino
+    with open(seeded[1], encoding="utf-8") as f:
+        assert f.read() == '{"a": 1, "b": 2}\n'
+
+    with pytest.raises(FileNotFoundError):
+        seed_resumed_steps("parent", child_dir, 3, cache_dir)
+
+    # 只有第一个重新运行的算子的输入是必需的，更早的步骤被回收了就跳过
+    os.remove(step0)
+    other_dir = str(tmp_path / "cache" / "other_output")
+    seeded = seed_resumed_steps("parent", other_dir, 2, cache_dir)
+    assert [os.path.basename(p) for p in seeded] == ["dataflow_cache_step_step2.jsonl"]
+
+
+def test_resume_and_fork_validate_the_parent(task_registry):
+    config = {"input_dataset": "ds", "operators": [{"name": "A"}, {"name": "B"}, {"name": "C"}]}
+    task = task_registry.create({"executor_type": "pipeline", "executor_name": "P"})
+    task_registry.store.update(task["id"], lambda r: r.update({
+        "status": "running",
+        "pipeline_config": config,
+        "output": {"operators_detail": _detail("completed", "running")},
+    }))
+    with pytest.raises(ValueError, match="still running"):
+        asyncio.run(task_registry.resume_execution(task["id"]))
+
+    task_registry.store.update(task["id"], lambda r: r.update({
+        "status": "failed",
+        "output": {"operators_detail": _detail("completed", "failed", "initialized")},
+    }))
+    with pytest.raises(ValueError, match="first 1 step"):
+        asyncio.run(task_registry.fork_execution(task["id"], 2))
+    with pytest.raises(KeyError):
+        asyncio.run(task_registry.resume_execution("missing"))
+
+    # 续跑需要第 0 步的输出：已被回收（或文件不在了）时在排队之前就拒绝
+    with pytest.raises(FileNotFoundError, match="no longer available"):
+        asyncio.run(task_registry.resume_execution(task["id"]))
+    task_registry.store.patch(task["id"], {"evicted_steps": [0], "cache_evicted_at": "t"})
+    with pytest.raises(FileNotFoundError, match="evicted"):
+        asyncio.run(task_registry.fork_execution(task["id"], 1))
+
+    task_registry.store.update(task["id"], lambda r: r.update({
+        "status": "completed",
+        "output": {"operators_detail": _detail("completed", "completed", "completed")},
+    }))
+    with pytest.raises(ValueError, match="nothing|no failed"):
+        asyncio.run(task_registry.resume_execution(task["id"]))
@@ -6,6 +6,8 @@
     或
     pytest tests/test_task_registry.py::test_create_task -v  # 运行单个测试
 """
+import asyncio
+
 import pytest
 from app.services.task_registry import TaskRegistry
 
@@ -109,6 +111,64 @@ class TestTaskRegistry:
         all_tasks = task_registry.list()
         assert len(all_tasks) >= 3
 
+    def test_list_executions_pages_with_summary_fields(self, task_registry, sample_task_data):
+        """测试执行记录分页与字段投影"""
+        for i in range(3):
+            task = task_registry.create({**sample_task_data, "dataset_id": f"dataset_{i}"})
+            task_registry.store.patch(task["id"], {"task_id": task["id"], "logs": ["x"], "pipeline_config": {"big": True}})
+
+        first, cursor = task_registry.list_executions(limit=2)
+        assert len(first) == 2 and cursor is not None
+        assert "pipeline_config" not in first[0]
+        assert "logs" not in first[0]
+
+        rest, cursor = task_registry.list_executions(limit=2, cursor=cursor)
+        assert len(rest) == 1 and cursor is None
+        assert {e["task_id"] for e in first + rest} == {t["id"] for t in task_registry.list()}
+
+        with_config, _ = task_registry.list_executions(limit=1, fields=["pipeline_config"])
+        assert set(with_config[0]) == {"task_id", "pipeline_config"}
+
+        # 不分页（旧调用方）：一次返回全部
+        everything, cursor = task_registry.list_executions(limit=None)
+        assert len(everything) == 3 and cursor is None
+
+    def test_wait_execution_change_returns_delta(self, task_registry, sample_task_data):
+        """测试长轮询只在状态/当前算子/进度桶变化时返回增量"""
+        task_id = task_registry.create(sample_task_data)["id"]
+        journal = task_registry.journal(task_id)
+        journal.append("status", status="running", fields={"started_at": "t0"})
+
+        def wait(since, timeout_s=0.1):
+            return asyncio.run(task_registry.wait_execution_change(task_id, since=since, timeout_s=timeout_s, poll_interval=0.01))
+
+        idle = wait(since=None)
+        assert idle["timed_out"] is True and idle["changed"] is False
+
+        journal.append("operator", op_key="Op_0", fields={"status": "running", "index": 0})
+        journal.append("log", op_key="Op_0", line="hello")
+        delta = wait(since=idle["cursor"])
+        assert delta["changed"] is True
+        assert delta["current_operator"] == "Op_0"
+        assert list(delta["operators"]) == ["Op_0"]
+        assert delta["logs"] == ["hello"]
+
+        # 同一个 10% 进度桶内的变化不唤醒
+        journal.append("progress", op_key="Op_0", percentage=3.0)
+        same_bucket = wait(since=delta["cursor"])
+        assert same_bucket["changed"] is False and same_bucket["timed_out"] is True
+
+        journal.append("progress", op_key="Op_0", percentage=15.0)
+        next_bucket = wait(since=same_bucket["cursor"])
+        assert next_bucket["changed"] is True
+        assert next_bucket["progress_percentage"] == 15.0
+
+        journal.append("status", status="completed", fields={"completed_at": "t1"})
+        done = wait(since=next_bucket["cursor"], timeout_s=5)
+        assert done["status"] == "completed"
+        assert done["completed_at"] == "t1"
+        journal.close()
+
     def test_list_tasks_by_status(self, task_registry, sample_task_data):
         """测试按状态过滤任务列表"""
         # 创建多个不同状态的任务
@@ -177,6 +237,41 @@ class TestTaskRegistry:
         assert "pipeline" in stats["by_executor_type"]
         assert "operator" in stats["by_executor_type"]
 
+    def test_get_rollups(self, task_registry, sample_task_data):
+        """测试按时间桶聚合的运行统计"""
+        for pipeline_id, status in [("p1", "success"), ("p1", "failed"), ("p2", "success")]:
+            task = task_registry.create({**sample_task_data, "meta": {"pipeline_id": pipeline_id}})
+            task_registry.update(task["id"], {"status": "running"})
+            task_registry.update(task["id"], {"status": status})
+        
+        per_pipeline = task_registry.get_rollups("day")
+        assert {(r["pipeline_id"], r["finished"]) for r in per_pipeline} >= {("p1", 2), ("p2", 1)}
+        
+        [p1] = task_registry.get_rollups("day", pipeline_id="p1")
+        assert p1["started"] == 2
+        assert p1["success_rate"] == 0.5
+        assert p1["mean_duration_s"] is not None and p1["p95_duration_s"] is not None
+        
+        merged = task_registry.get_rollups("day", by_pipeline=False)
+        assert all(r["pipeline_id"] is None for r in merged)
+        assert sum(r["finished"] for r in merged) >= 3
+
+    @pytest.mark.parametrize("parent_type", ["batch", "sweep"])
+    def test_parent_runs_are_not_counted_twice(self, task_registry, sample_task_data, parent_type):
+        """测试批量执行 / 参数扫描的父任务不重复计入统计：只统计子执行"""
+        parent = task_registry.create({**sample_task_data, "executor_type": parent_type, "pipeline_id": "pb"})
+        task_registry.update(parent["id"], {"status": "running"})
+        for _ in range(2):
+            child = task_registry.create({**sample_task_data, "executor_type": "pipeline", "pipeline_id": "pb"})
+            task_registry.update(child["id"], {"status": "running"})
+            task_registry.update(child["id"], {"status": "success"})
+        task_registry.update(parent["id"], {"status": "success"})
+
+        [rollup] = task_registry.get_rollups("day", pipeline_id="pb")
+        assert (rollup["started"], rollup["finished"], rollup["succeeded"]) == (2, 2, 2)
+        stats = task_registry.get_statistics()
+        assert stats["total"] == 2 and stats["success"] == 2
+
     def test_delete_task(self, task_registry, created_task):
         """测试删除任务"""
         task_id = created_task["id"]
@@ -0,0 +1,241 @@
+"""
+任务存储后端测试
+
+使用 pytest 运行:
+    pytest tests/test_task_store.py -v
+"""
+import json
+import os
+import threading
+
+import pytest
+
+from app.services.task_store import (
+    JsonTaskStore,
+    SqliteTaskStore,
+    create_task_store,
+    sqlite_path_for,
+)
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+    """两种后端跑同一套接口测试"""
+    s = create_task_store(str(tmp_path / "task_registry.json"), backend=request.param)
+    yield s
+    s.close()
+
+
+class TestTaskStoreInterface:
+
+    def test_put_and_get(self, store):
+        store.put("t1", {"id": "t1", "status": "pending", "created_at": "2024-01-01T00:00:00"})
+        assert store.get("t1")["status"] == "pending"
+        assert store.get("missing") is None
+
+    def test_update_is_row_level(self, store):
+        store.put("t1", {"id": "t1", "status": "pending", "created_at": "2024-01-01T00:00:00"})
+        store.put("t2", {"id": "t2", "status": "pending", "created_at": "2024-01-02T00:00:00"})
+
+        updated = store.update("t1", lambda r: r.update({"status": "running"}))
+
+        assert updated["status"] == "running"
+        assert store.get("t2")["status"] == "pending"
+        assert store.update("missing", lambda r: r.update({"status": "x"})) is None
+
+    def test_patch_merges_output(self, store):
+        store.put("t1", {"id": "t1", "status": "queued", "output": {"a": 1}})
+        store.patch("t1", {"status": "running"}, {"b": 2})
+
+        record = store.get("t1")
+        assert record["status"] == "running"
+        assert record["output"] == {"a": 1, "b": 2}
+
+    def test_list_filters_and_orders(self, store):
+        store.put("old", {"id": "old", "status": "success", "executor_type": "pipeline", "created_at": "2024-01-01T00:00:00"})
+        store.put("new", {"id": "new", "status": "failed", "executor_type": "operator", "created_at": "2024-03-01T00:00:00"})
+        store.put("mid", {"id": "mid", "status": "success", "executor_type": "pipeline", "created_at": "2024-02-01T00:00:00"})
+
+        assert [t["id"] for t in store.list()] == ["new", "mid", "old"]
+        assert [t["id"] for t in store.list(status="success")] == ["mid", "old"]
+        assert [t["id"] for t in store.list(executor_type="operator")] == ["new"]
+
+    def test_query_pages_filters_and_projects(self, store):
+        for i in range(5):
+            store.put(f"t{i}", {
+                "id": f"t{i}",
+                "status": "running" if i % 2 else "success",
+                "pipeline_id": "p1" if i < 3 else "p2",
+                "created_at": f"2024-01-0{i + 1}T00:00:00",
+                "logs": ["heavy"] * 10,
+            })
+
+        page, cursor = store.query(limit=2, fields=["id", "status"])
+        assert [r["id"] for r in page] == ["t4", "t3"]
+        assert page[0]["status"] == "success"
+        assert "logs" not in page[0]
+
+        seen = [r["id"] for r in page]
+        while cursor:
+            page, cursor = store.query(limit=2, cursor=cursor, fields=["id"])
+            seen.extend(r["id"] for r in page)
+        assert seen == ["t4", "t3", "t2", "t1", "t0"]
+
+        by_pipeline, _ = store.query(pipeline_id="p1", status=["success"])
+        assert [r["id"] for r in by_pipeline] == ["t2", "t0"]
+
+        in_range, _ = store.query(created_after="2024-01-02T00:00:00", created_before="2024-01-03T00:00:00", fields=["id"])
+        assert [r["id"] for r in in_range] == ["t2", "t1"]
+
+    def test_query_rejects_bad_input(self, store):
+        with pytest.raises(ValueError):
+            store.query(cursor="not-a-cursor")
+        with pytest.raises(ValueError):
+            store.query(fields=["data') --"])
+
+    def test_delete(self, store):
+        store.put("t1", {"id": "t1", "status": "pending"})
+        assert store.delete("t1") is True
+        assert store.delete("t1") is False
+        assert store.get("t1") is None
+
+    def test_status_counts_follow_transitions(self, store):
+        store.put("t1", {"id": "t1", "status": "queued", "executor_type": "pipeline"})
+        store.put("t2", {"id": "t2", "status": "queued", "executor_type": "pipeline"})
+        store.patch("t1", {"status": "running"})
+        store.patch("t1", {"status": "completed"})
+        store.put("t3", {"id": "t3", "executor_type": "operator"})
+        store.delete("t2")
+
+        counts = {(c["status"], c["executor_type"]): c["count"] for c in store.status_counts()}
+        assert counts == {("completed", "pipeline"): 1, ("pending", "operator"): 1}
+
+    def test_rollups_by_bucket_and_pipeline(self, store):
+        for i, (status, seconds) in enumerate([("completed", 3), ("completed", 30), ("failed", 8)]):
+            task_id = f"t{i}"
+            store.put(task_id, {"id": task_id, "status": "queued", "pipeline_id": "p1",
+                                "created_at": "2024-05-01T10:00:00"})
+            store.patch(task_id, {"status": "running", "started_at": "2024-05-01T10:15:00"})
+            store.patch(task_id, {
+                "status": status,
+                "completed_at": f"2024-05-01T10:15:{seconds:02d}",
+                "output": {"operators_detail": {"A_0": {"sample_count": 100}, "B_1": {"sample_count": 40}}},
+            })
+        # 终态之后的补充写入不会重复计数
+        store.patch("t0", {"duration_seconds": 3.2})
+
+        [hour] = [r for b, pid, r in store.rollups("hour") if b == "2024-05-01T10" and pid == "p1"]
+        assert hour["started"] == 3 and hour["finished"] == 3
+        assert hour["succeeded"] == 2 and hour["failed"] == 1
+        assert hour["duration_count"] == 3 and hour["duration_sum"] == 41
+        assert hour["rows"] == 420
+        assert [b for b, _, _ in store.rollups("day")] == ["2024-05-01"]
+        assert store.rollups("day", since="2024-05-02") == []
+        with pytest.raises(ValueError):
+            store.rollups("week")
+
+
+class TestSqliteTaskStore:
+
+    def test_created_at_is_kept_when_record_lacks_it(self, tmp_path):
+        store = SqliteTaskStore(str(tmp_path / "tasks.db"))
+        store.put("t1", {"id": "t1", "status": "pending", "created_at": "2024-01-01T00:00:00"})
+        # execution 记录不带 created_at，整体替换后排序列仍应保留
+        store.put("t1", {"task_id": "t1", "status": "queued"})
+
+        row = store._conn().execute("SELECT created_at FROM tasks WHERE id = 't1'").fetchone()
+        assert row["created_at"] == "2024-01-01T00:00:00"
+
+    def test_imports_legacy_json_once(self, tmp_path):
+        legacy = tmp_path / "task_registry.json"
+        legacy.write_text(json.dumps({"tasks": {
+            "a": {"id": "a", "status": "success", "created_at": "2024-01-01T00:00:00"},
+            "b": {"task_id": "b", "status": "completed", "pipeline_id": "p1"},
+        }}))
+
+        store = create_task_store(str(legacy), backend="sqlite")
+
+        assert os.path.exists(sqlite_path_for(str(legacy)))
+        assert not legacy.exists()
+        assert (tmp_path / "task_registry.json.migrated").exists()
+        assert store.get("a")["status"] == "success"
+        assert store.get("b")["pipeline_id"] == "p1"
+
+        # 再放一个同名 JSON 也不会被重复导入
+        legacy.write_text(json.dumps({"tasks": {"c": {"id": "c", "status": "pending"}}}))
+        store = create_task_store(str(legacy), backend="sqlite")
+        assert store.get("c") is None
+
+    def test_concurrent_updates_are_not_lost(self, tmp_path):
+        store = SqliteTaskStore(str(tmp_path / "tasks.db"))
+        store.put("t1", {"id": "t1", "counter": 0})
+
+        def bump():
+            for _ in range(50):
+                store.update("t1", lambda r: r.update({"counter": r["counter"] + 1}))
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert store.get("t1")["counter"] == 200
+
+    def test_stats_are_backfilled_once_for_existing_rows(self, tmp_path):
+        store = SqliteTaskStore(str(tmp_path / "tasks.db"))
+        store.put("a", {"id": "a", "status": "success", "executor_type": "pipeline",
+                        "started_at": "2024-05-01T10:00:00", "completed_at": "2024-05-01T10:00:05"})
+        incremental = (store.status_counts(), store.rollups("day"))
+        # 模拟升级前的数据库：统计表为空、没有版本标记
+        conn = store._conn()
+        conn.execute("DELETE FROM task_counts")
+        conn.execute("DELETE FROM task_rollups")
+        conn.execute("DELETE FROM store_meta WHERE key = 'stats_version'")
+
+        reopened = SqliteTaskStore(str(tmp_path / "tasks.db"))
+        assert (reopened.status_counts(), reopened.rollups("day")) == incremental
+
+    def test_wal_mode(self, tmp_path):
+        store = SqliteTaskStore(str(tmp_path / "tasks.db"))
+        mode = store._conn().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode.lower() == "wal"
+
+
+def test_json_backend_keeps_legacy_layout(tmp_path):
+    path = tmp_path / "task_registry.json"
+    store = JsonTaskStore(str(path))
+    store.put("t1", {"id": "t1", "status": "pending"})
+
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f) == {"tasks": {"t1": {"id": "t1", "status": "pending"}}}
+
+
+def test_factory_reuses_one_store_per_path(tmp_path):
+    path = str(tmp_path / "task_registry.json")
+    store = create_task_store(path, backend="sqlite")
+    assert create_task_store(path, backend="sqlite") is store
+    assert create_task_store(path, backend="json") is not store
+
+    os.remove(sqlite_path_for(path))
+    # 数据库被删除后重新建库
+    assert create_task_store(path, backend="sqlite") is not store
+
+
+def test_json_backend_writes_atomically_under_the_registry_lock(tmp_path):
+    path = tmp_path / "task_registry.json"
+    stores = [JsonTaskStore(str(path)) for _ in range(2)]
+    stores[0].put("t1", {"id": "t1", "counter": 0})
+
+    def bump(store):
+        for _ in range(25):
+            store.update("t1", lambda r: r.update({"counter": r["counter"] + 1}))
+
+    threads = [threading.Thread(target=bump, args=(s,)) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert stores[1].get("t1")["counter"] == 50
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
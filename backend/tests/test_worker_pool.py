@@ -0,0 +1,93 @@
+"""
+常驻 worker 池测试（本地 Ray）：复用、按任务数 / 内存增长回收、终止
+
+使用 pytest 运行:
+    pytest tests/test_worker_pool.py -m ray -v
+"""
+import os
+import time
+
+import pytest
+import ray
+
+from app.services.execution_watcher import classify_exit
+from app.services.worker_pool import WorkerPool, current_rss_mb
+
+
+# 整个模块都要启动本地 Ray，默认不运行（pytest -m ray）
+pytestmark = pytest.mark.ray
+
+
+@pytest.fixture(scope="module", autouse=True)
+def local_ray():
+    started = not ray.is_initialized()
+    if started:
+        ray.init(num_cpus=2, include_dashboard=False, logging_level="error", log_to_driver=False)
+    yield
+    if started:
+        ray.shutdown()
+
+
+class _EchoWorker:
+    """与 PipelineWorker 接口一致的轻量 worker，不加载 DataFlow"""
+
+    def __init__(self):
+        self.jobs = 0
+        self.baseline_rss_mb = current_rss_mb()
+        self._hold = []
+
+    def run(self, pipeline_config, dataflow_runtime, task_id, pipeline_execution_path, state_actor=None):
+        self._hold.append(bytearray(pipeline_config.get("allocate_mb", 0) * 1024 * 1024))
+        time.sleep(pipeline_config.get("sleep", 0))
+        self.jobs += 1
+        return {"task_id": task_id, "status": "completed", "pid": os.getpid()}
+
+    def stats(self):
+        rss = current_rss_mb()
+        return {"pid": os.getpid(), "jobs": self.jobs, "rss_mb": rss, "rss_growth_mb": rss - self.baseline_rss_mb}
+
+
+def _run(pool, task_id, **config):
+    ref = pool.submit(task_id, config, {}, "unused")
+    result = ray.get(ref, timeout=60)
+    pool.release(task_id)
+    return result
+
+
+def test_workers_are_reused_and_recycled_after_max_jobs():
+    pool = WorkerPool(size=1, max_jobs=2, max_rss_growth_mb=0, worker_cls=_EchoWorker)
+    pool.warm()
+    try:
+        first = _run(pool, "t1")["pid"]
+        assert _run(pool, "t2")["pid"] == first
+        assert pool.recycled_count == 1
+        assert _run(pool, "t3")["pid"] != first
+        assert pool.snapshot()["idle"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_worker_is_recycled_after_memory_growth():
+    pool = WorkerPool(size=1, max_jobs=0, max_rss_growth_mb=150, worker_cls=_EchoWorker)
+    try:
+        first = _run(pool, "small")["pid"]
+        assert _run(pool, "big", allocate_mb=256)["pid"] == first
+        assert pool.recycled_count == 1
+        assert _run(pool, "after")["pid"] != first
+    finally:
+        pool.shutdown()
+
+
+def test_kill_ends_the_running_job_and_refills_the_pool():
+    pool = WorkerPool(size=1, max_jobs=0, max_rss_growth_mb=0, worker_cls=_EchoWorker)
+    try:
+        ref = pool.submit("slow", {"sleep": 60}, {}, "unused")
+        assert pool.busy("slow")
+        assert pool.kill("slow") is True
+        with pytest.raises(ray.exceptions.RayActorError) as exc_info:
+            ray.get(ref, timeout=30)
+        assert classify_exit(exc_info.value) == ("worker_crashed", "failed")
+        assert pool.snapshot() == {"size": 1, "idle": 1, "busy": {}, "recycled": 1}
+        assert _run(pool, "next")["status"] == "completed"
+    finally:
+        pool.shutdown()
@@ -792,19 +792,26 @@ operators.get_operator_detail_by_name.path=`/api/v1/operators/details/{op_name}`
 export class tasks {
  
   /**
-  * @summary 列出所有Pipeline执行记录
+  * @summary 分页列出Pipeline执行记录
+  * @param {String} [status] 状态过滤，多个用逗号分隔，如 queued,running
+  * @param {String} [pipeline_id] Pipeline ID 过滤
+  * @param {String} [created_after] 创建时间下界（ISO 格式，含）
+  * @param {String} [created_before] 创建时间上界（ISO 格式，含）
+  * @param {String} [cursor] 上一页返回的 meta.next_cursor
+  * @param {Number} [limit] 每页条数
+  * @param {String} [fields] 返回字段，逗号分隔；默认只返回摘要字段，pipeline_config / logs / output 等需显式请求
   * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
   * @param {Function} [uploadProgress] 上传回调函数
   * @param {Function} [downloadProgress] 下载回调函数
   */
-  static async list_executions(cancelSource,uploadProgress,downloadProgress){
+  static async list_executions(status,pipeline_id,created_after,created_before,cursor,limit,fields,cancelSource,uploadProgress,downloadProgress){
     return await new Promise((resolve,reject)=>{
       let responseType = "json";
       let options = {
         method:'get',
         url:'/api/v1/tasks/executions',
         data:{},
-        params:{},
+        params:{status,pipeline_id,created_after,created_before,cursor,limit,fields},
         headers:{
           "Content-Type":""
         },
@@ -891,21 +898,79 @@ export class tasks {
     })
   }
 
+  /**
+  * @summary 按分钟/小时/天聚合的运行统计（成功率、耗时 p95、处理行数）
+  * @param {string} [granularity] 聚合粒度：minute / hour / day
+  * @param {string} [since] 起始时间（ISO 格式，含）
+  * @param {string} [until] 结束时间（ISO 格式，含）
+  * @param {string} [pipeline_id] 只看某个 Pipeline
+  * @param {boolean} [by_pipeline] 是否按 Pipeline 分组；false 时同一时间桶合并为一行
+  * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
+  * @param {Function} [uploadProgress] 上传回调函数
+  * @param {Function} [downloadProgress] 下载回调函数
+  */
+  static async get_task_stats_rollups(granularity,since,until,pipeline_id,by_pipeline,cancelSource,uploadProgress,downloadProgress){
+    return await new Promise((resolve,reject)=>{
+      let responseType = "json";
+      let options = {
+        method:'get',
+        url:'/api/v1/tasks/stats/rollups',
+        data:{},
+        params:{granularity,since,until,pipeline_id,by_pipeline},
+        headers:{
+          "Content-Type":""
+        },
+        onUploadProgress:uploadProgress,
+        onDownloadProgress:downloadProgress
+      }
+      // support wechat mini program
+      if (cancelSource!=undefined){
+        options.cancelToken = cancelSource.token
+      }
+      if (responseType != "json"){
+        options.responseType = responseType;
+      }
+      axios(options)
+      .then(res=>{
+        if (res.config.responseType=="blob"){
+          resolve(new Blob([res.data],{
+            type: res.headers["content-type"].split(";")[0]
+          }))
+        }else{
+          resolve(res.data);
+          return res.data
+        }
+      }).catch(err=>{
+        if (err.response){
+          if (err.response.data)
+            reject(err.response.data)
+          else
+            reject(err.response);
+        }else{
+          reject(err)
+        }
+      })
+    })
+  }
+
   /**
   * @summary 查询Pipeline执行状态（算子粒度）
   * @param {String} [pathtask_id]
+  * @param {Boolean} [wait_for_change] 为 true 时阻塞到状态/当前算子/进度(10%)变化或超时，只返回增量
+  * @param {Number} [timeout_s] wait_for_change 时的最长等待秒数
+  * @param {Number} [since] wait_for_change 时的起点游标，取上次返回的 cursor；缺省为当前
   * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
   * @param {Function} [uploadProgress] 上传回调函数
   * @param {Function} [downloadProgress] 下载回调函数
   */
-  static async get_execution_status(pathtask_id,cancelSource,uploadProgress,downloadProgress){
+  static async get_execution_status(pathtask_id,wait_for_change,timeout_s,since,cancelSource,uploadProgress,downloadProgress){
     return await new Promise((resolve,reject)=>{
       let responseType = "json";
       let options = {
         method:'get',
         url:'/api/v1/tasks/execution/'+pathtask_id+'/status',
         data:{},
-        params:{},
+        params:{wait_for_change,timeout_s,since},
         headers:{
           "Content-Type":""
         },
@@ -1153,18 +1218,24 @@ export class tasks {
   /**
   * @summary 异步执行Pipeline（使用Ray）
   * @param {String} [pipeline_id] 
+  * @param {String} [priority] 
+  * @param {String} [user_id] 
+  * @param {Boolean} [step_cache] 
+  * @param {String} [sample_mode] 
+  * @param {Number} [sample_size] 
+  * @param {Number} [sample_seed] 
   * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
   * @param {Function} [uploadProgress] 上传回调函数
   * @param {Function} [downloadProgress] 下载回调函数
   */
-  static async execute_pipeline_async(pipeline_id,cancelSource,uploadProgress,downloadProgress){
+  static async execute_pipeline_async(pipeline_id,priority,user_id,step_cache,sample_mode,sample_size,sample_seed,cancelSource,uploadProgress,downloadProgress){
     return await new Promise((resolve,reject)=>{
       let responseType = "json";
       let options = {
         method:'post',
         url:'/api/v1/tasks/execute-async',
         data:{},
-        params:{pipeline_id},
+        params:{pipeline_id,priority,user_id,step_cache,sample_mode,sample_size,sample_seed},
         headers:{
           "Content-Type":""
         },
@@ -1251,6 +1322,329 @@ export class tasks {
       })
     })
   }
+ 
+  /**
+  * @summary 从最后一个完好的步骤续跑
+  * @param {String} [pathtask_id] 
+  * @param {String} [priority] 调度队列；缺省按输入数据集行数决定
+  * @param {String} [user_id] 提交用户
+  * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
+  * @param {Function} [uploadProgress] 上传回调函数
+  * @param {Function} [downloadProgress] 下载回调函数
+  */
+  static async resume_execution(pathtask_id,priority,user_id,cancelSource,uploadProgress,downloadProgress){
+    return await new Promise((resolve,reject)=>{
+      let responseType = "json";
+      let options = {
+        method:'post',
+        url:'/api/v1/tasks/execution/'+pathtask_id+'/resume',
+        data:{},
+        params:{priority,user_id},
+        headers:{
+          "Content-Type":""
+        },
+        onUploadProgress:uploadProgress,
+        onDownloadProgress:downloadProgress
+      }
+      // support wechat mini program
+      if (cancelSource!=undefined){
+        options.cancelToken = cancelSource.token
+      }
+      if (responseType != "json"){
+        options.responseType = responseType;
+      }
+      axios(options)
+      .then(res=>{
+        if (res.config.responseType=="blob"){
+          resolve(new Blob([res.data],{
+            type: res.headers["content-type"].split(";")[0]
+          }))
+        }else{
+          resolve(res.data);
+          return res.data
+        }
+      }).catch(err=>{
+        if (err.response){
+          if (err.response.data)
+            reject(err.response.data)
+          else
+            reject(err.response);
+        }else{
+          reject(err)
+        }
+      })
+    })
+  }
+ 
+  /**
+  * @summary 从指定步骤分叉执行
+  * @param {String} [pathtask_id] 
+  * @param {String} [priority] 调度队列；缺省按输入数据集行数决定
+  * @param {String} [user_id] 提交用户
+  * @param {UserModel.PipelineExecutionForkRequest} [pipelineexecutionforkrequest] 
+  * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
+  * @param {Function} [uploadProgress] 上传回调函数
+  * @param {Function} [downloadProgress] 下载回调函数
+  */
+  static async fork_execution(pathtask_id,priority,user_id,pipelineexecutionforkrequest,cancelSource,uploadProgress,downloadProgress){
+    return await new Promise((resolve,reject)=>{
+      let responseType = "json";
+      let options = {
+        method:'post',
+        url:'/api/v1/tasks/execution/'+pathtask_id+'/fork',
+        data:pipelineexecutionforkrequest,
+        params:{priority,user_id},
+        headers:{
+          "Content-Type":"application/json"
+        },
+        onUploadProgress:uploadProgress,
+        onDownloadProgress:downloadProgress
+      }
+      // support wechat mini program
+      if (cancelSource!=undefined){
+        options.cancelToken = cancelSource.token
+      }
+      if (responseType != "json"){
+        options.responseType = responseType;
+      }
+      axios(options)
+      .then(res=>{
+        if (res.config.responseType=="blob"){
+          resolve(new Blob([res.data],{
+            type: res.headers["content-type"].split(";")[0]
+          }))
+        }else{
+          resolve(res.data);
+          return res.data
+        }
+      }).catch(err=>{
+        if (err.response){
+          if (err.response.data)
+            reject(err.response.data)
+          else
+            reject(err.response);
+        }else{
+          reject(err)
+        }
+      })
+    })
+  }
+ 
+  /**
+  * @summary 同一个Pipeline批量执行多个数据集
+  * @param {String} [priority] 调度队列；缺省按各数据集行数决定
+  * @param {String} [user_id] 提交用户，调度器在同一队列内按用户公平分配
+  * @param {Boolean} [step_cache] 是否复用跨运行步骤缓存
+  * @param {String} [sample_mode] 对每个数据集做采样运行，含义同 execute-async
+  * @param {Number} [sample_size] 采样行数或百分比
+  * @param {Number} [sample_seed] 采样随机种子
+  * @param {UserModel.PipelineBatchExecutionRequest} [pipelinebatchexecutionrequest] 
+  * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
+  * @param {Function} [uploadProgress] 上传回调函数
+  * @param {Function} [downloadProgress] 下载回调函数
+  */
+  static async execute_pipeline_batch(priority,user_id,step_cache,sample_mode,sample_size,sample_seed,pipelinebatchexecutionrequest,cancelSource,uploadProgress,downloadProgress){
+    return await new Promise((resolve,reject)=>{
+      let responseType = "json";
+      let options = {
+        method:'post',
+        url:'/api/v1/tasks/execute-batch',
+        data:pipelinebatchexecutionrequest,
+        params:{priority,user_id,step_cache,sample_mode,sample_size,sample_seed},
+        headers:{
+          "Content-Type":"application/json"
+        },
+        onUploadProgress:uploadProgress,
+        onDownloadProgress:downloadProgress
+      }
+      // support wechat mini program
+      if (cancelSource!=undefined){
+        options.cancelToken = cancelSource.token
+      }
+      if (responseType != "json"){
+        options.responseType = responseType;
+      }
+      axios(options)
+      .then(res=>{
+        if (res.config.responseType=="blob"){
+          resolve(new Blob([res.data],{
+            type: res.headers["content-type"].split(";")[0]
+          }))
+        }else{
+          resolve(res.data);
+          return res.data
+        }
+      }).catch(err=>{
+        if (err.response){
+          if (err.response.data)
+            reject(err.response.data)
+          else
+            reject(err.response);
+        }else{
+          reject(err)
+        }
+      })
+    })
+  }
+ 
+  /**
+  * @summary 批量执行的汇总进度
+  * @param {String} [pathbatch_id] 
+  * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
+  * @param {Function} [uploadProgress] 上传回调函数
+  * @param {Function} [downloadProgress] 下载回调函数
+  */
+  static async get_batch_status(pathbatch_id,cancelSource,uploadProgress,downloadProgress){
+    return await new Promise((resolve,reject)=>{
+      let responseType = "json";
+      let options = {
+        method:'get',
+        url:'/api/v1/tasks/batch/'+pathbatch_id+'/status',
+        data:{},
+        params:{},
+        headers:{
+          "Content-Type":"application/json"
+        },
+        onUploadProgress:uploadProgress,
+        onDownloadProgress:downloadProgress
+      }
+      // support wechat mini program
+      if (cancelSource!=undefined){
+        options.cancelToken = cancelSource.token
+      }
+      if (responseType != "json"){
+        options.responseType = responseType;
+      }
+      axios(options)
+      .then(res=>{
+        if (res.config.responseType=="blob"){
+          resolve(new Blob([res.data],{
+            type: res.headers["content-type"].split(";")[0]
+          }))
+        }else{
+          resolve(res.data);
+          return res.data
+        }
+      }).catch(err=>{
+        if (err.response){
+          if (err.response.data)
+            reject(err.response.data)
+          else
+            reject(err.response);
+        }else{
+          reject(err)
+        }
+      })
+    })
+  }
+ 
+  /**
+  * @summary 参数扫描：共享上游只跑一次
+  * @param {String} [priority] 调度队列；缺省按输入数据集行数决定
+  * @param {String} [user_id] 提交用户，调度器在同一队列内按用户公平分配
+  * @param {Boolean} [step_cache] 是否复用跨运行步骤缓存
+  * @param {String} [sample_mode] 在采样数据上做扫描，含义同 execute-async
+  * @param {Number} [sample_size] 采样行数或百分比
+  * @param {Number} [sample_seed] 采样随机种子
+  * @param {UserModel.PipelineSweepRequest} [pipelinesweeprequest] 
+  * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
+  * @param {Function} [uploadProgress] 上传回调函数
+  * @param {Function} [downloadProgress] 下载回调函数
+  */
+  static async execute_pipeline_sweep(priority,user_id,step_cache,sample_mode,sample_size,sample_seed,pipelinesweeprequest,cancelSource,uploadProgress,downloadProgress){
+    return await new Promise((resolve,reject)=>{
+      let responseType = "json";
+      let options = {
+        method:'post',
+        url:'/api/v1/tasks/execute-sweep',
+        data:pipelinesweeprequest,
+        params:{priority,user_id,step_cache,sample_mode,sample_size,sample_seed},
+        headers:{
+          "Content-Type":"application/json"
+        },
+        onUploadProgress:uploadProgress,
+        onDownloadProgress:downloadProgress
+      }
+      // support wechat mini program
+      if (cancelSource!=undefined){
+        options.cancelToken = cancelSource.token
+      }
+      if (responseType != "json"){
+        options.responseType = responseType;
+      }
+      axios(options)
+      .then(res=>{
+        if (res.config.responseType=="blob"){
+          resolve(new Blob([res.data],{
+            type: res.headers["content-type"].split(";")[0]
+          }))
+        }else{
+          resolve(res.data);
+          return res.data
+        }
+      }).catch(err=>{
+        if (err.response){
+          if (err.response.data)
+            reject(err.response.data)
+          else
+            reject(err.response);
+        }else{
+          reject(err)
+        }
+      })
+    })
+  }
+ 
+  /**
+  * @summary 参数扫描的对比表
+  * @param {String} [pathsweep_id] 
+  * @param {CancelTokenSource} [cancelSource] Axios Cancel Source 对象，可以取消该请求
+  * @param {Function} [uploadProgress] 上传回调函数
+  * @param {Function} [downloadProgress] 下载回调函数
+  */
+  static async get_sweep_comparison(pathsweep_id,cancelSource,uploadProgress,downloadProgress){
+    return await new Promise((resolve,reject)=>{
+      let responseType = "json";
+      let options = {
+        method:'get',
+        url:'/api/v1/tasks/sweep/'+pathsweep_id,
+        data:{},
+        params:{},
+        headers:{
+          "Content-Type":"application/json"
+        },
+        onUploadProgress:uploadProgress,
+        onDownloadProgress:downloadProgress
+      }
+      // support wechat mini program
+      if (cancelSource!=undefined){
+        options.cancelToken = cancelSource.token
+      }
+      if (responseType != "json"){
+        options.responseType = responseType;
+      }
+      axios(options)
+      .then(res=>{
+        if (res.config.responseType=="blob"){
+          resolve(new Blob([res.data],{
+            type: res.headers["content-type"].split(";")[0]
+          }))
+        }else{
+          resolve(res.data);
+          return res.data
+        }
+      }).catch(err=>{
+        if (err.response){
+          if (err.response.data)
+            reject(err.response.data)
+          else
+            reject(err.response);
+        }else{
+          reject(err)
+        }
+      })
+    })
+  }
 }
 
 // class tasks static method properties bind
@@ -1271,6 +1665,14 @@ tasks.get_task_stats.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/stats`
 */
 tasks.get_task_stats.path=`/api/v1/tasks/stats`
 /**
+* @description get_task_stats_rollups url链接，包含baseURL
+*/
+tasks.get_task_stats_rollups.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/stats/rollups`
+/**
+* @description get_task_stats_rollups url链接，不包含baseURL
+*/
+tasks.get_task_stats_rollups.path=`/api/v1/tasks/stats/rollups`
+/**
 * @description get_execution_status url链接，包含baseURL
 */
 tasks.get_execution_status.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/execution/{task_id}/status`
@@ -1326,6 +1728,54 @@ tasks.kill_execution.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/execution/
 * @description kill_execution url链接，不包含baseURL
 */
 tasks.kill_execution.path=`/api/v1/tasks/execution/{task_id}/kill`
+/**
+* @description resume_execution url链接，包含baseURL
+*/
+tasks.resume_execution.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/execution/{task_id}/resume`
+/**
+* @description resume_execution url链接，不包含baseURL
+*/
+tasks.resume_execution.path=`/api/v1/tasks/execution/{task_id}/resume`
+/**
+* @description fork_execution url链接，包含baseURL
+*/
+tasks.fork_execution.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/execution/{task_id}/fork`
+/**
+* @description fork_execution url链接，不包含baseURL
+*/
+tasks.fork_execution.path=`/api/v1/tasks/execution/{task_id}/fork`
+/**
+* @description execute_pipeline_batch url链接，包含baseURL
+*/
+tasks.execute_pipeline_batch.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/execute-batch`
+/**
+* @description execute_pipeline_batch url链接，不包含baseURL
+*/
+tasks.execute_pipeline_batch.path=`/api/v1/tasks/execute-batch`
+/**
+* @description get_batch_status url链接，包含baseURL
+*/
+tasks.get_batch_status.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/batch/{batch_id}/status`
+/**
+* @description get_batch_status url链接，不包含baseURL
+*/
+tasks.get_batch_status.path=`/api/v1/tasks/batch/{batch_id}/status`
+/**
+* @description execute_pipeline_sweep url链接，包含baseURL
+*/
+tasks.execute_pipeline_sweep.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/execute-sweep`
+/**
+* @description execute_pipeline_sweep url链接，不包含baseURL
+*/
+tasks.execute_pipeline_sweep.path=`/api/v1/tasks/execute-sweep`
+/**
+* @description get_sweep_comparison url链接，包含baseURL
+*/
+tasks.get_sweep_comparison.fullPath=`${axios.defaults.baseURL}/api/v1/tasks/sweep/{sweep_id}`
+/**
+* @description get_sweep_comparison url链接，不包含baseURL
+*/
+tasks.get_sweep_comparison.path=`/api/v1/tasks/sweep/{sweep_id}`
 
 export class pipelines {
  
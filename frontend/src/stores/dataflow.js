@@ -228,35 +228,71 @@ export const useDataflow = defineStore('useDataflow', () => {
 
     const execution = ref({})
     const executionStep = ref(null)
+    const updateExecutionStep = () => {
+        try {
+            if (execution.value.status === 'running') {
+                for (let key in execution.value.operators_detail) {
+                    let { index, status } = execution.value.operators_detail[key]
+                    if (status === 'running') {
+                        executionStep.value = index
+                        break
+                    }
+                }
+            } else {
+                for (let key in execution.value.operators_detail) {
+                    let { index, status } = execution.value.operators_detail[key]
+                    if (status === 'completed') {
+                        if (index > executionStep.value || executionStep.value === null) {
+                            executionStep.value = index
+                        }
+                    }
+                }
+            }
+        } catch (error) {
+            executionStep.value = null
+        }
+    }
     const getExecution = async (task_id) => {
         await proxy.$api.tasks.get_execution_status(task_id).then((res) => {
             if (res.code === 200) {
                 execution.value = res.data
-                try {
-                    if (execution.value.status === 'running') {
-                        for (let key in execution.value.operators_detail) {
-                            let { index, status } = execution.value.operators_detail[key]
-                            if (status === 'running') {
-                                executionStep.value = index
-                                break
-                            }
-                        }
-                    } else {
-                        for (let key in execution.value.operators_detail) {
-                            let { index, status } = execution.value.operators_detail[key]
-                            if (status === 'completed') {
-                                if (index > executionStep.value || executionStep.value === null) {
-                                    executionStep.value = index
-                                }
-                            }
-                        }
-                    }
-                } catch (error) {
-                    executionStep.value = null
-                }
+                updateExecutionStep()
             }
         })
     }
+    // 把 /execution/{task_id}/events 推送的单个事件合并进当前 execution
+    const applyExecutionEvent = (event) => {
+        let current = execution.value
+        if (!current || !event) return
+        // 游标不大于已应用的游标说明是重放的旧事件（日志会重复），丢弃；status 幂等，照常合并
+        if (event.type !== 'status' && event.cursor !== undefined && current.cursor !== undefined && event.cursor <= current.cursor) return
+        if (event.type === 'status') {
+            if (event.status) current.status = event.status
+            Object.assign(current, event.fields || {})
+        } else if (event.type === 'operator') {
+            current.operators_detail = current.operators_detail || {}
+            current.operators_detail[event.op_key] = {
+                ...(current.operators_detail[event.op_key] || {}),
+                ...(event.fields || {})
+            }
+        } else if (event.type === 'progress') {
+            current.operators_detail = current.operators_detail || {}
+            let detail = current.operators_detail[event.op_key] || {}
+            if (event.percentage !== null && event.percentage !== undefined) detail.progress_percentage = event.percentage
+            if (event.progress) detail.progress = event.progress
+            current.operators_detail[event.op_key] = detail
+        } else if (event.type === 'log') {
+            current.logs = current.logs || []
+            current.logs.push(event.line)
+            if (event.op_key) {
+                current.operator_logs = current.operator_logs || {}
+                current.operator_logs[event.op_key] = current.operator_logs[event.op_key] || []
+                current.operator_logs[event.op_key].push(event.line)
+            }
+        }
+        if (event.cursor !== undefined) current.cursor = event.cursor
+        updateExecutionStep()
+    }
     const clearExecution = () => {
         execution.value = {}
     }
@@ -315,6 +351,7 @@ export const useDataflow = defineStore('useDataflow', () => {
         execution,
         executionStep,
         getExecution,
+        applyExecutionEvent,
         clearExecution,
         isAutoConnection,
         switchAutoConnection,